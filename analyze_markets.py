@@ -5,13 +5,14 @@ DMR四象限多市场分析工具
 批量分析多个交易对的市场状态
 """
 
-import os
+import csv
 import sys
 import time
+import asyncio
 import argparse
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
+import numpy as np
 
 # 添加项目根目录到 Python 路径
 project_root = str(Path(__file__).parent)
@@ -19,87 +20,68 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 # 导入项目组件
-from dmr_analysis import DMRMarketAnalyzer
+from config.config import MARKET_SCANNER_CONFIG
+from data.market_scanner import scan_markets
+from strategy.dmr_panel import QUADRANT_NAMES
 
-# 默认分析的交易对列表
-DEFAULT_SYMBOLS = [
-    "BTC/USDT",
-    "ETH/USDT",
-    "BNB/USDT",
-    "SOL/USDT",
-    "XRP/USDT",
-    "DOGE/USDT",
-    "ADA/USDT",
-    "AVAX/USDT",
-    "MATIC/USDT",
-    "LINK/USDT"
-]
+# 市场状态描述、仓位建议与 Enet 值（与 DMRMarketAnalyzer 无持仓时一致，扫描不查询账户）
+STATE_INFO = {
+    'T1': ('多头趋势', '多头趋势行情', '浮盈加仓 双多', 200),
+    'T2': ('空头趋势', '空头趋势行情', '浮盈加仓 双空', -150),
+    'R1': ('高位震荡', '高位震荡行情', '对冲行情 锁空', 50),
+    'R2': ('低位震荡', '低位震荡行情', '对冲行情 锁多', -30),
+}
+
+SUMMARY_COLUMNS = ['symbol', 'market_state', 'market_description', 'position_advice',
+                   'dmr_4h_value', 'dmr_1h_value', 'dmr_4h_transition', 'dmr_1h_transition', 'enet_value']
 
 def parse_arguments():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(description='DMR四象限多市场分析工具')
-    parser.add_argument('-s', '--symbols', type=str, nargs='+', default=DEFAULT_SYMBOLS,
-                        help='要分析的交易对列表 (默认: 前10大加密货币)')
+    parser.add_argument('-s', '--symbols', type=str, nargs='+', default=None,
+                        help='要分析的交易对列表 (默认: 全部U本位永续合约)')
     parser.add_argument('-4h', '--dmr-4h', type=int, default=12,
                         help='4H DMR周期 (默认: 12)')
     parser.add_argument('-1h', '--dmr-1h', type=int, default=26,
                         help='1H DMR周期 (默认: 26)')
     parser.add_argument('-o', '--output', type=str, default='market_analysis_summary.csv',
                         help='输出汇总文件名 (默认: market_analysis_summary.csv)')
-    parser.add_argument('-d', '--output-dir', type=str, default='analysis_reports',
-                        help='输出报告目录 (默认: analysis_reports)')
+    parser.add_argument('-c', '--concurrency', type=int, default=MARKET_SCANNER_CONFIG['max_concurrency'],
+                        help='同时在途的请求数')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='显示详细信息')
     
     return parser.parse_args()
 
-def analyze_market(symbol, dmr_4h, dmr_1h, output_dir):
-    """分析单个市场状态"""
-    print(f"\n正在分析 {symbol} 市场状态...")
-    
-    # 初始化分析器
-    analyzer = DMRMarketAnalyzer(
-        symbol=symbol,
-        dmr_period_12=dmr_4h,
-        dmr_period_26=dmr_1h
-    )
-    
-    # 生成报告
-    report = analyzer.generate_analysis_report()
-    
-    # 如果分析失败，返回None
-    if report.startswith("无法生成报告"):
-        print(f"分析 {symbol} 失败")
-        return None
-    
-    # 确保输出目录存在
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 将报告保存到文件
-    base_currency = symbol.split('/')[0]
-    output_file = f"{output_dir}/{base_currency}_analysis.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"分析时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"交易对：{symbol}\n")
-        f.write(f"4H DMR周期: {dmr_4h}\n")
-        f.write(f"1H DMR周期: {dmr_1h}\n")
-        f.write("=" * 50 + "\n")
-        f.write(report)
+def classify_transitions(current, previous):
+    """批量判断DMR转变方向，与 DMRMarketAnalyzer.get_dmr_transition 一致"""
+    conditions = [
+        (previous < 0) & (current > 0),
+        (previous > 0) & (current < 0),
+        current > 0,
+    ]
+    return np.select(conditions, ['负转正', '正转负', '持续为正'], default='持续为负')
+
+def write_summary(path, result):
+    """一次性写出汇总CSV，返回各市场状态的交易对数量"""
+    states = QUADRANT_NAMES[result['quadrant']]
+    long_transitions = classify_transitions(result['dmr_long'], result['dmr_long_prev'])
+    short_transitions = classify_transitions(result['dmr_short'], result['dmr_short_prev'])
     
-    print(f"分析报告已保存至 {output_file}")
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_COLUMNS)
+        for row in zip(result['symbols'], states, result['dmr_long'], result['dmr_short'],
+                       long_transitions, short_transitions):
+            symbol, state, dmr_long, dmr_short, long_transition, short_transition = row
+            if state == 'UNKNOWN':
+                continue
+            _, description, advice, enet = STATE_INFO.get(state, ('未知', '未知行情', '无明确建议', 0))
+            writer.writerow([symbol, state, description, advice, dmr_long, dmr_short,
+                             long_transition, short_transition, enet])
     
-    # 返回分析结果摘要
-    return {
-        'symbol': symbol,
-        'market_state': analyzer.market_state,
-        'market_description': analyzer.get_market_description(),
-        'position_advice': analyzer.get_position_advice(),
-        'dmr_4h_value': analyzer.dmr_4h_value,
-        'dmr_1h_value': analyzer.dmr_1h_value,
-        'dmr_4h_transition': analyzer.get_dmr_transition(analyzer.dmr_4h_value, analyzer.dmr_4h_prev_value),
-        'dmr_1h_transition': analyzer.get_dmr_transition(analyzer.dmr_1h_value, analyzer.dmr_1h_prev_value),
-        'enet_value': analyzer.enet_value
-    }
+    values, counts = np.unique(states, return_counts=True)
+    return dict(zip(values, counts))
 
 def main():
     """主函数"""
@@ -109,47 +91,35 @@ def main():
     print("=" * 50)
     print("DMR四象限多市场分析工具")
     print("=" * 50)
-    print(f"分析交易对: {', '.join(args.symbols)}")
+    print(f"分析交易对: {', '.join(args.symbols) if args.symbols else '全部U本位永续合约'}")
     print(f"4H DMR周期: {args.dmr_4h}")
     print(f"1H DMR周期: {args.dmr_1h}")
     print("=" * 50)
     
-    # 分析结果列表
-    results = []
+    started = time.perf_counter()
+    result, scanner = asyncio.run(scan_markets(
+        args.symbols, args.dmr_4h, args.dmr_1h, config={'max_concurrency': args.concurrency}
+    ))
+    elapsed = time.perf_counter() - started
     
-    # 分析每个交易对
-    for symbol in args.symbols:
-        try:
-            result = analyze_market(symbol, args.dmr_4h, args.dmr_1h, args.output_dir)
-            if result:
-                results.append(result)
-                # 休眠1秒，避免API请求过于频繁
-                time.sleep(1)
-        except Exception as e:
-            print(f"分析 {symbol} 时发生错误: {e}")
+    if args.verbose:
+        for key, error in scanner.errors.items():
+            print(f"分析 {key} 时发生错误: {error}")
     
-    # 如果有分析结果，生成汇总报告
-    if results:
-        # 转换为DataFrame
-        df = pd.DataFrame(results)
-        
-        # 保存为CSV
-        df.to_csv(args.output, index=False)
-        print(f"\n汇总分析报告已保存至 {args.output}")
-        
-        # 打印市场状态分布统计
-        market_state_counts = df['market_state'].value_counts()
-        print("\n市场状态分布统计:")
-        for state, count in market_state_counts.items():
-            state_desc = {
-                'T1': '多头趋势',
-                'T2': '空头趋势',
-                'R1': '高位震荡',
-                'R2': '低位震荡'
-            }.get(state, '未知')
-            print(f"{state} ({state_desc}): {count} 个交易对")
-    else:
+    if len(result['symbols']) == 0:
         print("没有成功分析任何交易对")
+        return
+    
+    state_counts = write_summary(args.output, result)
+    print(f"\n扫描 {len(result['symbols'])} 个交易对，请求 {scanner.request_count} 次，"
+          f"失败 {len(scanner.errors)} 次，限速等待 {scanner.budget.waited_seconds:.1f}s，耗时 {elapsed:.1f}s")
+    print(f"汇总分析报告已保存至 {args.output} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+    
+    # 打印市场状态分布统计
+    print("\n市场状态分布统计:")
+    for state, count in sorted(state_counts.items(), key=lambda item: -item[1]):
+        state_desc = STATE_INFO.get(state, ('未知',))[0]
+        print(f"{state} ({state_desc}): {count} 个交易对")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
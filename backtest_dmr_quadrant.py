@@ -19,14 +19,20 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from strategy.DMRQuadrantStrategy import DMRQuadrantStrategy
 from config.config import SYMBOL, POSITION_SIZE, TIMEFRAME_SHORT
 from data.data_fetcher import DataFetcher
+from monitoring.backtest_metrics import compute_metrics
 
 class DMRQuadrantBacktest:
     """DMR四象限量化策略回测类"""
     
-    def __init__(self, data_path=None, symbol=SYMBOL, initial_capital=10000):
+    def __init__(self, data_path=None, symbol=SYMBOL, initial_capital=10000, timeframe=TIMEFRAME_SHORT,
+                 fee_rate=0.0004):
         self.data_path = data_path
         self.symbol = symbol
         self.initial_capital = initial_capital
+        # 回测K线周期，决定夏普等指标的年化系数
+        self.timeframe = timeframe
+        # 估算手续费率（按成交名义金额），只用于统计手续费拖累，不计入模拟资金
+        self.fee_rate = fee_rate
         self.results = None
         
     def load_data(self):
@@ -39,7 +45,7 @@ class DMRQuadrantBacktest:
             # 初始化数据获取器
             fetcher = DataFetcher()
             # 获取历史数据
-            df = fetcher.get_historical_data(self.symbol, TIMEFRAME_1H, limit=1000)
+            df = fetcher.get_historical_data(self.symbol, self.timeframe, limit=1000)
             # 保存数据
             if df is not None and self.data_path:
                 os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
@@ -66,6 +72,8 @@ class DMRQuadrantBacktest:
         results['capital'] = capital
         results['position'] = 0
         results['trade_type'] = ''
+        # 每根K线收盘时的持仓，用于统计持仓时间占比
+        held = np.zeros(len(results))
         
         # 创建一个模拟的OrderExecutor
         class MockOrderExecutor:
@@ -207,6 +215,7 @@ class DMRQuadrantBacktest:
                 })
             
             # 更新资金
+            held[i] = position
             if position != 0:
                 # 计算未实现盈亏
                 if position > 0:  # 多仓
@@ -234,51 +243,30 @@ class DMRQuadrantBacktest:
                 'profit': profit
             })
             
-        # 计算回测指标
+        # 计算回测指标：净值与成交数组上一次向量化计算
         trades_df = pd.DataFrame(trades)
-        if not trades_df.empty:
-            profit_trades = trades_df[trades_df['profit'] > 0]
-            loss_trades = trades_df[trades_df['profit'] < 0]
-            
-            win_rate = len(profit_trades) / len(trades_df) if len(trades_df) > 0 else 0
-            
-            # 计算最大回撤
-            results['drawdown'] = results['capital'].cummax() - results['capital']
-            max_drawdown = results['drawdown'].max()
-            max_drawdown_pct = max_drawdown / results['capital'].cummax().max() * 100
-            
-            # 计算收益率
-            total_return = (capital - self.initial_capital) / self.initial_capital * 100
-            
-            # 计算夏普比率
-            daily_returns = results['capital'].pct_change().dropna()
-            sharpe_ratio = daily_returns.mean() / daily_returns.std() * np.sqrt(252) if daily_returns.std() != 0 else 0
-            
-            backtest_metrics = {
-                'initial_capital': self.initial_capital,
-                'final_capital': capital,
-                'total_return_pct': total_return,
-                'win_rate': win_rate,
-                'trade_count': len(trades_df),
-                'profit_trades': len(profit_trades),
-                'loss_trades': len(loss_trades),
-                'max_drawdown': max_drawdown,
-                'max_drawdown_pct': max_drawdown_pct,
-                'sharpe_ratio': sharpe_ratio
-            }
-        else:
-            backtest_metrics = {
-                'initial_capital': self.initial_capital,
-                'final_capital': capital,
-                'total_return_pct': 0,
-                'win_rate': 0,
-                'trade_count': 0,
-                'profit_trades': 0,
-                'loss_trades': 0,
-                'max_drawdown': 0,
-                'max_drawdown_pct': 0,
-                'sharpe_ratio': 0
-            }
+        equity = results['capital'].to_numpy(dtype=float)
+        trade_pnl = [trade['profit'] for trade in trades if 'profit' in trade]
+        traded_notional = self._traded_notional(trades)
+        metrics = compute_metrics(
+            equity, self.timeframe, position=held, trade_pnl=trade_pnl, traded_notional=traded_notional,
+            fees=[notional * self.fee_rate for notional in traded_notional]
+        )
+        backtest_metrics = {
+            'initial_capital': self.initial_capital,
+            'final_capital': capital,
+            'total_return_pct': (capital - self.initial_capital) / self.initial_capital * 100,
+            'win_rate': metrics['win_rate'],
+            'trade_count': len(trades_df),
+            'profit_trades': metrics['winning_trades'],
+            'loss_trades': metrics['losing_trades'],
+            'max_drawdown': metrics['max_drawdown_amount'],
+            'max_drawdown_pct': metrics['max_drawdown'] * 100,
+            'sharpe_ratio': metrics['sharpe_ratio'],
+            **{key: metrics[key] for key in ('cagr', 'sortino_ratio', 'calmar_ratio', 'max_drawdown_duration',
+                                             'exposure', 'turnover', 'fees', 'fee_drag', 'profit_factor',
+                                             'closed_trades')},
+        }
             
         self.results = {
             'metrics': backtest_metrics,
@@ -289,6 +277,17 @@ class DMRQuadrantBacktest:
         
         return self.results
     
+    @staticmethod
+    def _traded_notional(trades):
+        """每笔成交的名义金额：开仓按开仓数量，平仓按被平掉的上一笔开仓数量"""
+        notional = []
+        open_position = 0
+        for trade in trades:
+            if 'position' in trade:
+                open_position = trade['position']
+            notional.append(abs(open_position) * trade['price'])
+        return notional
+
     def run_backtest_bt(self):
         """使用backtrader运行回测"""
         # 这里可以实现基于backtrader的回测
@@ -4,8 +4,10 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 
 class EnhancedLogger:
-    def __init__(self, strategy_name: str, log_file: str = None):
+    def __init__(self, strategy_name: str, log_file: str = None, pnl_engine=None):
         self.strategy_name = strategy_name
+        # 可选的实时盈亏引擎，交易周期日志中的盈亏从中读取
+        self.pnl_engine = pnl_engine
         self.logger = self.setup_logger(log_file)
         
     def setup_logger(self, log_file: Optional[str] = None) -> logging.Logger:
@@ -118,6 +120,13 @@ class EnhancedLogger:
     def calculate_pnl(self, position_before: Dict[str, Any], position_after: Dict[str, Any], 
                      order_result: Dict[str, Any]) -> Dict[str, Any]:
         """计算盈亏"""
+        if self.pnl_engine is not None:
+            pnl = self.pnl_engine.get_pnl(strategy=self.strategy_name)
+            return {
+                'realized_pnl': pnl['realized'] - pnl['fees'],
+                'unrealized_pnl': pnl['unrealized'],
+                'total_pnl': pnl['total']
+            }
         # 简化的盈亏计算
         return {
             'realized_pnl': 0,  # 实际应该根据具体交易计算
@@ -0,0 +1,364 @@
+"""
+实时盈亏引擎
+
+消费成交（含手续费）和标记价格更新，按策略、仓位槽、交易对三个维度维护已实现/未实现盈亏：
+- 每笔成交只更新所属持仓的数量与均价，并把数量/成本的差额累加到对应的汇总账户，O(1)
+- 每个汇总账户按交易对保存 Σ数量 与 Σ数量x均价，未实现盈亏 = Σ数量 x 标记价 - Σ成本，读取时计算，
+  价格更新只写入最新标记价，O(1)
+- 按交易所服务器时间的 UTC 日界重置当日盈亏（当日已实现 - 当日手续费 + 未实现盈亏的当日变化）
+
+成交可直接调用 on_fill，也可订阅用户数据流的 ORDER_TRADE_UPDATE：
+下单方通过 register_order 登记订单ID或客户端订单ID所属的策略/槽位，未登记的成交记入 default_strategy，
+没有默认策略时等待登记 pending_ttl 秒，超时记入 'unattributed'。
+多个策略/槽位共用的净额订单通过 register_allocations 登记，成交按分配顺序拆分入账。
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.config import PNL_ENGINE_CONFIG
+
+DAY_MS = 24 * 60 * 60 * 1000
+# 数量比较容差
+QUANTITY_EPSILON = 1e-12
+UNATTRIBUTED = 'unattributed'
+
+
+class PnLAccount:
+    """一个维度（策略/槽位/交易对/全部）的盈亏累计"""
+
+    __slots__ = ('realized', 'fees', 'daily_realized', 'daily_fees', 'day_start_unrealized', 'exposure')
+
+    def __init__(self):
+        self.realized = 0.0
+        self.fees = 0.0
+        self.daily_realized = 0.0
+        self.daily_fees = 0.0
+        self.day_start_unrealized = 0.0
+        # 交易对 -> [Σ带符号数量, Σ带符号数量 x 均价]
+        self.exposure: Dict[str, List[float]] = {}
+
+    def apply(self, symbol: str, delta_quantity: float, delta_cost: float, realized: float, fee: float):
+        exposure = self.exposure.get(symbol)
+        if exposure is None:
+            exposure = self.exposure[symbol] = [0.0, 0.0]
+        exposure[0] += delta_quantity
+        exposure[1] += delta_cost
+        self.realized += realized
+        self.daily_realized += realized
+        self.fees += fee
+        self.daily_fees += fee
+
+    def unrealized(self, marks: Dict[str, float]) -> float:
+        total = 0.0
+        for symbol, (quantity, cost) in self.exposure.items():
+            mark = marks.get(symbol)
+            if mark is not None and abs(quantity) > QUANTITY_EPSILON:
+                total += quantity * mark - cost
+        return total
+
+    def summary(self, marks: Dict[str, float]) -> Dict[str, float]:
+        unrealized = self.unrealized(marks)
+        return {
+            'realized': self.realized,
+            'fees': self.fees,
+            'unrealized': unrealized,
+            'total': self.realized - self.fees + unrealized,
+            'daily': self.daily_realized - self.daily_fees + unrealized - self.day_start_unrealized,
+        }
+
+
+class PnLEngine:
+    """按成交和标记价格增量计算盈亏"""
+
+    def __init__(self, clock: Optional[Callable[[], int]] = None, exchange=None,
+                 default_strategy: Optional[str] = None, config: Dict[str, Any] = None):
+        """
+        Args:
+            clock: 返回交易所服务器时间(毫秒)的函数，如 DataFetcher.get_timestamp；用于 UTC 日界
+            exchange: 可选的 ccxt 交易所实例，用于把推送中的交易对ID（BTCUSDT）转换为统一写法
+            default_strategy: 未登记订单的成交记入的策略（单策略进程使用）
+            config: 覆盖 PNL_ENGINE_CONFIG
+        """
+        self.clock = clock or (lambda: int(time.time() * 1000))
+        self.exchange = exchange
+        self.default_strategy = default_strategy
+        self.config = dict(PNL_ENGINE_CONFIG)
+        if config:
+            self.config.update(config)
+        # (策略, 槽位, 交易对) -> [带符号数量, 均价]
+        self.positions: Dict[Tuple[str, Optional[str], str], List[float]] = {}
+        # (策略, 交易对) -> 持仓槽位，用于未指定槽位的减仓
+        self._slots: Dict[Tuple[str, str], List[str]] = {}
+        self.accounts: Dict[tuple, PnLAccount] = {}
+        self.marks: Dict[str, float] = {}
+        self.registered: Dict[str, Tuple[str, Optional[str]]] = {}
+        # 订单ID -> [[策略, 槽位, 待分配数量], ...]
+        self.allocations: Dict[str, List[list]] = {}
+        self._pending: Dict[str, List[tuple]] = {}
+        self.day = self.clock() // DAY_MS
+        self.fill_count = 0
+        self._lock = threading.RLock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    # ------------------------------------------------------------------ 事件源
+    def attach_stream(self, stream):
+        """订阅用户数据流的成交推送"""
+        stream.subscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+
+    def attach_price_cache(self, price_cache):
+        """以价格缓存的更新作为标记价格"""
+        price_cache.add_listener(self.on_mark)
+
+    def _symbol_of(self, market_id: str) -> str:
+        if self.exchange is None:
+            return market_id
+        try:
+            return self.exchange.safe_symbol(market_id, None, None, 'swap').split(':')[0]
+        except Exception:
+            return market_id
+
+    def register_order(self, order_id, strategy: str, slot: Optional[str] = None):
+        """登记订单（订单ID或客户端订单ID）所属的策略/槽位；先到的成交随即入账"""
+        if order_id is None:
+            return
+        order_id = str(order_id)
+        with self._lock:
+            self.registered[order_id] = (strategy, slot)
+            fills = self._pending.pop(order_id, [])
+            # 同一列表也登记在另一个ID下，清空后另一个键随过期清理一并移除
+            pending, fills[:] = list(fills), []
+            for fill in pending:
+                self._apply_fill(strategy, slot, *fill[1:])
+
+    def register_allocations(self, order_id, allocations):
+        """
+        登记多个策略/槽位共用的订单，成交按顺序拆分给各分配，超出登记数量的部分记入最后一个分配
+
+        Args:
+            allocations: [(策略, 槽位, 数量), ...]
+        """
+        if order_id is None or not allocations:
+            return
+        order_id = str(order_id)
+        with self._lock:
+            entries = self.allocations[order_id] = [[strategy, slot, float(quantity)]
+                                                    for strategy, slot, quantity in allocations]
+            fills = self._pending.pop(order_id, [])
+            pending, fills[:] = list(fills), []
+            for fill in pending:
+                self._apply_allocated(entries, *fill[1:])
+
+    def alias_order(self, alias, *order_ids):
+        """替换订单（超时重挂/转市价）沿用原订单的归属：按第一个已登记的原订单ID登记新ID"""
+        if alias is None:
+            return
+        with self._lock:
+            for order_id in order_ids:
+                if order_id is None:
+                    continue
+                entries = self.allocations.get(str(order_id))
+                if entries is not None:
+                    # 共用同一份待分配数量，替换订单继续按原分配顺序拆分
+                    self.allocations[str(alias)] = entries
+                    fills = self._pending.pop(str(alias), [])
+                    pending, fills[:] = list(fills), []
+                    for fill in pending:
+                        self._apply_allocated(entries, *fill[1:])
+                    return
+                owner = self.registered.get(str(order_id))
+                if owner is not None:
+                    self.register_order(alias, *owner)
+                    return
+
+    def _apply_allocated(self, entries: List[list], symbol: str, side: str, quantity: float, price: float,
+                         fee: float):
+        remaining = quantity
+        for entry in entries:
+            if remaining <= QUANTITY_EPSILON:
+                return
+            share = remaining if entry is entries[-1] else min(entry[2], remaining)
+            if share <= QUANTITY_EPSILON:
+                continue
+            entry[2] -= share
+            remaining -= share
+            self._apply_fill(entry[0], entry[1], symbol, side, share, price, fee * share / quantity)
+
+    def _on_order_update(self, event: Dict[str, Any]):
+        order = event.get('o') or {}
+        if order.get('x') != 'TRADE':
+            return
+        quantity = float(order.get('l') or 0)
+        if quantity <= 0:
+            return
+        price = float(order['L'])
+        fee = self._fee_value(float(order.get('n') or 0), order.get('N'))
+        fill = (time.monotonic(), self._symbol_of(order['s']), order['S'].lower(), quantity, price, fee)
+        with self._lock:
+            entries = self.allocations.get(order.get('c')) or self.allocations.get(str(order.get('i')))
+            if entries is not None:
+                self._apply_allocated(entries, *fill[1:])
+                return
+            owner = self.registered.get(order.get('c')) or self.registered.get(str(order.get('i')))
+            if owner is None and self.default_strategy is not None:
+                owner = (self.default_strategy, None)
+            if owner is None:
+                # 按订单ID和客户端订单ID都可以登记认领
+                fills = self._pending.get(str(order.get('i')))
+                if fills is None:
+                    fills = []
+                    for key in (str(order.get('i')), order.get('c')):
+                        if key:
+                            self._pending[key] = fills
+                fills.append(fill)
+                return
+            self._apply_fill(owner[0], owner[1], *fill[1:])
+
+    def _fee_value(self, fee: float, asset: Optional[str]) -> float:
+        """手续费折算为计价资产；非计价资产按 <资产>/USDT 的标记价折算，无价格时忽略"""
+        if not fee or asset is None or asset in self.config['quote_assets']:
+            return fee
+        mark = self.marks.get(f'{asset}/USDT')
+        if mark is None:
+            self.logger.warning(f"手续费资产 {asset} 无价格，未计入盈亏: {fee}")
+            return 0.0
+        return fee * mark
+
+    # ------------------------------------------------------------------ 事件
+    def on_fill(self, strategy: str, symbol: str, side: str, quantity: float, price: float, fee: float = 0.0,
+                slot: Optional[str] = None):
+        """
+        一笔成交
+
+        Args:
+            side: 'buy' / 'sell'
+            fee: 手续费（计价资产）
+            slot: 仓位槽；为 None 的减仓按开仓先后从该策略的槽位中扣减
+        """
+        with self._lock:
+            self._apply_fill(strategy, slot, symbol, side.lower(), float(quantity), float(price), float(fee))
+
+    def on_mark(self, symbol: str, price: float):
+        """标记价格更新"""
+        with self._lock:
+            self._roll()
+            self.marks[symbol] = float(price)
+
+    def _apply_fill(self, strategy: str, slot: Optional[str], symbol: str, side: str, quantity: float,
+                    price: float, fee: float):
+        self._roll()
+        self._expire_pending()
+        self.fill_count += 1
+        signed = quantity if side == 'buy' else -quantity
+        if slot is None:
+            # 未指定槽位的减仓：按开仓先后扣减反向持仓的槽位
+            for slot_name in list(self._slots.get((strategy, symbol), [])):
+                held = self.positions[(strategy, slot_name, symbol)][0]
+                if abs(signed) <= QUANTITY_EPSILON:
+                    break
+                if held * signed >= 0:
+                    continue
+                part = -held if abs(held) < abs(signed) else signed
+                self._apply_position(strategy, slot_name, symbol, part, price, fee * abs(part) / quantity)
+                signed -= part
+            if abs(signed) <= QUANTITY_EPSILON:
+                return
+            fee = fee * abs(signed) / quantity
+        self._apply_position(strategy, slot, symbol, signed, price, fee)
+
+    def _apply_position(self, strategy: str, slot: Optional[str], symbol: str, signed: float, price: float,
+                        fee: float):
+        key = (strategy, slot, symbol)
+        position = self.positions.get(key)
+        if position is None:
+            position = self.positions[key] = [0.0, 0.0]
+            if slot is not None:
+                self._slots.setdefault((strategy, symbol), []).append(slot)
+        old_quantity, old_price = position
+        new_quantity = old_quantity + signed
+        realized = 0.0
+        if abs(old_quantity) <= QUANTITY_EPSILON or old_quantity * signed > 0:
+            new_price = (abs(old_quantity) * old_price + abs(signed) * price) / abs(new_quantity)
+        else:
+            closed = min(abs(signed), abs(old_quantity))
+            realized = closed * (price - old_price) * (1.0 if old_quantity > 0 else -1.0)
+            if abs(new_quantity) <= QUANTITY_EPSILON:
+                new_quantity, new_price = 0.0, 0.0
+            elif new_quantity * old_quantity > 0:
+                new_price = old_price
+            else:
+                # 反手：剩余数量按本次成交价开仓
+                new_price = price
+        position[0], position[1] = new_quantity, new_price
+
+        delta_quantity = new_quantity - old_quantity
+        delta_cost = new_quantity * new_price - old_quantity * old_price
+        for account_key in (('all',), ('strategy', strategy), ('symbol', symbol), ('slot', strategy, slot)):
+            account = self.accounts.get(account_key)
+            if account is None:
+                account = self.accounts[account_key] = PnLAccount()
+            account.apply(symbol, delta_quantity, delta_cost, realized, fee)
+
+    def _expire_pending(self):
+        if not self._pending:
+            return
+        cutoff = time.monotonic() - self.config['pending_ttl']
+        for order_id in [oid for oid, fills in self._pending.items() if not fills or fills[0][0] < cutoff]:
+            fills = self._pending.pop(order_id, [])
+            pending, fills[:] = list(fills), []
+            for fill in pending:
+                self._apply_fill(UNATTRIBUTED, None, *fill[1:])
+
+    def _roll(self):
+        """跨过 UTC 日界时重置当日盈亏（每天一次，遍历全部账户）"""
+        day = self.clock() // DAY_MS
+        if day == self.day:
+            return
+        self.day = day
+        for account in self.accounts.values():
+            account.daily_realized = 0.0
+            account.daily_fees = 0.0
+            account.day_start_unrealized = account.unrealized(self.marks)
+        self.logger.info(f"盈亏引擎已按 UTC 日界重置当日盈亏: day={day}")
+
+    # ------------------------------------------------------------------ 查询
+    def get_pnl(self, strategy: Optional[str] = None, slot: Optional[str] = None,
+                symbol: Optional[str] = None) -> Dict[str, float]:
+        """
+        查询盈亏 {'realized', 'fees', 'unrealized', 'total', 'daily'}
+
+        strategy + slot 查询槽位，只给 strategy 查询策略，只给 symbol 查询交易对，都不给查询全部
+        """
+        if strategy is not None:
+            key = ('slot', strategy, slot) if slot is not None else ('strategy', strategy)
+        elif symbol is not None:
+            key = ('symbol', symbol)
+        else:
+            key = ('all',)
+        with self._lock:
+            self._roll()
+            account = self.accounts.get(key) or PnLAccount()
+            return account.summary(self.marks)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """全部维度的盈亏，用于日志和监控"""
+        result = {'strategies': {}, 'slots': {}, 'symbols': {}}
+        with self._lock:
+            self._roll()
+            for key, account in self.accounts.items():
+                if key[0] == 'strategy':
+                    result['strategies'][key[1]] = account.summary(self.marks)
+                elif key[0] == 'symbol':
+                    result['symbols'][key[1]] = account.summary(self.marks)
+                elif key[0] == 'slot' and key[2] is not None:
+                    result['slots'][f'{key[1]}/{key[2]}'] = account.summary(self.marks)
+        return result
+
+    def gauges(self) -> Dict[str, float]:
+        """按策略导出的盈亏指标，注册到 MetricsRegistry 后随监控接口输出"""
+        values = {}
+        for strategy, summary in self.snapshot()['strategies'].items():
+            for field in ('realized', 'unrealized', 'fees', 'daily', 'total'):
+                values[f'pnl_{field}{{strategy="{strategy}"}}'] = summary[field]
+        return values
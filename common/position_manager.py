@@ -23,8 +23,14 @@ class UnifiedPositionManager:
                 'current_position': {'side': None, 'amount': 0, 'entry_price': 0}
             }
         }
+        # 持仓变化监听器 (strategy_name, position, add_times)，如风控引擎
+        self.listeners = []
         self.logger = logging.getLogger(self.__class__.__name__)
         
+    def add_listener(self, listener):
+        """订阅持仓变化"""
+        self.listeners.append(listener)
+        
     def validate_position_rules(self, strategy_name: str, action: str, amount: float, current_price: float = None) -> bool:
         """验证加仓/持仓规则"""
         strategy = self.strategies[strategy_name]
@@ -107,6 +113,8 @@ class UnifiedPositionManager:
             strategy['current_add_times'] = 0
             
         self.logger.info(f"{strategy_name}策略持仓更新: {action} {side} {amount}@{price}, 当前持仓: {position}")
+        for listener in self.listeners:
+            listener(strategy_name, position.copy(), strategy['current_add_times'])
         
     def get_strategy_position(self, strategy_name: str) -> Dict[str, Any]:
         """获取策略持仓信息"""
@@ -0,0 +1,179 @@
+"""
+下单前风控快速检查
+
+TradingValidator.pre_trade_validation 每次下单前都重新查询交易所持仓，
+UnifiedPositionManager.validate_position_rules 通过抛异常表达拒绝，
+LongTermRiskManager.calculate_position_risk 还会请求 fetch_balance。
+下单前检查只读取内存中的持仓状态和本地计数，按 RISK_CONFIG 检查：
+单策略最大持仓、加仓次数与浮盈加仓阈值、对冲等额容忍度、当日成交次数、最小下单间隔，
+返回结构化的 GateVerdict，不抛异常、不做任何 I/O。
+当日成交次数按交易所服务器时间的 UTC 日界重置，只在登记下单或达到上限时读取时钟。
+
+    python -m common.pre_trade_gate    # 单次检查耗时基准
+"""
+import time
+from typing import Dict, Optional
+
+from common.pnl_engine import DAY_MS
+from config.risk_config import RISK_CONFIG
+
+OPEN_ACTIONS = ('open_long', 'open_short', 'add_position')
+
+
+class GateVerdict:
+    """一次下单前检查的结果"""
+
+    __slots__ = ('allowed', 'check', 'reason')
+
+    def __init__(self, allowed: bool, check: Optional[str] = None, reason: str = ''):
+        self.allowed = allowed
+        self.check = check
+        self.reason = reason
+
+    def __bool__(self):
+        return self.allowed
+
+    def __repr__(self):
+        return f"GateVerdict(allowed={self.allowed}, check={self.check}, reason={self.reason!r})"
+
+
+# 通过时复用同一个结果对象
+PASSED = GateVerdict(True)
+
+
+class PreTradeGate:
+    """基于内存状态的下单前检查"""
+
+    def __init__(self, position_manager, config: Dict = None, clock=time.monotonic, day_clock=None):
+        """
+        Args:
+            position_manager: UnifiedPositionManager，读取各策略当前持仓与加仓次数
+            config: 覆盖 RISK_CONFIG 中 position_rules / risk_limits 的阈值
+            clock: 时间函数（秒），用于最小下单间隔
+            day_clock: 返回交易所服务器时间(毫秒)的函数，如 DataFetcher.get_timestamp；用于 UTC 日界
+        """
+        self.strategies = position_manager.strategies
+        limits = {**RISK_CONFIG['position_rules'], **RISK_CONFIG['risk_limits']}
+        if config:
+            limits.update(config)
+        # 阈值展开为属性，检查路径上不再查字典
+        self.max_add_times = limits['max_add_times']
+        self.max_position = limits['base_position_size'] * (1 + limits['max_add_times'])
+        self.add_profit_threshold = limits['add_profit_threshold']
+        self.hedge_tolerance = limits['hedge_balance_tolerance']
+        self.max_daily_trades = limits['max_daily_trades']
+        self.min_order_interval = limits['min_order_interval']
+        self.clock = clock
+        self.day_clock = day_clock or (lambda: int(time.time() * 1000))
+        self.day = self.day_clock() // DAY_MS
+        self.daily_trades = 0
+        self.last_order_at: Dict[str, float] = {}
+
+    def check(self, strategy_name: str, action: str, amount: float, price: float,
+              now: Optional[float] = None) -> GateVerdict:
+        """
+        检查一笔下单
+
+        Args:
+            strategy_name: 'long_term' / 'short_term'
+            action: 'open_long' / 'open_short' / 'add_position' / 'close'
+            amount: 下单金额（U）
+            price: 当前价格
+            now: 当前时间（秒），缺省使用 clock()
+
+        Returns:
+            GateVerdict: allowed 为 False 时 check 为未通过的检查项
+        """
+        if action not in OPEN_ACTIONS:
+            # 平仓只会降低风险，不受限制
+            return PASSED
+        strategy = self.strategies.get(strategy_name)
+        if strategy is None:
+            return GateVerdict(False, 'strategy', f"未知策略: {strategy_name}")
+
+        now = self.clock() if now is None else now
+        last = self.last_order_at.get(strategy_name)
+        if last is not None and now - last < self.min_order_interval:
+            return GateVerdict(False, 'min_order_interval',
+                               f"距上次下单 {now - last:.1f}s < {self.min_order_interval}s")
+        if self.daily_trades >= self.max_daily_trades:
+            self._roll()
+            if self.daily_trades >= self.max_daily_trades:
+                return GateVerdict(False, 'max_daily_trades', f"当日成交 {self.daily_trades}/{self.max_daily_trades}")
+
+        position = strategy['current_position']
+        if action == 'open_long':
+            side = 'LONG'
+        elif action == 'open_short':
+            side = 'SHORT'
+        else:
+            side = position['side']
+        # 反手开仓前原持仓先平掉，不计入持仓上限与对冲等额
+        held = position['amount'] if position['side'] == side else 0
+        if action == 'add_position':
+            if strategy['current_add_times'] >= self.max_add_times:
+                return GateVerdict(False, 'max_add_times',
+                                   f"已加仓 {strategy['current_add_times']}/{self.max_add_times} 次")
+            entry = position['entry_price']
+            if not held or entry <= 0:
+                return GateVerdict(False, 'add_profit', "无持仓时不能加仓")
+            change = (price - entry) / entry
+            if position['side'] == 'SHORT':
+                change = -change
+            if change < self.add_profit_threshold:
+                return GateVerdict(False, 'add_profit', f"浮盈 {change:.2%} 未达到加仓阈值 {self.add_profit_threshold:.2%}")
+        if held + amount > self.max_position:
+            return GateVerdict(False, 'max_position', f"持仓 {held + amount:.2f}U 超过上限 {self.max_position:.2f}U")
+
+        # 对冲状态（两个策略持有相反方向）下多空须等额
+        other = self.strategies['short_term' if strategy_name == 'long_term' else 'long_term']['current_position']
+        if held > 0 and other['side'] and other['side'] != side and other['amount'] > 0:
+            mine = held + amount
+            if abs(mine - other['amount']) > max(mine, other['amount']) * self.hedge_tolerance:
+                return GateVerdict(False, 'hedge_tolerance',
+                                   f"对冲状态下多空不等额: {strategy_name} {mine:.2f}U vs 另一策略 {other['amount']:.2f}U")
+        return PASSED
+
+    def record_order(self, strategy_name: str, now: Optional[float] = None):
+        """下单成功后登记，用于当日成交次数和最小下单间隔"""
+        self._roll()
+        self.daily_trades += 1
+        self.last_order_at[strategy_name] = self.clock() if now is None else now
+
+    def reset_daily(self):
+        self.daily_trades = 0
+
+    def _roll(self):
+        """跨过 UTC 日界时清零当日成交次数"""
+        day = self.day_clock() // DAY_MS
+        if day != self.day:
+            self.day = day
+            self.reset_daily()
+
+
+def benchmark(iterations: int = 200000) -> Dict[str, float]:
+    """单次检查耗时基准（微秒），分别测量通过与被拒绝的路径"""
+    from common.position_manager import UnifiedPositionManager
+
+    manager = UnifiedPositionManager()
+    manager.update_position('long_term', 'LONG', 20.0, 100.0, 'open')
+    manager.update_position('short_term', 'SHORT', 20.0, 100.0, 'open')
+    gate = PreTradeGate(manager)
+    cases = {
+        'pass_open': ('long_term', 'open_long', 0.0, 101.0),
+        'reject_add_profit': ('long_term', 'add_position', 20.0, 100.5),
+        'pass_close': ('short_term', 'close', 20.0, 101.0),
+    }
+    results = {}
+    for name, args in cases.items():
+        check = gate.check
+        started = time.perf_counter()
+        for _ in range(iterations):
+            check(*args, now=0.0)
+        results[name] = (time.perf_counter() - started) / iterations * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    for name, micros in benchmark().items():
+        print(f"{name}: {micros:.3f} µs/次")
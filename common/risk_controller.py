@@ -1,8 +1,10 @@
 import logging
 import time
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from config.risk_config import RISK_CONFIG
+
 class RiskController:
     def __init__(self, position_manager, exchange):
         self.position_manager = position_manager
@@ -18,16 +20,31 @@ class RiskController:
             'max_daily_loss': 0.05,         # 最大日损失5%
             'position_check_interval': 30   # 持仓检查间隔30秒
         }
+        # 可选的事件驱动风控引擎，挂载后全量扫描只作为低频兜底
+        self.risk_engine = None
+        # 可选的结构化数组持仓簿，挂载后对冲/加仓检查按全部 (策略, 交易对, 方向) 向量化归约
+        self.position_book = None
+        
+    def attach_risk_engine(self, risk_engine):
+        """挂载事件驱动风控引擎"""
+        self.risk_engine = risk_engine
+
+    def attach_position_book(self, position_book):
+        """挂载持仓簿（见 common.position_book.PositionBook.attach_position_manager）"""
+        self.position_book = position_book
         
     def continuous_risk_monitoring(self):
-        """持续风险监控"""
+        """持续风险监控（挂载风控引擎后按 fallback_scan_interval 低频兜底扫描）"""
         while not self.emergency_stop_triggered:
             try:
                 anomalies = self.detect_all_anomalies()
                 if anomalies:
                     self.handle_anomalies(anomalies)
                     
-                time.sleep(self.risk_thresholds['position_check_interval'])
+                if self.risk_engine is not None:
+                    time.sleep(RISK_CONFIG['risk_engine']['fallback_scan_interval'])
+                else:
+                    time.sleep(self.risk_thresholds['position_check_interval'])
                 
             except Exception as e:
                 self.logger.error(f"风险监控异常: {e}")
@@ -61,6 +78,8 @@ class RiskController:
         
     def detect_hedge_imbalance(self) -> Optional[Dict[str, Any]]:
         """检测对冲不平衡"""
+        if self.position_book is not None:
+            return self._detect_book_hedge_imbalance()
         if not self.position_manager.is_hedging_state():
             return None
             
@@ -80,8 +99,36 @@ class RiskController:
             
         return None
         
+    def _detect_book_hedge_imbalance(self) -> Optional[Dict[str, Any]]:
+        """所有交易对的多空金额一次归约，返回不平衡率最高的一个"""
+        violations = self.position_book.hedge_imbalances(self.risk_thresholds['max_position_imbalance'])
+        if not violations:
+            return None
+        worst = violations[0]
+        return {
+            'type': 'hedge_imbalance',
+            'description': f"{worst['symbol']}对冲不平衡: 多仓{worst['long_amount']:.2f}U vs "
+                           f"空仓{worst['short_amount']:.2f}U, 不平衡率{worst['imbalance_ratio']:.2%}",
+            'severity': 'critical',
+            'timestamp': datetime.now(),
+            'data': {**worst, 'violations': len(violations)}
+        }
+
     def detect_add_overflow(self) -> Optional[Dict[str, Any]]:
         """检测加仓溢出"""
+        if self.position_book is not None:
+            overflows = self.position_book.add_overflows()
+            if len(overflows):
+                overflow = self.position_book.describe(overflows[0])
+                return {
+                    'type': 'add_overflow',
+                    'description': f"{overflow['strategy']}策略{overflow['symbol']}加仓溢出: "
+                                   f"{overflow['current_times']}/{overflow['max_add_times']}",
+                    'severity': 'critical',
+                    'timestamp': datetime.now(),
+                    'data': overflow
+                }
+            return None
         for strategy_name, strategy in self.position_manager.strategies.items():
             if strategy['current_add_times'] > strategy['max_add_times']:
                 return {
@@ -0,0 +1,344 @@
+"""
+事件驱动的增量风控引擎
+
+RiskController.continuous_risk_monitoring 每 30 秒全量扫描一次异常，风险最长 30 秒才被发现，
+且没有变化时也在重复计算。风控引擎改为由持仓、价格和成交事件触发：
+- 每个事件只按差额更新总敞口、对冲两侧金额、加仓溢出计数、已实现/未实现盈亏等聚合量，O(1)
+- 只运行受该事件影响的检查；检查从正常变为违规时立即上报，严重违规直接交给 RiskController 处理
+- 每项检查的耗时记录到指标注册表的直方图 risk_check_seconds.<检查名>
+
+持仓金额沿用 UnifiedPositionManager 的口径（U），未实现盈亏按 Σ(±金额/开仓价) x 最新价 - Σ(±金额) 计算。
+挂载价格触发索引后，每个策略持仓按 emergency_stop_loss 登记紧急止损价，价格穿越时作为严重违规上报。
+日初权益与当日成交次数按交易所服务器时间的 UTC 日界重置（与 PnLEngine 相同），由事件到达时检查。
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from common.pnl_engine import DAY_MS
+from common.trigger_index import ABOVE, BELOW
+from config.risk_config import RISK_CONFIG
+from monitoring.metrics_registry import metrics
+
+# 金额比较容差
+AMOUNT_EPSILON = 1e-9
+
+
+class RiskEngine:
+    """按事件增量更新风险聚合量并立即上报违规"""
+
+    def __init__(self, position_manager, controller=None, config: Dict[str, Any] = None, registry=None,
+                 clock: Optional[Callable[[], int]] = None):
+        """
+        Args:
+            position_manager: UnifiedPositionManager，启动时读取初始持仓并订阅持仓变化
+            controller: 可选的 RiskController，严重违规交给其 handle_anomalies（自动修复/紧急停止）
+            config: 覆盖 RISK_CONFIG['risk_engine'] 与 RISK_CONFIG['risk_limits'] 中的阈值
+            registry: 指标注册表，默认进程内共享的 metrics
+            clock: 返回交易所服务器时间(毫秒)的函数，如 DataFetcher.get_timestamp；用于 UTC 日界
+        """
+        self.position_manager = position_manager
+        self.controller = controller
+        self.config = {**RISK_CONFIG['risk_limits'], **RISK_CONFIG['risk_engine']}
+        if config:
+            self.config.update(config)
+        self.registry = registry or metrics
+        self.clock = clock or (lambda: int(time.time() * 1000))
+        self.day = self.clock() // DAY_MS
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        # 各策略当前持仓 {'side', 'amount', 'entry_price'} 与加仓次数
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        self.add_times: Dict[str, int] = {}
+        self.max_add_times: Dict[str, int] = {}
+        # 增量聚合量
+        self.gross_exposure = 0.0
+        self.net_quantity = 0.0
+        self.net_notional = 0.0
+        self.add_overflows = 0
+        self.realized_pnl = 0.0
+        self.daily_trades = 0
+        self.last_price: Optional[float] = None
+        self.capital = float(self.config['capital'])
+        self.peak_equity = self.capital
+        self.daily_start_equity = self.capital
+        # 当前处于违规状态的检查 -> 异常
+        self.active: Dict[str, Dict[str, Any]] = {}
+        self.event_count = 0
+        self._lock = threading.RLock()
+        # 可选的价格触发索引与各策略的紧急止损触发编号
+        self.trigger_index = None
+        self.symbol: Optional[str] = None
+        self.emergency_triggers: Dict[str, int] = {}
+
+        for strategy_name in position_manager.strategies:
+            self._load(strategy_name)
+        if hasattr(position_manager, 'add_listener'):
+            position_manager.add_listener(self.on_position)
+
+    # ------------------------------------------------------------------ 事件源
+    def attach_price_cache(self, price_cache, symbol: str):
+        """订阅价格缓存的价格更新"""
+        def on_update(updated_symbol: str, price: float):
+            if updated_symbol == symbol:
+                self.on_price(price)
+
+        price_cache.add_listener(on_update)
+
+    def attach_trigger_index(self, trigger_index, symbol: str):
+        """挂载价格触发索引，为现有及之后的持仓登记紧急止损"""
+        with self._lock:
+            self.trigger_index = trigger_index
+            self.symbol = symbol
+            for strategy_name in self.positions:
+                self._arm_emergency_stop(strategy_name)
+
+    def attach_stream(self, stream):
+        """订阅用户数据流的成交推送（ORDER_TRADE_UPDATE 中 x=TRADE 的事件）"""
+        stream.subscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+
+    def _on_order_update(self, event: Dict[str, Any]):
+        order = event.get('o') or {}
+        if order.get('x') != 'TRADE':
+            return
+        self.on_fill(float(order.get('rp') or 0), price=float(order.get('L') or 0) or None)
+
+    # ------------------------------------------------------------------ 事件
+    def on_position(self, strategy_name: str, position: Dict[str, Any], add_times: int):
+        """持仓变化事件：只替换该策略的贡献"""
+        with self._lock:
+            self.event_count += 1
+            self._roll()
+            self._apply_position(strategy_name, position, add_times)
+            self._arm_emergency_stop(strategy_name)
+            self._check('gross_exposure', self._check_exposure)
+            self._check('hedge_imbalance', self._check_hedge_imbalance)
+            self._check(f'add_overflow.{strategy_name}', lambda: self._check_add_overflow(strategy_name))
+            self._check_equity()
+
+    def on_price(self, price: float):
+        """价格事件：只重算权益相关的检查"""
+        with self._lock:
+            self.event_count += 1
+            self._roll()
+            self.last_price = float(price)
+            self._check_equity()
+
+    def on_fill(self, realized_pnl: float = 0.0, price: Optional[float] = None):
+        """成交事件：累加已实现盈亏与当日成交次数"""
+        with self._lock:
+            self.event_count += 1
+            self._roll()
+            self.realized_pnl += realized_pnl
+            self.daily_trades += 1
+            if price:
+                self.last_price = float(price)
+            self._check('daily_trades', self._check_daily_trades)
+            self._check_equity()
+
+    def reset_daily(self):
+        """新交易日：以当前权益作为日初权益"""
+        with self._lock:
+            self.daily_start_equity = self.equity()
+            self.daily_trades = 0
+            self.active.pop('daily_trades', None)
+            self.active.pop('daily_loss', None)
+
+    def _roll(self):
+        """跨过 UTC 日界时重置日初权益与当日成交次数"""
+        day = self.clock() // DAY_MS
+        if day == self.day:
+            return
+        self.day = day
+        self.reset_daily()
+        self.logger.info(f"风控引擎已按 UTC 日界重置日初权益: day={day}")
+
+    # ------------------------------------------------------------------ 紧急止损
+    def _arm_emergency_stop(self, strategy_name: str):
+        """按持仓方向和开仓价重新登记紧急止损：多头下穿、空头上穿，空仓时撤销"""
+        if self.trigger_index is None:
+            return
+        trigger_id = self.emergency_triggers.pop(strategy_name, None)
+        if trigger_id is not None:
+            self.trigger_index.remove(trigger_id)
+        self.active.pop(f'emergency_stop_loss.{strategy_name}', None)
+        position = self.positions.get(strategy_name) or {}
+        entry_price = float(position.get('entry_price') or 0)
+        if not position.get('side') or not position.get('amount') or entry_price <= 0:
+            return
+        stop_loss = self.config['emergency_stop_loss']
+        if str(position['side']).upper() == 'LONG':
+            direction, price = BELOW, entry_price * (1 - stop_loss)
+        else:
+            direction, price = ABOVE, entry_price * (1 + stop_loss)
+        self.emergency_triggers[strategy_name] = self.trigger_index.add(
+            self.symbol, direction, self._on_emergency_stop, price=price, tag=strategy_name)
+
+    def _on_emergency_stop(self, trigger, price: float):
+        with self._lock:
+            strategy_name = trigger.tag
+            if self.emergency_triggers.get(strategy_name) != trigger.trigger_id:
+                return
+            del self.emergency_triggers[strategy_name]
+            self.event_count += 1
+            anomaly = self._anomaly(
+                'emergency_stop_loss',
+                f"{strategy_name}策略触发紧急止损: 价格{price} 穿越 {trigger.price:.6f}",
+                'critical', {'strategy': strategy_name, 'price': price, 'stop_price': trigger.price}
+            )
+            self.active[f'emergency_stop_loss.{strategy_name}'] = anomaly
+            self._raise(f'emergency_stop_loss.{strategy_name}', anomaly)
+
+    # ------------------------------------------------------------------ 聚合量
+    @staticmethod
+    def _contribution(position: Optional[Dict[str, Any]]):
+        """单个策略持仓对 (总敞口, 净数量, 净金额) 的贡献"""
+        if not position or not position.get('side') or not position.get('amount'):
+            return 0.0, 0.0, 0.0
+        amount = float(position['amount'])
+        sign = 1.0 if str(position['side']).upper() == 'LONG' else -1.0
+        entry_price = float(position.get('entry_price') or 0)
+        quantity = amount / entry_price if entry_price > 0 else 0.0
+        return amount, sign * quantity, sign * amount
+
+    def _apply_position(self, strategy_name: str, position: Dict[str, Any], add_times: int):
+        old_exposure, old_quantity, old_notional = self._contribution(self.positions.get(strategy_name))
+        new_exposure, new_quantity, new_notional = self._contribution(position)
+        self.gross_exposure += new_exposure - old_exposure
+        self.net_quantity += new_quantity - old_quantity
+        self.net_notional += new_notional - old_notional
+        self.positions[strategy_name] = dict(position)
+
+        max_times = self.max_add_times.get(strategy_name, 0)
+        was_overflow = self.add_times.get(strategy_name, 0) > max_times
+        self.add_times[strategy_name] = add_times
+        self.add_overflows += int(add_times > max_times) - int(was_overflow)
+
+    def _load(self, strategy_name: str):
+        """从持仓管理器读取单个策略的状态（启动和自动修复后使用）"""
+        strategy = self.position_manager.strategies[strategy_name]
+        self.max_add_times[strategy_name] = strategy['max_add_times']
+        self._apply_position(strategy_name, strategy['current_position'], strategy['current_add_times'])
+
+    def unrealized_pnl(self) -> float:
+        if self.last_price is None:
+            return 0.0
+        return self.net_quantity * self.last_price - self.net_notional
+
+    def equity(self) -> float:
+        return self.capital + self.realized_pnl + self.unrealized_pnl()
+
+    def _amount(self, strategy_name: str) -> float:
+        position = self.positions.get(strategy_name) or {}
+        return float(position.get('amount') or 0) if position.get('side') else 0.0
+
+    # ------------------------------------------------------------------ 检查
+    def _check(self, name: str, check: Callable[[], Optional[Dict[str, Any]]]):
+        """运行一项检查并记录耗时，状态变化时上报"""
+        started = time.perf_counter()
+        anomaly = check()
+        self.registry.histogram(f'risk_check_seconds.{name.split(".")[0]}').observe(time.perf_counter() - started)
+        if anomaly is None:
+            if self.active.pop(name, None) is not None:
+                self.logger.info(f"风险恢复正常: {name}")
+            return
+        if name in self.active:
+            self.active[name] = anomaly
+            return
+        self.active[name] = anomaly
+        self._raise(name, anomaly)
+
+    def _raise(self, name: str, anomaly: Dict[str, Any]):
+        if anomaly['severity'] != 'critical':
+            self.logger.warning(f"检测到风险: {anomaly['description']}")
+            return
+        self.logger.critical(f"严重风险: {anomaly['description']}")
+        if self.controller is None:
+            return
+        self.controller.handle_anomalies([anomaly])
+        # 自动修复可能直接改写了持仓管理器中的状态，重新读取受影响的策略
+        strategy_name = anomaly.get('data', {}).get('strategy')
+        if strategy_name in self.position_manager.strategies:
+            self._load(strategy_name)
+            if self.add_times[strategy_name] <= self.max_add_times[strategy_name]:
+                self.active.pop(name, None)
+
+    @staticmethod
+    def _anomaly(anomaly_type: str, description: str, severity: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {'type': anomaly_type, 'description': description, 'severity': severity,
+                'timestamp': datetime.now(), 'data': data}
+
+    def _check_exposure(self):
+        limit = self.config['max_gross_exposure']
+        if self.gross_exposure <= limit + AMOUNT_EPSILON:
+            return None
+        return self._anomaly('gross_exposure', f"总敞口超限: {self.gross_exposure:.2f}U > {limit:.2f}U",
+                             'critical', {'gross_exposure': self.gross_exposure, 'limit': limit})
+
+    def _check_hedge_imbalance(self):
+        long_amount = self._amount('long_term')
+        short_amount = self._amount('short_term')
+        if long_amount <= 0 or short_amount <= 0:
+            return None
+        imbalance_ratio = abs(long_amount - short_amount) / max(long_amount, short_amount, 1)
+        if imbalance_ratio <= self.config['max_position_imbalance']:
+            return None
+        return self._anomaly(
+            'hedge_imbalance',
+            f"对冲不平衡: 多仓{long_amount:.2f}U vs 空仓{short_amount:.2f}U, 不平衡率{imbalance_ratio:.2%}",
+            'critical', {'long_amount': long_amount, 'short_amount': short_amount, 'imbalance_ratio': imbalance_ratio}
+        )
+
+    def _check_add_overflow(self, strategy_name: str):
+        current, maximum = self.add_times.get(strategy_name, 0), self.max_add_times.get(strategy_name, 0)
+        if current <= maximum:
+            return None
+        return self._anomaly('add_overflow', f"{strategy_name}策略加仓溢出: {current}/{maximum}",
+                             'critical', {'strategy': strategy_name, 'current_times': current})
+
+    def _check_daily_trades(self):
+        limit = self.config['max_daily_trades']
+        if self.daily_trades <= limit:
+            return None
+        return self._anomaly('daily_trades', f"当日成交次数超限: {self.daily_trades}/{limit}",
+                             'high', {'daily_trades': self.daily_trades})
+
+    def _check_equity(self):
+        """回撤与日损失共用一次权益计算"""
+        equity = self.equity()
+        if equity > self.peak_equity:
+            self.peak_equity = equity
+        self._check('drawdown', lambda: self._check_drawdown(equity))
+        self._check('daily_loss', lambda: self._check_daily_loss(equity))
+
+    def _check_drawdown(self, equity: float):
+        drawdown = (self.peak_equity - equity) / self.peak_equity if self.peak_equity > 0 else 0.0
+        if drawdown <= self.config['max_drawdown']:
+            return None
+        return self._anomaly('drawdown', f"回撤超限: {drawdown:.2%} (峰值{self.peak_equity:.2f}U, 当前{equity:.2f}U)",
+                             'critical', {'drawdown': drawdown, 'equity': equity, 'peak_equity': self.peak_equity})
+
+    def _check_daily_loss(self, equity: float):
+        loss = (self.daily_start_equity - equity) / self.capital if self.capital > 0 else 0.0
+        if loss <= self.config['max_daily_loss']:
+            return None
+        return self._anomaly('daily_loss', f"日损失超限: {loss:.2%}", 'critical', {'daily_loss': loss, 'equity': equity})
+
+    # ------------------------------------------------------------------ 查询
+    def get_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'gross_exposure': self.gross_exposure,
+                'long_term_amount': self._amount('long_term'),
+                'short_term_amount': self._amount('short_term'),
+                'add_overflows': self.add_overflows,
+                'realized_pnl': self.realized_pnl,
+                'unrealized_pnl': self.unrealized_pnl(),
+                'equity': self.equity(),
+                'peak_equity': self.peak_equity,
+                'daily_trades': self.daily_trades,
+                'active': sorted(self.active),
+                'events': self.event_count,
+            }
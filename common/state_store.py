@@ -0,0 +1,297 @@
+"""
+事务性状态存储
+
+所有策略的持仓、仓位槽、已执行信号、订单与成交保存在同一个 SQLite 数据库中（WAL 模式）。
+每次更新是一个事务：同一事务中的多处写入要么全部生效、要么全部回滚，提交时只做一次 fsync；
+进程崩溃后不会留下写了一半的文件。重启时按主键/索引查询，不再解析 JSON 文件。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from config.config import STATE_STORE_CONFIG
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    strategy TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    amount REAL NOT NULL,
+    entry_price REAL,
+    data TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (strategy, symbol)
+);
+CREATE TABLE IF NOT EXISTS slots (
+    strategy TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    status TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL,
+    order_id TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (strategy, symbol, slot)
+);
+CREATE TABLE IF NOT EXISTS signals (
+    strategy TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    bar_time INTEGER NOT NULL,
+    signal TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (strategy, symbol, bar_time, signal)
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    client_order_id TEXT,
+    strategy TEXT,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    position_side TEXT,
+    order_type TEXT,
+    amount REAL,
+    price REAL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_strategy_status ON orders (strategy, status);
+CREATE INDEX IF NOT EXISTS idx_orders_client_id ON orders (client_order_id);
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT,
+    strategy TEXT,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    source TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fills_strategy_symbol ON fills (strategy, symbol, ts);
+CREATE INDEX IF NOT EXISTS idx_fills_order ON fills (order_id);
+"""
+
+
+def _bar_time_ms(bar_time) -> int:
+    if hasattr(bar_time, 'timestamp'):
+        return int(bar_time.timestamp() * 1000)
+    return int(bar_time)
+
+
+class StateStore:
+    """SQLite WAL 状态存储，同一进程内共享一个连接"""
+
+    def __init__(self, path: str = None, config: Dict[str, Any] = None):
+        """
+        Args:
+            path: 数据库文件路径，默认 STATE_STORE_CONFIG['path']；':memory:' 用于测试
+            config: 覆盖 STATE_STORE_CONFIG
+        """
+        self.config = dict(STATE_STORE_CONFIG)
+        if config:
+            self.config.update(config)
+        self.path = path or self.config['path']
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 自行管理事务（isolation_level=None），由 transaction() 显式 BEGIN/COMMIT
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                    timeout=self.config['busy_timeout_ms'] / 1000)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(f"PRAGMA synchronous={self.config['synchronous']}")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    @contextmanager
+    def transaction(self):
+        """事务：块内的所有写入一次提交（一次 fsync），异常时回滚；嵌套时内层使用保存点"""
+        with self._lock:
+            savepoint = f'sp{self._depth}' if self._depth else None
+            self.conn.execute(f'SAVEPOINT {savepoint}' if savepoint else 'BEGIN IMMEDIATE')
+            self._depth += 1
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute(f'ROLLBACK TO {savepoint}' if savepoint else 'ROLLBACK')
+                if savepoint:
+                    self.conn.execute(f'RELEASE {savepoint}')
+                raise
+            else:
+                self.conn.execute(f'RELEASE {savepoint}' if savepoint else 'COMMIT')
+            finally:
+                self._depth -= 1
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # ------------------------------------------------------------------ 策略持仓
+    def save_position(self, strategy: str, symbol: str, position: Optional[Dict[str, Any]]):
+        """保存策略持仓，position 为 None 表示空仓"""
+        with self.transaction() as conn:
+            if not position:
+                conn.execute('DELETE FROM positions WHERE strategy = ? AND symbol = ?', (strategy, symbol))
+                return
+            conn.execute(
+                'INSERT OR REPLACE INTO positions (strategy, symbol, side, amount, entry_price, data, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (strategy, symbol, position['side'], float(position['amount']), position.get('entry_price'),
+                 json.dumps(position, default=str), time.time())
+            )
+
+    def load_position(self, strategy: str, symbol: str) -> Optional[Dict[str, Any]]:
+        """读取策略持仓，无持仓返回 None"""
+        with self._lock:
+            row = self.conn.execute('SELECT data FROM positions WHERE strategy = ? AND symbol = ?',
+                                    (strategy, symbol)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def import_json_position(self, strategy: str, symbol: str, json_path: str) -> bool:
+        """
+        迁移旧的 JSON 持仓文件：数据库中尚无该策略持仓时导入，导入后将文件重命名为 .migrated
+
+        Returns:
+            bool: 是否导入了持仓
+        """
+        if not os.path.exists(json_path):
+            return False
+        imported = False
+        try:
+            with open(json_path, 'r') as f:
+                position = json.load(f)
+            if position and self.load_position(strategy, symbol) is None:
+                self.save_position(strategy, symbol, position)
+                imported = True
+        except (OSError, json.JSONDecodeError):
+            pass
+        os.replace(json_path, json_path + '.migrated')
+        return imported
+
+    # ------------------------------------------------------------------ 仓位槽
+    def save_slots(self, strategy: str, symbol: str, slots: Dict[str, Optional[Dict[str, Any]]]):
+        """保存全部仓位槽（空槽删除），一个事务"""
+        now = time.time()
+        with self.transaction() as conn:
+            for slot_name, slot in slots.items():
+                if not isinstance(slot, dict) or slot.get('filled', 0) <= 0:
+                    conn.execute('DELETE FROM slots WHERE strategy = ? AND symbol = ? AND slot = ?',
+                                 (strategy, symbol, slot_name))
+                    continue
+                order = slot.get('order') or {}
+                conn.execute(
+                    'INSERT OR REPLACE INTO slots (strategy, symbol, slot, status, quantity, price, order_id, '
+                    'updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (strategy, symbol, slot_name, slot.get('status', 'filled'), float(slot['filled']),
+                     slot.get('price'), order.get('id') if isinstance(order, dict) else None, now)
+                )
+
+    def load_slots(self, strategy: str, symbol: str) -> Dict[str, Dict[str, Any]]:
+        """读取持有数量的仓位槽 {槽位: {'status', 'order', 'filled', 'price'}}"""
+        with self._lock:
+            rows = self.conn.execute('SELECT slot, quantity, price FROM slots WHERE strategy = ? AND symbol = ?',
+                                     (strategy, symbol)).fetchall()
+        return {row['slot']: {'status': 'filled', 'order': None, 'filled': row['quantity'], 'price': row['price']}
+                for row in rows}
+
+    # ------------------------------------------------------------------ 信号
+    def record_signal(self, strategy: str, symbol: str, bar_time, signal: str) -> bool:
+        """
+        记录已执行的信号
+
+        Returns:
+            bool: 首次记录返回 True；同一根K线的同一信号已记录过（如重启后重放）返回 False
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO signals (strategy, symbol, bar_time, signal, created_at) VALUES (?, ?, ?, ?, ?)',
+                (strategy, symbol, _bar_time_ms(bar_time), signal, time.time())
+            )
+            return cursor.rowcount == 1
+
+    def has_signal(self, strategy: str, symbol: str, bar_time, signal: str) -> bool:
+        """同一根K线的同一信号是否已记录（已执行）"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM signals WHERE strategy = ? AND symbol = ? AND bar_time = ? AND signal = ?',
+                (strategy, symbol, _bar_time_ms(bar_time), signal)).fetchone()
+        return row is not None
+
+    def last_signal(self, strategy: str, symbol: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT bar_time, signal FROM signals WHERE strategy = ? AND symbol = ? ORDER BY bar_time DESC LIMIT 1',
+                (strategy, symbol)).fetchone()
+        return dict(row) if row else None
+
+    # ------------------------------------------------------------------ 订单与成交
+    def record_order(self, order: Dict[str, Any], strategy: str = None, position_side: str = None):
+        """记录或更新订单（ccxt 统一格式）"""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT INTO orders (order_id, client_order_id, strategy, symbol, side, position_side, order_type, '
+                'amount, price, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(order_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at',
+                (str(order['id']), order.get('clientOrderId'), strategy, order.get('symbol'), order.get('side'),
+                 position_side, order.get('type'), order.get('amount'), order.get('price'),
+                 order.get('status') or 'open', now, now)
+            )
+
+    def update_order_status(self, order_id: str, status: str):
+        with self.transaction() as conn:
+            conn.execute('UPDATE orders SET status = ?, updated_at = ? WHERE order_id = ?',
+                         (status, time.time(), str(order_id)))
+
+    def open_orders(self, strategy: str = None) -> List[Dict[str, Any]]:
+        """未结束的订单"""
+        sql = "SELECT * FROM orders WHERE status IN ('open', 'PENDING', 'NEW', 'PARTIALLY_FILLED')"
+        args = ()
+        if strategy is not None:
+            sql += ' AND strategy = ?'
+            args = (strategy,)
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, args).fetchall()]
+
+    def record_fill(self, symbol: str, side: str, quantity: float, price: float, order_id: str = None,
+                    strategy: str = None, source: str = 'exchange', ts: float = None):
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT INTO fills (order_id, strategy, symbol, side, quantity, price, source, ts) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (None if order_id is None else str(order_id), strategy, symbol, side, float(quantity), float(price),
+                 source, ts or time.time())
+            )
+
+    def fills(self, strategy: str = None, symbol: str = None, since: float = None) -> List[Dict[str, Any]]:
+        """按策略/交易对/时间查询成交"""
+        clauses, args = [], []
+        for column, value in (('strategy', strategy), ('symbol', symbol)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                args.append(value)
+        if since is not None:
+            clauses.append('ts >= ?')
+            args.append(since)
+        sql = 'SELECT * FROM fills' + (' WHERE ' + ' AND '.join(clauses) if clauses else '') + ' ORDER BY ts'
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, args).fetchall()]
+
+
+_stores: Dict[str, StateStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_state_store(path: str = None) -> StateStore:
+    """进程内按路径共享的状态存储"""
+    path = path or STATE_STORE_CONFIG['path']
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = StateStore(path)
+        return _stores[path]
+
@@ -1,32 +1,28 @@
-import json
-import os
 from datetime import datetime
 from typing import Dict, Optional, Any
 
+from common.state_store import get_state_store
+
 class StrategyPositionManager:
     """策略持仓管理器 - 跟踪每个策略的独立持仓"""
     
-    def __init__(self, strategy_name: str, symbol: str):
+    def __init__(self, strategy_name: str, symbol: str, state_store=None):
         self.strategy_name = strategy_name
         self.symbol = symbol
+        # 旧版 JSON 持仓文件，仅用于首次加载时迁移
         self.position_file = f"/tmp/{strategy_name}_position_{symbol.replace('/', '_')}.json"
+        self.state_store = state_store or get_state_store()
         self.position = self._load_position()
     
     def _load_position(self) -> Optional[Dict[str, Any]]:
-        """从文件加载策略持仓"""
-        try:
-            if os.path.exists(self.position_file):
-                with open(self.position_file, 'r') as f:
-                    return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
-        return None
+        """从状态存储加载策略持仓"""
+        self.state_store.import_json_position(self.strategy_name, self.symbol, self.position_file)
+        return self.state_store.load_position(self.strategy_name, self.symbol)
     
     def _save_position(self):
-        """保存策略持仓到文件"""
+        """保存策略持仓到状态存储"""
         try:
-            with open(self.position_file, 'w') as f:
-                json.dump(self.position, f, default=str, indent=2)
+            self.state_store.save_position(self.strategy_name, self.symbol, self.position)
         except Exception as e:
             print(f"保存{self.strategy_name}策略持仓失败: {e}")
     
@@ -60,5 +56,4 @@ class StrategyPositionManager:
     def clear_position(self):
         """清除策略持仓记录"""
         self.position = None
-        if os.path.exists(self.position_file):
-            os.remove(self.position_file)
\ No newline at end of file
+        self._save_position()
\ No newline at end of file
@@ -1,19 +1,34 @@
 import logging
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
+
+from common.pre_trade_gate import GateVerdict
 
 class TradingValidator:
-    def __init__(self, exchange, position_manager):
+    def __init__(self, exchange, position_manager, position_cache=None, pre_trade_gate=None):
         self.exchange = exchange
         self.position_manager = position_manager
+        # 可选的共享持仓缓存，挂载后同步持仓从内存读取
+        self.position_cache = position_cache
+        # 可选的下单前快速检查，挂载后交易前验证只读内存状态
+        self.pre_trade_gate = pre_trade_gate
         self.logger = logging.getLogger(self.__class__.__name__)
         
-    def pre_trade_validation(self, strategy_name: str, signal: Dict[str, Any], current_price: float) -> bool:
-        """交易前三重验证"""
+    def pre_trade_validation(self, strategy_name: str, signal: Dict[str, Any],
+                             current_price: float) -> Union[bool, GateVerdict]:
+        """
+        交易前三重验证
+
+        挂载下单前检查时直接返回 GateVerdict（布尔值即是否放行），拒绝不抛异常、放行不写日志；
+        未挂载时走交易所持仓同步的完整验证，失败抛异常。
+        """
         try:
             # 1. 信号验证
             self.validate_signal(signal)
             
+            if self.pre_trade_gate is not None:
+                return self.pre_trade_gate.check(strategy_name, signal['action'], signal['amount'], current_price)
+            
             # 2. 实时同步交易所持仓
             exchange_positions = self.sync_exchange_positions()
             
@@ -33,6 +48,11 @@ class TradingValidator:
             self.logger.error(f"{strategy_name}策略交易前验证失败: {e}")
             raise
             
+    def record_order(self, strategy_name: str):
+        """下单成功后登记到下单前检查（当日成交次数与最小下单间隔）"""
+        if self.pre_trade_gate is not None:
+            self.pre_trade_gate.record_order(strategy_name)
+            
     def post_trade_validation(self, strategy_name: str, order_id: str, expected_result: Dict[str, Any]) -> Dict[str, Any]:
         """交易后验证"""
         try:
@@ -71,9 +91,13 @@ class TradingValidator:
     def sync_exchange_positions(self) -> Dict[str, Any]:
         """同步交易所持仓"""
         try:
-            positions = self.exchange.fetch_positions()
+            if self.position_cache is not None:
+                positions = self.position_cache.get_all_positions()
+            else:
+                positions = self.exchange.fetch_positions()
             # 过滤出有持仓的记录
-            active_positions = {pos['symbol']: pos for pos in positions if pos['size'] > 0}
+            active_positions = {pos['symbol']: pos for pos in positions
+                                if float(pos.get('contracts') or pos.get('size') or 0) > 0}
             return active_positions
         except Exception as e:
             self.logger.error(f"同步交易所持仓失败: {e}")
@@ -0,0 +1,232 @@
+"""
+价格触发索引
+
+交易所端无法挂出的触发条件（槽位移动止损、RISK_CONFIG 的 emergency_stop_loss、象限价格提醒）
+在本地按价格索引，每个交易对维护两张按价格排序的触发价表：
+- 下穿表 BELOW：价格 <= 触发价时触发（多头止损、空头止盈、下跌提醒），最高的触发价最近
+- 上穿表 ABOVE：价格 >= 触发价时触发（空头止损、多头止盈、上涨提醒），最低的触发价最近
+每次标记价格更新只二分定位表的一端并弹出已穿越的触发价，O(log n + 触发数)，不扫描全部触发条件。
+
+移动止损另按锚点（多头为最高价、空头为最低价）排序，新高/新低时只更新锚点被超越的那一段，
+触发价随之上移/下移，未被超越的移动止损不做任何计算。
+"""
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from monitoring.metrics_registry import metrics
+
+BELOW = 'below'
+ABOVE = 'above'
+
+
+class Trigger:
+    """一个价格触发条件，触发后自动移出索引"""
+
+    __slots__ = ('trigger_id', 'symbol', 'direction', 'price', 'callback', 'trail_pct', 'anchor', 'tag')
+
+    def __init__(self, trigger_id: int, symbol: str, direction: str, price: float, callback: Callable,
+                 trail_pct: Optional[float] = None, anchor: Optional[float] = None, tag: Any = None):
+        self.trigger_id = trigger_id
+        self.symbol = symbol
+        self.direction = direction
+        self.price = price
+        self.callback = callback
+        self.trail_pct = trail_pct
+        self.anchor = anchor
+        self.tag = tag
+
+    def __repr__(self):
+        trail = f" trail={self.trail_pct} anchor={self.anchor}" if self.trail_pct is not None else ''
+        return f"Trigger({self.trigger_id} {self.symbol} {self.direction} {self.price}{trail} tag={self.tag})"
+
+
+class _SymbolBook:
+    """单个交易对的触发价表；表项为 (价格, 编号, Trigger)，编号保证排序稳定且不比较 Trigger"""
+
+    __slots__ = ('below', 'above', 'trail_below', 'trail_above')
+
+    def __init__(self):
+        self.below: List[Tuple[float, int, Trigger]] = []
+        self.above: List[Tuple[float, int, Trigger]] = []
+        # 移动止损的锚点表：下穿按最高价升序，上穿按 -最低价 升序，锚点被超越的都在表头
+        self.trail_below: List[Tuple[float, int, Trigger]] = []
+        self.trail_above: List[Tuple[float, int, Trigger]] = []
+
+    def levels(self, direction: str) -> List[Tuple[float, int, Trigger]]:
+        return self.below if direction == BELOW else self.above
+
+    def anchors(self, direction: str) -> List[Tuple[float, int, Trigger]]:
+        return self.trail_below if direction == BELOW else self.trail_above
+
+    def __len__(self):
+        return len(self.below) + len(self.above)
+
+
+def _remove(entries: List[Tuple[float, int, Trigger]], key: float, trigger_id: int):
+    index = bisect.bisect_left(entries, (key, trigger_id))
+    if index < len(entries) and entries[index][1] == trigger_id:
+        del entries[index]
+
+
+class TriggerIndex:
+    """按交易对、方向排序的价格触发索引"""
+
+    def __init__(self, registry=None):
+        """
+        Args:
+            registry: 指标注册表，默认进程内共享的 metrics；每次价格评估耗时记录到 trigger_eval_seconds
+        """
+        self.registry = registry or metrics
+        self.books: Dict[str, _SymbolBook] = {}
+        self.triggers: Dict[int, Trigger] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self.stats = {'evaluations': 0, 'fired': 0, 'trail_updates': 0}
+
+    def attach_price_cache(self, price_cache):
+        """订阅价格缓存的价格更新"""
+        price_cache.add_listener(self.on_price)
+
+    # ------------------------------------------------------------------ 登记
+    @staticmethod
+    def _trail_price(direction: str, anchor: float, trail_pct: float) -> float:
+        return anchor * (1 - trail_pct) if direction == BELOW else anchor * (1 + trail_pct)
+
+    @staticmethod
+    def _anchor_key(direction: str, anchor: float) -> float:
+        return anchor if direction == BELOW else -anchor
+
+    def add(self, symbol: str, direction: str, callback: Callable[[Trigger, float], None],
+            price: Optional[float] = None, trail_pct: Optional[float] = None, anchor: Optional[float] = None,
+            tag: Any = None) -> int:
+        """
+        登记触发条件
+
+        Args:
+            direction: BELOW（价格 <= 触发价）/ ABOVE（价格 >= 触发价）
+            callback: 触发回调 callback(trigger, price)，在锁外调用
+            price: 固定触发价；移动止损不需要
+            trail_pct: 移动止损回撤比例，提供时触发价 = 锚点 x (1 ∓ trail_pct)
+            anchor: 移动止损的初始锚点（通常为入场价或当前价）
+            tag: 调用方自定义标识（如 (策略, 槽位)）
+
+        Returns:
+            触发条件编号，用于 remove
+        """
+        if direction not in (BELOW, ABOVE):
+            raise ValueError(f"未知的触发方向: {direction}")
+        if trail_pct is not None:
+            if anchor is None:
+                raise ValueError("移动止损需要提供初始锚点 anchor")
+            price = self._trail_price(direction, anchor, trail_pct)
+        elif price is None:
+            raise ValueError("固定触发条件需要提供触发价 price")
+        with self._lock:
+            trigger = Trigger(next(self._ids), symbol, direction, float(price), callback, trail_pct, anchor, tag)
+            book = self.books.setdefault(symbol, _SymbolBook())
+            bisect.insort(book.levels(direction), (trigger.price, trigger.trigger_id, trigger))
+            if trail_pct is not None:
+                bisect.insort(book.anchors(direction),
+                              (self._anchor_key(direction, anchor), trigger.trigger_id, trigger))
+            self.triggers[trigger.trigger_id] = trigger
+            return trigger.trigger_id
+
+    def remove(self, trigger_id: int) -> bool:
+        """撤销触发条件，已触发或不存在时返回 False"""
+        with self._lock:
+            trigger = self.triggers.pop(trigger_id, None)
+            if trigger is None:
+                return False
+            book = self.books[trigger.symbol]
+            _remove(book.levels(trigger.direction), trigger.price, trigger_id)
+            if trigger.trail_pct is not None:
+                _remove(book.anchors(trigger.direction), self._anchor_key(trigger.direction, trigger.anchor),
+                        trigger_id)
+            return True
+
+    # ------------------------------------------------------------------ 评估
+    def _update_trailing(self, book: _SymbolBook, direction: str, price: float):
+        """新高/新低：锚点被超越的移动止损整体移到新锚点，其余不动"""
+        anchors = book.anchors(direction)
+        key = self._anchor_key(direction, price)
+        count = bisect.bisect_left(anchors, (key,))
+        if count == 0:
+            return
+        levels = book.levels(direction)
+        moved = [entry[2] for entry in anchors[:count]]
+        for trigger in moved:
+            _remove(levels, trigger.price, trigger.trigger_id)
+            trigger.anchor = price
+            trigger.price = self._trail_price(direction, price, trigger.trail_pct)
+            bisect.insort(levels, (trigger.price, trigger.trigger_id, trigger))
+        # 被更新的锚点都等于新价格，不大于其余锚点；与锚点恰好等于新价格的表项按编号归并，保持有序
+        tied = bisect.bisect_right(anchors, (key, float('inf')), count)
+        anchors[:tied] = heapq.merge(sorted((key, trigger.trigger_id, trigger) for trigger in moved),
+                                     anchors[count:tied])
+        self.stats['trail_updates'] += count
+
+    def _pop_crossed(self, book: _SymbolBook, price: float) -> List[Trigger]:
+        fired = []
+        # 下穿表中触发价 >= 当前价的都已穿越，位于表尾
+        index = bisect.bisect_left(book.below, (price,))
+        if index < len(book.below):
+            fired.extend(entry[2] for entry in book.below[index:])
+            del book.below[index:]
+        # 上穿表中触发价 <= 当前价的都已穿越，位于表头
+        index = bisect.bisect_left(book.above, (price, float('inf')))
+        if index:
+            fired.extend(entry[2] for entry in book.above[:index])
+            del book.above[:index]
+        for trigger in fired:
+            self.triggers.pop(trigger.trigger_id, None)
+            if trigger.trail_pct is not None:
+                _remove(book.anchors(trigger.direction), self._anchor_key(trigger.direction, trigger.anchor),
+                        trigger.trigger_id)
+        return fired
+
+    def on_price(self, symbol: str, price: float) -> List[Trigger]:
+        """标记价格更新：先推进移动止损，再弹出已穿越的触发条件并回调"""
+        started = time.perf_counter()
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None or not len(book):
+                return []
+            self.stats['evaluations'] += 1
+            if book.trail_below:
+                self._update_trailing(book, BELOW, price)
+            if book.trail_above:
+                self._update_trailing(book, ABOVE, price)
+            fired = self._pop_crossed(book, price)
+            self.stats['fired'] += len(fired)
+        self.registry.histogram('trigger_eval_seconds').observe(time.perf_counter() - started)
+        for trigger in fired:
+            try:
+                trigger.callback(trigger, price)
+            except Exception as e:
+                print(f"触发回调执行失败 {trigger}: {e}")
+        return fired
+
+    # ------------------------------------------------------------------ 查询
+    def nearest(self, symbol: str) -> Tuple[Optional[float], Optional[float]]:
+        """最近的下穿触发价与上穿触发价"""
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                return None, None
+            return (book.below[-1][0] if book.below else None,
+                    book.above[0][0] if book.above else None)
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'triggers': len(self.triggers),
+                'symbols': {symbol: len(book) for symbol, book in self.books.items() if len(book)},
+                'stats': dict(self.stats),
+            }
@@ -41,6 +41,7 @@ DMR_STRATEGY_CONFIG = {
     'tolerance': 1e-6,
     'timeframe_4h': TIMEFRAME_LONG,
     'timeframe_1h': TIMEFRAME_SHORT,
+    'slot_netting': True,  # 同一根K线的槽位动作按持仓腿轧差后下单，按数量平仓
 }
 
 # 策略判断用的周期参数
@@ -56,6 +57,11 @@ DATA_FETCHER_CONFIG = {
     'rate_limit': True,  # 启用速率限制
 }
 
+# 进程内价格缓存配置
+PRICE_CACHE_CONFIG = {
+    'max_age_seconds': 15,  # 缓存价格的最长有效期(秒)，超过后下单时回退到 REST 查询
+}
+
 # 交易执行配置
 ORDER_EXECUTOR_CONFIG = {
     'default_type': 'future',  # 默认交易类型
@@ -64,6 +70,53 @@ ORDER_EXECUTOR_CONFIG = {
     'slippage_tolerance': 0.001,  # 滑点容忍度
     'open_order_type': 'limit',  # 开仓使用限价单
     'close_order_type': 'market',  # 平仓使用市价单
+    'leverage': 5,  # 杠杆倍数
+    'margin_type': 'CROSSED',  # 保证金模式：CROSSED 全仓 / ISOLATED 逐仓
+    'dual_side_position': True,  # 双向持仓模式
+    'context_warmup_workers': 8,  # 启动时并行初始化交易配置的线程数
+    'timeout_action': 'reprice',  # 限价单超时处理：reprice 撤单按最新价重挂 / market 撤单转市价 / cancel 仅撤单
+    'max_reprices': 2,  # 最多重挂次数，超过后转市价
+    'lifecycle_check_interval': 1.0,  # 订单生命周期检查间隔(秒)，所有订单共用一个线程
+    'order_poll_interval': 5.0,  # 数据流不可用时轮询挂单的间隔(秒)
+    'submit_max_retries': 3,  # 下单网络失败时的最大尝试次数（按客户端订单ID幂等）
+    'submit_retry_backoff': 0.05,  # 下单重试的初始退避(秒)，之后按2倍递增
+    'default_amount_step': 0.001,  # 未加载市场信息时的数量步长
+    'default_price_step': 0.0001,  # 未加载市场信息时的价格步长
+    'default_min_notional': 20,  # 未加载市场信息时的最小订单名义价值(USDT)
+}
+
+# 对冲腿并发提交配置（R1/R2 锁仓）
+HEDGE_EXECUTOR_CONFIG = {
+    'on_leg_failure': 'rollback',  # 部分腿失败时：rollback 撤销/平掉已成功的腿 / alert 仅告警保留
+    'max_leg_gap_ms': 200,  # 腿间确认时间差超过该值时告警(毫秒)
+    'max_workers': 4,  # 跨交易对并发提交的线程数
+}
+
+# 跨策略执行协调器配置（长/短周期策略内部撮合）
+EXECUTION_COORDINATOR_CONFIG = {
+    'window_ms': 300,  # 收集意图的时间窗口(毫秒)，窗口结束后统一撮合并提交净额
+    'address': ('127.0.0.1', 50055),  # 跨进程服务地址
+    'authkey': b'dmr-coordinator',  # 跨进程连接认证密钥
+    'result_timeout': 10.0,  # 等待意图结算的最长时间(秒)
+}
+
+# 用户数据流配置（订单/账户推送）
+USER_DATA_STREAM_CONFIG = {
+    'ws_url': 'wss://fstream.binance.com/ws/',  # U本位合约数据流地址
+    'keepalive_interval': 1800,  # listenKey 续期间隔(秒)
+    'reconnect_max_delay': 60,   # 断线重连最大退避(秒)
+}
+
+# 持仓/余额缓存配置（对账间隔见 RISK_CONFIG['monitoring']['position_sync_interval']）
+POSITION_CACHE_CONFIG = {
+    'ttl_seconds': 5.0,          # 未接入数据流时的缓存有效期(秒)
+    'stream_wait_seconds': 1.0,  # 下单后等待账户推送的最长时间(秒)，超时回退到 REST
+}
+
+# 实时盈亏引擎配置
+PNL_ENGINE_CONFIG = {
+    'pending_ttl': 5.0,  # 未登记订单的成交等待归属的最长时间(秒)，超时记入 unattributed
+    'quote_assets': ('USDT', 'USDC', 'BUSD'),  # 按面值计入手续费的计价资产
 }
 
 # 系统运行配置
@@ -73,6 +126,15 @@ SYSTEM_CONFIG = {
     'force_sync_on_startup': True,  # 启动时强制同步时间
 }
 
+# K线收盘调度配置（基于交易所服务器时间）
+BAR_SCHEDULER_CONFIG = {
+    'probe_initial_delay_ms': 200,   # 收盘确认探测的初始等待(毫秒)
+    'probe_max_delay_ms': 2000,      # 探测退避的最大等待(毫秒)
+    'probe_timeout_ms': 30000,       # 收盘确认超时(毫秒)，超时后仍然触发
+    'max_wait_slice_ms': 1000,       # 等待收盘时的最大单次休眠(毫秒)，便于跟随时钟校准
+    'late_warning_ms': 5000,         # 触发延迟超过该值时告警(毫秒)
+}
+
 # 风险管理配置
 RISK_MANAGEMENT_CONFIG = {
     'max_position_size': TRADE_AMOUNT * 5,  # 基于交易金额动态计算
@@ -82,6 +144,14 @@ RISK_MANAGEMENT_CONFIG = {
     'max_drawdown_pct': 0.10,
 }
 
+# 交易所端保护单配置（STOP_MARKET / TAKE_PROFIT_MARKET）
+PROTECTIVE_ORDER_CONFIG = {
+    'stop_loss_pct': RISK_MANAGEMENT_CONFIG['stop_loss_pct'],      # 默认止损比例
+    'take_profit_pct': RISK_MANAGEMENT_CONFIG['take_profit_pct'],  # 默认止盈比例
+    'working_type': 'MARK_PRICE',  # 触发价格类型：MARK_PRICE / CONTRACT_PRICE
+    'price_protect': True,         # 触发时的价格保护
+}
+
 # 监控配置
 MONITORING_CONFIG = {
     'account_info_log_interval': '00:00',  # 账户信息记录间隔
@@ -89,6 +159,30 @@ MONITORING_CONFIG = {
     'performance_check_interval': 300,     # 性能检查间隔(秒)
 }
 
+# 状态存储配置（SQLite WAL，替代各策略的 JSON 持仓文件）
+STATE_STORE_CONFIG = {
+    'path': 'data/state/trading_state.db',  # 数据库文件路径
+    'synchronous': 'FULL',  # WAL 模式下每次提交一次 fsync，断电也不丢已提交事务
+    'busy_timeout_ms': 5000,  # 多进程同时写入时的等待时间(毫秒)
+}
+
+# 交易所流量录制/回放配置
+EXCHANGE_TRAFFIC_CONFIG = {
+    'mode': 'live',  # live: 直连交易所, record: 录制全部请求/响应, replay: 从录制文件回放
+    'path': 'data/recordings/exchange_traffic.dmrrec',  # 录制文件路径
+}
+
+# 多交易对市场扫描配置
+MARKET_SCANNER_CONFIG = {
+    'weight_per_minute': 2400,      # 币安U本位合约IP每分钟请求权重上限
+    'weight_budget_ratio': 0.5,     # 扫描可占用的权重比例，其余留给实盘交易
+    'max_concurrency': 20,          # 同时在途的请求数
+    'kline_limit': 99,              # 每次拉取K线数量，<100 时单次权重为1
+    'timeframe_long': '4h',         # 长周期（DMR12）
+    'timeframe_short': '1h',        # 短周期（DMR26）
+    'request_timeout': 10000,       # 单次请求超时(毫秒)
+}
+
 # 四象限配置
 QUADRANT_CONFIG = {
     "T1": {
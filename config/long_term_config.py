@@ -37,6 +37,12 @@ LONG_TERM_CONFIG = {
         'cache_ttl': 300,  # 缓存生存时间（秒）
     },
     
+    'worker_config': {
+        'delta_limit': 100,            # 单次增量拉取K线上限，超过则全量刷新
+        'reconcile_interval': 3600,    # 常驻工作器与交易所核对持仓的间隔（秒）
+        'save_csv_every_tick': False,  # 是否每次调度都写出完整CSV
+    },
+    
     'order_config': {
         'open_order_type': 'limit',
         'close_order_type': 'market', 
@@ -26,6 +26,14 @@ RISK_CONFIG = {
         'emergency_stop_enabled': True,    # 启用紧急停止
         'alert_webhook_url': None          # 告警webhook地址
     },
+
+    # 事件驱动风控引擎
+    'risk_engine': {
+        'capital': 40.0,                   # 两个策略资金池合计(U)，回撤与日损失按此计算
+        'max_gross_exposure': 80.0,        # 最大总敞口(U)：2个策略 x (20U + 加仓20U)
+        'max_drawdown': 0.10,              # 最大回撤10%
+        'fallback_scan_interval': 300      # 兜底全量扫描间隔(秒)
+    },
     
     # 策略隔离
     'strategy_isolation': {
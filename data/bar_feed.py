@@ -0,0 +1,131 @@
+"""
+共享K线行情源
+
+同一进程内的多个策略订阅同一交易对的不同时间周期时，
+每个交易对只拉取一次最小周期的K线（增量更新），更高周期由其重采样得到。
+交易所请求量和内存占用随交易对数量增长，而不是随策略数量增长。
+"""
+import logging
+import threading
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from config.config import DATA_FETCHER_CONFIG
+from data.price_cache import price_cache
+from utils.bar_scheduler import timeframe_to_ms
+
+# 币安单次K线请求的最大条数
+MAX_KLINE_LIMIT = 1500
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+OHLCV_AGG = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def _ohlcv_to_frame(ohlcv) -> pd.DataFrame:
+    df = pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df.set_index('timestamp', inplace=True)
+    return df
+
+
+class SharedBarFeed:
+    """按交易对共享的K线数据源"""
+
+    def __init__(self, exchange, data_limit: int = None, delta_limit: int = 100):
+        """
+        Args:
+            exchange: 共享的 ccxt 交易所实例
+            data_limit: 每个订阅周期需要保留的K线数量，默认使用 DATA_FETCHER_CONFIG
+            delta_limit: 单次增量拉取上限，超过则全量刷新
+        """
+        self.exchange = exchange
+        self.data_limit = data_limit or DATA_FETCHER_CONFIG['data_limit']
+        self.delta_limit = delta_limit
+        self.subscribers: Dict[str, Dict[str, List[Callable]]] = {}
+        self.base_frames: Dict[str, pd.DataFrame] = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def subscribe(self, symbol: str, timeframe: str, callback: Callable[[pd.DataFrame], None] = None):
+        """订阅交易对的某个周期，callback 在该周期K线收盘后收到最新数据"""
+        timeframe_to_ms(timeframe)  # 校验周期
+        callbacks = self.subscribers.setdefault(symbol, {}).setdefault(timeframe, [])
+        if callback is not None:
+            callbacks.append(callback)
+
+    def base_timeframe(self, symbol: str) -> str:
+        """交易对所有订阅周期中最小的周期，作为实际拉取的周期"""
+        return min(self.subscribers[symbol], key=timeframe_to_ms)
+
+    def _base_limit(self, symbol: str) -> int:
+        base_ms = timeframe_to_ms(self.base_timeframe(symbol))
+        widest = max(timeframe_to_ms(tf) for tf in self.subscribers[symbol])
+        return min(self.data_limit * widest // base_ms, MAX_KLINE_LIMIT)
+
+    def refresh(self, symbol: str) -> pd.DataFrame:
+        """增量刷新交易对的基础周期K线，并以最新收盘价更新价格缓存"""
+        df = self._refresh(symbol)
+        price_cache.update_from_frame(symbol, df)
+        return df
+
+    def _refresh(self, symbol: str) -> pd.DataFrame:
+        base_tf = self.base_timeframe(symbol)
+        limit = self._base_limit(symbol)
+        with self._lock:
+            df = self.base_frames.get(symbol)
+            if df is not None and not df.empty:
+                since = int(df.index[-1].timestamp() * 1000)
+                ohlcv = self.exchange.fetch_ohlcv(symbol, base_tf, since=since, limit=self.delta_limit)
+                self.request_count += 1
+                if ohlcv and len(ohlcv) < self.delta_limit:
+                    delta = _ohlcv_to_frame(ohlcv)
+                    # 未收盘K线被新数据覆盖
+                    df = pd.concat([df[df.index < delta.index[0]], delta]).iloc[-limit:]
+                    self.base_frames[symbol] = df
+                    return df
+                if not ohlcv:
+                    return df
+
+            ohlcv = self.exchange.fetch_ohlcv(symbol, base_tf, limit=limit)
+            self.request_count += 1
+            df = _ohlcv_to_frame(ohlcv) if ohlcv else pd.DataFrame(columns=OHLCV_COLUMNS[1:])
+            self.base_frames[symbol] = df
+            self.logger.info(f"共享行情全量刷新 {symbol} {base_tf}: {len(df)} 根K线")
+            return df
+
+    def get_frame(self, symbol: str, timeframe: str) -> pd.DataFrame:
+        """
+        获取交易对某个周期的K线副本
+
+        基础周期直接返回副本；更高周期由基础周期重采样，
+        最后一根K线与交易所一致，可能是未收盘K线。
+        """
+        base = self.base_frames.get(symbol)
+        if base is None or base.empty:
+            return base
+        if timeframe == self.base_timeframe(symbol):
+            return base.copy()
+        rule = f"{timeframe_to_ms(timeframe) // 60000}min"
+        return base.resample(rule).agg(OHLCV_AGG).dropna()
+
+    def publish(self, symbol: str, timeframes: List[str]):
+        """刷新交易对数据并推送给已收盘周期的订阅者"""
+        if symbol not in self.subscribers:
+            return
+        self.refresh(symbol)
+        for timeframe in timeframes:
+            callbacks = self.subscribers[symbol].get(timeframe, [])
+            if not callbacks:
+                continue
+            for callback in callbacks:
+                try:
+                    # 每个订阅者拿到独立副本，互不影响指标列
+                    callback(self.get_frame(symbol, timeframe))
+                except Exception as e:
+                    self.logger.error(f"行情推送失败 {symbol} {timeframe}: {e}")
+
+    def all_timeframes(self) -> List[str]:
+        """所有交易对订阅周期的并集"""
+        return sorted({tf for tfs in self.subscribers.values() for tf in tfs}, key=timeframe_to_ms)
@@ -16,6 +16,7 @@ from config.config import (
     POSITION_SIZE, MA_LONG_PERIOD, MA_SHORT_PERIOD,
     DATA_FETCHER_CONFIG, ORDER_EXECUTOR_CONFIG
 )
+from utils.exchange_recorder import attach_traffic_hooks
 
 class DataFetcher:
     def __init__(self):
@@ -29,11 +30,19 @@ class DataFetcher:
                 'recvWindow': DATA_FETCHER_CONFIG['recv_window']
             }
         })
+        # 按配置挂载流量录制/回放
+        attach_traffic_hooks(self.exchange)
         # 手动同步时间差异
         self.time_offset = 0
         self.last_time_sync = 0
         # 初始化时强制同步时间
         self.sync_time(force=True)
+        # 可选的共享持仓/余额缓存，挂载后持仓查询从内存返回
+        self.position_cache = None
+    
+    def attach_position_cache(self, position_cache):
+        """挂载共享持仓/余额缓存"""
+        self.position_cache = position_cache
     
     def sync_time(self, force=False):
         """
@@ -197,6 +206,14 @@ class DataFetcher:
     
     def get_positions(self, symbol=None):
         """获取当前持仓信息"""
+        if self.position_cache is not None:
+            try:
+                positions = self.position_cache.get_positions(symbol) if symbol else \
+                    self.position_cache.get_all_positions()
+                return [p for p in positions if float(p['contracts']) > 0]
+            except Exception as e:
+                print(f"从持仓缓存获取持仓失败，回退到直接查询: {e}")
+        
         max_retries = 3
         retry_count = 0
         
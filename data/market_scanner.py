@@ -0,0 +1,182 @@
+"""
+并发多交易对行情扫描
+
+所有交易对共用一个异步 ccxt 客户端，按币安请求权重预算并发拉取K线，
+再由 strategy.dmr_panel 在统一UTC时间轴的 (N × T) 面板上一次计算全部交易对的DMR。
+扫描只使用公开行情接口，不同步时间、不查询账户。
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import ccxt.async_support as ccxt_async
+import numpy as np
+
+from config.config import MARKET_SCANNER_CONFIG
+from strategy.dmr_panel import DMRPanel, quadrant_codes
+
+
+def kline_weight(limit: int) -> int:
+    """币安U本位合约K线接口的请求权重"""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class WeightBudget:
+    """请求权重令牌桶：按每分钟预算匀速补充，额度不足时等待"""
+
+    def __init__(self, weight_per_minute: int):
+        self.rate = weight_per_minute / 60.0
+        # 突发额度取预算的一半，任意一分钟窗口内的实际用量不超过预算的1.5倍
+        self.capacity = max(1, weight_per_minute // 2)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waited_seconds = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, weight: int):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= weight:
+                        self.tokens -= weight
+                        return
+                    delay = (weight - self.tokens) / self.rate
+                self.waited_seconds += delay
+                await asyncio.sleep(delay)
+
+    def pause_until_next_minute(self):
+        """交易所反馈的已用权重接近上限时，暂停到下一分钟窗口"""
+        self.paused_until = max(self.paused_until, time.monotonic() + 60 - time.time() % 60)
+
+
+class MarketScanner:
+    """U本位永续合约并发扫描器"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(MARKET_SCANNER_CONFIG)
+        if config:
+            self.config.update(config)
+        self.weight_limit = self.config['weight_per_minute']
+        self.budget = WeightBudget(int(self.weight_limit * self.config['weight_budget_ratio']))
+        self.exchange = None
+        self.markets = {}
+        self.request_count = 0
+        self.errors: Dict[str, str] = {}
+
+    async def open(self):
+        # 限速由权重预算负责，关闭 ccxt 自带的串行限速
+        self.exchange = ccxt_async.binance({
+            'enableRateLimit': False,
+            'timeout': self.config['request_timeout'],
+            'options': {
+                'defaultType': 'future',
+                'fetchMarkets': ['linear'],
+            }
+        })
+        self.markets = await self.exchange.load_markets()
+        self.request_count += 1
+
+    async def close(self):
+        if self.exchange is not None:
+            await self.exchange.close()
+            self.exchange = None
+
+    def usdt_perpetuals(self) -> List[str]:
+        """全部在交易中的USDT本位永续合约"""
+        return sorted(
+            symbol for symbol, market in self.markets.items()
+            if market.get('swap') and market.get('linear') and market.get('quote') == 'USDT'
+            and market.get('active') and market.get('info', {}).get('contractType') == 'PERPETUAL'
+        )
+
+    def resolve_symbol(self, symbol: str) -> Optional[str]:
+        """兼容 BTC/USDT 写法，映射为合约交易对 BTC/USDT:USDT（同名现货市场不作为扫描对象）"""
+        if self.markets.get(symbol, {}).get('linear'):
+            return symbol
+        contract = f"{symbol}:{symbol.split('/')[-1]}" if '/' in symbol and ':' not in symbol else None
+        return contract if self.markets.get(contract, {}).get('linear') else None
+
+    def _observe_used_weight(self):
+        headers = self.exchange.last_response_headers or {}
+        used = headers.get('x-mbx-used-weight-1m') or headers.get('X-MBX-USED-WEIGHT-1M')
+        if used is not None and int(used) >= self.weight_limit * 0.9:
+            self.budget.pause_until_next_minute()
+
+    async def _fetch_ohlcv(self, semaphore, symbol: str, timeframe: str, limit: int):
+        async with semaphore:
+            await self.budget.acquire(kline_weight(limit))
+            self.request_count += 1
+            try:
+                ohlcv = await self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            except Exception as e:
+                self.errors[f"{symbol} {timeframe}"] = str(e)
+                return symbol, timeframe, None
+            self._observe_used_weight()
+            return symbol, timeframe, ohlcv
+
+    async def fetch_klines(self, symbols: List[str], timeframes: List[str], limit: int) -> Dict[str, Dict[str, list]]:
+        """并发拉取所有 (交易对, 周期) 的K线"""
+        semaphore = asyncio.Semaphore(self.config['max_concurrency'])
+        results = await asyncio.gather(*[
+            self._fetch_ohlcv(semaphore, symbol, timeframe, limit)
+            for symbol in symbols for timeframe in timeframes
+        ])
+        klines: Dict[str, Dict[str, list]] = {timeframe: {} for timeframe in timeframes}
+        for symbol, timeframe, ohlcv in results:
+            if ohlcv:
+                klines[timeframe][symbol] = ohlcv
+        return klines
+
+    async def scan(self, symbols: Optional[List[str]] = None, dmr_long: int = 12,
+                   dmr_short: int = 26) -> Dict[str, np.ndarray]:
+        """
+        扫描交易对，返回长/短周期最新及前一根DMR与四象限状态
+
+        Returns:
+            dict: symbols、quadrant(int8 编码) 及 dmr_long / dmr_long_prev / dmr_short / dmr_short_prev 数组
+        """
+        if symbols:
+            resolved = [self.resolve_symbol(symbol) for symbol in symbols]
+            for symbol, contract in zip(symbols, resolved):
+                if contract is None:
+                    self.errors[symbol] = '不是U本位合约交易对'
+            symbols = [symbol for symbol in resolved if symbol]
+        else:
+            symbols = self.usdt_perpetuals()
+
+        limit = self.config['kline_limit']
+        tf_long, tf_short = self.config['timeframe_long'], self.config['timeframe_short']
+        klines = await self.fetch_klines(symbols, [tf_long, tf_short], limit)
+
+        result = {'symbols': np.array(symbols, dtype=object)}
+        for key, timeframe, period in (('dmr_long', tf_long, dmr_long), ('dmr_short', tf_short, dmr_short)):
+            panel = DMRPanel.from_ohlcv(klines[timeframe], timeframe, symbols)
+            dmr = panel.dmr(period)
+            result[key] = panel.latest(dmr)
+            result[f'{key}_prev'] = panel.latest(dmr, offset=1)
+        result['quadrant'] = quadrant_codes(result['dmr_long'], result['dmr_short'])
+        return result
+
+
+async def scan_markets(symbols: Optional[List[str]] = None, dmr_long: int = 12, dmr_short: int = 26,
+                       config: Optional[Dict] = None):
+    """打开共享异步客户端完成一次扫描，返回 (扫描结果, 扫描器)"""
+    scanner = MarketScanner(config)
+    try:
+        await scanner.open()
+        result = await scanner.scan(symbols, dmr_long, dmr_short)
+    finally:
+        await scanner.close()
+    return result, scanner
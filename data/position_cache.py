@@ -0,0 +1,298 @@
+"""
+共享持仓/余额缓存
+
+同一进程内的多个策略和执行器共享一份交易所持仓与余额快照：
+- 接入用户数据流后，ACCOUNT_UPDATE 推送直接更新内存中的持仓和余额，读取不再请求交易所；
+  后台线程按 RISK_CONFIG['monitoring']['position_sync_interval'] 用 REST 对账，数据流断线重连后重新拉取一次
+- 下单后按交易对标记待更新，读取时最多等待 stream_wait_seconds 的账户推送，超时回退到 REST
+- 未接入数据流或数据流不健康时，缓存有效期内直接从内存返回，过期后一次 fetch_positions 刷新所有已关注的交易对
+各策略自己的持仓台账仍然相互独立。
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config.config import POSITION_CACHE_CONFIG
+from config.risk_config import RISK_CONFIG
+
+# 数量比较容差
+QUANTITY_EPSILON = 1e-9
+
+
+def _position_side(position: Dict[str, Any]) -> str:
+    """持仓记录的 positionSide（双向持仓 LONG/SHORT，单向持仓 BOTH）"""
+    return position.get('positionSide') or (position.get('info') or {}).get('positionSide') or 'BOTH'
+
+
+def _aliases(symbol: str) -> List[str]:
+    """ccxt 的合约交易对可能带结算币后缀（如 BTC/USDT:USDT），同时按现货写法登记"""
+    if symbol and ':' in symbol:
+        return [symbol, symbol.split(':')[0]]
+    return [symbol]
+
+
+class PositionCache:
+    """交易所持仓与余额的进程内共享缓存"""
+
+    def __init__(self, exchange, ttl_seconds: Optional[float] = None,
+                 params_fn: Optional[Callable[[], Dict[str, Any]]] = None,
+                 sync_interval: Optional[float] = None, config: Dict[str, Any] = None):
+        """
+        Args:
+            exchange: 共享的 ccxt 交易所实例
+            ttl_seconds: 未接入数据流时的缓存有效期（秒），默认 POSITION_CACHE_CONFIG['ttl_seconds']
+            params_fn: 返回私有接口公共参数（timestamp/recvWindow）的函数
+            sync_interval: REST 对账间隔（秒），默认 RISK_CONFIG['monitoring']['position_sync_interval']
+            config: 覆盖 POSITION_CACHE_CONFIG
+        """
+        self.exchange = exchange
+        self.config = dict(POSITION_CACHE_CONFIG)
+        if config:
+            self.config.update(config)
+        self.ttl_seconds = self.config['ttl_seconds'] if ttl_seconds is None else ttl_seconds
+        self.sync_interval = sync_interval or RISK_CONFIG['monitoring']['position_sync_interval']
+        self.params_fn = params_fn or dict
+        self.positions: Dict[str, List[Dict[str, Any]]] = {}
+        self.updated_at: Dict[str, float] = {}
+        # 各交易对最近一次 REST 同步时间，数据流推送不更新此时间
+        self.synced_at: Dict[str, float] = {}
+        self.full_synced_at = None
+        # 下单后等待账户推送的交易对 -> 标记时间
+        self.pending: Dict[str, float] = {}
+        self.balances: Dict[str, Dict[str, float]] = {}
+        self.balance_synced_at = None
+        self.symbols = set()
+        self.request_count = 0
+        self.stream_updates = 0
+        self.reconcile_mismatches = 0
+        self.stream = None
+        self._seen_reconnects = 0
+        self._lock = threading.RLock()
+        self._updated = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def track(self, symbol: str):
+        """登记需要缓存持仓的交易对，刷新时一次性批量查询"""
+        self.symbols.add(symbol)
+
+    # ------------------------------------------------------------------ 数据流
+    def attach_stream(self, stream):
+        """接入用户数据流，ACCOUNT_UPDATE 推送直接更新持仓和余额"""
+        self.stream = stream
+        self._seen_reconnects = stream.reconnect_count
+        stream.subscribe('ACCOUNT_UPDATE', self.on_account_update)
+
+    def _stream_live(self) -> bool:
+        """数据流健康且重连后已重新对账，此时推送的数据可以直接使用"""
+        return (self.stream is not None and self.stream.is_healthy()
+                and self.stream.reconnect_count == self._seen_reconnects)
+
+    def _symbol_of(self, market_id: str) -> str:
+        try:
+            return self.exchange.safe_symbol(market_id, None, None, 'swap')
+        except Exception:
+            return market_id
+
+    def on_account_update(self, event: Dict[str, Any]):
+        """处理 ACCOUNT_UPDATE：a.B 为余额（wb 钱包余额，cw 全仓钱包余额），a.P 为持仓"""
+        data = event.get('a') or {}
+        now = time.monotonic()
+        with self._updated:
+            for item in data.get('B') or []:
+                balance = self.balances.setdefault(item['a'], {})
+                balance['total'] = float(item['wb'])
+                balance['cross_wallet'] = float(item.get('cw') or item['wb'])
+            for item in data.get('P') or []:
+                symbol = self._symbol_of(item['s'])
+                self._apply_stream_position(symbol, item)
+                for key in _aliases(symbol):
+                    self.updated_at[key] = now
+                    self.pending.pop(key, None)
+            self.stream_updates += 1
+            self._updated.notify_all()
+
+    def _apply_stream_position(self, symbol: str, item: Dict[str, Any]):
+        position_side = item.get('ps') or 'BOTH'
+        amount = float(item['pa'])
+        entries = []
+        for key in _aliases(symbol):
+            for entry in self.positions.get(key, []):
+                if _position_side(entry) == position_side and all(entry is not e for e in entries):
+                    entries.append(entry)
+        if not entries:
+            entries = [{'symbol': symbol, 'info': {}}]
+            for key in _aliases(symbol):
+                self.positions.setdefault(key, []).append(entries[0])
+        if position_side == 'BOTH':
+            side = 'long' if amount >= 0 else 'short'
+        else:
+            side = position_side.lower()
+        for entry in entries:
+            entry['contracts'] = abs(amount)
+            entry['side'] = side
+            entry['entryPrice'] = float(item['ep'])
+            entry['unrealizedPnl'] = float(item.get('up') or 0)
+            entry['info'] = {**(entry.get('info') or {}), 'symbol': item['s'], 'positionAmt': item['pa'],
+                             'entryPrice': item['ep'], 'unRealizedProfit': item.get('up'),
+                             'positionSide': position_side}
+            if position_side in ('LONG', 'SHORT'):
+                entry['positionSide'] = position_side
+
+    # ------------------------------------------------------------------ REST
+    def _is_fresh(self, symbol: str) -> bool:
+        synced = self.synced_at.get(symbol)
+        if synced is None:
+            return False
+        if self.stream is not None and self.stream.reconnect_count != self._seen_reconnects:
+            # 断线期间的推送可能丢失，重连后先重新拉取
+            return False
+        age = time.monotonic() - synced
+        if self._stream_live():
+            # 推送保持数据最新，只需按对账间隔与交易所核对
+            return symbol not in self.pending and age < self.sync_interval
+        return age < self.ttl_seconds
+
+    def refresh(self, symbols: Optional[List[str]] = None, full: bool = False):
+        """
+        从交易所刷新持仓
+
+        Args:
+            symbols: 额外需要刷新的交易对（已登记的交易对总是一并刷新）
+            full: 查询账户全部持仓
+        """
+        symbols = sorted(set(symbols or []) | self.symbols)
+        if self.stream is not None:
+            # 先记下重连次数，刷新期间再次重连时下次读取会重新拉取
+            reconnects = self.stream.reconnect_count
+        positions = self.exchange.fetch_positions(None if full else (symbols or None), params=self.params_fn())
+        self.request_count += 1
+        now = time.monotonic()
+        grouped = {symbol: [] for symbol in symbols}
+        for position in positions or []:
+            # 双向持仓方向统一放在顶层，与数据流更新的记录一致
+            if (position.get('info') or {}).get('positionSide') in ('LONG', 'SHORT'):
+                position.setdefault('positionSide', position['info']['positionSide'])
+            grouped.setdefault(position.get('symbol'), []).append(position)
+        for symbol, items in list(grouped.items()):
+            if symbol and ':' in symbol:
+                grouped.setdefault(symbol.split(':')[0], []).extend(items)
+        with self._updated:
+            if self._stream_live():
+                self._check_drift(grouped)
+            for symbol, items in grouped.items():
+                self.positions[symbol] = items
+                self.updated_at[symbol] = now
+                self.synced_at[symbol] = now
+                self.pending.pop(symbol, None)
+            if full:
+                self.full_synced_at = now
+            if self.stream is not None:
+                self._seen_reconnects = reconnects
+            self._updated.notify_all()
+
+    def _check_drift(self, grouped: Dict[str, List[Dict[str, Any]]]):
+        """对账：数据流维护的数量与 REST 不一致时记录告警"""
+        for symbol, items in grouped.items():
+            if symbol not in self.positions or ':' in (symbol or ''):
+                continue
+            cached = {_position_side(p): float(p.get('contracts') or 0) for p in self.positions[symbol]}
+            fetched = {_position_side(p): float(p.get('contracts') or 0) for p in items}
+            for side in set(cached) | set(fetched):
+                if abs(cached.get(side, 0.0) - fetched.get(side, 0.0)) > QUANTITY_EPSILON:
+                    self.reconcile_mismatches += 1
+                    self.logger.warning(f"持仓对账不一致 {symbol} {side}: 缓存={cached.get(side, 0.0)}, "
+                                        f"交易所={fetched.get(side, 0.0)}，以交易所为准")
+
+    def refresh_balance(self):
+        """从交易所刷新余额"""
+        balance = self.exchange.fetch_balance(params=self.params_fn())
+        self.request_count += 1
+        with self._updated:
+            for asset, total in (balance.get('total') or {}).items():
+                self.balances[asset] = {
+                    'total': float(total or 0),
+                    'free': float((balance.get('free') or {}).get(asset) or 0),
+                    'used': float((balance.get('used') or {}).get(asset) or 0),
+                }
+            self.balance_synced_at = time.monotonic()
+
+    def reconcile(self):
+        """一次 REST 对账：持仓（全部已登记交易对）和余额"""
+        self.refresh(full=self.full_synced_at is not None)
+        if self.balance_synced_at is not None:
+            self.refresh_balance()
+
+    def start_reconcile(self):
+        """启动后台对账线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='PositionCacheReconcile', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.sync_interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                self.logger.error(f"持仓对账失败: {e}")
+
+    # ------------------------------------------------------------------ 读取
+    def get_positions(self, symbol: str) -> List[Dict[str, Any]]:
+        """获取交易对的全部持仓记录（含数量为0的方向）"""
+        self.track(symbol)
+        with self._updated:
+            if symbol in self.pending and self._stream_live():
+                self._updated.wait_for(lambda: symbol not in self.pending, self.config['stream_wait_seconds'])
+            if not self._is_fresh(symbol):
+                self.refresh([symbol])
+            return list(self.positions.get(symbol, []))
+
+    def get_all_positions(self) -> List[Dict[str, Any]]:
+        """获取账户全部持仓记录（同一记录只返回一次）"""
+        with self._updated:
+            live = self._stream_live()
+            if self.pending and live:
+                self._updated.wait_for(lambda: not self.pending, self.config['stream_wait_seconds'])
+            limit = self.sync_interval if live else self.ttl_seconds
+            if self.full_synced_at is None or self.pending or time.monotonic() - self.full_synced_at >= limit:
+                self.refresh(full=True)
+            seen, positions = set(), []
+            for items in self.positions.values():
+                for position in items:
+                    if id(position) not in seen:
+                        seen.add(id(position))
+                        positions.append(position)
+            return positions
+
+    def get_balance(self, asset: str = 'USDT') -> Dict[str, float]:
+        """获取资产余额 {'total', 'free', 'used'}；数据流推送更新 total（钱包余额）与 cross_wallet"""
+        with self._updated:
+            synced = self.balance_synced_at
+            limit = self.sync_interval if self._stream_live() else self.ttl_seconds
+            if synced is None or time.monotonic() - synced >= limit:
+                self.refresh_balance()
+            return dict(self.balances.get(asset, {}))
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """
+        下单后使缓存失效，None 表示全部失效
+
+        接入数据流时只标记为待更新，下一次读取等待账户推送；否则直接失效，下一次读取走 REST。
+        """
+        with self._updated:
+            symbols = list(self.synced_at) if symbol is None else _aliases(symbol)
+            if self._stream_live():
+                now = time.monotonic()
+                for key in symbols:
+                    self.pending[key] = now
+                return
+            for key in symbols:
+                self.synced_at.pop(key, None)
+            self.full_synced_at = None
@@ -0,0 +1,75 @@
+"""
+进程内价格缓存
+
+行情更新（K线拉取、共享行情源、数据流）时写入最新价格，
+执行器下单换算数量时直接读取；缓存价格超过有效期才回退到 REST fetch_ticker。
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config.config import PRICE_CACHE_CONFIG
+
+
+class PriceCache:
+    """按交易对记录最新价格及其更新时间"""
+
+    def __init__(self, max_age_seconds: float = None):
+        """
+        Args:
+            max_age_seconds: 价格有效期（秒），默认使用 PRICE_CACHE_CONFIG
+        """
+        self.max_age_seconds = max_age_seconds or PRICE_CACHE_CONFIG['max_age_seconds']
+        self.prices: Dict[str, tuple] = {}
+        self.stats = {'hits': 0, 'stale': 0, 'rest_fallbacks': 0}
+        # 价格更新监听器 (symbol, price)，如风控引擎
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """订阅价格更新"""
+        self.listeners.append(listener)
+
+    def update(self, symbol: str, price: float, source: str = 'feed'):
+        """写入最新价格"""
+        if price is None or price != price or price <= 0:
+            return
+        with self._lock:
+            self.prices[symbol] = (float(price), time.monotonic(), source)
+        for listener in self.listeners:
+            listener(symbol, float(price))
+
+    def update_from_frame(self, symbol: str, df):
+        """以K线数据最后一根的收盘价更新缓存"""
+        if df is not None and len(df) > 0:
+            self.update(symbol, df['close'].iloc[-1], source='kline')
+
+    def get(self, symbol: str, max_age: float = None) -> Optional[float]:
+        """获取未过期的价格，过期或不存在时返回 None"""
+        entry = self.prices.get(symbol)
+        max_age = self.max_age_seconds if max_age is None else max_age
+        if entry is None or time.monotonic() - entry[1] > max_age:
+            self.stats['stale'] += 1
+            return None
+        self.stats['hits'] += 1
+        return entry[0]
+
+    def age(self, symbol: str) -> Optional[float]:
+        """价格已缓存的时长（秒）"""
+        entry = self.prices.get(symbol)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    def get_or_fetch(self, exchange, symbol: str, params: Optional[Dict[str, Any]] = None,
+                     max_age: float = None) -> float:
+        """优先返回缓存价格，缓存过期时通过 fetch_ticker 查询并回写缓存"""
+        price = self.get(symbol, max_age)
+        if price is not None:
+            return price
+        ticker = exchange.fetch_ticker(symbol, params=params or {})
+        self.stats['rest_fallbacks'] += 1
+        self.update(symbol, ticker['last'], source='rest')
+        return ticker['last']
+
+
+# 进程内共享的价格缓存
+price_cache = PriceCache()
@@ -0,0 +1,122 @@
+"""
+币安U本位合约用户数据流
+
+通过 listenKey 订阅账户推送（订单成交 ORDER_TRADE_UPDATE、余额与持仓 ACCOUNT_UPDATE 等），
+在后台线程中维持 websocket 连接、定期续期 listenKey、断线后指数退避重连。
+消费方按事件类型订阅回调，并通过 is_healthy() 判断是否需要回退到 REST 轮询。
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import websockets
+
+from config.config import USER_DATA_STREAM_CONFIG
+
+
+class UserDataStream:
+    """用户数据流：单连接，多订阅者"""
+
+    def __init__(self, exchange, config: Dict[str, Any] = None):
+        """
+        Args:
+            exchange: 已配置 API Key 的 ccxt 交易所实例（用于申请和续期 listenKey）
+            config: 覆盖 USER_DATA_STREAM_CONFIG
+        """
+        self.exchange = exchange
+        self.config = dict(USER_DATA_STREAM_CONFIG)
+        if config:
+            self.config.update(config)
+        self.listen_key = None
+        self.connected = False
+        self.last_event_at = 0.0
+        self.event_count = 0
+        self.reconnect_count = 0
+        self.subscribers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def subscribe(self, event_type: str, callback: Callable[[Dict[str, Any]], None]):
+        """订阅事件类型（如 ORDER_TRADE_UPDATE），'*' 表示全部事件"""
+        self.subscribers.setdefault(event_type, []).append(callback)
+
+    def is_healthy(self) -> bool:
+        """连接正常且 listenKey 有效；断线期间消费方应回退到 REST 轮询"""
+        return self.connected and self.listen_key is not None
+
+    def start(self):
+        """启动后台线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='UserDataStream', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止数据流"""
+        self._stop_event.set()
+
+    def _dispatch(self, event: Dict[str, Any]):
+        self.last_event_at = time.time()
+        self.event_count += 1
+        event_type = event.get('e')
+        if event_type == 'listenKeyExpired':
+            self.logger.warning("listenKey 已过期，重新连接")
+            self.listen_key = None
+        for callback in self.subscribers.get(event_type, []) + self.subscribers.get('*', []):
+            try:
+                callback(event)
+            except Exception as e:
+                self.logger.error(f"用户数据流回调失败 {event_type}: {e}")
+
+    def _create_listen_key(self) -> str:
+        response = self.exchange.fapiPrivatePostListenKey()
+        return response['listenKey']
+
+    def _keepalive(self):
+        try:
+            self.exchange.fapiPrivatePutListenKey()
+        except Exception as e:
+            self.logger.warning(f"listenKey 续期失败，将重新申请: {e}")
+            self.listen_key = None
+
+    async def _session(self):
+        if self.listen_key is None:
+            self.listen_key = await asyncio.to_thread(self._create_listen_key)
+        url = self.config['ws_url'] + self.listen_key
+        next_keepalive = time.time() + self.config['keepalive_interval']
+        async with websockets.connect(url, ping_interval=180) as ws:
+            self.connected = True
+            self.logger.info("用户数据流已连接")
+            while not self._stop_event.is_set() and self.listen_key is not None:
+                if time.time() >= next_keepalive:
+                    await asyncio.to_thread(self._keepalive)
+                    next_keepalive = time.time() + self.config['keepalive_interval']
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                self._dispatch(json.loads(message))
+
+    async def _main(self):
+        delay = 1
+        while not self._stop_event.is_set():
+            try:
+                await self._session()
+                delay = 1
+            except Exception as e:
+                self.logger.warning(f"用户数据流断开: {e}，{delay}秒后重连")
+            finally:
+                self.connected = False
+            if self._stop_event.is_set():
+                break
+            self.reconnect_count += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.config['reconnect_max_delay'])
+
+    def _run(self):
+        asyncio.run(self._main())
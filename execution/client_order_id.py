@@ -0,0 +1,93 @@
+"""
+确定性的客户端订单ID
+
+同一 (策略, 仓位槽, K线时间, 动作) 总是得到同一个 newClientOrderId，
+网络超时后的重试或进程重启后的重新下单可以先按客户端订单ID查询，
+确认交易所尚未接受该订单时才重新提交，不会重复开仓。
+"""
+import hashlib
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+import ccxt
+
+from config.config import ORDER_EXECUTOR_CONFIG
+from execution.trading_context import parse_error_code
+
+# 币安 newClientOrderId 规则: ^[.A-Z:/a-z0-9_-]{1,36}$
+MAX_CLIENT_ORDER_ID_LENGTH = 36
+
+# 客户端订单ID重复（同ID的订单仍在挂单中）
+DUPLICATE_CLIENT_ORDER_ID_CODE = -4116
+
+# 可以安全重试的错误：请求可能已到达交易所但结果未知
+RETRYABLE_ERRORS = (ccxt.NetworkError,)
+
+
+def make_client_order_id(strategy: str, slot: str, bar_timestamp, action: str) -> str:
+    """
+    由 (策略, 仓位槽, K线时间, 动作) 生成确定性的客户端订单ID
+
+    Args:
+        strategy: 策略名称
+        slot: 仓位槽名称（如 Long_4H_T1）
+        bar_timestamp: 触发下单的K线时间（毫秒整数、datetime 或 pandas.Timestamp）
+        action: 动作（buy / sell / close 等）
+
+    Returns:
+        str: 不超过36个字符，前缀为策略名便于在交易所端识别
+    """
+    if hasattr(bar_timestamp, 'timestamp'):
+        bar_timestamp = int(bar_timestamp.timestamp() * 1000)
+    key = f"{strategy}|{slot}|{int(bar_timestamp)}|{action}"
+    prefix = re.sub(r'[^A-Za-z0-9]', '', strategy)[:8] or 'x'
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return f"{prefix}-{digest[:MAX_CLIENT_ORDER_ID_LENGTH - len(prefix) - 1]}"
+
+
+def find_order_by_client_id(exchange, symbol: str, client_order_id: str,
+                            params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """按客户端订单ID查询订单，不存在时返回 None"""
+    try:
+        return exchange.fetch_order(None, symbol, params={'origClientOrderId': client_order_id, **(params or {})})
+    except ccxt.OrderNotFound:
+        return None
+
+
+def submit_idempotent(exchange, symbol: str, client_order_id: str, submit: Callable[[str], Dict[str, Any]],
+                      lookup_first: bool = False, params_fn: Optional[Callable[[], Dict[str, Any]]] = None,
+                      max_retries: int = None, backoff: float = None) -> Optional[Dict[str, Any]]:
+    """
+    以客户端订单ID幂等地提交订单
+
+    Args:
+        submit: 实际下单函数 submit(client_order_id) -> 订单，需把ID作为 newClientOrderId 发送
+        lookup_first: 首次提交前先查询（进程重启后重放同一根K线时使用）
+        params_fn: 返回私有接口公共参数（timestamp/recvWindow）的函数
+        max_retries / backoff: 默认使用 ORDER_EXECUTOR_CONFIG
+
+    Returns:
+        交易所已有的或新提交的订单
+    """
+    params_fn = params_fn or dict
+    max_retries = max_retries or ORDER_EXECUTOR_CONFIG['submit_max_retries']
+    backoff = ORDER_EXECUTOR_CONFIG['submit_retry_backoff'] if backoff is None else backoff
+
+    for attempt in range(max_retries):
+        # 重试前（以及需要时的首次提交前）先确认交易所是否已接受该订单
+        if attempt > 0 or lookup_first:
+            existing = find_order_by_client_id(exchange, symbol, client_order_id, params_fn())
+            if existing is not None:
+                print(f"客户端订单ID {client_order_id} 已存在于交易所，跳过重复提交")
+                return existing
+        try:
+            return submit(client_order_id)
+        except Exception as e:
+            if parse_error_code(e) == DUPLICATE_CLIENT_ORDER_ID_CODE:
+                return find_order_by_client_id(exchange, symbol, client_order_id, params_fn())
+            if not isinstance(e, RETRYABLE_ERRORS) or attempt == max_retries - 1:
+                raise
+            print(f"下单结果未知 (尝试 {attempt + 1}/{max_retries}) {client_order_id}: {e}")
+            time.sleep(backoff * (2 ** attempt))
+    return None
@@ -1,60 +1,67 @@
+import logging
+import time
+from datetime import datetime
+
+from config.config import SYMBOL
+from execution.order_executor import OrderExecutor
+from execution.client_order_id import make_client_order_id, submit_idempotent
+
+
 class EnhancedOrderExecutor(OrderExecutor):
     def __init__(self, exchange):
         super().__init__(exchange)
         self.order_history = []  # 订单历史
         self.retry_queue = []    # 重试队列
         self.max_retries = 3     # 最大重试次数
-        
-    def execute_order_with_retry(self, order_type, symbol, amount, price=None, max_retries=3):
-        """带重试机制的订单执行"""
-        for attempt in range(max_retries):
-            try:
-                # 生成唯一订单ID
-                order_id = f"{order_type}_{symbol}_{int(time.time())}_{attempt}"
-                
-                # 执行订单
-                if order_type == 'limit_buy':
-                    result = self.place_limit_order('buy', amount, price)
-                elif order_type == 'limit_sell':
-                    result = self.place_limit_order('sell', amount, price)
-                elif order_type == 'market_buy':
-                    result = self.place_market_order('buy', amount)
-                elif order_type == 'market_sell':
-                    result = self.place_market_order('sell', amount)
-                
-                if result:
-                    # 记录成功订单
-                    self.order_history.append({
-                        'id': order_id,
-                        'type': order_type,
-                        'symbol': symbol,
-                        'amount': amount,
-                        'price': price,
-                        'timestamp': datetime.now(),
-                        'status': 'success',
-                        'exchange_order_id': result.get('id')
-                    })
-                    return result
-                    
-            except Exception as e:
-                self.logger.error(f"订单执行失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # 指数退避
-                else:
-                    # 记录失败订单
-                    self.order_history.append({
-                        'id': order_id,
-                        'type': order_type,
-                        'symbol': symbol,
-                        'amount': amount,
-                        'price': price,
-                        'timestamp': datetime.now(),
-                        'status': 'failed',
-                        'error': str(e)
-                    })
-        
-        return None
-    
+        self.logger = logging.getLogger(self.__class__.__name__)
+        # 进程启动时间：启动前的K线产生的订单可能已由上一个进程提交，提交前先按客户端订单ID查询
+        self.started_at_ms = int(time.time() * 1000)
+
+    def execute_order_with_retry(self, order_type, symbol, amount, price=None, max_retries=3,
+                                 strategy='enhanced', slot='default', *, bar_timestamp):
+        """
+        带重试机制的订单执行
+
+        同一 (strategy, slot, bar_timestamp, order_type) 的所有尝试使用同一个客户端订单ID，
+        超时等结果未知的失败在重试前先按ID查询，交易所已接受的订单不会被重复提交。
+
+        Args:
+            bar_timestamp: 产生该订单的K线收盘时间(毫秒)，必填；同一K线同一槽位的订单才共用客户端订单ID。
+                只有早于本进程启动的K线（重启后重放）才在提交前先按ID查询
+        """
+        symbol = symbol or SYMBOL
+        client_order_id = make_client_order_id(strategy, slot, bar_timestamp, order_type)
+        order_kind, side = order_type.split('_', 1)  # limit_buy -> ('limit', 'buy')
+
+        def submit(cid):
+            self.data_fetcher.sync_time()
+            params = {**self.get_private_params(), 'newClientOrderId': cid}
+            return self.exchange.create_order(symbol, order_kind, side, amount,
+                                              price if order_kind == 'limit' else None, params=params)
+
+        record = {
+            'id': client_order_id,
+            'type': order_type,
+            'symbol': symbol,
+            'amount': amount,
+            'price': price,
+        }
+        try:
+            result = submit_idempotent(self.exchange, symbol, client_order_id, submit,
+                                       lookup_first=bar_timestamp < self.started_at_ms,
+                                       params_fn=self.get_private_params, max_retries=max_retries)
+        except Exception as e:
+            self.logger.error(f"订单执行失败 {client_order_id}: {e}")
+            # 记录失败订单
+            self.order_history.append({**record, 'timestamp': datetime.now(), 'status': 'failed', 'error': str(e)})
+            return None
+
+        if result:
+            # 记录成功订单
+            self.order_history.append({**record, 'timestamp': datetime.now(), 'status': 'success',
+                                       'exchange_order_id': result.get('id')})
+        return result
+
     def validate_order_parameters(self, symbol, amount, price=None):
         """验证订单参数"""
         # 检查最小订单金额
@@ -62,11 +69,11 @@ class EnhancedOrderExecutor(OrderExecutor):
             min_cost = self.market_info[symbol].get('limits', {}).get('cost', {}).get('min', 0)
             if amount < min_cost:
                 raise ValueError(f"订单金额 {amount} 小于最小限制 {min_cost}")
-        
+
         # 检查价格精度
         if price is not None:
             price_precision = self.market_info[symbol].get('precision', {}).get('price', 8)
             if len(str(price).split('.')[-1]) > price_precision:
                 raise ValueError(f"价格精度超出限制: {price}")
-        
-        return True
\ No newline at end of file
+
+        return True
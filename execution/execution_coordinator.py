@@ -0,0 +1,354 @@
+"""
+跨策略执行协调器
+
+长/短周期策略在同一根K线上对同一交易对下达相反方向的市价单时，两边都要支付吃单手续费。
+协调器在一个短时间窗口内收集各策略的下单意图，按 (交易对, 持仓方向) 分组：
+同组内的买卖意图先在内部按同一参考价格撮合，只把净差额作为一笔市价单发给交易所，
+成交再按意图先后分配回各策略。每笔内部撮合和交易所成交都记入按策略区分的成交台账。
+
+双向持仓模式下只撮合同一持仓方向（positionSide）上的意图，例如一个策略开多、另一个策略平多，
+保证交易所 LONG / SHORT 两条腿的数量与各策略台账之和一致。
+
+挂载盈亏引擎时，内部撮合直接按策略入账，净额订单按分配登记，交易所成交推送按同样的分配拆分入账。
+
+同进程使用时由运行时在K线收盘处理期间开启 batch()，结束时统一撮合；
+独立进程运行的策略通过 serve_coordinator / connect_coordinator 共享同一个协调器，按时间窗口撮合。
+"""
+import itertools
+import logging
+import threading
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+from typing import Any, Callable, Dict, List, Optional
+
+from config.config import EXECUTION_COORDINATOR_CONFIG
+from data.price_cache import price_cache
+
+# 数量比较容差
+QUANTITY_EPSILON = 1e-9
+
+
+class ExecutionCoordinator:
+    """收集多个策略的下单意图，内部撮合后提交净额"""
+
+    def __init__(self, exchange, params_fn: Optional[Callable[[], Dict[str, Any]]] = None,
+                 config: Dict[str, Any] = None):
+        """
+        Args:
+            exchange: ccxt 交易所实例，用于提交净额订单
+            params_fn: 返回私有接口公共参数（timestamp/recvWindow）的函数
+            config: 覆盖 EXECUTION_COORDINATOR_CONFIG
+        """
+        self.exchange = exchange
+        self.params_fn = params_fn or dict
+        self.config = dict(EXECUTION_COORDINATOR_CONFIG)
+        if config:
+            self.config.update(config)
+        self.intents: Dict[str, Dict[str, Any]] = {}
+        self.fills: List[Dict[str, Any]] = []
+        self.positions: Dict[tuple, float] = {}
+        self.stats = {'intents': 0, 'crossed_quantity': 0.0, 'exchange_orders': 0, 'saved_orders': 0}
+        self._pending: List[Dict[str, Any]] = []
+        self._ids = itertools.count(1)
+        self._batch_depth = 0
+        self._timer = None
+        self._lock = threading.RLock()
+        # 可选的状态存储：净额订单与按策略分配的成交写入 orders / fills 表
+        self.state_store = None
+        # 可选的实时盈亏引擎：成交台账按策略入账
+        self.pnl_engine = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def attach_state_store(self, state_store):
+        """挂载状态存储，成交台账同时写入数据库"""
+        self.state_store = state_store
+
+    def attach_pnl_engine(self, pnl_engine):
+        """挂载盈亏引擎，内部撮合与净额订单的成交按策略入账"""
+        self.pnl_engine = pnl_engine
+
+    def _persist(self, write):
+        if self.state_store is None:
+            return
+        try:
+            write(self.state_store)
+        except Exception as e:
+            self.logger.error(f"写入状态存储失败: {e}")
+
+    # ------------------------------------------------------------------ 意图提交
+    def submit(self, strategy: str, symbol: str, side: str, quantity: float,
+               position_side: Optional[str] = None, reference_price: Optional[float] = None) -> str:
+        """
+        提交一个市价下单意图
+
+        Args:
+            strategy: 策略名称（成交台账按此区分）
+            side: 'buy' 或 'sell'
+            quantity: 标的数量
+            position_side: 双向持仓模式下的 'LONG' / 'SHORT'
+            reference_price: 内部撮合的参考价格，缺省使用价格缓存
+
+        Returns:
+            str: 意图ID，可通过 result() 查询结算结果
+        """
+        intent_id = str(next(self._ids))
+        intent = {
+            'id': intent_id,
+            'strategy': strategy,
+            'symbol': symbol,
+            'side': side.lower(),
+            'quantity': float(quantity),
+            'remaining': float(quantity),
+            'position_side': position_side,
+            'reference_price': reference_price,
+            'cost': 0.0,
+            'status': 'pending',
+            'error': None,
+            'done': threading.Event(),
+            'callbacks': [],
+        }
+        with self._lock:
+            self.intents[intent_id] = intent
+            self._pending.append(intent)
+            self.stats['intents'] += 1
+            # 不在批处理中时（跨进程或单独调用）按时间窗口撮合
+            if self._batch_depth == 0 and self._timer is None:
+                self._timer = threading.Timer(self.config['window_ms'] / 1000, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return intent_id
+
+    @contextmanager
+    def batch(self):
+        """批处理期间提交的意图在退出时统一撮合（同进程的K线收盘处理使用）"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                outermost = self._batch_depth == 0
+            if outermost:
+                self.flush()
+
+    def result(self, intent_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        等待意图结算并返回 {'id', 'status', 'filled', 'average', 'error'}，超时返回 None
+
+        同进程批处理中提交的意图在批处理退出时才结算，批处理期间应使用 add_done_callback。
+        """
+        intent = self.intents.get(str(intent_id))
+        if intent is None:
+            return None
+        timeout = self.config['result_timeout'] if timeout is None else timeout
+        if not intent['done'].wait(timeout):
+            return None
+        return self._result(intent)
+
+    def add_done_callback(self, intent_id: str, callback: Callable[[Dict[str, Any]], None]):
+        """意图结算后以 result() 的返回值调用 callback，已结算时立即调用（仅同进程使用）"""
+        intent = self.intents[str(intent_id)]
+        with self._lock:
+            if not intent['done'].is_set():
+                intent['callbacks'].append(callback)
+                return
+        callback(self._result(intent))
+
+    @staticmethod
+    def _result(intent: Dict[str, Any]) -> Dict[str, Any]:
+        filled = intent['quantity'] - intent['remaining']
+        return {
+            'id': intent['id'],
+            'status': intent['status'],
+            'filled': filled,
+            'average': intent['cost'] / filled if filled > QUANTITY_EPSILON else None,
+            'error': intent['error'],
+        }
+
+    # ------------------------------------------------------------------ 撮合
+    def flush(self):
+        """撮合当前收集到的全部意图并提交净额"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, []
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for intent in pending:
+            groups.setdefault((intent['symbol'], intent['position_side']), []).append(intent)
+        for (symbol, position_side), intents in groups.items():
+            try:
+                self._settle_group(symbol, position_side, intents)
+            except Exception as e:
+                self.logger.error(f"撮合 {symbol} {position_side} 失败: {e}")
+                for intent in intents:
+                    if not intent['done'].is_set():
+                        self._finish(intent, error=str(e))
+
+    def _reference_price(self, symbol: str, intents: List[Dict[str, Any]]) -> float:
+        for intent in intents:
+            if intent['reference_price']:
+                return float(intent['reference_price'])
+        return price_cache.get_or_fetch(self.exchange, symbol)
+
+    def _settle_group(self, symbol: str, position_side: Optional[str], intents: List[Dict[str, Any]]):
+        buys = [intent for intent in intents if intent['side'] == 'buy']
+        sells = [intent for intent in intents if intent['side'] == 'sell']
+        buy_qty = sum(intent['quantity'] for intent in buys)
+        sell_qty = sum(intent['quantity'] for intent in sells)
+
+        crossed = min(buy_qty, sell_qty)
+        if crossed > QUANTITY_EPSILON:
+            price = self._reference_price(symbol, intents)
+            for side_intents in (buys, sells):
+                self._allocate(side_intents, crossed, price, 'internal', None)
+            self.stats['crossed_quantity'] += crossed
+            self.stats['saved_orders'] += 1
+            print(f"内部撮合 {symbol} {position_side or ''}: 数量={crossed} 价格={price}")
+
+        net_intents = buys if buy_qty > sell_qty else sells
+        residual = abs(buy_qty - sell_qty)
+        if residual > QUANTITY_EPSILON:
+            net_side = 'buy' if buy_qty > sell_qty else 'sell'
+            params = dict(self.params_fn())
+            if position_side:
+                params['positionSide'] = position_side
+            try:
+                amount = float(self.exchange.amount_to_precision(symbol, residual))
+                order = self.exchange.create_order(symbol, 'market', net_side, amount, None, params=params)
+                self.stats['exchange_orders'] += 1
+                self._persist(lambda store: store.record_order(
+                    {**order, 'symbol': symbol, 'side': net_side, 'type': 'market', 'amount': amount},
+                    position_side=position_side))
+                filled = float(order.get('filled') or amount)
+                price = order.get('average') or order.get('price') or self._reference_price(symbol, intents)
+                shares = self._allocate(net_intents, filled, float(price), 'exchange', order.get('id'))
+                if self.pnl_engine is not None:
+                    # 交易所成交（含手续费）由用户数据流推送，按分配拆分给各策略
+                    self.pnl_engine.register_allocations(order.get('id'), [(strategy, None, share)
+                                                                           for strategy, share in shares])
+                print(f"净额下单 {symbol} {position_side or ''}: {net_side} {amount}, 订单ID={order.get('id')}")
+            except Exception as e:
+                self.logger.error(f"净额下单失败 {symbol} {net_side} {residual}: {e}")
+                for intent in net_intents:
+                    if intent['remaining'] > QUANTITY_EPSILON:
+                        self._finish(intent, error=str(e))
+
+        for intent in intents:
+            if not intent['done'].is_set():
+                self._finish(intent)
+
+    def _allocate(self, intents: List[Dict[str, Any]], quantity: float, price: float, source: str,
+                  order_id: Optional[str]):
+        """按提交先后把成交数量分配给意图，并记入各策略台账，返回 [(策略, 数量), ...]"""
+        remaining = quantity
+        shares = []
+        for intent in intents:
+            if remaining <= QUANTITY_EPSILON:
+                break
+            share = min(intent['remaining'], remaining)
+            if share <= QUANTITY_EPSILON:
+                continue
+            intent['remaining'] -= share
+            intent['cost'] += share * price
+            remaining -= share
+            key = (intent['strategy'], intent['symbol'], intent['position_side'])
+            with self._lock:
+                self.positions[key] = self.positions.get(key, 0.0) + (share if intent['side'] == 'buy' else -share)
+                self.fills.append({
+                    'intent_id': intent['id'],
+                    'strategy': intent['strategy'],
+                    'symbol': intent['symbol'],
+                    'position_side': intent['position_side'],
+                    'side': intent['side'],
+                    'quantity': share,
+                    'price': price,
+                    'source': source,
+                    'order_id': order_id,
+                })
+            self._persist(lambda store: store.record_fill(intent['symbol'], intent['side'], share, price,
+                                                          order_id=order_id, strategy=intent['strategy'],
+                                                          source=source))
+            if source == 'internal' and self.pnl_engine is not None:
+                # 内部撮合没有交易所成交推送，直接入账
+                self.pnl_engine.on_fill(intent['strategy'], intent['symbol'], intent['side'], share, price)
+            shares.append((intent['strategy'], share))
+        return shares
+
+    def _finish(self, intent: Dict[str, Any], error: Optional[str] = None):
+        if intent['remaining'] <= QUANTITY_EPSILON:
+            intent['status'] = 'filled'
+        else:
+            intent['status'] = 'partial' if intent['remaining'] < intent['quantity'] else 'failed'
+        intent['error'] = error
+        with self._lock:
+            intent['done'].set()
+            callbacks, intent['callbacks'] = intent['callbacks'], []
+        result = self._result(intent)
+        for callback in callbacks:
+            try:
+                callback(result)
+            except Exception as e:
+                self.logger.error(f"意图 {intent['id']} 结算回调失败: {e}")
+
+    # ------------------------------------------------------------------ 查询
+    def get_position(self, strategy: str, symbol: str, position_side: Optional[str] = None) -> float:
+        """策略在某交易对/持仓方向上经协调器成交的净数量（买为正）"""
+        return self.positions.get((strategy, symbol, position_side), 0.0)
+
+    def get_fills(self, strategy: Optional[str] = None) -> List[Dict[str, Any]]:
+        """成交台账（内部撮合与交易所成交），可按策略过滤"""
+        with self._lock:
+            return [dict(fill) for fill in self.fills if strategy is None or fill['strategy'] == strategy]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+class CoordinatorManager(BaseManager):
+    """跨进程共享协调器的管理器"""
+
+
+def serve_coordinator(coordinator: ExecutionCoordinator, address=None, authkey: bytes = None):
+    """
+    在后台线程中对外提供协调器，独立进程运行的策略通过 connect_coordinator 连接
+
+    Returns:
+        管理器服务对象（调用 stop_event.set() 或进程退出时停止）
+    """
+    CoordinatorManager.register('get_coordinator', callable=lambda: coordinator,
+                                exposed=('submit', 'result', 'flush', 'get_position', 'get_fills', 'get_stats'))
+    manager = CoordinatorManager(address=address or EXECUTION_COORDINATOR_CONFIG['address'],
+                                 authkey=authkey or EXECUTION_COORDINATOR_CONFIG['authkey'])
+    server = manager.get_server()
+    thread = threading.Thread(target=server.serve_forever, name='ExecutionCoordinatorServer', daemon=True)
+    thread.start()
+    return server
+
+
+def connect_coordinator(address=None, authkey: bytes = None):
+    """连接其他进程提供的协调器，返回可调用 submit/result 等方法的代理"""
+    CoordinatorManager.register('get_coordinator')
+    manager = CoordinatorManager(address=address or EXECUTION_COORDINATOR_CONFIG['address'],
+                                 authkey=authkey or EXECUTION_COORDINATOR_CONFIG['authkey'])
+    manager.connect()
+    return manager.get_coordinator()
+
+
+if __name__ == '__main__':
+    import time
+    from common.state_store import get_state_store
+    from data.data_fetcher import DataFetcher
+
+    fetcher = DataFetcher()
+    coordinator = ExecutionCoordinator(fetcher.exchange)
+    coordinator.attach_state_store(get_state_store())
+    serve_coordinator(coordinator)
+    print(f"执行协调器已启动: {EXECUTION_COORDINATOR_CONFIG['address']}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"协调器统计: {coordinator.get_stats()}")
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,179 @@
+"""
+对冲腿并发提交
+
+R1/R2 象限的锁仓决策包含方向相反的两条腿。各腿先在本地准备好（交易配置缓存、价格缓存、数量换算），
+再一次性提交：同一交易对的腿通过批量下单接口在一个请求内提交，不同交易对的腿并发提交。
+记录各腿确认时间差；部分腿失败时撤销并平掉已成功的腿或告警，避免长时间单边敞口。
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config.config import HEDGE_EXECUTOR_CONFIG
+from execution.client_order_id import submit_idempotent
+
+
+class HedgeExecutor:
+    """对冲腿执行器，依附于 OrderExecutor"""
+
+    def __init__(self, order_executor, config: Dict[str, Any] = None,
+                 alert_fn: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        """
+        Args:
+            order_executor: OrderExecutor（提供交易所、交易配置缓存、批量下单和订单跟踪）
+            config: 覆盖 HEDGE_EXECUTOR_CONFIG
+            alert_fn: 告警回调 alert_fn(message, report)，默认只写日志
+        """
+        self.order_executor = order_executor
+        self.exchange = order_executor.exchange
+        self.config = dict(HEDGE_EXECUTOR_CONFIG)
+        if config:
+            self.config.update(config)
+        self.alert_fn = alert_fn
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.last_report = None
+
+    def prepare_leg(self, symbol: str, position_side: str, amount: float, price: float = None,
+                    order_type: str = 'LIMIT', client_order_id: str = None,
+                    on_fill=None, on_done=None, quantity: float = None) -> Dict[str, Any]:
+        """
+        准备一条开仓腿：交易配置与价格都走缓存，提交时不再有额外请求
+
+        Args:
+            position_side: 'LONG' 或 'SHORT'
+            amount: 下单金额(USDT)，不足最小名义价值时补足数量
+            price: 限价，未提供时按最新价向不利方向偏移0.5%
+            quantity: 直接指定标的数量（如槽位轧差后的净数量），此时忽略 amount
+        """
+        executor = self.order_executor
+        executor.initialize_trading_config(symbol)
+        market_price = executor._get_market_price(symbol, executor.get_private_params())
+        is_long = position_side == 'LONG'
+        order_type = order_type.upper()
+        if order_type == 'LIMIT' and price is None:
+            price = market_price * (0.995 if is_long else 1.005)
+        rules = executor.trading_context.rules(symbol)
+        if quantity is None:
+            quantity = rules.order_quantity(amount, market_price)
+        else:
+            quantity = rules.round_amount(quantity)
+        return {
+            'symbol': symbol,
+            'side': 'BUY' if is_long else 'SELL',
+            'positionSide': position_side,
+            'amount': quantity,
+            'type': order_type,
+            'price': rules.round_price(price) if order_type == 'LIMIT' else None,
+            'clientOrderId': client_order_id,
+            'reduceOnly': False,
+            'on_fill': on_fill,
+            'on_done': on_done,
+        }
+
+    def _submit_one(self, leg: Dict[str, Any]) -> Dict[str, Any]:
+        def submit(client_order_id=None):
+            params = {**self.order_executor.get_private_params(), 'positionSide': leg['positionSide']}
+            if client_order_id:
+                params['newClientOrderId'] = client_order_id
+            return self.exchange.create_order(leg['symbol'], leg['type'].lower(), leg['side'], leg['amount'],
+                                              leg['price'], params=params)
+
+        try:
+            if leg.get('clientOrderId'):
+                # 网络超时后先按客户端订单ID确认，交易所已接受的腿不重复提交也不误判为失败
+                order = submit_idempotent(self.exchange, leg['symbol'], leg['clientOrderId'], submit,
+                                          params_fn=self.order_executor.get_private_params)
+            else:
+                order = submit()
+            return {'leg': leg, 'success': True, 'order': order, 'error': None, 'acked_at': time.monotonic()}
+        except Exception as e:
+            return {'leg': leg, 'success': False, 'order': None, 'error': str(e), 'acked_at': time.monotonic()}
+
+    def _submit_batch(self, legs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = self.order_executor.submit_batch_orders(legs)
+        acked_at = time.monotonic()
+        for result in results:
+            result['acked_at'] = acked_at
+            if result['success']:
+                # 批量接口返回原始字段，转换为 ccxt 统一格式
+                market = self.exchange.market(result['leg']['symbol'])
+                result['order'] = self.exchange.parse_order(result['order'], market)
+        return results
+
+    def submit(self, legs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        同时提交各腿
+
+        Returns:
+            dict: {'results', 'gap_ms', 'elapsed_ms', 'hedged', 'rolled_back'}
+                  hedged 为 True 表示所有腿都已被交易所接受
+        """
+        started = time.monotonic()
+        symbols = {leg['symbol'] for leg in legs}
+        if len(symbols) == 1 and len(legs) <= 5:
+            # 同一交易对：一个批量请求提交全部腿，腿间没有网络往返间隔
+            results = self._submit_batch(legs)
+        else:
+            workers = min(len(legs), self.config['max_workers'])
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self._submit_one, legs))
+
+        acked = [result['acked_at'] for result in results]
+        report = {
+            'results': results,
+            'gap_ms': (max(acked) - min(acked)) * 1000 if acked else 0.0,
+            'elapsed_ms': (time.monotonic() - started) * 1000,
+            'hedged': all(result['success'] for result in results),
+            'rolled_back': False,
+        }
+        print(f"对冲腿提交完成: {len(legs)}腿, 腿间间隔={report['gap_ms']:.1f}ms, 总耗时={report['elapsed_ms']:.1f}ms")
+        if report['gap_ms'] > self.config['max_leg_gap_ms']:
+            self._alert(f"对冲腿间隔 {report['gap_ms']:.1f}ms 超过 {self.config['max_leg_gap_ms']}ms", report)
+
+        succeeded = [result for result in results if result['success']]
+        if not report['hedged'] and succeeded:
+            errors = '; '.join(result['error'] for result in results if not result['success'])
+            if self.config['on_leg_failure'] == 'rollback':
+                for result in succeeded:
+                    self._rollback(result)
+                report['rolled_back'] = True
+                self._alert(f"对冲腿部分失败，已回滚 {len(succeeded)} 条成功腿: {errors}", report)
+            else:
+                self._alert(f"对冲腿部分失败，保留 {len(succeeded)} 条单边腿: {errors}", report)
+
+        if not report['rolled_back']:
+            for result in succeeded:
+                leg = result['leg']
+                self.order_executor._track_order(result['order'], leg['symbol'], leg['side'], leg['amount'],
+                                                 leg['price'], leg['positionSide'], leg['type'],
+                                                 leg.get('on_fill'), leg.get('on_done'))
+        self.last_report = report
+        return report
+
+    def _rollback(self, result: Dict[str, Any]):
+        """撤销已成功的腿，已成交部分以市价反向平掉"""
+        leg, order = result['leg'], result['order']
+        filled = float(order.get('filled') or 0)
+        try:
+            if order.get('status') == 'open':
+                response = self.exchange.cancel_order(order['id'], leg['symbol'],
+                                                      params=self.order_executor.get_private_params())
+                filled = float(response.get('filled') or filled)
+            if filled > 0:
+                self.exchange.create_order(leg['symbol'], 'market', 'SELL' if leg['side'] == 'BUY' else 'BUY', filled,
+                                           params={**self.order_executor.get_private_params(),
+                                                   'positionSide': leg['positionSide']})
+            result['rolled_back'] = True
+        except Exception as e:
+            result['rolled_back'] = False
+            self._alert(f"回滚 {leg['symbol']} {leg['positionSide']} 失败，需人工处理: {e}", {'results': [result]})
+
+    def _alert(self, message: str, report: Dict[str, Any]):
+        self.logger.error(message)
+        print(message)
+        if self.alert_fn is not None:
+            try:
+                self.alert_fn(message, report)
+            except Exception as e:
+                self.logger.error(f"对冲告警回调失败: {e}")
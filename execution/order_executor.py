@@ -1,5 +1,5 @@
 from config.config import SYMBOL, POSITION_SIZE
-import time
+import json
 import sys
 from pathlib import Path
 
@@ -9,6 +9,9 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from data.data_fetcher import DataFetcher
+from execution.trading_context import TradingContextCache
+from data.price_cache import price_cache
+from execution.client_order_id import RETRYABLE_ERRORS, find_order_by_client_id, submit_idempotent
 
 class OrderExecutor:
     def __init__(self, exchange):
@@ -18,6 +21,18 @@ class OrderExecutor:
         self.data_fetcher = DataFetcher()
         # 获取交易对规则
         self.market_info = {}
+        # 杠杆/保证金/持仓模式缓存，下单前不再逐笔设置
+        self.trading_context = TradingContextCache(exchange, params_fn=self.get_private_params)
+        # 可选的订单生命周期管理器，挂载后开仓单会被跟踪到成交/撤销
+        self.order_lifecycle = None
+        # 可选的对冲腿执行器，挂载后 R1/R2 锁仓的两条腿同时提交
+        self.hedge_executor = None
+        # 可选的共享持仓缓存，挂载后平仓前的持仓查询从内存返回
+        self.position_cache = None
+        # 可选的实时盈亏引擎，策略按客户端订单ID登记槽位归属
+        self.pnl_engine = None
+        # 可选的保护单管理器，挂载后策略为已成交的仓位槽在交易所挂止损/止盈单
+        self.protective_orders = None
         try:
             # 确保时间同步
             self.data_fetcher.sync_time(force=True)
@@ -38,6 +53,73 @@ class OrderExecutor:
         except Exception as e:
             print(f"加载市场信息失败: {e}")
 
+    def get_private_params(self):
+        """私有接口公共参数"""
+        return {
+            'timestamp': self.data_fetcher.get_timestamp(),
+            'recvWindow': 60000
+        }
+
+    def _get_market_price(self, symbol, params=None):
+        """下单换算数量用的最新价格：缓存未过期时直接使用，否则回退到 fetch_ticker"""
+        return price_cache.get_or_fetch(self.exchange, symbol, params=params)
+
+    def attach_order_lifecycle(self, order_lifecycle):
+        """挂载订单生命周期管理器"""
+        self.order_lifecycle = order_lifecycle
+
+    def attach_hedge_executor(self, hedge_executor):
+        """挂载对冲腿执行器"""
+        self.hedge_executor = hedge_executor
+
+    def attach_position_cache(self, position_cache):
+        """挂载共享持仓缓存"""
+        self.position_cache = position_cache
+
+    def attach_pnl_engine(self, pnl_engine):
+        """挂载实时盈亏引擎"""
+        self.pnl_engine = pnl_engine
+
+    def attach_protective_orders(self, protective_orders):
+        """挂载交易所端保护单管理器"""
+        self.protective_orders = protective_orders
+
+    def _fetch_positions(self, symbols, params):
+        """持仓快照：挂载了持仓缓存时从内存读取，否则请求交易所"""
+        if self.position_cache is None:
+            return self.exchange.fetch_positions(symbols, params=params)
+        return [position for symbol in symbols for position in self.position_cache.get_positions(symbol)]
+
+    def _invalidate_positions(self, symbol):
+        """下单后通知持仓缓存，下一次读取等待账户推送或重新查询"""
+        if self.position_cache is not None:
+            self.position_cache.invalidate(symbol)
+
+    def _track_order(self, order, symbol, side, quantity, price, position_side, order_type, on_fill, on_done):
+        """登记开仓订单，未挂载生命周期管理器时不跟踪"""
+        if self.order_lifecycle is None or order is None:
+            return
+        self.order_lifecycle.track(order, symbol, side, quantity, price=price, position_side=position_side,
+                                   order_type=order_type, on_fill=on_fill, on_done=on_done)
+
+    def _create_order(self, symbol, order_type, side, quantity, price, order_params,
+                      client_order_id=None, lookup_first=False):
+        """下单；提供客户端订单ID时按ID幂等提交，网络失败的重试不会重复开仓"""
+        self._invalidate_positions(symbol)
+        if client_order_id is None:
+            return self.exchange.create_order(symbol, order_type, side, quantity, price, params=order_params)
+
+        def submit(cid):
+            params = {**order_params, **self.get_private_params(), 'newClientOrderId': cid}
+            return self.exchange.create_order(symbol, order_type, side, quantity, price, params=params)
+
+        return submit_idempotent(self.exchange, symbol, client_order_id, submit,
+                                 lookup_first=lookup_first, params_fn=self.get_private_params)
+
+    def warm_up_trading_context(self, symbols=None):
+        """启动时并行初始化各交易对的交易配置"""
+        return self.trading_context.warm_up(symbols or [SYMBOL])
+
     def place_market_order(self, side, amount):
         """
         下市价单
@@ -86,46 +168,22 @@ class OrderExecutor:
             return None
 
     def initialize_trading_config(self, symbol):
-        """初始化交易配置"""
+        """初始化交易配置：已缓存时直接返回，否则向交易所设置杠杆和保证金模式"""
         try:
-            # 确保时间同步
-            self.data_fetcher.sync_time(force=True)
-            
-            # 设置杠杆倍数为5倍
-            params = {
-                'symbol': symbol.replace('/', ''),
-                'leverage': 5,
-                'timestamp': self.data_fetcher.get_timestamp(),
-                'recvWindow': 60000
-            }
-            
-            self.exchange.fapiPrivatePostLeverage(params)
-            
-            try:
-                # 设置保证金模式为全仓模式
-                params = {
-                    'symbol': symbol.replace('/', ''),
-                    'marginType': 'CROSSED',
-                    'timestamp': self.data_fetcher.get_timestamp(),
-                    'recvWindow': 60000
-                }
-                
-                self.exchange.fapiPrivatePostMarginType(params)
-            except Exception as e:
-                # 如果是"No need to change margin type"错误，则忽略
-                if "No need to change margin type" in str(e):
-                    print(f"保证金类型已经设置为全仓模式，无需更改 {symbol}")
-                else:
-                    raise e
-                    
-            print(f"交易配置已初始化 {symbol}")
+            self.trading_context.ensure(symbol)
         except Exception as e:
             print(f"初始化交易配置错误: {e}")
     
     # 修改open_long方法中的价格设置部分
-    def open_long(self, symbol, amount, price=None, order_type='LIMIT'):
+    def open_long(self, symbol, amount, price=None, order_type='LIMIT', on_fill=None, on_done=None,
+                  client_order_id=None, lookup_first=False):
+        """
+        on_fill / on_done: 挂载订单生命周期管理器时的成交与终态回调，见 OrderLifecycleManager.track
+        client_order_id: 确定性的客户端订单ID（见 make_client_order_id），提供时下单失败可安全重试
+        lookup_first: 提交前先按客户端订单ID查询（进程重启后重放同一根K线时）
+        """
         try:
-            # 确保交易配置已初始化
+            # 交易配置已在启动时缓存，未缓存或已失效时才设置
             self.initialize_trading_config(symbol)
             
             # 确保时间同步
@@ -137,19 +195,17 @@ class OrderExecutor:
                 'recvWindow': 60000
             }
             
-            # 获取最新价格并计算数量
-            ticker = self.exchange.fetch_ticker(symbol, params=base_params)
-            market_price = ticker['last']
-            
-            # 确保下单金额至少为20 USDT
-            actual_amount = max(amount, 20)
-            quantity = round(actual_amount / market_price, 3)  # 将USDT转换为对应的数量
+            # 获取最新价格并计算数量（优先使用行情缓存）
+            market_price = self._get_market_price(symbol, base_params)
             
             # 确保下单金额正确
             if amount != POSITION_SIZE:
                 print(f"Warning: Order amount adjusted to {POSITION_SIZE} USDT")
                 amount = POSITION_SIZE
-                quantity = round(amount / market_price, 3)
+            
+            # 按缓存的数量步长换算数量，不足最小名义价值时补足
+            rules = self.trading_context.rules(symbol)
+            quantity = rules.order_quantity(amount, market_price)
             
             # 合并参数
             order_params = {
@@ -159,13 +215,10 @@ class OrderExecutor:
             
             # 根据订单类型执行不同的下单逻辑
             if order_type.upper() == 'MARKET':
-                order = self.exchange.create_market_order(
-                    symbol=symbol,
-                    side='BUY',
-                    amount=quantity,
-                    params=order_params
-                )
-                print(f"成功开多仓（市价单）: 金额={actual_amount}USDT, 数量={quantity}")
+                order = self._create_order(symbol, 'market', 'BUY', quantity, None, order_params,
+                                           client_order_id, lookup_first)
+                print(f"成功开多仓（市价单）: 金额={amount}USDT, 数量={quantity}")
+                self._track_order(order, symbol, 'BUY', quantity, None, 'LONG', 'MARKET', on_fill, on_done)
             else:  # 默认使用限价单
                 # 如果没有提供价格，则使用当前市场价并添加适当的滑点
                 if price is None:
@@ -173,28 +226,24 @@ class OrderExecutor:
                     price = market_price * 0.995  # 买入价格略低于市场价
                     print(f"No price provided, using adjusted market price: {price}")
                 
-                # 使用策略提供的价格，不再调整
-                limit_price = round(price, 4)  # 增加精度，使用4位小数
+                # 使用策略提供的价格，只取整到最小变动价位
+                limit_price = rules.round_price(price)
                 
                 # 再次确认订单价值满足最低要求
-                notional = quantity * limit_price
-                if notional < 20:
-                    # 如果订单价值仍然小于20 USDT，调整数量
-                    quantity = round(20 / limit_price, 3) + 0.001  # 加一点余量确保满足要求
+                if quantity < rules.min_quantity(limit_price):
+                    quantity = rules.min_quantity(limit_price)
                     print(f"调整下单数量以满足最低订单价值要求: {quantity}")
                 
-                order = self.exchange.create_limit_order(
-                    symbol=symbol,
-                    side='BUY',
-                    amount=quantity,
-                    price=limit_price,
-                    params=order_params
-                )
-                print(f"成功开多仓（限价单）: 金额={actual_amount}USDT, 数量={quantity}, 价格={limit_price}")
+                order = self._create_order(symbol, 'limit', 'BUY', quantity, limit_price, order_params,
+                                           client_order_id, lookup_first)
+                print(f"成功开多仓（限价单）: 金额={amount}USDT, 数量={quantity}, 价格={limit_price}")
+                self._track_order(order, symbol, 'BUY', quantity, limit_price, 'LONG', 'LIMIT', on_fill, on_done)
             
             return order
         except Exception as e:
             error_msg = str(e)
+            # 与交易配置相关的错误使缓存失效，下次下单前重新设置
+            self.trading_context.handle_error(symbol, e)
             if "insufficient balance" in error_msg.lower():
                 print(f"开多仓失败: 余额不足，请确保账户有足够的USDT")
             elif "MIN_NOTIONAL" in error_msg or "notional" in error_msg:
@@ -209,9 +258,15 @@ class OrderExecutor:
             return None
 
     # 修改open_short方法中的价格设置部分
-    def open_short(self, symbol, amount, price=None, order_type='LIMIT'):
+    def open_short(self, symbol, amount, price=None, order_type='LIMIT', on_fill=None, on_done=None,
+                   client_order_id=None, lookup_first=False):
+        """
+        on_fill / on_done: 挂载订单生命周期管理器时的成交与终态回调，见 OrderLifecycleManager.track
+        client_order_id: 确定性的客户端订单ID（见 make_client_order_id），提供时下单失败可安全重试
+        lookup_first: 提交前先按客户端订单ID查询（进程重启后重放同一根K线时）
+        """
         try:
-            # 确保交易配置已初始化
+            # 交易配置已在启动时缓存，未缓存或已失效时才设置
             self.initialize_trading_config(symbol)
             
             # 确保时间同步
@@ -223,19 +278,17 @@ class OrderExecutor:
                 'recvWindow': 60000
             }
             
-            # 获取最新价格并计算数量
-            ticker = self.exchange.fetch_ticker(symbol, params=base_params)
-            market_price = ticker['last']
-            
-            # 确保下单金额至少为20 USDT
-            actual_amount = max(amount, 20)
-            quantity = round(actual_amount / market_price, 3)  # 将USDT转换为对应的数量
+            # 获取最新价格并计算数量（优先使用行情缓存）
+            market_price = self._get_market_price(symbol, base_params)
             
             # 确保下单金额正确
             if amount != POSITION_SIZE:
                 print(f"Warning: Order amount adjusted to {POSITION_SIZE} USDT")
                 amount = POSITION_SIZE
-                quantity = round(amount / market_price, 3)
+            
+            # 按缓存的数量步长换算数量，不足最小名义价值时补足
+            rules = self.trading_context.rules(symbol)
+            quantity = rules.order_quantity(amount, market_price)
             
             # 合并参数
             order_params = {
@@ -245,13 +298,10 @@ class OrderExecutor:
             
             # 根据订单类型执行不同的下单逻辑
             if order_type.upper() == 'MARKET':
-                order = self.exchange.create_market_order(
-                    symbol=symbol,
-                    side='SELL',
-                    amount=quantity,
-                    params=order_params
-                )
-                print(f"成功开空仓（市价单）: 金额={actual_amount}USDT, 数量={quantity}")
+                order = self._create_order(symbol, 'market', 'SELL', quantity, None, order_params,
+                                           client_order_id, lookup_first)
+                print(f"成功开空仓（市价单）: 金额={amount}USDT, 数量={quantity}")
+                self._track_order(order, symbol, 'SELL', quantity, None, 'SHORT', 'MARKET', on_fill, on_done)
             else:  # 默认使用限价单
                 # 如果没有提供价格，则使用当前市场价并添加适当的滑点
                 if price is None:
@@ -259,28 +309,24 @@ class OrderExecutor:
                     price = market_price * 1.005  # 卖出价格略高于市场价
                     print(f"No price provided, using adjusted market price: {price}")
                 
-                # 使用策略提供的价格，不再调整
-                limit_price = round(price, 4)  # 增加精度，使用4位小数
+                # 使用策略提供的价格，只取整到最小变动价位
+                limit_price = rules.round_price(price)
                 
                 # 再次确认订单价值满足最低要求
-                notional = quantity * limit_price
-                if notional < 20:
-                    # 如果订单价值仍然小于20 USDT，调整数量
-                    quantity = round(20 / limit_price, 3) + 0.001  # 加一点余量确保满足要求
+                if quantity < rules.min_quantity(limit_price):
+                    quantity = rules.min_quantity(limit_price)
                     print(f"调整下单数量以满足最低订单价值要求: {quantity}")
                 
-                order = self.exchange.create_limit_order(
-                    symbol=symbol,
-                    side='SELL',
-                    amount=quantity,
-                    price=limit_price,
-                    params=order_params
-                )
-                print(f"成功开空仓（限价单）: 金额={actual_amount}USDT, 数量={quantity}, 价格={limit_price}")
+                order = self._create_order(symbol, 'limit', 'SELL', quantity, limit_price, order_params,
+                                           client_order_id, lookup_first)
+                print(f"成功开空仓（限价单）: 金额={amount}USDT, 数量={quantity}, 价格={limit_price}")
+                self._track_order(order, symbol, 'SELL', quantity, limit_price, 'SHORT', 'LIMIT', on_fill, on_done)
             
             return order
         except Exception as e:
             error_msg = str(e)
+            # 与交易配置相关的错误使缓存失效，下次下单前重新设置
+            self.trading_context.handle_error(symbol, e)
             if "insufficient balance" in error_msg.lower():
                 print(f"开空仓失败: 余额不足，请确保账户有足够的USDT")
             elif "MIN_NOTIONAL" in error_msg or "notional" in error_msg:
@@ -294,6 +340,50 @@ class OrderExecutor:
                 print(f"开空仓失败: {e}")
             return None
 
+    def increase_position(self, symbol, position_side, quantity, order_type='LIMIT', price=None,
+                          client_order_id=None, on_fill=None, on_done=None, lookup_first=False):
+        """按数量加仓（数量为标的数量，不做金额换算）"""
+        side = 'BUY' if position_side == 'LONG' else 'SELL'
+        return self._position_order(symbol, position_side, side, quantity, order_type, price,
+                                    client_order_id, on_fill, on_done, lookup_first)
+
+    def reduce_position(self, symbol, position_side, quantity, order_type='MARKET', price=None,
+                        client_order_id=None, on_fill=None, on_done=None, lookup_first=False):
+        """
+        按数量减仓：只平掉指定数量，同一方向上其他槽位持有的部分不受影响
+
+        client_order_id: 确定性的客户端订单ID，提供时网络失败的重试与重启重放不会重复减仓
+        """
+        side = 'SELL' if position_side == 'LONG' else 'BUY'
+        return self._position_order(symbol, position_side, side, quantity, order_type, price,
+                                    client_order_id, on_fill, on_done, lookup_first)
+
+    def _position_order(self, symbol, position_side, side, quantity, order_type, price,
+                        client_order_id, on_fill, on_done, lookup_first=False):
+        try:
+            self.initialize_trading_config(symbol)
+            self.data_fetcher.sync_time()
+            order_type = order_type.upper()
+            rules = self.trading_context.rules(symbol)
+            quantity = rules.round_amount(quantity)
+            if order_type == 'LIMIT':
+                price = rules.round_price(price)
+            else:
+                price = None
+            # 双向持仓模式由 positionSide 决定加仓或减仓，不能再传 reduceOnly
+            order_params = {'positionSide': position_side, **self.get_private_params()}
+            order = self._create_order(symbol, order_type.lower(), side, quantity, price, order_params,
+                                       client_order_id, lookup_first)
+            print(f"按数量下单成功: {symbol} {position_side} {side} 数量={quantity} ({order_type})")
+            self._track_order(order, symbol, side, quantity, price, position_side, order_type, on_fill, on_done)
+            return order
+        except Exception as e:
+            self.trading_context.handle_error(symbol, e)
+            if "Timestamp for this request" in str(e):
+                self.data_fetcher.sync_time(force=True)
+            print(f"按数量下单失败: {symbol} {position_side} {side} 数量={quantity}: {e}")
+            return None
+
     def close_position(self, symbol, position_side, order_type='MARKET', price=None):
         """平掉指定方向的仓位（支持市价单和限价单）"""
         try:
@@ -306,7 +396,8 @@ class OrderExecutor:
                 'recvWindow': 60000
             }
             
-            positions = self.exchange.fetch_positions([symbol], params=base_params)
+            positions = self._fetch_positions([symbol], base_params)
+            self._invalidate_positions(symbol)
             for position in positions:
                 # 检查是否支持positionSide参数
                 if 'positionSide' in position and float(position['contracts']) != 0:
@@ -323,7 +414,7 @@ class OrderExecutor:
                         
                         if order_type.upper() == 'LIMIT' and price is not None:
                             # 使用限价单平仓
-                            limit_price = round(price, 4)  # 增加精度，使用4位小数
+                            limit_price = self.trading_context.rules(symbol).round_price(price)
                             self.exchange.create_limit_order(
                                 symbol=symbol,
                                 side=side,
@@ -358,7 +449,7 @@ class OrderExecutor:
                         
                         if order_type.upper() == 'LIMIT' and price is not None:
                             # 使用限价单平仓
-                            limit_price = round(price, 4)  # 增加精度，使用4位小数
+                            limit_price = self.trading_context.rules(symbol).round_price(price)
                             self.exchange.create_limit_order(
                                 symbol=symbol,
                                 side=side,
@@ -385,13 +476,149 @@ class OrderExecutor:
             else:
                 print(f"平仓 {position_side} 仓位失败: {e}")
 
+    def build_close_legs(self, positions, position_sides=('LONG', 'SHORT'), order_type='MARKET', price=None):
+        """
+        根据一次持仓快照生成平仓订单腿
+
+        Args:
+            positions: fetch_positions 返回的持仓列表
+            position_sides: 需要平掉的方向
+            order_type: 'MARKET' 或 'LIMIT'（LIMIT 需提供 price）
+            price: 限价单价格
+
+        Returns:
+            list: 订单腿 {'symbol', 'side', 'positionSide', 'amount', 'type', 'price'}
+        """
+        use_limit = order_type.upper() == 'LIMIT' and price is not None
+        legs = []
+        for position in positions:
+            contracts = float(position.get('contracts') or 0)
+            if contracts == 0:
+                continue
+            # 双向持仓模式使用 positionSide（ccxt 统一格式没有该字段时从原始 info 读取），单向模式根据 side 判断
+            raw_side = position.get('positionSide') or (position.get('info') or {}).get('positionSide')
+            hedged = raw_side in ('LONG', 'SHORT')
+            position_side = raw_side if hedged else ('LONG' if position.get('side') == 'long' else 'SHORT')
+            if position_side not in position_sides:
+                continue
+            symbol = position['symbol'].split(':')[0]
+            legs.append({
+                'symbol': symbol,
+                'side': 'SELL' if position_side == 'LONG' else 'BUY',
+                'positionSide': position_side if hedged else None,
+                'amount': abs(contracts),
+                'type': 'LIMIT' if use_limit else 'MARKET',
+                'price': self.trading_context.rules(symbol).round_price(price) if use_limit else None,
+            })
+        return legs
+
+    def _batch_order_payload(self, leg):
+        """将订单腿转换为币安批量下单接口的单笔参数"""
+        order = {
+            'symbol': leg['symbol'].replace('/', ''),
+            'side': leg['side'],
+            'type': leg['type'],
+            'quantity': self.exchange.amount_to_precision(leg['symbol'], leg['amount']),
+        }
+        if leg['positionSide']:
+            order['positionSide'] = leg['positionSide']
+        else:
+            # 单向持仓模式用 reduceOnly 保证只减仓；双向模式由 positionSide 决定，不能再传 reduceOnly
+            order['reduceOnly'] = 'true'
+        if leg['type'] == 'LIMIT':
+            order['price'] = self.exchange.price_to_precision(leg['symbol'], leg['price'])
+            order['timeInForce'] = 'GTC'
+        if leg.get('clientOrderId'):
+            order['newClientOrderId'] = leg['clientOrderId']
+        return order
+
+    def _resolve_batch_leg(self, leg, error):
+        """按客户端订单ID查询结果未知的批量订单腿，交易所已接受时按成功返回原始字段"""
+        if leg.get('clientOrderId'):
+            try:
+                order = find_order_by_client_id(self.exchange, leg['symbol'], leg['clientOrderId'],
+                                                self.get_private_params())
+            except Exception as e:
+                print(f"按客户端订单ID查询 {leg['clientOrderId']} 失败: {e}")
+                order = None
+            if order is not None:
+                print(f"批量订单 {leg['clientOrderId']} 已被交易所接受: {error}")
+                return {'leg': leg, 'success': True, 'order': order.get('info') or order, 'error': None}
+        return {'leg': leg, 'success': False, 'order': None, 'error': str(error)}
+
+    def submit_batch_orders(self, legs, batch_size=5):
+        """
+        通过批量下单接口提交订单腿，每次请求最多5笔
+
+        Returns:
+            list: 与 legs 一一对应的结果 {'leg', 'success', 'order', 'error'}
+        """
+        results = []
+        for symbol in {leg['symbol'] for leg in legs}:
+            self._invalidate_positions(symbol)
+        for start in range(0, len(legs), batch_size):
+            chunk = legs[start:start + batch_size]
+            try:
+                self.data_fetcher.sync_time()
+                response = self.exchange.fapiPrivatePostBatchOrders({
+                    'batchOrders': json.dumps([self._batch_order_payload(leg) for leg in chunk]),
+                    'timestamp': self.data_fetcher.get_timestamp(),
+                    'recvWindow': 60000
+                })
+            except Exception as e:
+                if "Timestamp for this request" in str(e):
+                    self.data_fetcher.sync_time(force=True)
+                if isinstance(e, RETRYABLE_ERRORS):
+                    # 网络错误时批量请求可能已被交易所接受，逐腿按客户端订单ID确认后再判定失败
+                    results.extend(self._resolve_batch_leg(leg, e) for leg in chunk)
+                else:
+                    results.extend({'leg': leg, 'success': False, 'order': None, 'error': str(e)} for leg in chunk)
+                continue
+            # 批量接口按提交顺序逐笔返回订单或错误
+            for leg, item in zip(chunk, response):
+                if isinstance(item, dict) and 'code' in item and 'orderId' not in item:
+                    results.append({'leg': leg, 'success': False, 'order': None,
+                                    'error': f"{item.get('code')}: {item.get('msg')}"})
+                else:
+                    results.append({'leg': leg, 'success': True, 'order': item, 'error': None})
+
+        for result in results:
+            leg = result['leg']
+            label = f"{leg['symbol']} {leg['positionSide'] or leg['side']} {leg['amount']} ({leg['type']})"
+            if result['success']:
+                print(f"批量订单成功: {label}, 订单ID={result['order'].get('orderId')}")
+            else:
+                print(f"批量订单失败: {label}, 错误={result['error']}")
+        return results
+
     def close_all_positions(self, symbol, order_type='MARKET', price=None):
-        """平掉所有仓位（支持市价单和限价单）"""
+        """
+        平掉所有仓位（支持市价单和限价单）
+
+        只查询一次持仓快照，多空两侧（及多个交易对）的平仓单通过批量下单接口一次提交。
+
+        Args:
+            symbol: 交易对或交易对列表
+
+        Returns:
+            list: 每条平仓腿的结果
+        """
+        symbols = [symbol] if isinstance(symbol, str) else list(symbol)
         try:
-            # 分别平掉多头和空头仓位
-            self.close_position(symbol, 'LONG', order_type, price)
-            time.sleep(1)  # 添加延时，避免请求过快
-            self.close_position(symbol, 'SHORT', order_type, price)
-            print(f"Successfully closed all positions for {symbol} with {order_type.lower()} orders")
+            self.data_fetcher.sync_time()
+            positions = self._fetch_positions(symbols, {
+                'timestamp': self.data_fetcher.get_timestamp(),
+                'recvWindow': 60000
+            })
+            legs = self.build_close_legs(positions, order_type=order_type, price=price)
+            if not legs:
+                print(f"No open positions to close for {', '.join(symbols)}")
+                return []
+            results = self.submit_batch_orders(legs)
+            succeeded = sum(1 for result in results if result['success'])
+            print(f"Closed {succeeded}/{len(results)} position legs for {', '.join(symbols)} "
+                  f"with {order_type.lower()} orders")
+            return results
         except Exception as e:
-            print(f"Error closing positions: {e}")
\ No newline at end of file
+            print(f"Error closing positions: {e}")
+            return []
@@ -0,0 +1,384 @@
+"""
+订单生命周期管理
+
+每笔被跟踪的订单经历 已提交 → 已确认 → 部分成交 → 全部成交 / 已撤销 / 已过期 / 被拒绝。
+状态以用户数据流的 ORDER_TRADE_UPDATE 推送为准；数据流断开或重连后，
+按交易对批量查询挂单（每个交易对一次请求，而不是每笔订单一个轮询线程）补齐状态。
+所有订单共用一个检查线程：限价单超过 order_timeout 未成交时按配置撤单重挂、转市价或仅撤单。
+成交回调只在交易所确认成交后触发，调用方据此更新策略仓位槽。
+重挂/转市价的替换订单的客户端订单ID由原订单ID确定，按ID幂等提交，并沿用原订单在盈亏引擎中的归属。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config.config import ORDER_EXECUTOR_CONFIG
+from data.price_cache import price_cache
+from execution.client_order_id import make_client_order_id, submit_idempotent
+
+# 订单状态
+PENDING = 'PENDING'            # 已提交，尚未收到交易所确认
+NEW = 'NEW'                    # 交易所已确认挂单
+PARTIALLY_FILLED = 'PARTIALLY_FILLED'
+FILLED = 'FILLED'
+CANCELED = 'CANCELED'
+EXPIRED = 'EXPIRED'
+REJECTED = 'REJECTED'
+
+TERMINAL_STATES = {FILLED, CANCELED, EXPIRED, REJECTED}
+
+# ccxt 统一状态到币安状态的映射（轮询时使用）
+_CCXT_STATUS = {'open': NEW, 'closed': FILLED, 'canceled': CANCELED, 'expired': EXPIRED, 'rejected': REJECTED}
+
+
+class ManagedOrder:
+    """被跟踪的订单"""
+
+    __slots__ = ('order_id', 'client_order_id', 'symbol', 'side', 'position_side', 'order_type', 'amount', 'price',
+                 'state', 'filled', 'average_price', 'created_at', 'deadline', 'reprice_count', 'replaced_by',
+                 'on_fill', 'on_done', 'tag')
+
+    def __init__(self, order_id: str, client_order_id: Optional[str], symbol: str, side: str,
+                 position_side: Optional[str], order_type: str, amount: float, price: Optional[float],
+                 timeout_ms: Optional[int], on_fill=None, on_done=None, tag=None):
+        self.order_id = str(order_id)
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.side = side.upper()
+        self.position_side = position_side
+        self.order_type = order_type.upper()
+        self.amount = float(amount)
+        self.price = price
+        self.state = PENDING
+        self.filled = 0.0
+        self.average_price = None
+        self.created_at = time.time()
+        self.deadline = self.created_at + timeout_ms / 1000.0 if timeout_ms else None
+        self.reprice_count = 0
+        self.replaced_by = None
+        self.on_fill = on_fill
+        self.on_done = on_done
+        self.tag = tag
+
+    @property
+    def remaining(self) -> float:
+        return max(self.amount - self.filled, 0.0)
+
+    @property
+    def is_done(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+    def __repr__(self):
+        return (f"ManagedOrder({self.symbol} {self.side} {self.position_side} {self.order_type} "
+                f"id={self.order_id} state={self.state} filled={self.filled}/{self.amount})")
+
+
+class OrderLifecycleManager:
+    """订单状态机：数据流驱动、轮询兜底、单线程超时处理"""
+
+    def __init__(self, exchange, stream=None, params_fn: Optional[Callable[[], Dict[str, Any]]] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            exchange: ccxt 交易所实例
+            stream: 可选的 UserDataStream，为 None 时完全依赖轮询
+            params_fn: 返回私有接口公共参数（timestamp/recvWindow）的函数
+            config: 覆盖 ORDER_EXECUTOR_CONFIG
+        """
+        self.exchange = exchange
+        self.stream = stream
+        self.params_fn = params_fn or dict
+        self.config = dict(ORDER_EXECUTOR_CONFIG)
+        if config:
+            self.config.update(config)
+        self.orders: Dict[str, ManagedOrder] = {}
+        self._early_updates: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_poll = 0.0
+        self._seen_reconnects = 0
+        self.stats = {'stream_updates': 0, 'polls': 0, 'timeouts': 0, 'reprices': 0, 'market_fallbacks': 0}
+        # 可选的状态存储：订单状态与成交写入 orders / fills 表
+        self.state_store = None
+        self.default_strategy = None
+        # 可选的实时盈亏引擎：替换订单登记与原订单相同的策略/槽位归属
+        self.pnl_engine = None
+        if stream is not None:
+            stream.subscribe('ORDER_TRADE_UPDATE', self.on_stream_event)
+
+    def attach_state_store(self, state_store, default_strategy: Optional[str] = None):
+        """
+        挂载状态存储，跟踪的订单及其成交写入数据库
+
+        Args:
+            default_strategy: 未带 tag 的订单归属的策略（单策略进程使用）
+        """
+        self.state_store = state_store
+        self.default_strategy = default_strategy
+
+    def attach_pnl_engine(self, pnl_engine):
+        """挂载盈亏引擎，替换订单的成交按原订单的归属入账"""
+        self.pnl_engine = pnl_engine
+
+    def _persist(self, write):
+        if self.state_store is None:
+            return
+        try:
+            write(self.state_store)
+        except Exception as e:
+            print(f"订单状态写入状态存储失败: {e}")
+
+    # ------------------------------------------------------------------ 跟踪
+    def track(self, order: Dict[str, Any], symbol: str, side: str, amount: float, price: Optional[float] = None,
+              position_side: Optional[str] = None, order_type: str = 'LIMIT', on_fill=None, on_done=None,
+              tag=None, timeout_ms: Optional[int] = None) -> Optional[ManagedOrder]:
+        """
+        登记一笔已提交的订单
+
+        Args:
+            order: ccxt 下单返回值
+            on_fill: 成交回调 on_fill(managed_order, fill_amount, fill_price)，每次新增成交调用一次
+            on_done: 终态回调 on_done(managed_order)，重挂后的新订单终态时才调用
+            timeout_ms: 超时时间，默认 order_timeout；市价单不设超时
+        """
+        if not order or order.get('id') is None:
+            return None
+        if timeout_ms is None and order_type.upper() == 'LIMIT':
+            timeout_ms = self.config['order_timeout']
+        managed = ManagedOrder(order['id'], order.get('clientOrderId'), symbol, side, position_side, order_type,
+                               amount, price, timeout_ms, on_fill=on_fill, on_done=on_done, tag=tag)
+        with self._lock:
+            self.orders[managed.order_id] = managed
+            early = self._early_updates.pop(managed.order_id, None)
+        self._persist(lambda store: store.record_order(
+            {'id': managed.order_id, 'clientOrderId': managed.client_order_id, 'symbol': symbol,
+             'side': managed.side.lower(), 'type': managed.order_type.lower(), 'amount': managed.amount,
+             'price': price, 'status': PENDING},
+            strategy=managed.tag or self.default_strategy, position_side=position_side))
+        # 下单返回值本身可能已是成交状态（市价单）
+        self._apply(managed, _CCXT_STATUS.get(order.get('status'), NEW), order.get('filled'), order.get('average'))
+        if early is not None:
+            self._apply(managed, early['status'], early['filled'], early['average_price'])
+        return managed
+
+    def active_orders(self) -> List[ManagedOrder]:
+        with self._lock:
+            return [order for order in self.orders.values() if not order.is_done]
+
+    # ------------------------------------------------------------------ 状态更新
+    def _apply(self, order: ManagedOrder, status: str, filled=None, average_price=None):
+        """应用一次状态更新，按累计成交量计算新增成交并触发回调"""
+        callbacks = []
+        fill = None
+        with self._lock:
+            # 终态之后仍接受更晚到达的累计成交量（如撤单返回中的成交），但状态不再变化
+            was_done = order.is_done
+            previous_state = order.state
+            filled = float(filled) if filled is not None else order.filled
+            if filled > order.filled:
+                fill_amount = filled - order.filled
+                fill_price = float(average_price) if average_price else order.price
+                order.filled = filled
+                order.average_price = fill_price
+                fill = (fill_amount, fill_price)
+                if order.on_fill is not None:
+                    callbacks.append(lambda: order.on_fill(order, fill_amount, fill_price))
+            if not was_done and status in TERMINAL_STATES | {NEW, PARTIALLY_FILLED}:
+                order.state = status
+                if order.is_done and order.replaced_by is None and order.on_done is not None:
+                    callbacks.append(lambda: order.on_done(order))
+            state_changed = order.state != previous_state
+        strategy = order.tag or self.default_strategy
+        if fill is not None and fill[1] is not None:
+            self._persist(lambda store: store.record_fill(order.symbol, order.side.lower(), fill[0], fill[1],
+                                                          order_id=order.order_id, strategy=strategy))
+        if state_changed:
+            self._persist(lambda store: store.update_order_status(order.order_id, order.state))
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"订单回调执行失败 {order}: {e}")
+
+    def on_stream_event(self, event: Dict[str, Any]):
+        """处理用户数据流的 ORDER_TRADE_UPDATE 推送"""
+        data = event.get('o', {})
+        order_id = str(data.get('i'))
+        update = {'status': data.get('X'), 'filled': data.get('z'), 'average_price': data.get('ap')}
+        self.stats['stream_updates'] += 1
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                # 推送可能早于下单返回，先暂存；非本进程订单的推送只保留最近一部分
+                self._early_updates[order_id] = update
+                if len(self._early_updates) > 1000:
+                    self._early_updates.pop(next(iter(self._early_updates)))
+                return
+        self._apply(order, update['status'], update['filled'], update['average_price'])
+
+    def poll(self):
+        """按交易对批量查询挂单，补齐不在挂单列表中的订单的最终状态"""
+        self._last_poll = time.time()
+        active = self.active_orders()
+        if not active:
+            return
+        self.stats['polls'] += 1
+        by_symbol: Dict[str, List[ManagedOrder]] = {}
+        for order in active:
+            by_symbol.setdefault(order.symbol, []).append(order)
+        for symbol, orders in by_symbol.items():
+            try:
+                open_orders = {str(o['id']): o for o in self.exchange.fetch_open_orders(symbol, params=self.params_fn())}
+            except Exception as e:
+                print(f"查询挂单失败 {symbol}: {e}")
+                continue
+            for order in orders:
+                snapshot = open_orders.get(order.order_id)
+                if snapshot is None:
+                    # 已不在挂单中：单独查询一次最终状态
+                    try:
+                        snapshot = self.exchange.fetch_order(order.order_id, symbol, params=self.params_fn())
+                    except Exception as e:
+                        print(f"查询订单失败 {order}: {e}")
+                        continue
+                status = snapshot.get('info', {}).get('status') or _CCXT_STATUS.get(snapshot.get('status'), NEW)
+                self._apply(order, status, snapshot.get('filled'), snapshot.get('average'))
+
+    # ------------------------------------------------------------------ 超时处理
+    def _cancel(self, order: ManagedOrder) -> Optional[Dict[str, Any]]:
+        try:
+            return self.exchange.cancel_order(order.order_id, order.symbol, params=self.params_fn()) or {}
+        except Exception as e:
+            # 撤单失败通常是订单已成交，交由下一次轮询/推送确认
+            print(f"撤单失败 {order}: {e}")
+            return None
+
+    def _replace(self, order: ManagedOrder, order_type: str) -> Optional[ManagedOrder]:
+        """为剩余数量重新下单，新订单继承回调；客户端订单ID由原订单ID与重挂次数确定，超时重试不会重复下单"""
+        order_params = {}
+        if order.position_side:
+            order_params['positionSide'] = order.position_side
+        amount = order.remaining
+        price = None if order_type == 'MARKET' else price_cache.get_or_fetch(self.exchange, order.symbol)
+        client_order_id = make_client_order_id(order.client_order_id or order.order_id, order.side,
+                                               order.reprice_count, order_type.lower())
+        if self.pnl_engine is not None:
+            # 下单前登记，早于下单返回的成交推送也按原订单归属入账
+            self.pnl_engine.alias_order(client_order_id, order.client_order_id, order.order_id)
+
+        def submit(cid):
+            params = {**order_params, **self.params_fn(), 'newClientOrderId': cid}
+            return self.exchange.create_order(order.symbol, order_type.lower(), order.side.lower(), amount, price,
+                                              params)
+
+        new_order = submit_idempotent(self.exchange, order.symbol, client_order_id, submit,
+                                      params_fn=self.params_fn)
+        if new_order is not None and not new_order.get('clientOrderId'):
+            new_order = {**new_order, 'clientOrderId': client_order_id}
+        replacement = self.track(new_order, order.symbol, order.side, amount, price=price,
+                                 position_side=order.position_side, order_type=order_type,
+                                 on_fill=order.on_fill, on_done=order.on_done, tag=order.tag)
+        if replacement is not None:
+            replacement.reprice_count = order.reprice_count + (1 if order_type == 'LIMIT' else 0)
+        return replacement
+
+    def _handle_timeout(self, order: ManagedOrder):
+        self.stats['timeouts'] += 1
+        action = self.config['timeout_action']
+        if action == 'reprice' and order.reprice_count >= self.config['max_reprices']:
+            action = 'market'
+        replace = action != 'cancel'
+        print(f"订单超时未成交，处理方式={action}: {order}")
+
+        with self._lock:
+            # 先标记替换关系，撤单推送先到达时不触发原订单的终态回调
+            if replace:
+                order.replaced_by = 'pending'
+        response = self._cancel(order)
+        if response is None:
+            with self._lock:
+                order.replaced_by = None
+            return
+        self._apply(order, CANCELED, response.get('filled'), response.get('average'))
+        if not replace:
+            return
+
+        replacement = None
+        if order.remaining > 0:
+            try:
+                replacement = self._replace(order, 'MARKET' if action == 'market' else 'LIMIT')
+                self.stats['market_fallbacks' if action == 'market' else 'reprices'] += 1
+            except Exception as e:
+                print(f"超时重新下单失败 {order}: {e}")
+        with self._lock:
+            order.replaced_by = replacement.order_id if replacement is not None else None
+        if replacement is None and order.on_done is not None:
+            order.on_done(order)
+
+    def _current(self, order_id: str) -> Optional[ManagedOrder]:
+        """订单被重挂后沿替换关系找到当前生效的订单"""
+        order = self.orders.get(str(order_id))
+        while order is not None and order.replaced_by not in (None, 'pending'):
+            order = self.orders.get(order.replaced_by)
+        return order
+
+    def is_working(self, order_id: str) -> bool:
+        """订单（含超时后正在重挂的替换订单）是否仍可能成交"""
+        with self._lock:
+            order = self._current(order_id)
+            return order is not None and (not order.is_done or order.replaced_by == 'pending')
+
+    def cancel(self, order_id: str) -> bool:
+        """撤销订单（若已被重挂则撤销当前生效的替换订单），不再重挂"""
+        with self._lock:
+            order = self._current(order_id)
+            if order is None or order.is_done:
+                return False
+            order.deadline = None
+        response = self._cancel(order)
+        if response is None:
+            return False
+        self._apply(order, CANCELED, response.get('filled'), response.get('average'))
+        return True
+
+    def _prune(self, max_age: float = 3600):
+        """清理已结束较久的订单"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            for order_id in [oid for oid, o in self.orders.items() if o.is_done and o.created_at < cutoff]:
+                del self.orders[order_id]
+
+    def check(self):
+        """一次检查：必要时轮询，处理超时订单"""
+        stream_ok = self.stream is not None and self.stream.is_healthy()
+        reconnected = self.stream is not None and self.stream.reconnect_count != self._seen_reconnects
+        if reconnected:
+            self._seen_reconnects = self.stream.reconnect_count
+        if reconnected or (not stream_ok and time.time() - self._last_poll >= self.config['order_poll_interval']):
+            self.poll()
+
+        now = time.time()
+        for order in self.active_orders():
+            if order.deadline is not None and now >= order.deadline:
+                order.deadline = None
+                self._handle_timeout(order)
+        self._prune()
+
+    def start(self):
+        """启动共用的检查线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='OrderLifecycle', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.config['lifecycle_check_interval']):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"订单生命周期检查失败: {e}")
@@ -0,0 +1,300 @@
+"""
+交易所端保护单（止损/止盈）
+
+持仓管理器计算的止损/止盈价原先只在轮询中比较，反应速度取决于调度周期。
+保护单管理器为每个持仓槽在交易所挂 STOP_MARKET / TAKE_PROFIT_MARKET 只减仓订单，
+由交易所按标记价格触发：
+- 槽位数量或入场价变化时更新保护单；币安不支持修改条件单，先挂新单再撤旧单，更新期间不出现无保护的空窗
+- 槽位平仓时撤销保护单
+- 一侧触发成交后撤销另一侧（模拟 OCO），并回调策略扣减槽位
+- 保护单被外部撤销或过期时标记为无保护，下一次同步时重新挂单
+- 客户端订单ID由 (策略, 槽位, 类型, 数量, 触发价) 确定，进程重启后同步恢复的槽位时，
+  交易所仍挂着的同一保护单按ID认领（-4116 后按ID查询），不会重复挂单
+- 挂载盈亏引擎时，保护单的客户端订单ID登记到所属 (策略, 槽位)，触发成交的盈亏记入该槽位
+"""
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config.config import ORDER_EXECUTOR_CONFIG, PROTECTIVE_ORDER_CONFIG
+from execution.client_order_id import make_client_order_id, submit_idempotent
+from strategy.slot_ledger import QUANTITY_EPSILON, slot_leg
+
+STOP_LOSS = 'sl'
+TAKE_PROFIT = 'tp'
+ORDER_TYPES = {STOP_LOSS: 'STOP_MARKET', TAKE_PROFIT: 'TAKE_PROFIT_MARKET'}
+
+# 保护单非本进程撤销而结束的状态
+LOST_STATES = {'CANCELED', 'EXPIRED', 'REJECTED'}
+# ccxt 统一写法的已结束状态：按ID查到的旧保护单已结束时不能认领
+CLOSED_STATUSES = {'canceled', 'expired', 'rejected', 'closed'}
+
+# 触发回调 on_triggered(key, quantity, price)，key 为 (策略, 槽位)
+TriggerCallback = Callable[[Tuple[str, str], float, float], None]
+
+
+def protective_client_order_id(strategy: str, slot_name: str, kind: str, quantity: float,
+                               trigger_price: float) -> str:
+    """同一槽位、同一类型、同一数量与触发价的保护单总是得到同一个客户端订单ID"""
+    return make_client_order_id(strategy, slot_name, 0, f"{kind}|{quantity!r}|{trigger_price!r}")
+
+
+class ProtectedSlot:
+    """一个持仓槽的保护单状态"""
+
+    __slots__ = ('key', 'symbol', 'position_side', 'quantity', 'entry_price', 'stop_price', 'take_price',
+                 'order_ids', 'on_triggered')
+
+    def __init__(self, key: Tuple[str, str], symbol: str, position_side: str, on_triggered=None):
+        self.key = key
+        self.symbol = symbol
+        self.position_side = position_side
+        self.quantity = 0.0
+        self.entry_price = None
+        self.stop_price = None
+        self.take_price = None
+        # {STOP_LOSS: 订单ID, TAKE_PROFIT: 订单ID}，缺失表示该侧无保护
+        self.order_ids: Dict[str, str] = {}
+        self.on_triggered = on_triggered
+
+    def __repr__(self):
+        return (f"ProtectedSlot({self.key} {self.symbol} {self.position_side} qty={self.quantity} "
+                f"sl={self.stop_price} tp={self.take_price} orders={self.order_ids})")
+
+
+class ProtectiveOrderManager:
+    """按持仓槽维护交易所端的止损/止盈只减仓订单"""
+
+    def __init__(self, exchange, params_fn: Optional[Callable[[], Dict[str, Any]]] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            exchange: ccxt 交易所实例
+            params_fn: 返回私有接口公共参数（timestamp/recvWindow）的函数
+            config: 覆盖 PROTECTIVE_ORDER_CONFIG
+        """
+        self.exchange = exchange
+        self.params_fn = params_fn or dict
+        self.config = dict(PROTECTIVE_ORDER_CONFIG)
+        if config:
+            self.config.update(config)
+        # 双向持仓模式下用 positionSide 指定平仓腿，单向模式下用 reduceOnly
+        self.dual_side_position = self.config.get('dual_side_position', ORDER_EXECUTOR_CONFIG['dual_side_position'])
+        self.slots: Dict[Tuple[str, str], ProtectedSlot] = {}
+        # 订单ID -> (槽位key, 保护单类型)，用于处理数据流推送
+        self._orders: Dict[str, Tuple[Tuple[str, str], str]] = {}
+        self._lock = threading.RLock()
+        self.stats = {'placed': 0, 'cancelled': 0, 'triggered': 0, 'lost': 0, 'errors': 0}
+        # 可选的实时盈亏引擎
+        self.pnl_engine = None
+
+    def attach_pnl_engine(self, pnl_engine):
+        """挂载盈亏引擎，保护单成交按槽位归属入账"""
+        self.pnl_engine = pnl_engine
+
+    def attach_stream(self, stream):
+        """订阅用户数据流的订单推送，保护单触发/被撤销时及时处理"""
+        stream.subscribe('ORDER_TRADE_UPDATE', self.on_order_update)
+
+    # ------------------------------------------------------------------ 挂单/撤单
+    def trigger_prices(self, position_side: str, entry_price: float, stop_loss_pct: float,
+                       take_profit_pct: float) -> Tuple[float, float]:
+        """多头止损在入场价下方、止盈在上方；空头相反"""
+        if position_side == 'LONG':
+            return entry_price * (1 - stop_loss_pct), entry_price * (1 + take_profit_pct)
+        return entry_price * (1 + stop_loss_pct), entry_price * (1 - take_profit_pct)
+
+    def _precise(self, symbol: str, quantity: float, price: float) -> Tuple[float, float]:
+        try:
+            return (float(self.exchange.amount_to_precision(symbol, quantity)),
+                    float(self.exchange.price_to_precision(symbol, price)))
+        except Exception:
+            # 未加载市场信息时按原值提交，由交易所校验
+            return quantity, price
+
+    def _place(self, slot: ProtectedSlot, kind: str, quantity: float, trigger_price: float) -> Optional[str]:
+        """挂一张保护单，返回订单ID"""
+        side = 'SELL' if slot.position_side == 'LONG' else 'BUY'
+        order_params = {
+            'stopPrice': trigger_price,
+            'workingType': self.config['working_type'],
+            'priceProtect': 'TRUE' if self.config['price_protect'] else 'FALSE',
+        }
+        if self.dual_side_position:
+            order_params['positionSide'] = slot.position_side
+        else:
+            order_params['reduceOnly'] = True
+        strategy, slot_name = slot.key
+        client_order_id = protective_client_order_id(strategy, slot_name, kind, quantity, trigger_price)
+        if self.pnl_engine is not None:
+            self.pnl_engine.register_order(client_order_id, strategy, slot_name)
+
+        def submit(cid):
+            params = {**order_params, **self.params_fn(), 'newClientOrderId': cid}
+            return self.exchange.create_order(slot.symbol, ORDER_TYPES[kind], side, quantity, None, params=params)
+
+        try:
+            order = submit_idempotent(self.exchange, slot.symbol, client_order_id, submit, params_fn=self.params_fn)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"挂保护单失败 {slot.key} {ORDER_TYPES[kind]} 触发价={trigger_price}: {e}")
+            return None
+        if not order or order.get('id') is None:
+            return None
+        if order.get('status') in CLOSED_STATUSES:
+            # 重试时查到的是已结束的同ID旧单，下一次同步时重新挂单
+            print(f"保护单 {client_order_id} 已结束({order.get('status')})，下一次同步时重新挂单")
+            return None
+        order_id = str(order['id'])
+        self._orders[order_id] = (slot.key, kind)
+        self.stats['placed'] += 1
+        return order_id
+
+    def _cancel(self, symbol: str, order_id: str):
+        """撤销保护单；先移出索引，撤单推送不再被当作外部撤销"""
+        self._orders.pop(order_id, None)
+        try:
+            self.exchange.cancel_order(order_id, symbol, params=self.params_fn())
+            self.stats['cancelled'] += 1
+        except Exception as e:
+            # 已触发或已撤销的订单撤单失败无需处理
+            print(f"撤销保护单 {order_id} 失败: {e}")
+
+    # ------------------------------------------------------------------ 槽位保护
+    def protect(self, key: Tuple[str, str], symbol: str, position_side: str, quantity: float, entry_price: float,
+                stop_loss_pct: Optional[float] = None, take_profit_pct: Optional[float] = None,
+                on_triggered: Optional[TriggerCallback] = None) -> Optional[ProtectedSlot]:
+        """
+        挂出或更新一个持仓槽的保护单
+
+        Args:
+            key: (策略名, 槽位名)
+            position_side: 持仓腿 LONG / SHORT
+            quantity: 槽位持有数量，保护单只平这部分
+            entry_price: 入场均价，止损/止盈价按比例计算
+            stop_loss_pct / take_profit_pct: 默认使用配置
+            on_triggered: 保护单触发成交后的回调
+        """
+        if quantity <= QUANTITY_EPSILON or not entry_price:
+            self.release(key)
+            return None
+        stop_loss_pct = self.config['stop_loss_pct'] if stop_loss_pct is None else stop_loss_pct
+        take_profit_pct = self.config['take_profit_pct'] if take_profit_pct is None else take_profit_pct
+        stop_price, take_price = self.trigger_prices(position_side, entry_price, stop_loss_pct, take_profit_pct)
+        quantity, stop_price = self._precise(symbol, quantity, stop_price)
+        _, take_price = self._precise(symbol, quantity, take_price)
+
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None or slot.symbol != symbol or slot.position_side != position_side:
+                if slot is not None:
+                    self.release(key)
+                slot = ProtectedSlot(key, symbol, position_side, on_triggered)
+                self.slots[key] = slot
+            if on_triggered is not None:
+                slot.on_triggered = on_triggered
+            unchanged = (abs(slot.quantity - quantity) <= QUANTITY_EPSILON and slot.stop_price == stop_price
+                         and slot.take_price == take_price)
+            if unchanged and len(slot.order_ids) == len(ORDER_TYPES):
+                return slot
+
+            # 先挂新单再撤旧单；数量与价格未变的一侧保留
+            failed = False
+            for kind, trigger_price in ((STOP_LOSS, stop_price), (TAKE_PROFIT, take_price)):
+                if unchanged and kind in slot.order_ids:
+                    continue
+                order_id = self._place(slot, kind, quantity, trigger_price)
+                if order_id is None:
+                    failed = True
+                    continue
+                old_id = slot.order_ids.get(kind)
+                slot.order_ids[kind] = order_id
+                # 参数未变时同一客户端订单ID认领回的就是现有保护单，不能撤销
+                if old_id is not None and old_id != order_id:
+                    self._cancel(symbol, old_id)
+            if failed:
+                # 保留旧的数量/价格，下一次同步时重试
+                return slot
+            slot.quantity = quantity
+            slot.entry_price = entry_price
+            slot.stop_price = stop_price
+            slot.take_price = take_price
+            return slot
+
+    def release(self, key: Tuple[str, str]):
+        """槽位平仓：撤销全部保护单"""
+        with self._lock:
+            slot = self.slots.pop(key, None)
+            if slot is None:
+                return
+            for order_id in slot.order_ids.values():
+                self._cancel(slot.symbol, order_id)
+            slot.order_ids.clear()
+
+    def sync_slots(self, strategy: str, symbol: str, positions: Dict[str, Optional[Dict[str, Any]]],
+                   on_triggered: Optional[TriggerCallback] = None, stop_loss_pct: Optional[float] = None,
+                   take_profit_pct: Optional[float] = None):
+        """
+        按仓位槽字典同步保护单：已成交的槽位挂单/更新，空槽或未成交的槽位撤单
+
+        Args:
+            positions: 槽位名 -> None 或 {'filled', 'price', ...}（见 SlotLedger）
+        """
+        for slot_name, slot in positions.items():
+            key = (strategy, slot_name)
+            quantity = float(slot.get('filled') or 0.0) if isinstance(slot, dict) else 0.0
+            entry_price = (slot.get('price') or slot.get('average')) if isinstance(slot, dict) else None
+            if quantity > QUANTITY_EPSILON and entry_price:
+                self.protect(key, symbol, slot_leg(slot_name), quantity, float(entry_price),
+                             stop_loss_pct, take_profit_pct, on_triggered)
+            elif key in self.slots:
+                self.release(key)
+
+    # ------------------------------------------------------------------ 数据流
+    def on_order_update(self, event: Dict[str, Any]):
+        """处理保护单的 ORDER_TRADE_UPDATE 推送"""
+        data = event.get('o', {})
+        order_id = str(data.get('i'))
+        status = data.get('X')
+        with self._lock:
+            entry = self._orders.get(order_id)
+            if entry is None:
+                return
+            key, kind = entry
+            slot = self.slots.get(key)
+            if status == 'FILLED':
+                self._orders.pop(order_id, None)
+                if slot is None:
+                    return
+                slot.order_ids.pop(kind, None)
+                # 一侧触发后撤销另一侧，槽位不再受保护
+                self.slots.pop(key, None)
+                for sibling_id in slot.order_ids.values():
+                    self._cancel(slot.symbol, sibling_id)
+                slot.order_ids.clear()
+                self.stats['triggered'] += 1
+            elif status in LOST_STATES:
+                self._orders.pop(order_id, None)
+                if slot is not None and slot.order_ids.get(kind) == order_id:
+                    slot.order_ids.pop(kind)
+                self.stats['lost'] += 1
+                print(f"保护单 {order_id} {key} 已{status}，槽位在下一次同步时重新挂单")
+                return
+            else:
+                return
+        quantity = float(data.get('z') or data.get('q') or slot.quantity)
+        price = float(data.get('ap') or data.get('L') or 0.0)
+        print(f"保护单触发 {key} {ORDER_TYPES[kind]} 数量={quantity} 均价={price}")
+        if slot.on_triggered is not None:
+            try:
+                slot.on_triggered(key, quantity, price)
+            except Exception as e:
+                print(f"保护单触发回调执行失败 {key}: {e}")
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'slots': {f"{strategy}:{slot_name}": {'quantity': slot.quantity, 'stop_price': slot.stop_price,
+                                                      'take_price': slot.take_price, 'orders': dict(slot.order_ids)}
+                          for (strategy, slot_name), slot in self.slots.items()},
+                'stats': dict(self.stats),
+            }
@@ -1,6 +1,10 @@
 from config.testnet_config import TESTNET_API_KEY, TESTNET_API_SECRET
+from config.config import POSITION_SIZE
 import ccxt
 import time
+from utils.exchange_recorder import attach_traffic_hooks
+from execution.trading_context import TradingContextCache
+from data.price_cache import price_cache
 
 class TestnetOrderExecutor:
     def __init__(self):
@@ -14,35 +18,33 @@ class TestnetOrderExecutor:
                 'testnet': True
             }
         })
-        # 初始化时设置双向持仓模式
-        try:
-            self.exchange.fapiPrivatePostPositionSideDual({'dualSidePosition': True})
-            print("Successfully set dual position mode")
-        except Exception as e:
-            print(f"Error setting position mode: {e}")
+        # 按配置挂载流量录制/回放
+        attach_traffic_hooks(self.exchange)
+        # 双向持仓模式、杠杆和保证金模式按交易对缓存，首次下单前设置一次
+        self.trading_context = TradingContextCache(self.exchange)
+        # 可选的共享持仓缓存，挂载后持仓查询从内存返回
+        self.position_cache = None
+
+    def attach_position_cache(self, position_cache):
+        """挂载共享持仓缓存"""
+        self.position_cache = position_cache
+
+    def _fetch_positions(self, symbol):
+        if self.position_cache is not None:
+            return self.position_cache.get_positions(symbol)
+        return self.exchange.fetch_positions([symbol])
 
     def initialize_trading_config(self, symbol):
-        """初始化交易配置"""
+        """初始化交易配置（已缓存时直接返回）"""
         try:
-            # 设置杠杆倍数为5倍
-            self.exchange.fapiPrivatePostLeverage({
-                'symbol': symbol.replace('/', ''),
-                'leverage': 5
-            })
-            
-            # 设置保证金模式为全仓模式
-            self.exchange.fapiPrivatePostMarginType({
-                'symbol': symbol.replace('/', ''),
-                'marginType': 'CROSSED'  # 将 'ISOLATED' 改为 'CROSSED'
-            })
-            print(f"Trading configuration initialized for {symbol}")
+            self.trading_context.ensure(symbol)
         except Exception as e:
             print(f"Error initializing trading config: {e}")
 
     def get_position_info(self, symbol):
         """获取当前持仓信息"""
         try:
-            positions = self.exchange.fetch_positions([symbol])
+            positions = self._fetch_positions(symbol)
             position_info = {}
             for pos in positions:
                 if pos['positionSide'] == 'LONG':
@@ -60,17 +62,17 @@ class TestnetOrderExecutor:
             # 确保交易配置已初始化
             self.initialize_trading_config(symbol)
             
-            # 获取最新价格并计算数量
-            ticker = self.exchange.fetch_ticker(symbol)
-            price = ticker['last']
-            quantity = round(amount / price, 3)  # 将100USDT转换为对应的数量
-            
+            # 获取最新价格并计算数量（优先使用行情缓存）
+            price = price_cache.get_or_fetch(self.exchange, symbol)
             # 确保下单金额正确
             if amount != POSITION_SIZE:
                 print(f"Warning: Order amount adjusted to {POSITION_SIZE} USDT")
                 amount = POSITION_SIZE
-                quantity = round(amount / price, 3)
+            # 按缓存的数量步长换算数量，不足最小名义价值时补足
+            quantity = self.trading_context.rules(symbol).order_quantity(amount, price)
             
+            if self.position_cache is not None:
+                self.position_cache.invalidate(symbol)
             order = self.exchange.create_market_order(
                 symbol=symbol,
                 side='BUY',
@@ -92,17 +94,17 @@ class TestnetOrderExecutor:
             # 确保交易配置已初始化
             self.initialize_trading_config(symbol)
             
-            # 获取最新价格并计算数量
-            ticker = self.exchange.fetch_ticker(symbol)
-            price = ticker['last']
-            quantity = round(amount / price, 3)  # 将100USDT转换为对应的数量
-            
+            # 获取最新价格并计算数量（优先使用行情缓存）
+            price = price_cache.get_or_fetch(self.exchange, symbol)
             # 确保下单金额正确
             if amount != POSITION_SIZE:
                 print(f"Warning: Order amount adjusted to {POSITION_SIZE} USDT")
                 amount = POSITION_SIZE
-                quantity = round(amount / price, 3)
+            # 按缓存的数量步长换算数量，不足最小名义价值时补足
+            quantity = self.trading_context.rules(symbol).order_quantity(amount, price)
             
+            if self.position_cache is not None:
+                self.position_cache.invalidate(symbol)
             order = self.exchange.create_market_order(
                 symbol=symbol,
                 side='SELL',
@@ -121,7 +123,9 @@ class TestnetOrderExecutor:
     def close_position(self, symbol, position_side):
         """平掉指定方向的仓位"""
         try:
-            positions = self.exchange.fetch_positions([symbol])
+            positions = self._fetch_positions(symbol)
+            if self.position_cache is not None:
+                self.position_cache.invalidate(symbol)
             for position in positions:
                 if position['positionSide'] == position_side and float(position['contracts']) != 0:
                     side = 'SELL' if position_side == 'LONG' else 'BUY'
@@ -0,0 +1,277 @@
+"""
+按交易对缓存的交易配置
+
+杠杆、保证金模式、持仓模式和下单精度规则在启动时对所有交易对并行设置/读取一次，
+之后下单直接使用缓存，不再在每笔订单前请求交易所。
+下单数量/价格按缓存的步长取整，并按最小名义价值补足数量。
+只有交易所返回与这些配置相关的错误码时，才使对应交易对的缓存失效并在下次下单前重新设置；
+精度或名义价值类错误还会重新加载市场信息，刷新缓存的规则。
+"""
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from config.config import ORDER_EXECUTOR_CONFIG
+
+# 表示交易配置已与交易所不一致、需要重新校验的币安错误码
+REVALIDATE_ERROR_CODES = {
+    -1111: '精度超过允许范围',
+    -2027: '超过当前杠杆允许的最大持仓',
+    -4014: '价格不符合最小变动价位',
+    -4028: '杠杆倍数无效',
+    -4061: '订单持仓方向与持仓模式不符',
+    -4164: '订单名义价值低于最小要求',
+}
+
+# 表示本地缓存的精度/最小名义价值规则已过期的错误码，需重新加载市场信息
+MARKET_RULE_ERROR_CODES = {-1111, -4014, -4164}
+
+# ccxt 的精度模式常量：TICK_SIZE 时精度为步长（如 0.001），否则为小数位数（如 3）
+TICK_SIZE = 4
+
+# 设置配置时表示“已经是目标值”的错误码
+NO_CHANGE_ERROR_CODES = {
+    -4046: '保证金模式无需更改',
+    -4059: '持仓模式无需更改',
+}
+
+_ERROR_CODE_PATTERN = re.compile(r'"code"\s*:\s*(-?\d+)')
+
+
+def parse_error_code(error) -> Optional[int]:
+    """从 ccxt 异常信息中解析币安错误码"""
+    match = _ERROR_CODE_PATTERN.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def precision_step(precision, precision_mode=None) -> Optional[float]:
+    """把 ccxt 市场信息中的精度换算为步长"""
+    if precision is None:
+        return None
+    precision = float(precision)
+    if precision_mode == TICK_SIZE or (precision_mode is None and not precision.is_integer()):
+        return precision
+    return 10.0 ** -int(precision)
+
+
+def _to_step(value: float, step: float, rounding) -> float:
+    """按步长取整（rounding 为 math.floor / math.ceil / round），并消除浮点尾差"""
+    units = value / step
+    # 容忍除法误差：0.3 / 0.1 = 2.9999999999999996 向下取整仍应为 3
+    if rounding is math.floor:
+        units += 1e-9
+    elif rounding is math.ceil:
+        units -= 1e-9
+    decimals = max(0, -Decimal(str(step)).normalize().as_tuple().exponent)
+    return round(rounding(units) * step, decimals)
+
+
+class TradingContext:
+    """单个交易对的交易配置与精度规则"""
+
+    __slots__ = ('symbol', 'leverage', 'margin_type', 'dual_side_position', 'max_notional',
+                 'amount_precision', 'price_precision', 'precision_mode', 'min_amount', 'min_notional',
+                 'validated_at')
+
+    def __init__(self, symbol: str, leverage: int, margin_type: str, dual_side_position: bool,
+                 market: Optional[Dict[str, Any]] = None, max_notional: Optional[float] = None,
+                 precision_mode: Optional[int] = None):
+        market = market or {}
+        precision = market.get('precision', {})
+        limits = market.get('limits', {})
+        self.symbol = symbol
+        self.leverage = leverage
+        self.margin_type = margin_type
+        self.dual_side_position = dual_side_position
+        self.max_notional = max_notional
+        self.amount_precision = precision.get('amount')
+        self.price_precision = precision.get('price')
+        self.precision_mode = precision_mode
+        self.min_amount = limits.get('amount', {}).get('min')
+        self.min_notional = limits.get('cost', {}).get('min')
+        self.validated_at = time.time()
+
+    def __repr__(self):
+        return (f"TradingContext({self.symbol}, leverage={self.leverage}, margin={self.margin_type}, "
+                f"dual_side={self.dual_side_position}, min_notional={self.min_notional})")
+
+    # ------------------------------------------------------------------ 下单规则
+    @property
+    def amount_step(self) -> float:
+        step = precision_step(self.amount_precision, self.precision_mode)
+        return step or ORDER_EXECUTOR_CONFIG['default_amount_step']
+
+    @property
+    def price_step(self) -> float:
+        step = precision_step(self.price_precision, self.precision_mode)
+        return step or ORDER_EXECUTOR_CONFIG['default_price_step']
+
+    @property
+    def min_order_notional(self) -> float:
+        return float(self.min_notional) if self.min_notional else ORDER_EXECUTOR_CONFIG['default_min_notional']
+
+    def round_amount(self, quantity: float) -> float:
+        """数量按步长向下取整（与交易所截断规则一致）"""
+        return _to_step(quantity, self.amount_step, math.floor)
+
+    def round_price(self, price: float) -> float:
+        """价格取整到最近的最小变动价位"""
+        return _to_step(price, self.price_step, round)
+
+    def min_quantity(self, price: float) -> float:
+        """在该价格下满足最小名义价值和最小数量的最小下单数量"""
+        minimum = max(float(self.min_amount or 0), self.min_order_notional / price)
+        return _to_step(minimum, self.amount_step, math.ceil)
+
+    def order_quantity(self, notional: float, price: float) -> float:
+        """把下单金额换算为数量，按步长取整，不足最小名义价值时补足"""
+        return max(self.round_amount(notional / price), self.min_quantity(price))
+
+
+class TradingContextCache:
+    """交易配置缓存：启动时并行初始化，下单路径只读缓存"""
+
+    def __init__(self, exchange, params_fn: Optional[Callable[[], Dict[str, Any]]] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            exchange: ccxt 交易所实例
+            params_fn: 返回私有接口公共参数（如 timestamp/recvWindow）的函数
+            config: 覆盖 ORDER_EXECUTOR_CONFIG 中的杠杆/保证金/持仓模式设置
+        """
+        self.exchange = exchange
+        self.params_fn = params_fn or dict
+        self.config = dict(ORDER_EXECUTOR_CONFIG)
+        if config:
+            self.config.update(config)
+        self.contexts: Dict[str, TradingContext] = {}
+        self.dual_side_position: Optional[bool] = None
+        # 交易所返回精度/名义价值错误后置位，下次设置交易配置前重新加载市场信息
+        self.markets_stale = False
+        self.apply_count = 0
+        self._lock = threading.Lock()
+        self._symbol_locks: Dict[str, threading.Lock] = {}
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.Lock())
+
+    def _ensure_position_mode(self):
+        """持仓模式是账户级配置，只需确认一次"""
+        if self.dual_side_position is not None:
+            return
+        desired = self.config['dual_side_position']
+        try:
+            current = self.exchange.fapiPrivateGetPositionSideDual(self.params_fn())
+            current = str(current.get('dualSidePosition')).lower() == 'true'
+        except Exception as e:
+            print(f"查询持仓模式失败: {e}")
+            current = None
+        if current != desired:
+            try:
+                self.exchange.fapiPrivatePostPositionSideDual({
+                    'dualSidePosition': 'true' if desired else 'false',
+                    **self.params_fn()
+                })
+                print(f"持仓模式已设置为{'双向' if desired else '单向'}持仓")
+            except Exception as e:
+                if parse_error_code(e) not in NO_CHANGE_ERROR_CODES:
+                    raise
+        self.dual_side_position = desired
+
+    def _apply(self, symbol: str) -> TradingContext:
+        """向交易所设置杠杆和保证金模式，并记录精度规则"""
+        self._ensure_position_mode()
+        market_id = symbol.replace('/', '')
+        leverage = self.config['leverage']
+        margin_type = self.config['margin_type']
+
+        response = self.exchange.fapiPrivatePostLeverage({
+            'symbol': market_id,
+            'leverage': leverage,
+            **self.params_fn()
+        })
+        max_notional = response.get('maxNotionalValue') if isinstance(response, dict) else None
+
+        try:
+            self.exchange.fapiPrivatePostMarginType({
+                'symbol': market_id,
+                'marginType': margin_type,
+                **self.params_fn()
+            })
+        except Exception as e:
+            if parse_error_code(e) not in NO_CHANGE_ERROR_CODES and "No need to change margin type" not in str(e):
+                raise
+
+        if self.markets_stale:
+            self.markets_stale = False
+            self.exchange.load_markets(True)
+        context = self._context(symbol, max_notional=float(max_notional) if max_notional is not None else None)
+        self.apply_count += 1
+        return context
+
+    def _context(self, symbol: str, max_notional: Optional[float] = None) -> TradingContext:
+        markets = getattr(self.exchange, 'markets', None) or {}
+        return TradingContext(symbol, self.config['leverage'], self.config['margin_type'], self.dual_side_position,
+                              market=markets.get(symbol), max_notional=max_notional,
+                              precision_mode=getattr(self.exchange, 'precisionMode', None))
+
+    def ensure(self, symbol: str) -> TradingContext:
+        """获取交易对的交易配置，未缓存或已失效时设置一次"""
+        context = self.contexts.get(symbol)
+        if context is not None:
+            return context
+        with self._symbol_lock(symbol):
+            context = self.contexts.get(symbol)
+            if context is None:
+                context = self._apply(symbol)
+                self.contexts[symbol] = context
+                print(f"交易配置已初始化 {context}")
+        return context
+
+    def rules(self, symbol: str) -> TradingContext:
+        """下单取整与最小名义价值规则：优先使用缓存，交易配置尚未设置成功时按已加载的市场信息"""
+        context = self.contexts.get(symbol)
+        return context if context is not None else self._context(symbol)
+
+    def warm_up(self, symbols: List[str]) -> Dict[str, TradingContext]:
+        """启动时并行初始化所有交易对的交易配置，失败的交易对在首次下单时重试"""
+        self._ensure_position_mode()
+        workers = max(1, min(self.config['context_warmup_workers'], len(symbols)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {symbol: pool.submit(self.ensure, symbol) for symbol in symbols}
+        for symbol, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                print(f"初始化交易配置错误 {symbol}: {error}")
+        return dict(self.contexts)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """使缓存失效，None 表示全部失效（包括持仓模式）"""
+        if symbol is None:
+            self.contexts.clear()
+            self.dual_side_position = None
+        else:
+            self.contexts.pop(symbol, None)
+
+    def handle_error(self, symbol: str, error) -> bool:
+        """
+        下单失败时检查错误码，与交易配置相关时使缓存失效
+
+        Returns:
+            bool: 是否已失效，调用方可在下次下单前重新设置
+        """
+        code = parse_error_code(error)
+        if code not in REVALIDATE_ERROR_CODES:
+            return False
+        print(f"交易配置需重新校验 {symbol}: {REVALIDATE_ERROR_CODES[code]} ({code})")
+        if code == -4061:
+            self.dual_side_position = None
+        if code in MARKET_RULE_ERROR_CODES:
+            self.markets_stale = True
+        self.invalidate(symbol)
+        return True
@@ -9,7 +9,18 @@ import time
 from pathlib import Path
 from datetime import datetime, timedelta
 from data.data_fetcher import DataFetcher
+from data.price_cache import price_cache
 from execution.order_executor import OrderExecutor
+from execution.order_lifecycle import OrderLifecycleManager
+from execution.hedge_executor import HedgeExecutor
+from common.state_store import get_state_store
+from data.user_data_stream import UserDataStream
+from data.position_cache import PositionCache
+from common.pnl_engine import PnLEngine
+from execution.protective_orders import ProtectiveOrderManager
+from monitoring.metrics_registry import metrics
+from utils.exchange_recorder import mark_tick, close_traffic_sessions
+from utils.bar_scheduler import BarCloseScheduler, make_kline_probe
 # 导入部分
 from config.config import (
     SYMBOL, TIMEFRAME_SHORT, TIMEFRAME_LONG,
@@ -39,7 +50,7 @@ def update_data(fetcher, symbol, filename):
         return df
     return None
 
-def log_account_info(logger, fetcher, symbol):
+def log_account_info(logger, fetcher, symbol, pnl_engine=None):
     """记录账户信息和交易数据"""
     try:
         # 强制同步时间
@@ -62,6 +73,13 @@ def log_account_info(logger, fetcher, symbol):
         else:
             logger.info(f"当前无{symbol}持仓")
         
+        # 实时盈亏（按策略/槽位）
+        if pnl_engine is not None:
+            snapshot = pnl_engine.snapshot()
+            for name, pnl in {**snapshot['strategies'], **snapshot['slots']}.items():
+                logger.info(f"盈亏 - {name}: 已实现={pnl['realized']:.4f}, 手续费={pnl['fees']:.4f}, "
+                            f"未实现={pnl['unrealized']:.4f}, 当日={pnl['daily']:.4f}, 累计={pnl['total']:.4f}")
+        
         # 获取未完成订单
         open_orders = fetcher.get_open_orders(symbol)
         if open_orders:
@@ -81,8 +99,29 @@ def log_account_info(logger, fetcher, symbol):
     except Exception as e:
         logger.error(f"记录账户信息失败: {e}")
 
-def check_and_execute_strategy(logger, fetcher, order_executor, multi_strategy, data_path, executed_signals):
-    """检查并执行策略"""
+def get_dmr_strategy(multi_strategy, order_executor, state_store=None):
+    """获取常驻的DMR四象限策略实例，首次调用时创建并注册到 MultiStrategy
+    
+    Args:
+        state_store: 槽位状态存储，默认使用实盘状态库（回放时传入独立的存储）
+    """
+    for strategy in multi_strategy.strategies:
+        if isinstance(strategy, DMRQuadrantStrategy):
+            return strategy
+    dmr_strategy = DMRQuadrantStrategy(None, order_executor, params=DMR_STRATEGY_CONFIG,
+                                       state_store=state_store or get_state_store())
+    multi_strategy.add_strategy(dmr_strategy)
+    return dmr_strategy
+
+def check_and_execute_strategy(logger, fetcher, order_executor, multi_strategy, data_path, executed_signals,
+                               closed_timeframes=None):
+    """检查并执行策略
+    
+    Args:
+        closed_timeframes: 本次收盘的时间周期列表（由K线收盘调度器提供），None 时按本地时间判断
+    """
+    # 录制模式下标记调度边界与收盘周期，回放时按此还原调度
+    mark_tick('check_and_execute_strategy', closed_timeframes=closed_timeframes)
     try:
         # 同步时间并获取服务器时间
         fetcher.sync_time(force=True)
@@ -95,16 +134,17 @@ def check_and_execute_strategy(logger, fetcher, order_executor, multi_strategy,
             return
             
         logger.info(f"在 {current_time} 更新了市场数据")
+        # 最新收盘价写入价格缓存，下单换算数量时无需再查询行情
+        price_cache.update_from_frame(SYMBOL, df)
         
-        # 创建并执行策略 - 使用配置文件中的参数
-        dmr_strategy = DMRQuadrantStrategy(df, order_executor, params=DMR_STRATEGY_CONFIG)
-        multi_strategy.add_strategy(dmr_strategy)
+        # 常驻策略实例更新数据，仓位状态跨调度保留
+        dmr_strategy = get_dmr_strategy(multi_strategy, order_executor)
+        dmr_strategy.update_data(df)
+        dmr_strategy.closed_timeframes = closed_timeframes
         
         try:
-            # 获取当前信号但不立即执行
-            dmr_strategy.calculate_dmr()
-            dmr_strategy.resample_data()
-            dmr_strategy.generate_signals()
+            # 获取当前信号但不立即执行，计算结果在执行交易时复用
+            dmr_strategy.prepare()
             
             # 获取最新信号 - 修正变量名
             latest_4h_signal = dmr_strategy.df_4h['signal_4h'].iloc[-1] if len(dmr_strategy.df_4h) > 0 else 0
@@ -139,9 +179,6 @@ def check_and_execute_strategy(logger, fetcher, order_executor, multi_strategy,
                 logger.info("K线收盘时间，但没有新的交易信号")
         except Exception as e:
             logger.error(f"策略执行错误: {e}")
-            
-        # 清空策略列表，准备下一轮
-        multi_strategy.strategies.clear()
         
     except Exception as e:
         logger.error(f"执行策略检查时发生错误: {e}")
@@ -166,6 +203,39 @@ def main():
             fetcher.sync_time(force=True)
         
         order_executor = OrderExecutor(fetcher.exchange)
+        # 启动时一次性设置杠杆、保证金和持仓模式，下单路径不再逐笔请求
+        order_executor.warm_up_trading_context([SYMBOL])
+        
+        # 订单生命周期：用户数据流推送成交，断线时轮询兜底，超时撤单重挂
+        user_stream = UserDataStream(fetcher.exchange)
+        # 持仓/余额缓存：账户推送更新内存，定期 REST 对账，日志与平仓读取持仓不再逐次请求交易所
+        position_cache = PositionCache(fetcher.exchange, params_fn=order_executor.get_private_params)
+        position_cache.track(SYMBOL)
+        position_cache.attach_stream(user_stream)
+        fetcher.attach_position_cache(position_cache)
+        order_executor.attach_position_cache(position_cache)
+        order_lifecycle = OrderLifecycleManager(fetcher.exchange, stream=user_stream,
+                                                params_fn=order_executor.get_private_params)
+        # 订单状态与成交写入状态存储；本进程只运行DMR四象限策略
+        order_lifecycle.attach_state_store(get_state_store(), default_strategy='DMRQuadrant')
+        order_executor.attach_order_lifecycle(order_lifecycle)
+        # R1/R2 锁仓的两条腿一次提交，部分失败时回滚
+        order_executor.attach_hedge_executor(HedgeExecutor(order_executor))
+        # 实时盈亏：本进程只运行DMR四象限策略，未登记的成交都记入该策略，开平仓与保护单按客户端订单ID归属槽位
+        pnl_engine = PnLEngine(clock=fetcher.get_timestamp, exchange=fetcher.exchange, default_strategy='DMRQuadrant')
+        pnl_engine.attach_stream(user_stream)
+        pnl_engine.attach_price_cache(price_cache)
+        order_executor.attach_pnl_engine(pnl_engine)
+        order_lifecycle.attach_pnl_engine(pnl_engine)
+        metrics.add_collector(pnl_engine.gauges)
+        # 已成交的仓位槽在交易所挂止损/止盈保护单，槽位变化时更新，平仓时撤销
+        protective_orders = ProtectiveOrderManager(fetcher.exchange, params_fn=order_executor.get_private_params)
+        protective_orders.attach_stream(user_stream)
+        protective_orders.attach_pnl_engine(pnl_engine)
+        order_executor.attach_protective_orders(protective_orders)
+        user_stream.start()
+        position_cache.start_reconcile()
+        order_lifecycle.start()
         multi_strategy = MultiStrategy(order_executor)
         
         # 设置交易对和数据文件路径
@@ -180,71 +250,29 @@ def main():
         logger.info("=" * 50)
         logger.info("程序启动 - 初始账户信息和持仓数据")
         logger.info("-" * 50)
-        log_account_info(logger, fetcher, SYMBOL)
+        log_account_info(logger, fetcher, SYMBOL, pnl_engine)
         logger.info("=" * 50)
         
         # 创建一个信号记录字典，用于跟踪已执行的信号
         executed_signals = {TIMEFRAME_LONG: None, TIMEFRAME_SHORT: None}
         
-        # 修正调度逻辑 - 短周期调度
-        if TIMEFRAME_SHORT == '1h':
-            schedule.every().hour.at(":00").do(
-                check_and_execute_strategy, 
-                logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-            )
-        elif TIMEFRAME_SHORT == '5m':
-            for minute in range(0, 60, 5):
-                schedule.every().hour.at(f":{minute:02d}").do(
-                    check_and_execute_strategy,
-                    logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-                )
-        elif TIMEFRAME_SHORT == '15m':
-            for minute in [0, 15, 30, 45]:
-                schedule.every().hour.at(f":{minute:02d}").do(
-                    check_and_execute_strategy,
-                    logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-                )
-        elif TIMEFRAME_SHORT == '30m':
-            for minute in [0, 30]:
-                schedule.every().hour.at(f":{minute:02d}").do(
-                    check_and_execute_strategy,
-                    logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-                )
-        
-        # 修正调度逻辑 - 长周期调度
-        if TIMEFRAME_LONG == '4h':
-            for hour in [0, 4, 8, 12, 16, 20]:
-                schedule.every().day.at(f"{hour:02d}:00").do(
-                    check_and_execute_strategy,
-                    logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-                )
-        elif TIMEFRAME_LONG == '15m':
-            for minute in [0, 15, 30, 45]:
-                schedule.every().hour.at(f":{minute:02d}").do(
-                    check_and_execute_strategy,
-                    logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-                )
-        elif TIMEFRAME_LONG == '30m':
-            for minute in [0, 30]:
-                schedule.every().hour.at(f":{minute:02d}").do(
-                    check_and_execute_strategy,
-                    logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-                )
-        elif TIMEFRAME_LONG == '1h':
-            schedule.every().hour.at(":00").do(
-                check_and_execute_strategy,
-                logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-            )
-        elif TIMEFRAME_LONG == '2h':
-            for hour in range(0, 24, 2):
-                schedule.every().day.at(f"{hour:02d}:00").do(
-                    check_and_execute_strategy,
-                    logger, fetcher, order_executor, multi_strategy, data_path, executed_signals
-                )
+        # K线收盘调度 - 基于服务器时间，短/长周期同时收盘时合并为一次触发
+        bar_scheduler = BarCloseScheduler(
+            clock=fetcher.get_timestamp,
+            timeframes=[TIMEFRAME_SHORT, TIMEFRAME_LONG],
+            callback=lambda event: check_and_execute_strategy(
+                logger, fetcher, order_executor, multi_strategy, data_path, executed_signals,
+                closed_timeframes=event.timeframes
+            ),
+            probe=make_kline_probe(fetcher.exchange, SYMBOL)
+        )
+        bar_scheduler_thread = threading.Thread(target=bar_scheduler.run_forever)
+        bar_scheduler_thread.daemon = True
+        bar_scheduler_thread.start()
         
         # 设置定时任务 - 每天0点记录账户信息
         schedule.every().day.at("00:00").do(
-            lambda: log_account_info(logger, fetcher, SYMBOL)
+            lambda: log_account_info(logger, fetcher, SYMBOL, pnl_engine)
         )
         
         # 设置定时任务 - 每小时同步一次时间
@@ -252,6 +280,11 @@ def main():
             lambda: fetcher.sync_time(force=True)
         )
         
+        # 设置定时任务 - 每小时输出一次K线收盘触发延迟统计
+        schedule.every().hour.do(
+            lambda: logger.info(f"K线收盘触发延迟统计: {bar_scheduler.get_lateness_report()}")
+        )
+        
         # 启动调度器线程
         scheduler_thread = threading.Thread(target=run_scheduler)
         scheduler_thread.daemon = True
@@ -267,6 +300,7 @@ def main():
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
     finally:
+        close_traffic_sessions()
         logger.info("Bot stopped")
 
 if __name__ == "__main__":
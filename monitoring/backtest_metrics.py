@@ -0,0 +1,155 @@
+"""
+回测绩效指标
+
+run_backtest_custom 原先用多次独立的 pandas 运算计算回撤、胜率和夏普，夏普固定按 sqrt(252) 年化
+（对 5m K线收益率严重失真），胜率把开仓记录也计为非盈利交易。本模块在净值数组和成交数组上
+用一组 NumPy 向量运算一次算出全部指标，中间数组复用同一块缓冲区：
+- 总收益、CAGR，按K线周期的每年根数（7x24 交易，365 天）年化的夏普/Sortino/Calmar
+- 最大回撤（比例与金额）及最长回撤持续时间
+- 持仓时间占比、换手率、手续费拖累
+- 只按已平仓交易统计的胜率与盈亏因子
+"""
+import math
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.bar_scheduler import timeframe_to_ms
+
+YEAR_MS = 365 * 86400000
+
+
+def bars_per_year(timeframe: str) -> float:
+    """加密货币全年无休，每年K线根数 = 365天 / 周期"""
+    return YEAR_MS / timeframe_to_ms(timeframe)
+
+
+def _cagr(initial: float, final: float, years: float) -> float:
+    """按对数计算 CAGR；区间很短时年化后的指数超出浮点范围，返回 inf"""
+    if years <= 0 or initial <= 0 or final <= 0:
+        return 0.0
+    try:
+        return math.exp(math.log(final / initial) / years) - 1
+    except OverflowError:
+        return math.inf
+
+
+def _as_array(values: Optional[Sequence[float]]) -> np.ndarray:
+    if values is None:
+        return np.empty(0)
+    return np.asarray(values, dtype=np.float64)
+
+
+def compute_metrics(equity: Sequence[float], timeframe: str, position: Optional[Sequence[float]] = None,
+                    trade_pnl: Optional[Sequence[float]] = None, traded_notional: Optional[Sequence[float]] = None,
+                    fees: Optional[Sequence[float]] = None, risk_free_rate: float = 0.0) -> Dict[str, Any]:
+    """
+    计算回测绩效指标
+
+    Args:
+        equity: 每根K线收盘时的账户净值（含未实现盈亏）
+        timeframe: K线周期（如 '5m'），决定年化系数
+        position: 每根K线的持仓（数量或金额，非0即视为持仓中），用于持仓时间占比
+        trade_pnl: 每笔已平仓交易的盈亏（不含开仓记录）
+        traded_notional: 每笔成交的名义金额，用于换手率
+        fees: 每笔成交的手续费
+        risk_free_rate: 年化无风险利率
+
+    Returns:
+        指标字典；比例类指标为小数（0.05 表示 5%），持续时间单位为K线根数
+    """
+    equity = _as_array(equity)
+    bars = len(equity)
+    periods = bars_per_year(timeframe)
+    metrics: Dict[str, Any] = {'bars': bars, 'bars_per_year': periods}
+    if bars == 0:
+        return metrics
+
+    initial, final = float(equity[0]), float(equity[-1])
+    years = (bars - 1) / periods
+    total_return = final / initial - 1 if initial else 0.0
+    metrics.update({
+        'initial_equity': initial,
+        'final_equity': final,
+        'total_return': total_return,
+        'years': years,
+        'cagr': _cagr(initial, final, years),
+    })
+
+    # 收益率与下行收益率共用一块缓冲区
+    buffer = np.empty(max(bars - 1, 0))
+    if bars > 1:
+        np.divide(equity[1:], equity[:-1], out=buffer)
+        buffer -= 1.0
+        mean = float(buffer.mean())
+        std = float(buffer.std(ddof=1)) if bars > 2 else 0.0
+        excess = mean - risk_free_rate / periods
+        np.minimum(buffer, 0.0, out=buffer)
+        np.square(buffer, out=buffer)
+        downside = math.sqrt(float(buffer.mean()))
+        annual_factor = math.sqrt(periods)
+        metrics.update({
+            'mean_return': mean,
+            'volatility': std * annual_factor,
+            'sharpe_ratio': excess / std * annual_factor if std > 0 else 0.0,
+            'sortino_ratio': excess / downside * annual_factor if downside > 0 else 0.0,
+        })
+    else:
+        metrics.update({'mean_return': 0.0, 'volatility': 0.0, 'sharpe_ratio': 0.0, 'sortino_ratio': 0.0})
+
+    # 回撤：运行峰值、回撤金额与比例；持续时间 = 当前K线 - 最近一次处于峰值的K线
+    peak = np.maximum.accumulate(equity)
+    drawdown_amount = peak - equity
+    ratio = np.divide(drawdown_amount, peak, out=np.zeros(bars), where=peak > 0)
+    max_drawdown = float(ratio.max())
+    at_peak = np.arange(bars)
+    at_peak[drawdown_amount > 0] = 0
+    np.maximum.accumulate(at_peak, out=at_peak)
+    metrics.update({
+        'max_drawdown': max_drawdown,
+        'max_drawdown_amount': float(drawdown_amount.max()),
+        'max_drawdown_duration': int((np.arange(bars) - at_peak).max()),
+        'calmar_ratio': metrics['cagr'] / max_drawdown if max_drawdown > 0 else 0.0,
+    })
+
+    position = _as_array(position)
+    metrics['exposure'] = float(np.count_nonzero(position) / len(position)) if len(position) else 0.0
+
+    notional = _as_array(traded_notional)
+    average_equity = float(equity.mean())
+    metrics['turnover'] = float(notional.sum()) / average_equity if average_equity > 0 else 0.0
+    metrics['annual_turnover'] = metrics['turnover'] / years if years > 0 else 0.0
+    total_fees = float(_as_array(fees).sum())
+    metrics['fees'] = total_fees
+    metrics['fee_drag'] = total_fees / initial if initial else 0.0
+
+    pnl = _as_array(trade_pnl)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    gross_loss = float(-losses.sum())
+    metrics.update({
+        'closed_trades': len(pnl),
+        'winning_trades': len(wins),
+        'losing_trades': len(losses),
+        'win_rate': len(wins) / len(pnl) if len(pnl) else 0.0,
+        'profit_factor': float(wins.sum()) / gross_loss if gross_loss > 0 else (math.inf if len(wins) else 0.0),
+        'average_win': float(wins.mean()) if len(wins) else 0.0,
+        'average_loss': float(losses.mean()) if len(losses) else 0.0,
+    })
+    return metrics
+
+
+def benchmark(points: int = 10_000_000, timeframe: str = '5m') -> Dict[str, float]:
+    """在随机游走净值曲线上测量 compute_metrics 的耗时(毫秒)"""
+    rng = np.random.default_rng(0)
+    equity = 10000.0 * np.cumprod(1 + rng.normal(0, 0.001, points))
+    position = (rng.random(points) < 0.5).astype(np.float64)
+    started = time.perf_counter()
+    compute_metrics(equity, timeframe, position=position)
+    return {'points': points, 'elapsed_ms': (time.perf_counter() - started) * 1000}
+
+
+if __name__ == '__main__':
+    result = benchmark()
+    print(f"{result['points']} 点净值曲线: {result['elapsed_ms']:.1f} ms")
@@ -0,0 +1,118 @@
+"""
+进程内指标注册表
+
+风控、执行等模块把耗时等观测值记录到固定分桶的直方图中；
+盈亏等当前值由模块登记采集函数，导出时读取为 gauge。
+可导出为字典快照或 Prometheus 文本格式，由日志、监控接口读取。
+"""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+# 默认分桶（秒）：覆盖 10 微秒到 1 秒
+DEFAULT_LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+class Histogram:
+    """固定分桶直方图，observe 为 O(log 桶数)"""
+
+    def __init__(self, name: str, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.buckets: List[float] = sorted(buckets)
+        # 最后一个计数对应 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按分桶上界估算分位数，无数据返回 None"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """按名称登记直方图"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        # 导出时调用的采集函数，返回 {'指标名{标签}': 值}
+        self.collectors: List[Callable[[], Dict[str, float]]] = []
+        self._lock = threading.Lock()
+
+    def add_collector(self, collector: Callable[[], Dict[str, float]]):
+        """登记 gauge 采集函数"""
+        self.collectors.append(collector)
+
+    def collect_gauges(self) -> Dict[str, float]:
+        gauges = {}
+        for collector in self.collectors:
+            gauges.update(collector())
+        return gauges
+
+    def histogram(self, name: str, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        """获取或创建直方图"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(name, buckets))
+        return histogram
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        result = {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        if self.collectors:
+            result['gauges'] = self.collect_gauges()
+        return result
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        for name, histogram in sorted(self.histograms.items()):
+            metric = name.replace('.', '_')
+            lines.append(f'# TYPE {metric} histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f'{metric}_sum {histogram.sum}')
+            lines.append(f'{metric}_count {histogram.count}')
+        typed = set()
+        for key, value in sorted(self.collect_gauges().items()):
+            metric = key.split('{')[0]
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f'# TYPE {metric} gauge')
+            lines.append(f'{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内共享的指标注册表
+metrics = MetricsRegistry()
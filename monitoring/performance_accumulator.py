@@ -0,0 +1,128 @@
+"""
+增量绩效累加器
+
+PerformanceMonitor 每次计算都用全部交易记录重建 DataFrame，夏普比率和最大回撤各重建一次，
+运行越久越慢。累加器在每笔交易平仓时 O(1) 更新：
+- 收益率的笔数、均值、方差（Welford 在线算法，数值稳定）
+- 按 Π(1+收益率) 计算的净值、峰值和最大回撤
+- 盈亏笔数、总盈利/总亏损（盈亏因子）
+任意时刻读取指标都是常数时间，状态可导出为快照并恢复（如写入状态存储、重启后继续累计）。
+"""
+import math
+import threading
+from typing import Any, Dict, Optional
+
+# 快照中保存的字段
+STATE_FIELDS = ('count', 'mean', 'm2', 'equity', 'peak', 'max_drawdown', 'wins', 'losses',
+                'gross_profit', 'gross_loss', 'total_pnl')
+
+
+class PerformanceAccumulator:
+    """逐笔平仓交易更新的在线绩效统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        # 与均值差的平方和，样本方差 = m2 / (count - 1)
+        self.m2 = 0.0
+        # 复利净值与历史峰值；峰值从第一笔交易后的净值开始（与 PerformanceMonitor 原口径一致）
+        self.equity = 1.0
+        self.peak: Optional[float] = None
+        self.max_drawdown = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.total_pnl = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, trade_return: float, pnl: Optional[float] = None):
+        """
+        记入一笔平仓交易
+
+        Args:
+            trade_return: 收益率
+            pnl: 盈亏金额，未提供时以收益率计入盈亏因子
+        """
+        pnl = trade_return if pnl is None else pnl
+        with self._lock:
+            self.count += 1
+            delta = trade_return - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (trade_return - self.mean)
+
+            self.equity *= 1 + trade_return
+            if self.peak is None or self.equity > self.peak:
+                self.peak = self.equity
+            drawdown = self.equity / self.peak - 1 if self.peak else 0.0
+            if drawdown < self.max_drawdown:
+                self.max_drawdown = drawdown
+
+            self.total_pnl += pnl
+            if pnl > 0:
+                self.wins += 1
+                self.gross_profit += pnl
+            elif pnl < 0:
+                self.losses += 1
+                self.gross_loss -= pnl
+
+    # ------------------------------------------------------------------ 指标
+    @property
+    def variance(self) -> float:
+        """样本方差（ddof=1，与 pandas 的 std 一致），不足两笔时为 nan"""
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance) if self.count > 1 else float('nan')
+
+    def sharpe_ratio(self, risk_free_rate: float = 0.02) -> float:
+        std = self.std
+        if not std or std != std:
+            return float('nan')
+        return (self.mean - risk_free_rate) / std
+
+    @property
+    def current_drawdown(self) -> float:
+        return self.equity / self.peak - 1 if self.peak else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.count if self.count else 0.0
+
+    @property
+    def profit_factor(self) -> Optional[float]:
+        """总盈利 / 总亏损；没有亏损时为 inf，没有交易时为 None"""
+        if self.gross_loss > 0:
+            return self.gross_profit / self.gross_loss
+        return float('inf') if self.gross_profit > 0 else None
+
+    def metrics(self, risk_free_rate: float = 0.02) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'trades': self.count,
+                'mean_return': self.mean,
+                'std_return': self.std,
+                'sharpe_ratio': self.sharpe_ratio(risk_free_rate),
+                'equity': self.equity,
+                'max_drawdown': self.max_drawdown,
+                'current_drawdown': self.current_drawdown,
+                'wins': self.wins,
+                'losses': self.losses,
+                'win_rate': self.win_rate,
+                'profit_factor': self.profit_factor,
+                'total_pnl': self.total_pnl,
+            }
+
+    # ------------------------------------------------------------------ 快照
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {field: getattr(self, field) for field in STATE_FIELDS}
+
+    @classmethod
+    def restore(cls, state: Dict[str, Any]) -> 'PerformanceAccumulator':
+        accumulator = cls()
+        for field in STATE_FIELDS:
+            if field in state:
+                setattr(accumulator, field, state[field])
+        return accumulator
@@ -1,9 +1,13 @@
 import pandas as pd
 import numpy as np
 
+from monitoring.performance_accumulator import PerformanceAccumulator
+
 class PerformanceMonitor:
-    def __init__(self):
+    def __init__(self, accumulator=None):
         self.trades = []  # 存储所有交易记录
+        # 增量绩效统计，夏普比率/最大回撤等指标常数时间读取；可传入从快照恢复的累加器
+        self.accumulator = accumulator or PerformanceAccumulator()
 
     def add_trade(self, entry_time, exit_time, entry_price, exit_price, side, amount):
         """
@@ -24,6 +28,11 @@ class PerformanceMonitor:
             'amount': amount
         }
         self.trades.append(trade)
+        if side == 'long':
+            trade_return = (exit_price - entry_price) / entry_price
+        else:
+            trade_return = (entry_price - exit_price) / entry_price
+        self.accumulator.add(trade_return, pnl=trade_return * entry_price * amount)
 
     def calculate_returns(self):
         """
@@ -42,17 +51,22 @@ class PerformanceMonitor:
         :param risk_free_rate: 无风险利率
         :return: 夏普比率
         """
-        returns = self.calculate_returns()
-        sharpe_ratio = (returns.mean() - risk_free_rate) / returns.std()
-        return sharpe_ratio
+        return self.accumulator.sharpe_ratio(risk_free_rate)
 
     def calculate_max_drawdown(self):
         """
         计算最大回撤
         :return: 最大回撤比例
         """
-        returns = self.calculate_returns()
-        cumulative_returns = (1 + returns).cumprod()
-        peak = cumulative_returns.expanding(min_periods=1).max()
-        drawdown = (cumulative_returns / peak) - 1
-        return drawdown.min()
\ No newline at end of file
+        return self.accumulator.max_drawdown
+
+    def get_metrics(self, risk_free_rate=0.02):
+        """
+        当前绩效指标（笔数、均值/标准差、夏普、回撤、胜率、盈亏因子），常数时间
+        :param risk_free_rate: 无风险利率
+        """
+        return self.accumulator.metrics(risk_free_rate)
+
+    def snapshot(self):
+        """累加器状态快照，可用 PerformanceAccumulator.restore 恢复"""
+        return self.accumulator.snapshot()
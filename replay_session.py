@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+交易所流量回放工具
+使用 record 模式录制的实盘会话，离线、无延迟地重跑 check_and_execute_strategy，
+用于性能剖析与回归基准测试
+"""
+
+import os
+import sys
+import time
+import argparse
+import cProfile
+import pstats
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.config import EXCHANGE_TRAFFIC_CONFIG, TIMEFRAME_LONG, TIMEFRAME_SHORT, SYMBOL
+from common.state_store import StateStore
+from utils.bar_scheduler import timeframe_to_ms
+from utils.exchange_recorder import configure_traffic, recorded_ticks, exhausted_requests, close_traffic_sessions
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='交易所流量回放工具')
+    parser.add_argument('-f', '--file', type=str, default=EXCHANGE_TRAFFIC_CONFIG['path'],
+                        help=f"录制文件路径 (默认: {EXCHANGE_TRAFFIC_CONFIG['path']})")
+    parser.add_argument('-n', '--ticks', type=int, default=None,
+                        help='回放的调度次数 (默认: 录制文件中的全部调度)')
+    parser.add_argument('-p', '--profile', type=str, default=None,
+                        help='输出 cProfile 统计文件路径')
+    return parser.parse_args()
+
+
+def tick_closed_timeframes(tick, timeframes=(TIMEFRAME_SHORT, TIMEFRAME_LONG)):
+    """
+    一次调度收盘的时间周期
+
+    录制时由K线收盘调度器给出并写入调度标记；旧录制没有该字段时按录制的调度时刻推算：
+    调度按最短周期收盘触发，自上一根最短周期K线以来跨过边界的周期即为本次收盘的周期。
+    回放不读取本地时钟，结果只取决于录制文件。
+    """
+    if tick.get('closed_timeframes') is not None:
+        return list(tick['closed_timeframes'])
+    step = min(timeframe_to_ms(timeframe) for timeframe in timeframes)
+    t = tick['t']
+    return [timeframe for timeframe in timeframes
+            if t // timeframe_to_ms(timeframe) != (t - step) // timeframe_to_ms(timeframe)]
+
+
+def replay(tick_limit=None):
+    """
+    回放录制的调度
+
+    Returns:
+        dict: 回放调度次数、总耗时、单次平均耗时(毫秒)与录制记录用尽后重复返回的请求次数
+    """
+    # 延迟导入：必须在设置回放模式之后再创建交易所实例
+    from main import check_and_execute_strategy, get_dmr_strategy
+    from data.data_fetcher import DataFetcher
+    from execution.order_executor import OrderExecutor
+    from strategy.multi_strategy import MultiStrategy
+    from utils.logger import setup_logger
+
+    logger = setup_logger(name='ReplaySession', log_file='replay_session.log')
+    ticks = recorded_ticks()
+    if tick_limit is not None:
+        ticks = ticks[:tick_limit]
+    if not ticks:
+        logger.warning("录制文件中没有调度记录")
+        return {'ticks': 0, 'total_ms': 0.0, 'avg_ms': 0.0, 'exhausted': 0}
+
+    fetcher = DataFetcher()
+    order_executor = OrderExecutor(fetcher.exchange)
+    multi_strategy = MultiStrategy(order_executor)
+    # 槽位状态写入内存库，回放不读取也不覆盖实盘状态库
+    get_dmr_strategy(multi_strategy, order_executor, state_store=StateStore(':memory:'))
+    data_path = os.path.join(project_root, 'data', 'replay', f"{SYMBOL.split('/')[0]}_USDT_data.csv")
+    executed_signals = {TIMEFRAME_LONG: None, TIMEFRAME_SHORT: None}
+
+    started = time.perf_counter()
+    for tick in ticks:
+        check_and_execute_strategy(logger, fetcher, order_executor, multi_strategy, data_path, executed_signals,
+                                   closed_timeframes=tick_closed_timeframes(tick))
+    total_ms = (time.perf_counter() - started) * 1000
+
+    exhausted = exhausted_requests()
+    result = {'ticks': len(ticks), 'total_ms': total_ms, 'avg_ms': total_ms / len(ticks),
+              'exhausted': sum(exhausted.values())}
+    logger.info(f"回放完成: {result['ticks']} 次调度, 总耗时 {total_ms:.1f}ms, 平均 {result['avg_ms']:.1f}ms/次")
+    if exhausted:
+        # 回放的请求多于录制时，结果不再与录制会话一致
+        logger.warning(f"{len(exhausted)} 个请求的录制记录已用尽，共重复返回 {result['exhausted']} 次: "
+                       f"{', '.join(sorted(exhausted))}")
+    return result
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    configure_traffic('replay', args.file)
+
+    try:
+        if args.profile:
+            profiler = cProfile.Profile()
+            profiler.runcall(replay, args.ticks)
+            profiler.dump_stats(args.profile)
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+            print(f"剖析结果已保存至 {args.profile}")
+        else:
+            replay(args.ticks)
+    finally:
+        close_traffic_sessions()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
+import logging
+from datetime import datetime
+
+from common.position_book import PositionBook
+
+
 class EnhancedPositionManager:
-    def __init__(self):
-        self.positions = {}  # 持仓跟踪
+    def __init__(self, strategy='default'):
+        # 持仓跟踪：结构化数组持仓簿，敞口查询为整列归约
+        self.book = PositionBook()
+        self.strategy = strategy
         self.max_position_size = 100  # 最大持仓金额
         self.max_daily_trades = 50    # 每日最大交易次数
         self.daily_trade_count = 0
         self.last_reset_date = datetime.now().date()
-        
+        self.logger = logging.getLogger(self.__class__.__name__)
+
     def validate_new_position(self, symbol, side, amount):
         """验证新仓位是否符合风控要求"""
         # 重置每日交易计数
@@ -13,42 +22,55 @@ class EnhancedPositionManager:
         if current_date != self.last_reset_date:
             self.daily_trade_count = 0
             self.last_reset_date = current_date
-        
+
         # 检查每日交易次数限制
         if self.daily_trade_count >= self.max_daily_trades:
             raise ValueError(f"已达到每日最大交易次数限制: {self.max_daily_trades}")
-        
+
         # 检查持仓金额限制
         current_exposure = self.get_total_exposure(symbol)
         if current_exposure + amount > self.max_position_size:
             raise ValueError(f"新仓位将超出最大持仓限制: {self.max_position_size}")
-        
+
         # 检查冲突持仓
         if self.has_conflicting_position(symbol, side):
             raise ValueError(f"存在冲突持仓，无法开设 {side} 仓位")
-        
+
         return True
-    
+
+    def get_total_exposure(self, symbol=None):
+        """交易对（或全部）多空持仓金额之和"""
+        return self.book.gross_exposure(symbol)
+
+    def has_conflicting_position(self, symbol, side):
+        """同一交易对是否持有反方向仓位"""
+        opposite = 'short' if side.lower() == 'long' else 'long'
+        return self.book.get(self.strategy, symbol, opposite)['amount'] > 0
+
     def update_position(self, symbol, side, amount, price, action):
         """更新持仓记录"""
-        if symbol not in self.positions:
-            self.positions[symbol] = {'long': 0, 'short': 0, 'avg_price': 0}
-        
         if action == 'open':
-            self.positions[symbol][side] += amount
+            # 同方向再次开仓按加仓计入均价
+            held = self.book.get(self.strategy, symbol, side)['amount'] > 0
+            self.book.apply(self.strategy, symbol, side, amount, price, 'add' if held else 'open')
             self.daily_trade_count += 1
         elif action == 'close':
-            self.positions[symbol][side] = max(0, self.positions[symbol][side] - amount)
+            self.book.apply(self.strategy, symbol, side, amount, price, 'reduce')
             self.daily_trade_count += 1
-        
+
         # 记录到日志
         self.log_position_change(symbol, side, amount, price, action)
-    
+
+    def log_position_change(self, symbol, side, amount, price, action):
+        self.logger.info(f"{symbol} {action} {side} {amount}@{price}, 当前持仓: {self.book.get(self.strategy, symbol, side)}")
+
     def get_position_summary(self):
         """获取持仓摘要"""
+        positions = {symbol: {'long': long_amount, 'short': short_amount}
+                     for symbol, (long_amount, short_amount) in self.book.exposure_by_symbol().items()}
         summary = {
-            'total_positions': len(self.positions),
+            'total_positions': len(positions),
             'daily_trades': self.daily_trade_count,
-            'positions': self.positions.copy()
+            'positions': positions
         }
-        return summary
\ No newline at end of file
+        return summary
@@ -0,0 +1,128 @@
+import time
+from strategy.long_term.data_fetcher import LongTermDataFetcher
+from strategy.long_term.strategy_engine import LongTermDMRStrategy
+from strategy.long_term.order_executor import LongTermOrderExecutor
+from strategy.long_term.position_manager import LongTermPositionManager
+from strategy.long_term.risk_manager import LongTermRiskManager
+from strategy.short_term.data_fetcher import ShortTermDataFetcher
+from strategy.short_term.strategy_engine import ShortTermDMRStrategy
+from strategy.short_term.order_executor import ShortTermOrderExecutor
+from strategy.short_term.position_manager import ShortTermPositionManager
+from strategy.short_term.risk_manager import ShortTermRiskManager
+from config.long_term_config import LONG_TERM_CONFIG
+from config.short_term_config import SHORT_TERM_CONFIG
+from strategy.strategy_worker import StrategyWorker
+from strategy.runtime import StrategyRuntime, WorkerPlugin
+from execution.execution_coordinator import ExecutionCoordinator
+from data.user_data_stream import UserDataStream
+from data.price_cache import price_cache
+from common.pnl_engine import PnLEngine
+from common.state_store import get_state_store
+from common.position_manager import UnifiedPositionManager
+from common.position_book import PositionBook
+from common.risk_controller import RiskController
+from common.risk_engine import RiskEngine
+from common.trigger_index import TriggerIndex
+from common.pre_trade_gate import PreTradeGate
+from common.trading_validator import TradingValidator
+from execution.protective_orders import ProtectiveOrderManager
+from monitoring.metrics_registry import metrics
+
+def create_runtime():
+    """创建同时承载长/短周期策略的运行时，共享一个交易所连接、行情源和持仓缓存"""
+    clock_fetcher = LongTermDataFetcher()
+    runtime = StrategyRuntime(
+        clock_fetcher,
+        delta_limit=LONG_TERM_CONFIG['worker_config']['delta_limit']
+    )
+    # 同一根K线上长/短周期策略相反方向的市价单内部撮合，只下净额
+    coordinator = ExecutionCoordinator(runtime.exchange)
+    # 净额订单与按策略分配的成交（含内部撮合）写入状态存储
+    coordinator.attach_state_store(get_state_store())
+    runtime.attach_coordinator(coordinator)
+    # 持仓缓存由用户数据流的账户推送更新，各策略读取持仓不再请求交易所
+    user_stream = UserDataStream(runtime.exchange)
+    runtime.attach_user_stream(user_stream)
+    # 实时盈亏：成交推送入账，行情价格作为标记价格，按服务器时间的 UTC 日界重置
+    pnl_engine = PnLEngine(clock=clock_fetcher.get_timestamp, exchange=runtime.exchange)
+    pnl_engine.attach_stream(user_stream)
+    pnl_engine.attach_price_cache(price_cache)
+    metrics.add_collector(pnl_engine.gauges)
+    # 经协调器成交的内部撮合与净额订单按策略入账
+    coordinator.attach_pnl_engine(pnl_engine)
+    # 止损/止盈以保护单挂在交易所，由交易所按标记价格触发，不依赖调度周期
+    protective_orders = ProtectiveOrderManager(runtime.exchange)
+    protective_orders.attach_stream(user_stream)
+    protective_orders.attach_pnl_engine(pnl_engine)
+    # 事件驱动风控：策略持仓变化、成交推送与行情价格触发增量检查，严重违规交给风控控制器；
+    # 日初权益按服务器时间的 UTC 日界重置，紧急止损价登记在价格触发索引中
+    unified_positions = UnifiedPositionManager()
+    risk_controller = RiskController(unified_positions, runtime.exchange)
+    # 持仓簿镜像统一持仓，对冲不平衡与加仓溢出检测按整列归约
+    position_book = PositionBook()
+    position_book.attach_position_manager(unified_positions, LONG_TERM_CONFIG['symbol'])
+    risk_controller.attach_position_book(position_book)
+    risk_engine = RiskEngine(unified_positions, controller=risk_controller, clock=clock_fetcher.get_timestamp)
+    risk_controller.attach_risk_engine(risk_engine)
+    risk_engine.attach_stream(user_stream)
+    risk_engine.attach_price_cache(price_cache, LONG_TERM_CONFIG['symbol'])
+    trigger_index = TriggerIndex()
+    trigger_index.attach_price_cache(price_cache)
+    risk_engine.attach_trigger_index(trigger_index, LONG_TERM_CONFIG['symbol'])
+    # 开仓前只读内存状态的快速检查，当日成交次数按服务器时间的 UTC 日界重置
+    pre_trade_gate = PreTradeGate(unified_positions, day_clock=clock_fetcher.get_timestamp)
+    trading_validator = TradingValidator(runtime.exchange, unified_positions, position_cache=runtime.position_cache,
+                                         pre_trade_gate=pre_trade_gate)
+    
+    long_worker = StrategyWorker(
+        name='LongTermWorker',
+        config=LONG_TERM_CONFIG,
+        data_fetcher_cls=LongTermDataFetcher,
+        position_manager_cls=LongTermPositionManager,
+        order_executor_cls=LongTermOrderExecutor,
+        risk_manager_cls=LongTermRiskManager,
+        strategy_cls=LongTermDMRStrategy,
+        data_fetcher=clock_fetcher,
+        position_cache=runtime.position_cache,
+        coordinator=coordinator,
+        pnl_engine=pnl_engine,
+        protective_orders=protective_orders,
+        unified_positions=unified_positions,
+        trading_validator=trading_validator
+    )
+    short_worker = StrategyWorker(
+        name='ShortTermWorker',
+        config=SHORT_TERM_CONFIG,
+        data_fetcher_cls=ShortTermDataFetcher,
+        position_manager_cls=ShortTermPositionManager,
+        order_executor_cls=ShortTermOrderExecutor,
+        risk_manager_cls=ShortTermRiskManager,
+        strategy_cls=ShortTermDMRStrategy,
+        exchange=runtime.exchange,
+        position_cache=runtime.position_cache,
+        coordinator=coordinator,
+        pnl_engine=pnl_engine,
+        protective_orders=protective_orders,
+        unified_positions=unified_positions,
+        trading_validator=trading_validator
+    )
+    
+    runtime.register(WorkerPlugin(long_worker))
+    runtime.register(WorkerPlugin(short_worker))
+    return runtime
+
+def main():
+    """长/短周期策略单进程主程序"""
+    runtime = create_runtime()
+    runtime.logger.info("启动长/短周期DMR策略运行时")
+    runtime.start()
+    
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        runtime.stop()
+        runtime.logger.info("策略运行时已停止")
+
+if __name__ == "__main__":
+    main()
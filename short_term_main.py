@@ -1,5 +1,5 @@
 import time
-import schedule
+import argparse
 import threading
 from datetime import datetime
 from strategy.short_term.data_fetcher import ShortTermDataFetcher
@@ -9,9 +9,14 @@ from strategy.short_term.position_manager import ShortTermPositionManager
 from strategy.short_term.risk_manager import ShortTermRiskManager
 from config.short_term_config import SHORT_TERM_CONFIG
 from utils.logger import setup_logger
+from utils.bar_scheduler import BarCloseScheduler, make_kline_probe
+from strategy.strategy_worker import StrategyWorker, compare_tick_cost
+from execution.execution_coordinator import connect_coordinator
+from config.config import EXCHANGE_TRAFFIC_CONFIG
+from utils.exchange_recorder import configure_traffic, close_traffic_sessions
 
 def run_short_term_strategy():
-    """运行短周期策略"""
+    """运行短周期策略（每次调度重建全部组件，保留用于与常驻工作器对比）"""
     logger = setup_logger(
         name='ShortTermMain',
         log_file=SHORT_TERM_CONFIG['log_config']['log_file']
@@ -46,42 +51,60 @@ def run_short_term_strategy():
     except Exception as e:
         logger.error(f"短周期策略执行失败: {e}")
 
-def setup_short_term_schedule():
-    """设置短周期策略调度"""
-    timeframe = SHORT_TERM_CONFIG['timeframe']
-    
-    if timeframe == '5m':
-        for minute in range(0, 60, 5):
-            schedule.every().hour.at(f":{minute:02d}").do(run_short_term_strategy)
-    elif timeframe == '15m':
-        for minute in [0, 15, 30, 45]:
-            schedule.every().hour.at(f":{minute:02d}").do(run_short_term_strategy)
-    elif timeframe == '30m':
-        for minute in [0, 30]:
-            schedule.every().hour.at(f":{minute:02d}").do(run_short_term_strategy)
-    elif timeframe == '1h':
-        schedule.every().hour.at(":00").do(run_short_term_strategy)
+def create_short_term_worker(coordinator=None):
+    """创建常驻的短周期策略工作器（组件只构建一次）"""
+    return StrategyWorker(
+        name='ShortTermWorker',
+        config=SHORT_TERM_CONFIG,
+        data_fetcher_cls=ShortTermDataFetcher,
+        position_manager_cls=ShortTermPositionManager,
+        order_executor_cls=ShortTermOrderExecutor,
+        risk_manager_cls=ShortTermRiskManager,
+        strategy_cls=ShortTermDMRStrategy,
+        coordinator=coordinator
+    )
 
-def run_scheduler():
-    """运行调度器"""
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='短周期DMR26策略')
+    parser.add_argument('--benchmark', type=int, default=0,
+                        help='对比重建模式与常驻模式的单次调度耗时和内存分配，指定调度次数（回放录制文件，不访问交易所）')
+    parser.add_argument('-f', '--file', type=str, default=EXCHANGE_TRAFFIC_CONFIG['path'],
+                        help=f"--benchmark 回放的录制文件路径 (默认: {EXCHANGE_TRAFFIC_CONFIG['path']})")
+    parser.add_argument('--coordinator', action='store_true',
+                        help='连接独立运行的执行协调器（python -m execution.execution_coordinator），与其他策略进程内部撮合')
+    return parser.parse_args()
 
 def main():
     """短周期策略主程序"""
+    args = parse_arguments()
     logger = setup_logger(
         name='ShortTermMain',
         log_file=SHORT_TERM_CONFIG['log_config']['log_file']
     )
     
-    logger.info("启动短周期DMR26策略系统")
+    if args.benchmark > 0:
+        # 对比会运行真实策略，交易所响应全部来自录制文件，避免实盘下单
+        configure_traffic('replay', args.file)
+        try:
+            compare_tick_cost(run_short_term_strategy, create_short_term_worker(), ticks=args.benchmark)
+        finally:
+            close_traffic_sessions()
+        return
     
-    # 设置调度
-    setup_short_term_schedule()
+    worker = create_short_term_worker(coordinator=connect_coordinator() if args.coordinator else None)
     
-    # 启动调度器线程
-    scheduler_thread = threading.Thread(target=run_scheduler)
+    logger.info("启动短周期DMR26策略系统")
+    worker.start()
+    
+    # 基于服务器时间的K线收盘调度，每根K线只触发一次
+    bar_scheduler = BarCloseScheduler(
+        clock=worker.data_fetcher.get_timestamp,
+        timeframes=[SHORT_TERM_CONFIG['timeframe']],
+        callback=lambda event: worker.tick(),
+        probe=make_kline_probe(worker.exchange, SHORT_TERM_CONFIG['symbol'])
+    )
+    scheduler_thread = threading.Thread(target=bar_scheduler.run_forever)
     scheduler_thread.daemon = True
     scheduler_thread.start()
     
@@ -91,6 +114,8 @@ def main():
         while True:
             time.sleep(60)
     except KeyboardInterrupt:
+        bar_scheduler.stop()
+        logger.info(f"K线收盘触发延迟统计: {bar_scheduler.get_lateness_report()}")
         logger.info("短周期策略系统已停止")
 
 if __name__ == "__main__":
@@ -1,7 +1,24 @@
+import functools
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from config.config import SYMBOL, DMR_STRATEGY_CONFIG, QUADRANT_CONFIG
+from execution.client_order_id import make_client_order_id
+from strategy.slot_ledger import QUANTITY_EPSILON, SlotLedger
+
+
+def memoized_stage(func):
+    """策略计算阶段：同一数据版本只计算一次，数据更新后再次调用才会重新计算"""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self._stage_versions.get(func.__name__) == self.data_version:
+            return None
+        result = func(self, *args, **kwargs)
+        self._stage_versions[func.__name__] = self.data_version
+        return result
+    return wrapper
+
 
 class DMRQuadrantStrategy:
     """
@@ -14,7 +31,7 @@ class DMRQuadrantStrategy:
     - R2(低位震荡): 4H DMR12<0 且 1H DMR26>0，锁多对冲
     """
     
-    def __init__(self, df, order_executor, params=None):
+    def __init__(self, df, order_executor, params=None, state_store=None):
         """
         初始化策略
         
@@ -22,7 +39,11 @@ class DMRQuadrantStrategy:
             df: DataFrame，包含 'high', 'low', 'close' 的OHLCV数据
             order_executor: 交易执行器
             params: 策略参数字典，可选
+            state_store: 可选的状态存储，提供时仓位槽在重启后恢复
         """
+        # 数据版本号：每次替换数据时递增，各计算阶段按版本缓存结果
+        self.data_version = 0
+        self._stage_versions = {}
         self.df = df
         self.order_executor = order_executor
         
@@ -45,6 +66,18 @@ class DMRQuadrantStrategy:
             'Long_1H_R2': None,
         }
         
+        # 仓位槽持久化：重启时恢复已成交的槽位
+        self.state_store = state_store
+        if state_store is not None:
+            self.positions.update(state_store.load_slots('DMRQuadrant', SYMBOL))
+        
+        # 槽位账本：槽位映射到交易所 LONG/SHORT 持仓腿，同一根K线的动作轧差后下单
+        self.ledger = SlotLedger(self.positions)
+        # 开仓单撤单未结束、待订单结束后按最终成交数量平仓的槽位
+        self._deferred_closes = set()
+        # 恢复的槽位重新挂/核对交易所端保护单
+        self._sync_protection()
+        
         # 信号处理标志
         self.signal_4h_processed = False
         self.signal_1h_processed = False
@@ -57,6 +90,31 @@ class DMRQuadrantStrategy:
         self.df_1h = None
         self.df_4h = None
         
+        # 本次已收盘的时间周期（由K线收盘调度器按服务器时间提供），None 表示按本地时间判断
+        self.closed_timeframes = None
+
+        # 策略启动时间：启动前开始的K线所产生的订单可能已由上一个进程提交，下单前先按客户端订单ID查询
+        self.started_at_ms = int(time.time() * 1000)
+        
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self.data_version += 1
+
+    def update_data(self, df):
+        """
+        替换为最新K线数据，策略实例与仓位状态保留
+
+        Args:
+            df: 最新的OHLCV数据
+        """
+        self.df = df
+
+    @memoized_stage
     def calculate_dmr(self):
         """计算DMR指标 - 严格按照aicloin公式"""
         # 1. 计算中间价
@@ -90,6 +148,7 @@ class DMRQuadrantStrategy:
             print(f"有效DMR12数据: {self.df['dmr_avg12'].notna().sum()}")
             print(f"有效DMR26数据: {self.df['dmr_avg26'].notna().sum()}")
 
+    @memoized_stage
     def resample_data(self):
         """重采样数据到不同时间周期 - 修正重采样逻辑"""
         # 从配置获取时间周期（保持动态配置）
@@ -214,6 +273,7 @@ class DMRQuadrantStrategy:
         else:
             return "NEUTRAL"
 
+    @memoized_stage
     def generate_signals(self):
         """生成交易信号"""
         # 长周期策略信号（基于DMR12）
@@ -254,6 +314,10 @@ class DMRQuadrantStrategy:
 
     def is_trading_window(self, timeframe):
         """判断是否为交易窗口"""
+        # 优先使用调度器给出的收盘周期，避免任务启动稍晚时错过交易窗口
+        if self.closed_timeframes is not None:
+            return timeframe in self.closed_timeframes
+        
         now = datetime.now()
         
         # 根据时间框架判断
@@ -280,34 +344,374 @@ class DMRQuadrantStrategy:
             action: 'buy', 'sell', 'close'
             position_name: 仓位名称
             comment: 交易备注
+        
+        执行器挂载了订单生命周期管理器时，开仓后槽位先记为挂单中（pending），
+        交易所确认成交后才记为持仓（filled）；未成交即撤销/过期的挂单会释放槽位。
         """
         size = self.params['position_size']
         current_price = self.df['close'].iloc[-1]
         
-        if action == 'buy':
+        if action in ('buy', 'sell'):
             if self.positions[position_name] is None:
-                # 使用限价单开多仓
-                order = self.order_executor.open_long(SYMBOL, size, price=current_price, order_type='limit')
-                self.positions[position_name] = order
-                print(f"{datetime.now()}: {comment} - 限价开多 {size} USDT，价格：{current_price}")
-                
-            elif action == 'sell':
-                if self.positions[position_name] is None:
-                    # 使用限价单开空仓
-                    order = self.order_executor.open_short(SYMBOL, size, price=current_price, order_type='limit')
+                # 使用限价单开仓；同一K线同一槽位的开仓使用同一个客户端订单ID，重试与重启不会重复开仓
+                is_long = action == 'buy'
+                opener = self.order_executor.open_long if is_long else self.order_executor.open_short
+                id_kwargs = self._client_order_kwargs(position_name, action)
+                if getattr(self.order_executor, 'order_lifecycle', None) is None:
+                    order = opener(SYMBOL, size, price=current_price, order_type='limit', **id_kwargs)
                     self.positions[position_name] = order
-                    print(f"{datetime.now()}: {comment} - 限价开空 {size} USDT，价格：{current_price}")
-                    
-            elif action == 'close':
-                if self.positions[position_name] is not None:
-                    # 根据仓位名称确定平仓方向，使用市价单平仓
-                    if 'Long' in position_name:
-                        self.order_executor.close_position(SYMBOL, 'LONG', order_type='market')
-                        print(f"{datetime.now()}: {comment} - 市价平多")
-                    else:
-                        self.order_executor.close_position(SYMBOL, 'SHORT', order_type='market')
-                        print(f"{datetime.now()}: {comment} - 市价平空")
+                else:
+                    self.positions[position_name] = {'status': 'pending', 'order': None, 'filled': 0.0, 'price': None}
+                    order = opener(SYMBOL, size, price=current_price, order_type='limit', **id_kwargs,
+                                   **self._slot_callbacks(position_name))
+                    if order is None:
+                        self.positions[position_name] = None
+                    elif self.positions[position_name] is not None:
+                        self.positions[position_name]['order'] = order
+                print(f"{datetime.now()}: {comment} - 限价开{'多' if is_long else '空'} {size} USDT，价格：{current_price}")
+                
+        elif action == 'close':
+            slot = self.positions[position_name]
+            if slot is not None:
+                # 开仓单仍在挂单中时先撤单，订单结束后再按最终成交数量平仓；完全未成交时只释放槽位
+                if self._defer_close(position_name, slot):
+                    print(f"{datetime.now()}: {comment} - 撤单完成后平仓")
+                    return
+                if self._is_tracked_slot(slot) and slot['filled'] <= 0:
                     self.positions[position_name] = None
+                    print(f"{datetime.now()}: {comment} - 撤销未成交挂单")
+                    return
+                # 根据仓位名称确定平仓方向，使用市价单只减掉该槽位的成交数量，
+                # 同一持仓腿上其他槽位的持仓不受影响；数量无法确认时跳过，不平掉整条持仓腿
+                position_side = 'LONG' if 'Long' in position_name else 'SHORT'
+                held = self._confirmed_quantity(slot)
+                if held is None:
+                    print(f"{datetime.now()}: {comment} - 槽位成交数量未知，跳过平仓")
+                    return
+                if held <= 0:
+                    self.positions[position_name] = None
+                    print(f"{datetime.now()}: {comment} - 开仓单无成交，释放槽位")
+                    return
+                self.order_executor.reduce_position(SYMBOL, position_side, held, order_type='market',
+                                                    **self._client_order_kwargs(position_name, 'close'))
+                print(f"{datetime.now()}: {comment} - 市价平{'多' if position_side == 'LONG' else '空'}")
+                self.positions[position_name] = None
+
+    def execute_hedge(self, decisions):
+        """
+        R1/R2 锁仓：方向相反的开仓腿通过对冲执行器同时提交
+
+        任一腿失败时对冲执行器撤销并平掉已成功的腿，相应槽位全部释放。
+
+        Args:
+            decisions: QUADRANT_CONFIG 中的开仓动作 {'action', 'position', 'comment'}
+        """
+        hedge = self.order_executor.hedge_executor
+        size = self.params['position_size']
+        current_price = self.df['close'].iloc[-1]
+        tracked = getattr(self.order_executor, 'order_lifecycle', None) is not None
+        try:
+            legs = []
+            for decision in decisions:
+                position_name = decision['position']
+                legs.append(hedge.prepare_leg(
+                    SYMBOL, 'LONG' if decision['action'] == 'buy' else 'SHORT', size, price=current_price,
+                    client_order_id=self._client_order_kwargs(position_name, decision['action'])['client_order_id'],
+                    **(self._slot_callbacks(position_name) if tracked else {})
+                ))
+        except Exception as e:
+            print(f"准备对冲腿失败，逐腿下单: {e}")
+            for decision in decisions:
+                self.execute_trade(decision['action'], decision['position'], decision['comment'])
+            return
+
+        for decision in decisions:
+            if tracked:
+                self.positions[decision['position']] = {'status': 'pending', 'order': None, 'filled': 0.0,
+                                                        'price': None}
+        report = hedge.submit(legs)
+        for decision, result in zip(decisions, report['results']):
+            position_name = decision['position']
+            if not result['success'] or report['rolled_back']:
+                self.positions[position_name] = None
+            elif not tracked:
+                self.positions[position_name] = result['order']
+            elif self.positions[position_name] is not None:
+                self.positions[position_name]['order'] = result['order']
+            status = '成功' if self.positions[position_name] is not None else '未持仓'
+            print(f"{datetime.now()}: {decision['comment']} - 对冲腿{status}，价格：{current_price}")
+
+    def execute_netted(self, decisions):
+        """
+        按持仓腿轧差执行本次收盘的全部动作
+
+        同一腿上的平仓与开仓先在槽位之间内部转移，只有净差额下单；平仓按槽位数量减仓，
+        不会平掉同一腿上其他槽位的持仓。两条腿都有净开仓时通过对冲执行器一起提交。
+        """
+        size = self.params['position_size']
+        current_price = self.df['close'].iloc[-1]
+        quantity = None
+        intents = []
+        for decision in decisions:
+            position_name = decision['position']
+            slot = self.positions[position_name]
+            if decision['action'] in ('buy', 'sell') and slot is None:
+                if quantity is None:
+                    # 开仓数量按交易所缓存的数量步长换算，不足最小名义价值时补足
+                    quantity = self.order_executor.trading_context.rules(SYMBOL).order_quantity(size, current_price)
+                intents.append((position_name, 'open', quantity))
+            elif decision['action'] == 'close' and slot is not None:
+                # 开仓单仍在挂单中时先撤单，撤单回报前到达的成交也记入槽位后再按最终数量平仓
+                if self._defer_close(position_name, slot):
+                    print(f"{datetime.now()}: {decision['comment']} - 撤单完成后平仓")
+                    continue
+                intents.append((position_name, 'close', None))
+            else:
+                continue
+            print(f"{datetime.now()}: {decision['comment']}")
+
+        orders = self.ledger.net(intents, current_price)
+        for order in orders:
+            if order['reduce']:
+                self._submit_netted(order, current_price)
+        opens = [order for order in orders if not order['reduce']]
+        hedge = getattr(self.order_executor, 'hedge_executor', None)
+        if hedge is not None and len({order['leg'] for order in opens}) == 2:
+            self._submit_netted_hedge(opens, hedge, current_price)
+        else:
+            for order in opens:
+                self._submit_netted(order, current_price)
+
+    def _netted_callbacks(self, order):
+        if getattr(self.order_executor, 'order_lifecycle', None) is None:
+            return {}
+
+        def on_fill(managed, qty, price):
+            self.ledger.allocate(order, qty, price)
+            self.persist_slots()
+
+        def on_done(managed):
+            self.ledger.release(order)
+            self.persist_slots()
+            self._settle_deferred_closes()
+
+        return {'on_fill': on_fill, 'on_done': on_done}
+
+    def _confirmed_quantity(self, slot):
+        """
+        槽位已确认的成交数量
+
+        槽位未记录成交数量时按开仓订单ID向交易所查询，仍在挂单中的开仓单先撤单，
+        以撤单回报的成交数量为准；无法查询时返回 None。
+        """
+        if not isinstance(slot, dict):
+            return None
+        if slot.get('filled'):
+            return float(slot['filled'])
+        order_id = (slot['order'] if self._is_tracked_slot(slot) else slot).get('id')
+        exchange = getattr(self.order_executor, 'exchange', None)
+        if not order_id or exchange is None:
+            return None
+        try:
+            params = self.order_executor.get_private_params()
+            order = exchange.fetch_order(order_id, SYMBOL, params=params)
+            if order.get('status') == 'open':
+                order = exchange.cancel_order(order_id, SYMBOL, params=params) or order
+            return float(order.get('filled') or 0.0)
+        except Exception as e:
+            print(f"查询槽位开仓订单 {order_id} 成交数量失败: {e}")
+            return None
+
+    def _defer_close(self, position_name, slot):
+        """
+        槽位的开仓单仍在挂单中时撤单并推迟平仓，返回是否已推迟
+
+        撤单请求与回报之间到达的成交仍会记入槽位，立即按当前数量平仓会留下残余；
+        订单结束（on_done）后槽位数量才是最终值，由 _settle_deferred_closes 平仓。
+        """
+        lifecycle = getattr(self.order_executor, 'order_lifecycle', None)
+        if lifecycle is None or not self._is_tracked_slot(slot) or not lifecycle.is_working(slot['order']['id']):
+            return False
+        self._deferred_closes.add(position_name)
+        # 撤单回报同步返回时 on_done 在 cancel 内触发，平仓随之完成
+        lifecycle.cancel(slot['order']['id'])
+        return True
+
+    def _settle_deferred_closes(self):
+        """开仓单已结束的待平仓槽位按最终成交数量平仓"""
+        lifecycle = getattr(self.order_executor, 'order_lifecycle', None)
+        ready = []
+        for position_name in list(self._deferred_closes):
+            slot = self.positions.get(position_name)
+            if self._is_tracked_slot(slot) and lifecycle is not None and lifecycle.is_working(slot['order']['id']):
+                continue
+            self._deferred_closes.discard(position_name)
+            if slot is not None:
+                ready.append({'action': 'close', 'position': position_name, 'comment': f"{position_name} 撤单完成"})
+        if ready:
+            self._dispatch_decisions(ready, None)
+
+    def persist_slots(self):
+        """将仓位槽写入状态存储（一个事务），并同步交易所端保护单"""
+        self._sync_protection()
+        if self.state_store is None:
+            return
+        try:
+            self.state_store.save_slots('DMRQuadrant', SYMBOL, self.positions)
+        except Exception as e:
+            print(f"保存仓位槽失败: {e}")
+
+    def _sync_protection(self):
+        """已成交的槽位按数量和均价挂/改止损止盈单，空槽撤单（执行器挂载了保护单管理器时）"""
+        protective_orders = getattr(self.order_executor, 'protective_orders', None)
+        if protective_orders is None:
+            return
+        try:
+            protective_orders.sync_slots('DMRQuadrant', SYMBOL, self.positions,
+                                         on_triggered=self._on_protection_triggered)
+        except Exception as e:
+            print(f"同步保护单失败: {e}")
+
+    def _on_protection_triggered(self, key, quantity, price):
+        """保护单在交易所触发成交：扣减对应槽位，平完时释放"""
+        _, position_name = key
+        slot = self.positions.get(position_name)
+        if not isinstance(slot, dict):
+            return
+        held = float(slot.get('filled') or 0.0)
+        if held - quantity <= QUANTITY_EPSILON:
+            self.positions[position_name] = None
+        else:
+            slot['filled'] = held - quantity
+        print(f"{datetime.now()}: {position_name} 保护单触发平仓 数量={quantity} 价格={price}")
+        self.persist_slots()
+
+    def _netted_order_kwargs(self, order):
+        """轧差订单的客户端订单ID与重启后先查询标志（挂载盈亏引擎时按槽位分配登记归属）"""
+        # 开仓与逐槽位路径使用相同的动作键（buy/sell），切换 slot_netting 后重启仍能按ID查到同一订单；减仓为 close
+        slots = '+'.join(slot_name for slot_name, _ in order['allocations'])
+        if order['reduce']:
+            action = 'close'
+        else:
+            action = 'buy' if order['leg'] == 'LONG' else 'sell'
+        bar_ms = int(self.df.index[-1].timestamp() * 1000)
+        client_order_id = make_client_order_id('DMRQuad', slots, bar_ms, action)
+        pnl_engine = getattr(self.order_executor, 'pnl_engine', None)
+        if pnl_engine is not None:
+            # 轧差订单的成交按槽位分配顺序拆分入账，与 SlotLedger.allocate 一致
+            pnl_engine.register_allocations(client_order_id, [('DMRQuadrant', slot_name, pending)
+                                                              for slot_name, pending in order['allocations']])
+        return {
+            'client_order_id': client_order_id,
+            'lookup_first': bar_ms <= self.started_at_ms,
+        }
+
+    def _submit_netted(self, order, price):
+        """提交一笔轧差后的订单"""
+        callbacks = self._netted_callbacks(order)
+        if order['reduce']:
+            result = self.order_executor.reduce_position(SYMBOL, order['leg'], order['quantity'],
+                                                         order_type='market', **self._netted_order_kwargs(order),
+                                                         **callbacks)
+        else:
+            result = self.order_executor.increase_position(SYMBOL, order['leg'], order['quantity'],
+                                                           order_type='limit', price=price,
+                                                           **self._netted_order_kwargs(order),
+                                                           **callbacks)
+        self._settle_netted(order, result, price, bool(callbacks))
+
+    def _submit_netted_hedge(self, opens, hedge, price):
+        """两条腿的净开仓作为对冲腿一起提交"""
+        try:
+            legs = [hedge.prepare_leg(SYMBOL, order['leg'], 0, price=price, quantity=order['quantity'],
+                                      client_order_id=self._netted_order_kwargs(order)['client_order_id'],
+                                      **self._netted_callbacks(order))
+                    for order in opens]
+        except Exception as e:
+            print(f"准备对冲腿失败，逐腿下单: {e}")
+            for order in opens:
+                self._submit_netted(order, price)
+            return
+        report = hedge.submit(legs)
+        tracked = getattr(self.order_executor, 'order_lifecycle', None) is not None
+        for order, result in zip(opens, report['results']):
+            accepted = result['success'] and not report['rolled_back']
+            self._settle_netted(order, result['order'] if accepted else None, price, tracked)
+
+    def _settle_netted(self, order, result, price, tracked):
+        """下单结果记入账本：失败时释放未成交槽位；未跟踪订单时按下单即成交记账"""
+        if result is None:
+            self.ledger.release(order)
+            return
+        for slot_name, _ in order['allocations']:
+            slot = self.positions.get(slot_name)
+            if isinstance(slot, dict):
+                slot['order'] = result
+        if not tracked:
+            self.ledger.allocate(order, order['quantity'], result.get('average') or price)
+
+    def _dispatch_decisions(self, decisions, market_state):
+        """执行本次收盘产生的交易动作，完成后保存仓位槽"""
+        if self.params.get('slot_netting') and hasattr(self.order_executor, 'reduce_position'):
+            self.execute_netted(decisions)
+        else:
+            self._dispatch_per_slot(decisions, market_state)
+        if decisions:
+            self.persist_slots()
+
+    def _dispatch_per_slot(self, decisions, market_state):
+        """逐槽位执行；R1/R2 中同时出现多空开仓时作为对冲腿一起提交"""
+        opens = [d for d in decisions if d['action'] in ('buy', 'sell') and self.positions[d['position']] is None]
+        hedgeable = (market_state in ('R1', 'R2') and len(opens) >= 2
+                     and {d['action'] for d in opens} == {'buy', 'sell'}
+                     and getattr(self.order_executor, 'hedge_executor', None) is not None)
+        for decision in decisions:
+            if not (hedgeable and decision in opens):
+                self.execute_trade(decision['action'], decision['position'], decision['comment'])
+        if hedgeable:
+            self.execute_hedge(opens)
+
+    def _client_order_kwargs(self, position_name, action):
+        """同一K线同一槽位的开仓使用同一个客户端订单ID（挂载盈亏引擎时登记槽位归属）"""
+        bar_ms = int(self.df.index[-1].timestamp() * 1000)
+        client_order_id = make_client_order_id('DMRQuad', position_name, bar_ms, action)
+        pnl_engine = getattr(self.order_executor, 'pnl_engine', None)
+        if pnl_engine is not None:
+            pnl_engine.register_order(client_order_id, 'DMRQuadrant', position_name)
+        return {
+            'client_order_id': client_order_id,
+            'lookup_first': bar_ms <= self.started_at_ms,
+        }
+
+    def _slot_callbacks(self, position_name):
+        return {
+            'on_fill': lambda managed, qty, price: self._on_slot_fill(position_name, qty, price),
+            'on_done': lambda managed: self._on_slot_done(position_name),
+        }
+
+    @staticmethod
+    def _is_tracked_slot(slot):
+        return isinstance(slot, dict) and slot.get('order') is not None
+
+    def _on_slot_fill(self, position_name, quantity, price):
+        """交易所确认成交后更新仓位槽"""
+        slot = self.positions.get(position_name)
+        if not isinstance(slot, dict):
+            return
+        slot['filled'] += quantity
+        slot['price'] = price
+        slot['status'] = 'filled'
+        print(f"{datetime.now()}: {position_name} 成交确认 数量={quantity} 价格={price}")
+        self.persist_slots()
+
+    def _on_slot_done(self, position_name):
+        """订单结束（含超时重挂后的最终订单）；完全未成交时释放槽位，待平仓的槽位随后平仓"""
+        slot = self.positions.get(position_name)
+        if isinstance(slot, dict) and slot['filled'] <= 0:
+            self.positions[position_name] = None
+            print(f"{datetime.now()}: {position_name} 挂单未成交已结束，释放仓位槽")
+            self.persist_slots()
+        self._settle_deferred_closes()
 
     def execute_trades(self):
         """执行交易逻辑"""
@@ -392,6 +796,9 @@ class DMRQuadrantStrategy:
         # R1 – 高位震荡：4H DMR(12) 负→正，1H DMR(26) 正→负，锁空对冲
         # R2 – 低位震荡：4H DMR(12) 正→负，1H DMR(26) 负→正，锁多对冲
         
+        # 本次收盘的交易动作，4H在前；R1/R2 的多空开仓腿一起提交
+        decisions = []
+        
         # 4H信号处理(优先执行)
         if is_4h_close and not self.signal_4h_processed:
             quadrant_config = QUADRANT_CONFIG.get(market_state, {})
@@ -399,12 +806,12 @@ class DMRQuadrantStrategy:
             
             if dmr12_4h_cross_up and '4h_neg_to_pos' in actions:
                 action_config = actions['4h_neg_to_pos']
-                self.execute_trade(action_config['action'], action_config['position'], action_config['comment'])
+                decisions.append(action_config)
                 self.signal_4h_processed = True
                 
             if dmr12_4h_cross_down and '4h_pos_to_neg' in actions:
                 action_config = actions['4h_pos_to_neg']
-                self.execute_trade(action_config['action'], action_config['position'], action_config['comment'])
+                decisions.append(action_config)
                 self.signal_4h_processed = True
         
         # 1H信号处理(在4H信号处理完成后执行)
@@ -414,19 +821,25 @@ class DMRQuadrantStrategy:
             
             if dmr26_1h_cross_up and '1h_neg_to_pos' in actions:
                 action_config = actions['1h_neg_to_pos']
-                self.execute_trade(action_config['action'], action_config['position'], action_config['comment'])
+                decisions.append(action_config)
                 self.signal_1h_processed = True
                 
             if dmr26_1h_cross_down and '1h_pos_to_neg' in actions:
                 action_config = actions['1h_pos_to_neg']
-                self.execute_trade(action_config['action'], action_config['position'], action_config['comment'])
+                decisions.append(action_config)
                 self.signal_1h_processed = True
+        
+        self._dispatch_decisions(decisions, market_state)
     
-    def run_strategy(self):
-        """运行完整策略"""
+    def prepare(self):
+        """计算指标、重采样并生成信号，当前数据版本已计算过的阶段直接复用"""
         self.calculate_dmr()
         self.resample_data()
         self.generate_signals()
+
+    def run_strategy(self):
+        """运行完整策略"""
+        self.prepare()
         self.execute_trades()
         return self.df
 
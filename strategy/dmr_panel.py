@@ -0,0 +1,195 @@
+"""
+多交易对DMR面板计算
+
+将 N 个交易对的K线对齐到统一的UTC时间轴，排成 (N × T) 的二维数组，
+一次向量化计算所有交易对的DMR，公式与 DMRQuadrantStrategy.calculate_dmr 一致：
+中间价 = (最高 + 最低) / 2，比率 = 当前中间价 / 前一根中间价（每段连续数据的第一根为1），
+DMR(p) = 最近 p 个比率的均值 - 1。
+
+上市前、停牌等缺失K线在面板中为 NaN（mask 为 False），
+窗口内含缺失K线的DMR同样为 NaN，不会跨越缺口计算。
+四象限状态以 int8 矩阵返回，便于横截面排序与全市场扫描。
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.bar_scheduler import timeframe_to_ms
+
+# 四象限状态编码
+QUADRANT_UNKNOWN = 0
+QUADRANT_T1 = 1
+QUADRANT_T2 = 2
+QUADRANT_R1 = 3
+QUADRANT_R2 = 4
+QUADRANT_NEUTRAL = 5
+
+QUADRANT_NAMES = np.array(['UNKNOWN', 'T1', 'T2', 'R1', 'R2', 'NEUTRAL'], dtype=object)
+
+
+def midprice_ratio(mid: np.ndarray) -> np.ndarray:
+    """
+    计算 (N × T) 中间价的逐根比率
+
+    每段连续数据的第一根K线（前一根缺失）比率记为 1.0，与单交易对计算的 fillna(1.0) 一致；
+    当前K线缺失时比率为 NaN。
+    """
+    ratio = np.full(mid.shape, np.nan)
+    ratio[:, 1:] = mid[:, 1:] / mid[:, :-1]
+    previous_missing = np.ones(mid.shape, dtype=bool)
+    previous_missing[:, 1:] = np.isnan(mid[:, :-1])
+    ratio[previous_missing & ~np.isnan(mid)] = 1.0
+    return ratio
+
+
+def rolling_dmr(ratio: np.ndarray, period: int) -> np.ndarray:
+    """
+    对 (N × T) 比率数组计算 DMR(period)
+
+    窗口内存在缺失值或数据不足 period 根时结果为 NaN。
+    """
+    n, t = ratio.shape
+    dmr = np.full((n, t), np.nan)
+    if t < period:
+        return dmr
+    windows = np.lib.stride_tricks.sliding_window_view(ratio, period, axis=1)
+    dmr[:, period - 1:] = windows.mean(axis=2) - 1
+    return dmr
+
+
+def quadrant_codes(dmr_long: np.ndarray, dmr_short: np.ndarray) -> np.ndarray:
+    """
+    按长周期DMR与短周期DMR的符号计算四象限状态，规则同 DMRQuadrantStrategy.get_market_state
+
+    Returns:
+        np.ndarray: 与输入同形状的 int8 编码，任一DMR缺失时为 QUADRANT_UNKNOWN
+    """
+    codes = np.full(np.shape(dmr_long), QUADRANT_NEUTRAL, dtype=np.int8)
+    codes[(dmr_long > 0) & (dmr_short > 0)] = QUADRANT_T1
+    codes[(dmr_long < 0) & (dmr_short < 0)] = QUADRANT_T2
+    codes[(dmr_long > 0) & (dmr_short < 0)] = QUADRANT_R1
+    codes[(dmr_long < 0) & (dmr_short > 0)] = QUADRANT_R2
+    codes[np.isnan(dmr_long) | np.isnan(dmr_short)] = QUADRANT_UNKNOWN
+    return codes
+
+
+class DMRPanel:
+    """N 个交易对在统一UTC时间轴上的K线面板"""
+
+    def __init__(self, symbols: Sequence[str], timestamps: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: Optional[np.ndarray] = None, timeframe: Optional[str] = None):
+        """
+        Args:
+            symbols: 交易对列表，对应数组的行
+            timestamps: 长度为 T 的K线开盘时间（UTC毫秒，int64）
+            high, low, close: (N × T) 价格数组，缺失为 NaN
+            timeframe: 时间周期
+        """
+        self.symbols = list(symbols)
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.high = high
+        self.low = low
+        self.close = close
+        self.timeframe = timeframe
+        self.mask = ~(np.isnan(high) | np.isnan(low))
+        self._midprice = None
+        self._ratio = None
+        self._dmr: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv_by_symbol: Dict[str, list], timeframe: str,
+                   symbols: Optional[List[str]] = None) -> 'DMRPanel':
+        """
+        由 ccxt fetch_ohlcv 结果构建面板
+
+        时间轴为所有交易对最早到最晚K线之间按周期等距的UTC时刻，
+        不在时间轴上的K线（未对齐的时间戳）被丢弃。
+        """
+        symbols = list(symbols if symbols is not None else ohlcv_by_symbol)
+        step = timeframe_to_ms(timeframe)
+        arrays = {symbol: np.asarray(ohlcv_by_symbol[symbol], dtype=float)
+                  for symbol in symbols if len(ohlcv_by_symbol.get(symbol, ())) > 0}
+        if not arrays:
+            empty = np.empty((len(symbols), 0))
+            return cls(symbols, np.empty(0, dtype=np.int64), empty, empty.copy(), empty.copy(), timeframe)
+
+        start = min(int(bars[0, 0]) for bars in arrays.values()) // step * step
+        end = max(int(bars[-1, 0]) for bars in arrays.values())
+        timestamps = np.arange(start, end + 1, step, dtype=np.int64)
+
+        shape = (len(symbols), len(timestamps))
+        high, low, close = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+        for row, symbol in enumerate(symbols):
+            bars = arrays.get(symbol)
+            if bars is None:
+                continue
+            offsets = bars[:, 0].astype(np.int64) - start
+            aligned = offsets % step == 0
+            columns = offsets[aligned] // step
+            high[row, columns] = bars[aligned, 2]
+            low[row, columns] = bars[aligned, 3]
+            close[row, columns] = bars[aligned, 4]
+        return cls(symbols, timestamps, high, low, close, timeframe)
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, 'pd.DataFrame'], timeframe: str) -> 'DMRPanel':
+        """由以K线开盘时间（UTC，无时区）为索引的 OHLCV DataFrame 构建面板"""
+        ohlcv = {}
+        for symbol, df in frames.items():
+            if df is None or df.empty:
+                continue
+            # 索引精度随 pandas 版本不同（ns/us），统一换算为毫秒
+            ms = df.index.values.astype('datetime64[ms]').astype(np.int64)
+            ohlcv[symbol] = np.column_stack([ms, df['open'], df['high'], df['low'], df['close'], df['volume']])
+        return cls.from_ohlcv(ohlcv, timeframe, symbols=list(frames))
+
+    @property
+    def midprice(self) -> np.ndarray:
+        if self._midprice is None:
+            self._midprice = (self.high + self.low) / 2
+        return self._midprice
+
+    @property
+    def ratio(self) -> np.ndarray:
+        if self._ratio is None:
+            self._ratio = midprice_ratio(self.midprice)
+        return self._ratio
+
+    def dmr(self, period: int) -> np.ndarray:
+        """(N × T) 的 DMR(period)，同一周期只计算一次"""
+        if period not in self._dmr:
+            self._dmr[period] = rolling_dmr(self.ratio, period)
+        return self._dmr[period]
+
+    def asof_columns(self, timestamps: np.ndarray) -> np.ndarray:
+        """目标时刻所在K线在本面板中的列号，早于面板起点时为 -1"""
+        return np.searchsorted(self.timestamps, timestamps, side='right') - 1
+
+    def align_to(self, values: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """将本面板上的 (N × T) 数组按时间对齐到另一时间轴（取目标时刻所在的K线）"""
+        columns = self.asof_columns(timestamps)
+        aligned = np.full((values.shape[0], len(timestamps)), np.nan)
+        valid = columns >= 0
+        aligned[:, valid] = values[:, columns[valid]]
+        return aligned
+
+    def latest(self, values: np.ndarray, offset: int = 0) -> np.ndarray:
+        """每个交易对倒数第 offset+1 根K线上的值"""
+        if values.shape[1] <= offset:
+            return np.full(values.shape[0], np.nan)
+        return values[:, -1 - offset]
+
+
+def quadrant_matrix(long_panel: DMRPanel, long_period: int, short_panel: DMRPanel, short_period: int) -> np.ndarray:
+    """
+    在短周期时间轴上计算四象限状态矩阵
+
+    两个面板的交易对顺序需一致；长周期DMR取各短周期K线所在的长周期K线。
+
+    Returns:
+        np.ndarray: (N × T_short) int8 编码矩阵
+    """
+    if long_panel.symbols != short_panel.symbols:
+        raise ValueError("长短周期面板的交易对顺序不一致")
+    dmr_long = long_panel.align_to(long_panel.dmr(long_period), short_panel.timestamps)
+    return quadrant_codes(dmr_long, short_panel.dmr(short_period))
@@ -5,31 +5,39 @@ import time
 import os
 from config.long_term_config import LONG_TERM_CONFIG
 from utils.logger import setup_logger
+from utils.exchange_recorder import attach_traffic_hooks
 
 class LongTermDataFetcher:
     """长周期策略独立数据采集器"""
     
-    def __init__(self):
+    def __init__(self, exchange=None):
         self.config = LONG_TERM_CONFIG
         self.logger = setup_logger(
             name='LongTermDataFetcher',
             log_file=self.config['log_config']['log_file']
         )
         
-        # 初始化交易所连接
-        self.exchange = ccxt.binance({
-            'apiKey': self.config['api_key'],
-            'secret': self.config['api_secret'],
-            'sandbox': False,
-            'enableRateLimit': self.config['data_config']['rate_limit'],
-            'options': {
-                'defaultType': 'future',
-                'recvWindow': self.config['data_config']['recv_window'],
-            }
-        })
+        # 初始化交易所连接，传入共享连接时直接复用
+        if exchange is not None:
+            self.exchange = exchange
+        else:
+            self.exchange = ccxt.binance({
+                'apiKey': self.config['api_key'],
+                'secret': self.config['api_secret'],
+                'sandbox': False,
+                'enableRateLimit': self.config['data_config']['rate_limit'],
+                'options': {
+                    'defaultType': 'future',
+                    'recvWindow': self.config['data_config']['recv_window'],
+                }
+            })
+            # 按配置挂载流量录制/回放
+            attach_traffic_hooks(self.exchange)
         
         self.symbol = self.config['symbol']
         self.timeframe = self.config['timeframe']
+        # 本地与服务器的时间偏移（毫秒）
+        self.time_offset = 0
         self.dmr_period = self.config['dmr_period']
         
         # 设置数据保存路径
@@ -49,6 +57,7 @@ class LongTermDataFetcher:
                 return
 
             local_time = int(time.time() * 1000)
+            self.time_offset = server_time - local_time
             time_diff = abs(server_time - local_time)
             
             if time_diff > 1000 or force:
@@ -57,6 +66,10 @@ class LongTermDataFetcher:
         except Exception as e:
             self.logger.error(f"长周期策略时间同步失败: {e}")
     
+    def get_timestamp(self):
+        """获取按服务器时间校准后的时间戳（毫秒）"""
+        return int(time.time() * 1000) + self.time_offset
+
     def get_historical_data(self):
         """获取历史K线数据"""
         try:
@@ -112,6 +125,60 @@ class LongTermDataFetcher:
             self.logger.error(f"长周期策略DMR计算失败: {e}")
             return df
     
+    def _calculate_dmr_tail(self, df, changed_rows):
+        """只为末尾变化的K线重新计算DMR，窗口向前多取一个DMR周期"""
+        if len(df) <= changed_rows + self.dmr_period:
+            return self.calculate_dmr(df)
+
+        dmr_col = f'dmr_{self.dmr_period}'
+        window = df.iloc[-(changed_rows + self.dmr_period + 1):]
+        midprice = (window['high'] + window['low']) / 2
+        ratio = midprice / midprice.shift(1)
+        dmr = ratio.rolling(window=self.dmr_period, min_periods=self.dmr_period).mean() - 1
+
+        tail = df.index[-changed_rows:]
+        df.loc[tail, 'dmr_midprice'] = midprice.loc[tail]
+        df.loc[tail, 'dmr_ratio'] = ratio.loc[tail]
+        df.loc[tail, dmr_col] = dmr.loc[tail]
+        return df
+
+    def update_data(self, df):
+        """
+        增量更新K线数据：只拉取最后一根K线之后的数据并重算末尾DMR。
+        无历史数据或中断过久（增量超过上限）时退回全量获取。
+        """
+        if df is None or df.empty:
+            return self.get_and_save_data()
+
+        try:
+            delta_limit = self.config['worker_config']['delta_limit']
+            since = int(df.index[-1].timestamp() * 1000)  # 最后一根（可能未收盘的）K线
+            ohlcv = self.exchange.fetch_ohlcv(self.symbol, self.timeframe, since=since, limit=delta_limit)
+            if not ohlcv:
+                return df
+            if len(ohlcv) >= delta_limit:
+                self.logger.info("长周期策略增量数据超过上限，改为全量获取")
+                return self.get_and_save_data()
+
+            delta = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+            delta['timestamp'] = pd.to_datetime(delta['timestamp'], unit='ms')
+            delta.set_index('timestamp', inplace=True)
+            delta.index.name = df.index.name
+
+            # 未收盘K线会被新数据覆盖，超出保留长度的旧K线被丢弃
+            df = pd.concat([df[df.index < delta.index[0]], delta])
+            data_limit = self.config['data_config']['data_limit']
+            if len(df) > data_limit:
+                df = df.iloc[-data_limit:].copy()
+            df = self._calculate_dmr_tail(df, len(delta))
+
+            if self.config['worker_config']['save_csv_every_tick']:
+                self.save_data_to_csv(df)
+            return df
+        except Exception as e:
+            self.logger.error(f"长周期策略增量更新数据失败: {e}")
+            return df
+
     def get_account_balance(self):
         """获取账户余额"""
         try:
@@ -9,8 +9,10 @@ if project_root not in sys.path:
 from config.long_term_config import LONG_TERM_CONFIG
 
 class LongTermPositionManager:
-    def __init__(self, exchange):
+    def __init__(self, exchange, position_cache=None):
         self.exchange = exchange
+        # 可选的共享持仓缓存，同进程多策略共用一份交易所持仓快照
+        self.position_cache = position_cache
         self.config = LONG_TERM_CONFIG
         self.position_size = self.config['position_size']
         self.stop_loss_percentage = self.config.get('stop_loss_percentage', 0.02)
@@ -36,7 +38,10 @@ class LongTermPositionManager:
         """
         try:
             symbol = self.config['symbol']
-            positions = self.exchange.fetch_positions([symbol])
+            if self.position_cache is not None:
+                positions = self.position_cache.get_positions(symbol)
+            else:
+                positions = self.exchange.fetch_positions([symbol])
             
             # 过滤出有效持仓（合约数量不为0）
             active_positions = [pos for pos in positions if float(pos.get('contracts', 0)) != 0]
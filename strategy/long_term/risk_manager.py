@@ -16,16 +16,32 @@ class LongTermRiskManager:
         self.max_drawdown = self.config.get('max_drawdown', 0.10)
         self.daily_pnl = 0
         self.total_pnl = 0
+        # 可选的实时盈亏引擎，挂载后日盈亏/总盈亏由成交和标记价格计算
+        self.pnl_engine = None
+
+    def attach_pnl_engine(self, pnl_engine):
+        """挂载实时盈亏引擎"""
+        self.pnl_engine = pnl_engine
+
+    def sync_pnl(self):
+        """从盈亏引擎读取本策略盈亏，按策略资金（position_size）换算为比例"""
+        if self.pnl_engine is None:
+            return
+        pnl = self.pnl_engine.get_pnl(strategy=self.config['strategy_name'])
+        capital = self.config['position_size']
+        self.daily_pnl = pnl['daily'] / capital
+        self.total_pnl = pnl['total'] / capital
 
     def check_risk_limits(self):
-        """检查风险限制"""
+        """检查风险限制（只限制亏损）"""
+        self.sync_pnl()
         # 检查日损失限制
-        if abs(self.daily_pnl) > self.max_daily_loss:
+        if -self.daily_pnl > self.max_daily_loss:
             print(f"长期策略触发日损失限制: {self.daily_pnl:.2%}")
             return False
         
         # 检查最大回撤限制
-        if abs(self.total_pnl) > self.max_drawdown:
+        if -self.total_pnl > self.max_drawdown:
             print(f"长期策略触发最大回撤限制: {self.total_pnl:.2%}")
             return False
         
@@ -8,7 +8,9 @@ class MultiStrategy:
         self.logger = logging.getLogger('TradingBot')
 
     def add_strategy(self, strategy):
-        self.strategies.append(strategy)
+        # 策略实例常驻，重复注册同一实例时忽略
+        if strategy not in self.strategies:
+            self.strategies.append(strategy)
 
     def execute_strategies(self):
         for strategy in self.strategies:
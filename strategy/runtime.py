@@ -0,0 +1,146 @@
+"""
+单进程多策略运行时
+
+长/短周期策略不再各自占用一个进程：运行时持有一个交易所连接、一个共享K线行情源
+和一个共享持仓缓存，各策略以插件形式订阅 (交易对, 周期)。
+K线收盘调度只有一个，收盘时每个交易对刷新一次行情，再推送给对应周期的订阅者。
+交易所请求量与内存随交易对数量增长；每个策略仍然使用各自的持仓台账。
+"""
+import threading
+from typing import Dict, List
+
+from data.bar_feed import SharedBarFeed
+from data.position_cache import PositionCache
+from utils.bar_scheduler import BarCloseScheduler, make_kline_probe
+from utils.logger import setup_logger
+
+
+class StrategyPlugin:
+    """运行时策略插件基类"""
+
+    def __init__(self, name: str, symbol: str, timeframe: str):
+        self.name = name
+        self.symbol = symbol
+        self.timeframe = timeframe
+
+    def start(self, runtime: 'StrategyRuntime'):
+        """运行时启动时调用一次"""
+
+    def on_bar(self, df):
+        """订阅周期K线收盘后调用，df 为该插件独享的数据副本"""
+        raise NotImplementedError
+
+
+class WorkerPlugin(StrategyPlugin):
+    """将常驻策略工作器包装为运行时插件"""
+
+    def __init__(self, worker):
+        super().__init__(worker.name, worker.config['symbol'], worker.config['timeframe'])
+        self.worker = worker
+
+    def start(self, runtime: 'StrategyRuntime'):
+        # 历史数据由共享行情源提供，工作器只核对持仓状态
+        self.worker.start(fetch_history=False)
+
+    def on_bar(self, df):
+        if df is None or df.empty:
+            self.worker.logger.error(f"{self.name} 共享行情为空，跳过本次执行")
+            return
+        df = self.worker.data_fetcher.calculate_dmr(df)
+        self.worker.on_bar(df)
+
+
+class StrategyRuntime:
+    """持有共享连接、行情源、持仓缓存与调度器的策略运行时"""
+
+    def __init__(self, data_fetcher, delta_limit: int = 100, position_ttl: float = 5.0, log_file: str = None):
+        """
+        Args:
+            data_fetcher: 提供共享交易所连接与服务器时间的数据获取器
+            delta_limit: 行情增量拉取上限
+            position_ttl: 持仓缓存有效期（秒）
+            log_file: 日志文件
+        """
+        self.data_fetcher = data_fetcher
+        self.exchange = data_fetcher.exchange
+        self.feed = SharedBarFeed(self.exchange, delta_limit=delta_limit)
+        self.position_cache = PositionCache(self.exchange, ttl_seconds=position_ttl)
+        self.plugins: List[StrategyPlugin] = []
+        # 可选的跨策略执行协调器：同一次收盘处理中各插件的市价单统一撮合
+        self.coordinator = None
+        # 可选的用户数据流：账户推送直接更新持仓缓存
+        self.user_stream = None
+        self.scheduler = None
+        self._thread = None
+        self.logger = setup_logger(name='StrategyRuntime', log_file=log_file or 'strategy_runtime.log')
+
+    def attach_coordinator(self, coordinator):
+        """挂载执行协调器，每次K线收盘的处理作为一个撮合批次"""
+        self.coordinator = coordinator
+
+    def attach_user_stream(self, stream):
+        """挂载用户数据流，持仓缓存由 ACCOUNT_UPDATE 推送更新并定期 REST 对账"""
+        self.user_stream = stream
+        self.position_cache.attach_stream(stream)
+
+    def register(self, plugin: StrategyPlugin) -> StrategyPlugin:
+        """注册插件并订阅其交易对和周期"""
+        self.plugins.append(plugin)
+        self.feed.subscribe(plugin.symbol, plugin.timeframe, plugin.on_bar)
+        self.position_cache.track(plugin.symbol)
+        self.logger.info(f"注册策略插件 {plugin.name}: {plugin.symbol} {plugin.timeframe}")
+        return plugin
+
+    def start(self):
+        """预热共享行情、启动各插件并开始K线收盘调度"""
+        for symbol in self.feed.subscribers:
+            self.feed.refresh(symbol)
+        if self.user_stream is not None:
+            self.user_stream.start()
+            self.position_cache.start_reconcile()
+        for plugin in self.plugins:
+            plugin.start(self)
+
+        symbols = list(self.feed.subscribers)
+        self.scheduler = BarCloseScheduler(
+            clock=self.data_fetcher.get_timestamp,
+            timeframes=self.feed.all_timeframes(),
+            callback=self._on_bar_close,
+            probe=make_kline_probe(self.exchange, symbols[0]) if symbols else None
+        )
+        self._thread = threading.Thread(target=self.scheduler.run_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        self.logger.info(f"策略运行时已启动: {len(self.plugins)} 个插件, {len(symbols)} 个交易对, "
+                         f"周期 {self.feed.all_timeframes()}")
+
+    def _on_bar_close(self, event):
+        if self.coordinator is None:
+            self._publish(event)
+            return
+        with self.coordinator.batch():
+            self._publish(event)
+
+    def _publish(self, event):
+        for symbol in list(self.feed.subscribers):
+            self.feed.publish(symbol, event.timeframes)
+
+    def stop(self):
+        """停止调度并输出统计"""
+        if self.user_stream is not None:
+            self.user_stream.stop()
+            self.position_cache.stop()
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.logger.info(f"K线收盘触发延迟统计: {self.scheduler.get_lateness_report()}")
+        self.logger.info(f"请求统计: {self.get_request_stats()}")
+        if self.coordinator is not None:
+            self.logger.info(f"执行协调器统计: {self.coordinator.get_stats()}")
+
+    def get_request_stats(self) -> Dict[str, int]:
+        """共享行情与持仓缓存发出的交易所请求数"""
+        return {
+            'kline_requests': self.feed.request_count,
+            'position_requests': self.position_cache.request_count,
+            'position_stream_updates': self.position_cache.stream_updates,
+        }
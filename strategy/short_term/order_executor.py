@@ -11,14 +11,20 @@ from strategy.short_term.data_fetcher import ShortTermDataFetcher
 from config.short_term_config import SHORT_TERM_CONFIG
 
 class ShortTermOrderExecutor:
-    def __init__(self, exchange, position_manager=None):
+    def __init__(self, exchange, position_manager=None, data_fetcher=None):
         # 初始化交易所对象
         self.exchange = exchange
         self.position_manager = position_manager  # 保持对 position_manager 的引用，可能其他地方需要
-        # 创建数据获取器用于时间同步
-        self.data_fetcher = ShortTermDataFetcher()
+        # 复用传入的数据获取器用于时间同步，未提供时才新建（会新建交易所连接）
+        self.data_fetcher = data_fetcher if data_fetcher is not None else ShortTermDataFetcher()
         # 获取短期配置
         self.config = SHORT_TERM_CONFIG
+        # 可选的跨策略执行协调器，挂载后市价单先提交为意图，与其他策略内部撮合后只下净额
+        self.coordinator = None
+        # 可选的实时盈亏引擎，下单后登记订单所属策略，成交推送据此入账
+        self.pnl_engine = None
+        # 可选的状态存储，直接下达的订单与成交写入 orders / fills 表（经协调器的由协调器写入）
+        self.state_store = None
         # 获取交易对规则
         self.market_info = {}
         try:
@@ -32,20 +38,60 @@ class ShortTermOrderExecutor:
         except Exception as e:
             print(f"加载市场信息失败: {e}")
 
-    def place_market_order(self, side, amount, position_side=None):
-        """下市价单"""
+    def attach_pnl_engine(self, pnl_engine):
+        """挂载实时盈亏引擎"""
+        self.pnl_engine = pnl_engine
+
+    def attach_state_store(self, state_store):
+        """挂载状态存储"""
+        self.state_store = state_store
+
+    def attach_coordinator(self, coordinator):
+        """挂载跨策略执行协调器（同进程实例或跨进程代理）"""
+        self.coordinator = coordinator
+
+    def place_market_order(self, side, amount, position_side=None, on_filled=None, reference_price=None):
+        """
+        下市价单
+
+        Args:
+            on_filled: 成交确认回调 on_filled(成交数量, 成交均价)；经协调器提交时在意图结算后调用
+            reference_price: 参考价格，协调器内部撮合使用，成交返回缺少均价时作为成交价
+        """
         try:
-            self.data_fetcher.sync_time()
             symbol = self.config['symbol']
+            if self.coordinator is not None:
+                intent_id = self.coordinator.submit(self.config['strategy_name'], symbol, side, amount, position_side,
+                                                    reference_price)
+                position_cache = getattr(self.position_manager, 'position_cache', None)
+                if position_cache is not None:
+                    position_cache.invalidate(symbol)
+                print(f"短期策略下单意图已提交协调器: {side} {amount} {symbol} (positionSide: {position_side})")
+                self._settle_intent(intent_id, on_filled)
+                return {'id': intent_id, 'status': 'pending', 'coordinated': True}
+
+            self.data_fetcher.sync_time()
             
             # 构建订单参数
             params = {}
             if position_side:
                 params['positionSide'] = position_side
             
+            # 持仓将变化，下单前使共享持仓缓存失效（接入数据流时等待成交推送）
+            position_cache = getattr(self.position_manager, 'position_cache', None)
+            if position_cache is not None:
+                position_cache.invalidate(symbol)
             # 修正：移除多余的None参数
             order = self.exchange.create_market_order(symbol, side, amount, None, params)
+            if self.pnl_engine is not None:
+                self.pnl_engine.register_order(order.get('id'), self.config['strategy_name'])
             print(f"短期策略市价单已下达: {side} {amount} {symbol} (positionSide: {position_side})")
+            # 市价单下单返回即视为成交；返回中没有成交明细时按下单数量和参考价格
+            filled = float(order.get('filled') or amount)
+            average = order.get('average') or reference_price
+            self._record(order, side, position_side, filled, average)
+            if on_filled is not None:
+                on_filled(filled, average)
             return order
         except Exception as e:
             # 捕获并处理 "ReduceOnly Order is rejected" 错误
@@ -58,21 +104,53 @@ class ShortTermOrderExecutor:
                 print(f"短期策略下单失败: {e}")
             return None
 
-    def open_long(self, price, size):
+    def _record(self, order, side, position_side, filled, average):
+        """订单与成交写入状态存储，写入失败不影响下单结果"""
+        if self.state_store is None:
+            return
+        symbol = self.config['symbol']
+        strategy = self.config['strategy_name']
+        try:
+            with self.state_store.transaction():
+                self.state_store.record_order({**order, 'symbol': symbol, 'side': side, 'type': 'market'},
+                                              strategy=strategy, position_side=position_side)
+                if average:
+                    self.state_store.record_fill(symbol, side, filled, float(average), order_id=order.get('id'),
+                                                 strategy=strategy)
+        except Exception as e:
+            print(f"订单写入状态存储失败: {e}")
+
+    def _settle_intent(self, intent_id, on_filled):
+        """协调器意图结算后按实际成交数量回调；同进程协调器在批处理撮合后回调，跨进程代理等待结算结果"""
+        def settle(result):
+            if result is None:
+                print(f"下单意图 {intent_id} 等待结算超时")
+            elif result['error']:
+                print(f"下单意图 {intent_id} 结算失败: {result['status']} {result['error']}")
+            if result is not None and result['filled'] > 0 and on_filled is not None:
+                on_filled(result['filled'], result['average'])
+
+        add_done_callback = getattr(self.coordinator, 'add_done_callback', None)
+        if add_done_callback is not None:
+            add_done_callback(intent_id, settle)
+        else:
+            settle(self.coordinator.result(intent_id))
+
+    def open_long(self, price, size, on_filled=None):
         """开多仓"""
-        return self.place_market_order('buy', size, 'LONG')
+        return self.place_market_order('buy', size, 'LONG', on_filled=on_filled, reference_price=price)
 
-    def open_short(self, price, size):
+    def open_short(self, price, size, on_filled=None):
         """开空仓"""
-        return self.place_market_order('sell', size, 'SHORT')
+        return self.place_market_order('sell', size, 'SHORT', on_filled=on_filled, reference_price=price)
 
-    def close_long(self, amount, strategy_position):
+    def close_long(self, amount, strategy_position, on_filled=None):
         """平多仓 - 基于策略自身持仓记录"""
         try:
             # 验证策略自身的持仓记录，而不是查询全局持仓
             if strategy_position and strategy_position.get('side') == 'long' and amount > 0:
                 print(f"根据策略持仓记录，确认平多仓，数量: {amount}")
-                return self.place_market_order('sell', amount, 'LONG')
+                return self.place_market_order('sell', amount, 'LONG', on_filled=on_filled)
             
             print("警告：短周期策略尝试平多仓，但策略持仓记录不匹配或数量无效。")
             print(f"策略持仓: {strategy_position}, 计划平仓数量: {amount}")
@@ -81,13 +159,13 @@ class ShortTermOrderExecutor:
             print(f"平多仓失败: {e}")
             return None
 
-    def close_short(self, amount, strategy_position):
+    def close_short(self, amount, strategy_position, on_filled=None):
         """平空仓 - 基于策略自身持仓记录"""
         try:
             # 验证策略自身的持仓记录，而不是查询全局持仓
             if strategy_position and strategy_position.get('side') == 'short' and amount > 0:
                 print(f"根据策略持仓记录，确认平空仓，数量: {amount}")
-                return self.place_market_order('buy', amount, 'SHORT')
+                return self.place_market_order('buy', amount, 'SHORT', on_filled=on_filled)
                 
             print("警告：短周期策略尝试平空仓，但策略持仓记录不匹配或数量无效。")
             print(f"策略持仓: {strategy_position}, 计划平仓数量: {amount}")
@@ -1,9 +1,9 @@
 import pandas as pd
 from datetime import datetime
 import os
-import json
 from config.short_term_config import SHORT_TERM_CONFIG
 from utils.logger import setup_logger
+from common.state_store import get_state_store
 
 class ShortTermDMRStrategy:
     """短周期DMR26策略引擎"""
@@ -28,30 +28,84 @@ class ShortTermDMRStrategy:
         # 初始化策略持仓为空
         self.strategy_position = None
         safe_symbol = self.config['symbol'].replace('/', '_')
-        # 修改：将位置文件路径从/tmp更改为项目内更持久的路径
+        # 旧版 JSON 持仓文件，仅用于首次启动时迁移到状态存储
         self.position_file = f"data/positions/short_term_position_{safe_symbol}.json"
+        # 持仓与已执行信号保存在事务性状态存储中
+        self.state_store = get_state_store()
+        self.strategy_name = self.config['strategy_name']
+        # 可选的交易所端保护单管理器，持仓期间在交易所挂止损/止盈单
+        self.protective_orders = None
+        # 可选的统一持仓管理器，本策略持仓变化时上报，风控引擎据此增量检查
+        self.unified_positions = None
+        # 可选的交易验证器，开仓前按内存状态做下单前检查
+        self.trading_validator = None
         self.reset_flag_file = f"data/positions/short_term_reset.flag"
 
-    def reconcile_state(self):
+    def attach_protective_orders(self, protective_orders):
+        """挂载交易所端保护单管理器"""
+        self.protective_orders = protective_orders
+
+    def attach_trading_validator(self, trading_validator):
+        """挂载交易验证器（需挂载 PreTradeGate，按 strategy_type 区分策略）"""
+        self.trading_validator = trading_validator
+
+    def _pre_trade_allowed(self, action, quantity, price):
+        """开仓前检查，未挂载交易验证器时总是通过"""
+        if self.trading_validator is None:
+            return True
+        signal = {'action': action, 'side': action.split('_')[1], 'amount': quantity * price}
+        try:
+            verdict = self.trading_validator.pre_trade_validation(self.config['strategy_type'], signal, price)
+        except Exception as e:
+            self.logger.warning(f"短周期策略：下单前验证失败，跳过开仓: {e}")
+            return False
+        if not verdict:
+            self.logger.warning(f"短周期策略：下单前检查未通过[{verdict.check}]，跳过开仓: {verdict.reason}")
+        return bool(verdict)
+
+    def _record_submission(self, order):
+        """开仓订单提交成功后登记（当日成交次数与最小下单间隔）"""
+        if order is not None and self.trading_validator is not None:
+            self.trading_validator.record_order(self.config['strategy_type'])
+
+    def attach_unified_positions(self, unified_positions):
+        """挂载统一持仓管理器（按 strategy_type 区分策略）"""
+        self.unified_positions = unified_positions
+        self._publish_position()
+
+    def check_reset_flag(self):
+        """
+        检查强制重置标志，存在则重置策略状态并删除标志文件。
+        返回是否执行了重置。
+        """
+        if not os.path.exists(self.reset_flag_file):
+            return False
+        self.logger.warning("检测到重置标志文件，将强制重置策略状态。")
+        self._reset_position_state()
+        try:
+            os.remove(self.reset_flag_file)
+            self.logger.info(f"已删除重置标志文件: {self.reset_flag_file}")
+        except OSError as e:
+            self.logger.error(f"删除重置标志文件失败: {e}")
+        return True
+
+    def reconcile_state(self, reload=True):
         """
         启动时核对状态。
         1. 检查强制重置标志。
         2. 对比本地与交易所状态，处理手动平仓等情况。
         3. “认领”逻辑已移至 execute_signal，启动时不再主动认领未知持仓。
+        
+        Args:
+            reload: 是否从文件重新加载持仓；常驻工作器周期核对时使用内存中的持仓
         """
         # 1. 检查强制重置标志文件
-        if os.path.exists(self.reset_flag_file):
-            self.logger.warning("检测到重置标志文件，将强制重置策略状态。")
-            self._reset_position_state()
-            try:
-                os.remove(self.reset_flag_file)
-                self.logger.info(f"已删除重置标志文件: {self.reset_flag_file}")
-            except OSError as e:
-                self.logger.error(f"删除重置标志文件失败: {e}")
+        if self.check_reset_flag():
             return # 完成重置，直接返回
 
         # 2. 正常核对流程
-        self._load_strategy_position()
+        if reload:
+            self._load_strategy_position()
         local_position = self.get_strategy_position()
 
         if local_position:
@@ -64,6 +118,8 @@ class ShortTermDMRStrategy:
                 self._reset_position_state()
             else:
                 self.logger.info(f"本地与交易所均有 '{expected_side}' 持仓，状态同步。")
+                # 重启后或保护单被外部撤销时重新挂单
+                self._sync_protection()
         else:
             # 如果本地无持仓记录，我们假定本策略当前没有持仓。
             # 真正的“认领”将在 execute_signal 中根据信号方向进行，以确保只认领自己的仓位。
@@ -90,11 +146,13 @@ class ShortTermDMRStrategy:
             
         return signal
     
-    def execute_signal(self, signal, current_price):
+    def execute_signal(self, signal, current_price, bar_time=None):
         """
         执行交易信号。
         新增逻辑：在开仓前，如果本地无持仓记录，会先检查交易所是否存在同向的、可能是本策略遗漏的持仓。
+        bar_time 提供时，开仓成交后与持仓在同一事务中记录该信号已执行。
         """
+        executed_signal = None if bar_time is None else (bar_time, signal)
         try:
             trade_quantity = self.position_manager.calculate_position_size(current_price)
             strategy_position = self.get_strategy_position()
@@ -115,12 +173,17 @@ class ShortTermDMRStrategy:
                 # 如果有空仓，先平仓
                 if strategy_position and strategy_position['side'] == 'short':
                     self.logger.info("短周期策略：平空仓")
-                    self.order_executor.close_short(strategy_position['amount'], strategy_position)
+                    self.order_executor.close_short(strategy_position['amount'], strategy_position,
+                                                    on_filled=self._close_filled('short'))
                     
                 # 开多仓
+                if not self._pre_trade_allowed('open_long', trade_quantity, current_price):
+                    return
                 self.logger.info("短周期策略：执行开多操作")
-                self.order_executor.open_long(current_price, trade_quantity)
-                self._update_strategy_position('long', trade_quantity, current_price)
+                # 持仓按确认的成交记录；经协调器提交时在撮合结算后更新
+                order = self.order_executor.open_long(current_price, trade_quantity,
+                                                      on_filled=self._open_filled('long', current_price, executed_signal))
+                self._record_submission(order)
                     
             elif signal == 'SHORT':
                 if strategy_position and strategy_position['side'] == 'short':
@@ -138,12 +201,17 @@ class ShortTermDMRStrategy:
                 # 如果有多仓，先平仓
                 if strategy_position and strategy_position['side'] == 'long':
                     self.logger.info("短周期策略：平多仓")
-                    self.order_executor.close_long(strategy_position['amount'], strategy_position)
+                    self.order_executor.close_long(strategy_position['amount'], strategy_position,
+                                                   on_filled=self._close_filled('long'))
                     
                 # 开空仓
+                if not self._pre_trade_allowed('open_short', trade_quantity, current_price):
+                    return
                 self.logger.info("短周期策略：执行开空操作")
-                self.order_executor.open_short(current_price, trade_quantity)
-                self._update_strategy_position('short', trade_quantity, current_price)
+                # 持仓按确认的成交记录；经协调器提交时在撮合结算后更新
+                order = self.order_executor.open_short(current_price, trade_quantity,
+                                                       on_filled=self._open_filled('short', current_price, executed_signal))
+                self._record_submission(order)
                     
         except Exception as e:
             self.logger.error(f"短周期策略执行信号失败: {e}", exc_info=True)
@@ -165,50 +233,118 @@ class ShortTermDMRStrategy:
             if signal:
                 # 风控检查
                 if self.risk_manager.check_risk_limits():
+                    # 同一根K线的信号只执行一次（重启后重放同一根K线时跳过）；信号在开仓成交后才记录，
+                    # 下单失败或进程在成交前退出时重启后仍会重新执行
+                    if self.state_store.has_signal(self.strategy_name, self.config['symbol'], df.index[-1], signal):
+                        self.logger.info(f"短周期策略：信号 {signal} 已在该K线执行过，跳过")
+                        return
                     current_price = df['close'].iloc[-1]
-                    self.execute_signal(signal, current_price)
+                    self.execute_signal(signal, current_price, bar_time=df.index[-1])
                 else:
                     self.logger.warning("短周期策略：风控限制，跳过交易信号")
                     
         except Exception as e:
             self.logger.error(f"短周期策略运行失败: {e}")
     
-    def _save_strategy_position(self):
-        """保存策略持仓到文件"""
+    def _save_strategy_position(self, executed_signal=None):
+        """保存策略持仓到状态存储（单个事务），同时记录引起该持仓的已执行信号"""
+        symbol = self.config['symbol']
         try:
-            os.makedirs(os.path.dirname(self.position_file), exist_ok=True)
-            with open(self.position_file, 'w') as f:
-                json.dump(self.strategy_position, f, default=str)
+            with self.state_store.transaction():
+                self.state_store.save_position(self.strategy_name, symbol, self.strategy_position)
+                if executed_signal is not None:
+                    self.state_store.record_signal(self.strategy_name, symbol, *executed_signal)
         except Exception as e:
             self.logger.warning(f"保存策略持仓失败: {e}")
 
     def _load_strategy_position(self):
-        """从文件加载策略持仓"""
+        """从状态存储加载策略持仓，首次启动时迁移旧的 JSON 持仓文件"""
+        symbol = self.config['symbol']
+        if self.state_store.import_json_position(self.strategy_name, symbol, self.position_file):
+            self.logger.info(f"已将持仓文件 {self.position_file} 迁移到状态存储")
+        self.strategy_position = self.state_store.load_position(self.strategy_name, symbol)
+        self._publish_position()
+        if self.strategy_position:
+            self.logger.info(f"从状态存储加载策略持仓成功: {self.strategy_position}")
+        else:
+            self.logger.info("状态存储中无策略持仓，初始化为空仓。")
+
+    def _publish_position(self):
+        """向统一持仓管理器上报本策略持仓，数量按开仓价换算为金额(U)"""
+        if self.unified_positions is None:
+            return
+        position = self.strategy_position
+        try:
+            if position:
+                entry_price = float(position['entry_price'])
+                self.unified_positions.update_position(self.config['strategy_type'], position['side'].upper(),
+                                                       float(position['amount']) * entry_price, entry_price, 'open')
+            else:
+                self.unified_positions.update_position(self.config['strategy_type'], None, 0, 0, 'close')
+        except Exception as e:
+            self.logger.error(f"上报统一持仓失败: {e}")
+
+    def _sync_protection(self):
+        """按本策略持仓挂/改交易所端止损止盈单，空仓时撤单"""
+        if self.protective_orders is None:
+            return
+        key = (self.strategy_name, 'position')
+        position = self.strategy_position
         try:
-            with open(self.position_file, 'r') as f:
-                self.strategy_position = json.load(f)
-                if self.strategy_position:
-                    self.logger.info(f"从文件加载策略持仓成功: {self.strategy_position}")
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.strategy_position = None
-            self.logger.info("策略持仓文件不存在或无效，初始化为空仓。")
+            if not position:
+                self.protective_orders.release(key)
+                return
+            self.protective_orders.protect(
+                key, self.config['symbol'], position['side'].upper(), float(position['amount']),
+                float(position['entry_price']),
+                stop_loss_pct=self.position_manager.stop_loss_percentage,
+                take_profit_pct=self.position_manager.take_profit_percentage,
+                on_triggered=self._on_protection_triggered
+            )
+        except Exception as e:
+            self.logger.error(f"同步保护单失败: {e}")
+
+    def _on_protection_triggered(self, key, quantity, price):
+        """保护单在交易所触发成交，本策略持仓已被平掉"""
+        self.logger.info(f"短周期策略：保护单触发平仓 数量={quantity} 价格={price}")
+        self._reset_position_state()
 
     def _reset_position_state(self):
         """重置并清空策略持仓状态"""
         self.strategy_position = None
-        if os.path.exists(self.position_file):
-            try:
-                os.remove(self.position_file)
-                self.logger.info(f"已删除本地持仓状态文件: {self.position_file}")
-            except OSError as e:
-                self.logger.error(f"删除本地持仓文件失败: {e}")
+        self._sync_protection()
+        self._publish_position()
+        try:
+            self.state_store.save_position(self.strategy_name, self.config['symbol'], None)
+            self.logger.info("已清除状态存储中的策略持仓")
+        except Exception as e:
+            self.logger.error(f"清除策略持仓失败: {e}")
+
+    def _open_filled(self, side, reference_price, executed_signal=None):
+        """开仓成交回调：按实际成交数量和均价记录本策略持仓，并记录已执行的信号"""
+        def on_filled(quantity, price):
+            self._update_strategy_position(side, quantity, float(price or reference_price), executed_signal)
+        return on_filled
+
+    def _close_filled(self, side):
+        """平仓成交回调：扣减本策略持仓，全部平掉时清空（期间已换向开仓则不处理）"""
+        def on_filled(quantity, price):
+            position = self.get_strategy_position()
+            if not position or position['side'] != side:
+                return
+            remaining = float(position['amount']) - quantity
+            if remaining > 1e-9:
+                self._update_strategy_position(side, remaining, position['entry_price'])
+            else:
+                self._reset_position_state()
+        return on_filled
 
     def get_strategy_position(self):
         """获取本策略的持仓记录"""
         return getattr(self, 'strategy_position', None)
     
-    def _update_strategy_position(self, side, amount, price):
-        """更新本策略的持仓记录"""
+    def _update_strategy_position(self, side, amount, price, executed_signal=None):
+        """更新本策略的持仓记录，executed_signal=(K线时间, 信号) 与持仓同一事务记录"""
         self.strategy_position = {
             'side': side,
             'amount': amount,
@@ -216,7 +352,9 @@ class ShortTermDMRStrategy:
             'timestamp': datetime.now()
         }
         # 可以选择持久化到文件
-        self._save_strategy_position()
+        self._save_strategy_position(executed_signal)
+        self._sync_protection()
+        self._publish_position()
 
     def _claim_exchange_position(self, exchange_position):
         """根据交易所的持仓信息，更新并保存本地策略状态"""
@@ -0,0 +1,133 @@
+"""
+仓位槽账本
+
+DMRQuadrantStrategy 有8个虚拟仓位槽，而双向持仓模式下每个交易对只有 LONG / SHORT 两条交易所持仓腿。
+账本把槽位映射到持仓腿上，将同一根K线触发的所有动作按腿轧差为最少的订单：
+同一腿上一个槽位平仓、另一个槽位开仓时，数量先在槽位之间内部转移，只有净差额才下单；
+订单成交后再按顺序分配回各槽位，平仓只减掉所属槽位的数量，不影响同一腿上的其他槽位。
+
+槽位状态与策略的 positions 共用同一个字典：空槽为 None，
+持仓槽为 {'status', 'order', 'filled', 'price'}，其中 filled 为槽位持有的数量。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 数量比较容差
+QUANTITY_EPSILON = 1e-9
+
+
+def slot_leg(slot_name: str) -> str:
+    """槽位所属的交易所持仓腿：Long_* -> LONG，Short_* -> SHORT"""
+    return 'LONG' if slot_name.startswith('Long') else 'SHORT'
+
+
+class SlotLedger:
+    """槽位到交易所持仓腿的映射、按腿轧差与成交分配"""
+
+    def __init__(self, positions: Dict[str, Optional[Dict[str, Any]]]):
+        """
+        Args:
+            positions: 策略的仓位槽字典，账本直接在其上读写
+        """
+        self.positions = positions
+
+    def quantity(self, slot_name: str) -> float:
+        slot = self.positions.get(slot_name)
+        return float(slot['filled']) if isinstance(slot, dict) else 0.0
+
+    def leg_quantity(self, leg: str) -> float:
+        """账本记录的某条持仓腿的总数量（所有槽位之和）"""
+        return sum(self.quantity(name) for name in self.positions if slot_leg(name) == leg)
+
+    def _credit(self, slot_name: str, quantity: float, price: float):
+        slot = self.positions.get(slot_name)
+        if not isinstance(slot, dict):
+            slot = {'status': 'pending', 'order': None, 'filled': 0.0, 'price': None}
+            self.positions[slot_name] = slot
+        held = slot['filled']
+        slot['price'] = price if held <= 0 or slot['price'] is None else \
+            (slot['price'] * held + price * quantity) / (held + quantity)
+        slot['filled'] = held + quantity
+        slot['status'] = 'filled'
+
+    def _debit(self, slot_name: str, quantity: float):
+        slot = self.positions.get(slot_name)
+        if not isinstance(slot, dict):
+            return
+        slot['filled'] = max(slot['filled'] - quantity, 0.0)
+        if slot['filled'] <= QUANTITY_EPSILON:
+            self.positions[slot_name] = None
+
+    def net(self, intents: Iterable[Tuple[str, str, Optional[float]]], price: float) -> List[Dict[str, Any]]:
+        """
+        将同一根K线的动作按持仓腿轧差
+
+        Args:
+            intents: (槽位, 'open' / 'close', 开仓数量)，平仓数量取槽位当前持有量
+            price: 槽位之间内部转移的记账价格（当前价格）
+
+        Returns:
+            list: 需要提交的订单 {'leg', 'side', 'reduce', 'quantity', 'allocations'}，
+                  allocations 为 [[槽位, 待分配数量], ...]，按顺序分配成交
+        """
+        legs: Dict[str, Dict[str, list]] = {}
+        for slot_name, action, quantity in intents:
+            entry = legs.setdefault(slot_leg(slot_name), {'open': [], 'close': []})
+            if action == 'open' and quantity and quantity > 0:
+                entry['open'].append([slot_name, float(quantity)])
+            elif action == 'close' and self.quantity(slot_name) > 0:
+                entry['close'].append([slot_name, self.quantity(slot_name)])
+
+        orders = []
+        for leg, entry in legs.items():
+            opens, closes = entry['open'], entry['close']
+            # 平仓槽位的数量优先内部转移给同一腿上的开仓槽位
+            for close in closes:
+                for open_ in opens:
+                    moved = min(close[1], open_[1])
+                    if moved <= QUANTITY_EPSILON:
+                        continue
+                    self._debit(close[0], moved)
+                    self._credit(open_[0], moved, price)
+                    close[1] -= moved
+                    open_[1] -= moved
+            opens = [item for item in opens if item[1] > QUANTITY_EPSILON]
+            closes = [item for item in closes if item[1] > QUANTITY_EPSILON]
+            for slot_name, _ in opens:
+                if self.positions.get(slot_name) is None:
+                    self.positions[slot_name] = {'status': 'pending', 'order': None, 'filled': 0.0, 'price': None}
+            if opens:
+                orders.append({'leg': leg, 'side': 'BUY' if leg == 'LONG' else 'SELL', 'reduce': False,
+                               'quantity': sum(item[1] for item in opens), 'allocations': opens})
+            if closes:
+                orders.append({'leg': leg, 'side': 'SELL' if leg == 'LONG' else 'BUY', 'reduce': True,
+                               'quantity': sum(item[1] for item in closes), 'allocations': closes})
+        return orders
+
+    def allocate(self, order: Dict[str, Any], quantity: float, price: float):
+        """订单新增成交按顺序分配给各槽位"""
+        remaining = float(quantity)
+        for allocation in order['allocations']:
+            if remaining <= QUANTITY_EPSILON:
+                break
+            share = min(allocation[1], remaining)
+            if share <= QUANTITY_EPSILON:
+                continue
+            if order['reduce']:
+                self._debit(allocation[0], share)
+            else:
+                self._credit(allocation[0], share, price)
+            allocation[1] -= share
+            remaining -= share
+
+    def release(self, order: Dict[str, Any]):
+        """订单结束：开仓订单中完全未成交的槽位释放，部分成交的槽位保留已成交数量"""
+        for slot_name, pending in order['allocations']:
+            slot = self.positions.get(slot_name)
+            if not isinstance(slot, dict):
+                continue
+            if not order['reduce'] and slot['filled'] <= QUANTITY_EPSILON:
+                self.positions[slot_name] = None
+            else:
+                slot['status'] = 'filled'
+            if pending > QUANTITY_EPSILON:
+                print(f"{slot_name} 订单结束，未成交数量 {pending:.6f}")
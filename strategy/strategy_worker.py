@@ -0,0 +1,179 @@
+"""
+常驻策略工作器
+
+长/短周期策略原先每次调度都会重建数据获取器（新交易所连接）、持仓管理器、
+订单执行器（再次 load_markets）、风控和策略引擎，并重新核对状态、重读持仓文件。
+工作器在启动时只构建一次这些组件，指标数据和持仓状态常驻内存，
+每次调度只增量拉取新K线并重算末尾指标。
+"""
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from utils.exchange_recorder import traffic_mode
+from utils.logger import setup_logger
+
+
+class StrategyWorker:
+    """常驻内存的单策略工作器"""
+
+    def __init__(self, name: str, config: Dict[str, Any], data_fetcher_cls, position_manager_cls,
+                 order_executor_cls, risk_manager_cls, strategy_cls, exchange=None, data_fetcher=None,
+                 position_cache=None, coordinator=None, pnl_engine=None,
+                 protective_orders=None, unified_positions=None, trading_validator=None):
+        """
+        Args:
+            name: 工作器名称，用于日志
+            config: 策略配置（LONG_TERM_CONFIG / SHORT_TERM_CONFIG）
+            *_cls: 各组件类
+            exchange: 可选的共享交易所实例，不提供时使用数据获取器自己的连接
+            data_fetcher: 可选的共享数据获取器
+            position_cache: 可选的共享持仓缓存
+            coordinator: 可选的跨策略执行协调器，市价单与其他策略内部撮合后只下净额
+            pnl_engine: 可选的实时盈亏引擎，登记本策略订单并为风控提供日盈亏/总盈亏
+            protective_orders: 可选的保护单管理器，持仓期间在交易所挂止损/止盈单
+            unified_positions: 可选的统一持仓管理器，策略持仓变化时上报给风控引擎
+            trading_validator: 可选的交易验证器，开仓前做下单前检查、下单后登记
+        """
+        self.name = name
+        self.config = config
+        self.logger = setup_logger(name=name, log_file=config['log_config']['log_file'])
+
+        # 所有组件只构建一次，共享同一个交易所连接
+        if data_fetcher is not None:
+            self.data_fetcher = data_fetcher
+        elif exchange is not None:
+            self.data_fetcher = data_fetcher_cls(exchange=exchange)
+        else:
+            self.data_fetcher = data_fetcher_cls()
+        self.exchange = self.data_fetcher.exchange
+        self.position_manager = position_manager_cls(self.exchange, position_cache=position_cache)
+        self.order_executor = order_executor_cls(self.exchange, self.position_manager, data_fetcher=self.data_fetcher)
+        if coordinator is not None:
+            self.order_executor.attach_coordinator(coordinator)
+        self.risk_manager = risk_manager_cls(self.exchange)
+        if pnl_engine is not None:
+            self.order_executor.attach_pnl_engine(pnl_engine)
+            self.risk_manager.attach_pnl_engine(pnl_engine)
+        self.strategy = strategy_cls(self.data_fetcher, self.order_executor, self.position_manager, self.risk_manager)
+        # 直接下达的订单与成交写入策略使用的同一个状态存储
+        self.order_executor.attach_state_store(self.strategy.state_store)
+        if protective_orders is not None:
+            self.strategy.attach_protective_orders(protective_orders)
+        if unified_positions is not None:
+            self.strategy.attach_unified_positions(unified_positions)
+        if trading_validator is not None:
+            self.strategy.attach_trading_validator(trading_validator)
+
+        self.df = None
+        self.started = False
+        self.last_reconcile = 0.0
+        self.reconcile_interval = config['worker_config']['reconcile_interval']
+        self.tick_stats: List[Dict[str, float]] = []
+
+    def start(self, fetch_history: bool = True):
+        """
+        启动：加载持仓文件并与交易所核对一次，拉取全量历史数据
+
+        Args:
+            fetch_history: 是否自行拉取历史K线，由共享行情源推送数据时为 False
+        """
+        self.strategy.reconcile_state()
+        self.last_reconcile = time.monotonic()
+        if fetch_history:
+            self.df = self.data_fetcher.get_and_save_data()
+        self.started = True
+        self.logger.info(f"{self.name} 已启动，预热K线 {0 if self.df is None else len(self.df)} 根")
+
+    def on_bar(self, df):
+        """使用外部提供的最新K线数据运行一次策略"""
+        if not self.started:
+            self.start()
+
+        # 重置标志检查只是一次文件存在性判断，每次调度都执行
+        if not self.strategy.check_reset_flag():
+            now = time.monotonic()
+            if now - self.last_reconcile >= self.reconcile_interval:
+                self.strategy.reconcile_state(reload=False)
+                self.last_reconcile = now
+
+        if df is None or df.empty:
+            self.logger.error(f"{self.name} 数据为空，跳过本次执行")
+            return
+        self.df = df
+        self.strategy.run_strategy(df)
+
+    def tick(self):
+        """一次调度：增量刷新数据并运行策略，记录耗时与内存块变化"""
+        started = time.perf_counter()
+        blocks_before = sys.getallocatedblocks()
+        try:
+            if not self.started:
+                self.start()
+                df = self.df
+            else:
+                df = self.data_fetcher.update_data(self.df)
+            self.on_bar(df)
+        except Exception as e:
+            self.logger.error(f"{self.name} 执行失败: {e}")
+        finally:
+            stats = {
+                'wall_ms': (time.perf_counter() - started) * 1000,
+                'allocated_blocks_delta': sys.getallocatedblocks() - blocks_before,
+            }
+            self.tick_stats.append(stats)
+            self.logger.info(f"{self.name} 调度完成: 耗时 {stats['wall_ms']:.1f}ms, "
+                             f"内存块变化 {stats['allocated_blocks_delta']}")
+
+
+def measure_tick_cost(tick_fn: Callable[[], Any], ticks: int) -> Dict[str, float]:
+    """
+    测量调度函数的单次耗时和内存分配
+
+    使用 tracemalloc 统计每次调用的峰值分配字节数与新分配的内存块数量，
+    结果取多次调用的平均值。tracemalloc 本身会拖慢执行，仅用于前后对比。
+    """
+    wall_ms, peak_bytes, alloc_blocks = [], [], []
+    tracemalloc.start()
+    try:
+        for _ in range(ticks):
+            tracemalloc.clear_traces()
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            tick_fn()
+            wall_ms.append((time.perf_counter() - started) * 1000)
+            snapshot = tracemalloc.take_snapshot()
+            alloc_blocks.append(sum(stat.count for stat in snapshot.statistics('filename')))
+            peak_bytes.append(tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'ticks': ticks,
+        'avg_wall_ms': sum(wall_ms) / ticks,
+        'avg_peak_bytes': sum(peak_bytes) / ticks,
+        'avg_live_blocks': sum(alloc_blocks) / ticks,
+    }
+
+
+def compare_tick_cost(legacy_fn: Callable[[], Any], worker: StrategyWorker, ticks: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    对比每次调度全量重建（legacy_fn）与常驻工作器的单次耗时和内存分配
+
+    两条路径都会运行真实策略并可能下单，只允许在回放模式下执行（交易所响应来自录制文件，不访问网络）；
+    工作器与 legacy_fn 的交易所实例须在 configure_traffic('replay', ...) 之后创建。
+
+    Returns:
+        dict: {'before': 旧路径统计, 'after': 工作器统计}
+    """
+    if traffic_mode() != 'replay':
+        raise RuntimeError(f"调度耗时对比只能在回放模式下运行，当前流量模式: {traffic_mode()}")
+    if not worker.started:
+        worker.start()
+    before = measure_tick_cost(legacy_fn, ticks)
+    after = measure_tick_cost(worker.tick, ticks)
+    for label, stats in (('重建模式', before), ('常驻模式', after)):
+        print(f"{label}: 平均耗时 {stats['avg_wall_ms']:.1f}ms, 峰值分配 {stats['avg_peak_bytes'] / 1024:.1f}KB, "
+              f"存活内存块 {stats['avg_live_blocks']:.0f}")
+    return {'before': before, 'after': after}
@@ -0,0 +1,51 @@
+"""
+回测绩效指标测试
+"""
+import math
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.backtest_metrics import bars_per_year, compute_metrics
+
+
+class TestBacktestMetrics(unittest.TestCase):
+    """回测绩效指标测试类"""
+
+    def test_annualization_factor_follows_timeframe(self):
+        """每年K线根数按 365 天全天交易计算，夏普按 sqrt(每年根数) 年化"""
+        self.assertEqual(bars_per_year('5m'), 365 * 288)
+        self.assertEqual(bars_per_year('1h'), 365 * 24)
+        equity = [100.0, 101.0, 100.5, 102.0, 101.0]
+        hourly = compute_metrics(equity, '1h')
+        daily = compute_metrics(equity, '1d')
+        self.assertAlmostEqual(hourly['sharpe_ratio'] / daily['sharpe_ratio'], math.sqrt(24))
+        self.assertAlmostEqual(daily['years'], 4 / 365)
+
+    def test_drawdown_depth_and_duration(self):
+        """最大回撤按运行峰值计算，持续时间为离开峰值后最长的K线根数"""
+        metrics = compute_metrics([100.0, 110.0, 105.0, 99.0, 108.0, 111.0, 90.0], '1h')
+        self.assertAlmostEqual(metrics['max_drawdown'], 21.0 / 111.0)
+        self.assertAlmostEqual(metrics['max_drawdown_amount'], 21.0)
+        self.assertEqual(metrics['max_drawdown_duration'], 3)
+
+    def test_win_rate_counts_closed_trades_only(self):
+        """胜率与盈亏因子只按已平仓交易统计"""
+        metrics = compute_metrics([100.0, 101.0], '1h', trade_pnl=[5.0, -2.0, 3.0, -1.0])
+        self.assertEqual(metrics['closed_trades'], 4)
+        self.assertAlmostEqual(metrics['win_rate'], 0.5)
+        self.assertAlmostEqual(metrics['profit_factor'], 8.0 / 3.0)
+        self.assertEqual(compute_metrics([100.0, 101.0], '1h')['win_rate'], 0.0)
+
+    def test_cagr_overflow_returns_inf(self):
+        """区间很短时年化指数超出浮点范围，CAGR 为 inf 而不抛异常"""
+        self.assertEqual(compute_metrics([100.0, 200.0], '1m')['cagr'], math.inf)
+        metrics = compute_metrics([100.0] * 365 + [110.0], '1d')
+        self.assertAlmostEqual(metrics['cagr'], 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,91 @@
+"""
+K线收盘调度器测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bar_scheduler import BarCloseScheduler
+
+MINUTE = 60000
+
+
+class FakeClock:
+    """可手动推进的服务器时钟"""
+
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+
+    def __call__(self):
+        return self.now_ms
+
+    def wait(self, seconds):
+        self.now_ms += int(seconds * 1000)
+        return False
+
+
+class TestBarCloseScheduler(unittest.TestCase):
+    """K线收盘调度器测试类"""
+
+    def make_scheduler(self, clock, probe=None):
+        events = []
+        scheduler = BarCloseScheduler(
+            clock=clock, timeframes=['5m', '15m', '5m'], callback=events.append,
+            probe=probe, wait=clock.wait
+        )
+        return scheduler, events
+
+    def test_coalesces_coinciding_timeframes(self):
+        """5m 与 15m 在整刻同时收盘时只触发一次"""
+        clock = FakeClock(61 * MINUTE)
+        scheduler, events = self.make_scheduler(clock)
+
+        for _ in range(3):
+            scheduler.run_once()
+
+        self.assertEqual([e.close_time_ms for e in events], [65 * MINUTE, 70 * MINUTE, 75 * MINUTE])
+        self.assertEqual(events[0].timeframes, ['5m'])
+        self.assertEqual(events[2].timeframes, ['5m', '15m'])
+        self.assertEqual(scheduler.get_lateness_report()['15m']['fired'], 1)
+
+    def test_late_start_fires_instead_of_missing(self):
+        """调度滞后时对最近收盘K线补触发一次并报告跳过数量"""
+        clock = FakeClock(61 * MINUTE)
+        scheduler, events = self.make_scheduler(clock)
+
+        clock.now_ms = 76 * MINUTE
+        event = scheduler.run_once()
+
+        self.assertEqual(event.close_time_ms, 75 * MINUTE)
+        self.assertEqual(event.timeframes, ['5m', '15m'])
+        self.assertEqual(event.lateness_ms, MINUTE)
+        self.assertEqual(event.missed_bars, {'5m': 2})
+
+        # 同一根K线不会重复触发
+        next_event = scheduler.run_once()
+        self.assertEqual(next_event.close_time_ms, 80 * MINUTE)
+
+    def test_probe_waits_for_exchange_close(self):
+        """探测确认前不触发，并使用指数退避"""
+        clock = FakeClock(64 * MINUTE)
+        probe_times = []
+
+        def probe(timeframe, close_time_ms):
+            probe_times.append(clock.now_ms)
+            return clock.now_ms >= close_time_ms + 1000
+
+        scheduler, events = self.make_scheduler(clock, probe=probe)
+        event = scheduler.run_once()
+
+        self.assertTrue(event.confirmed)
+        self.assertEqual(event.probe_attempts, 4)
+        self.assertEqual(event.lateness_ms, 1400)
+        gaps = [b - a for a, b in zip(probe_times, probe_times[1:])]
+        self.assertEqual(gaps, [200, 400, 800])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
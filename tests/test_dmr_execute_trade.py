@@ -0,0 +1,198 @@
+"""
+DMR四象限策略逐槽位执行测试
+"""
+import unittest
+import sys
+import os
+
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import SYMBOL
+from strategy.DMRQuadrantStrategy import DMRQuadrantStrategy
+
+
+class FakeLifecycle:
+    """记录撤单的订单生命周期管理器"""
+
+    def __init__(self):
+        self.canceled = []
+
+    def is_working(self, order_id):
+        return order_id not in self.canceled
+
+    def cancel(self, order_id):
+        self.canceled.append(order_id)
+        return True
+
+
+class FakeExchange:
+    """按订单ID返回开仓单状态，撤单后状态变为 canceled"""
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.canceled = []
+
+    def fetch_order(self, order_id, symbol, params=None):
+        return dict(self.orders[order_id])
+
+    def cancel_order(self, order_id, symbol, params=None):
+        self.canceled.append(order_id)
+        self.orders[order_id]['status'] = 'canceled'
+        return dict(self.orders[order_id])
+
+
+class FakeExecutor:
+    """记录下单调用的执行器"""
+
+    def __init__(self, order_lifecycle=None):
+        self.order_lifecycle = order_lifecycle
+        self.calls = []
+        self.reduce_ids = []
+
+    def get_private_params(self):
+        return {}
+
+    def open_long(self, symbol, amount, **kwargs):
+        self.calls.append(('open_long', symbol, kwargs['client_order_id']))
+        return {'id': 'L1', 'filled': 0.0}
+
+    def open_short(self, symbol, amount, **kwargs):
+        self.calls.append(('open_short', symbol, kwargs['client_order_id']))
+        return {'id': 'S1', 'filled': 0.0}
+
+    def reduce_position(self, symbol, position_side, quantity, order_type='MARKET', **kwargs):
+        self.calls.append(('reduce_position', position_side, quantity))
+        self.reduce_ids.append(kwargs.get('client_order_id'))
+        return {'id': 'R1'}
+
+    def close_position(self, symbol, position_side, order_type='MARKET', price=None):
+        self.calls.append(('close_position', position_side))
+
+
+class FakePnLEngine:
+    """记录订单归属登记的盈亏引擎"""
+
+    def __init__(self):
+        self.registered = {}
+
+    def register_order(self, order_id, strategy, slot=None):
+        self.registered[order_id] = [(strategy, slot, None)]
+
+    def register_allocations(self, order_id, allocations):
+        self.registered[order_id] = list(allocations)
+
+
+def held(quantity):
+    return {'status': 'filled', 'order': None, 'filled': quantity, 'price': 100.0}
+
+
+class TestDMRExecuteTrade(unittest.TestCase):
+    """逐槽位执行测试类"""
+
+    def setUp(self):
+        self.executor = FakeExecutor()
+        df = pd.DataFrame({'close': [100.0, 101.0]},
+                          index=pd.date_range('2026-01-01', periods=2, freq='1h', tz='UTC'))
+        self.strategy = DMRQuadrantStrategy(df, self.executor)
+
+    def test_sell_opens_short_slot(self):
+        """卖出动作开空仓并占用槽位"""
+        self.strategy.execute_trade('sell', 'Short_4H_T2')
+
+        self.assertEqual(self.executor.calls[0][:2], ('open_short', SYMBOL))
+        self.assertEqual(self.strategy.positions['Short_4H_T2']['id'], 'S1')
+        # 已占用的槽位不重复开仓
+        self.strategy.execute_trade('sell', 'Short_4H_T2')
+        self.assertEqual(len(self.executor.calls), 1)
+
+    def test_close_reduces_only_the_slot_quantity(self):
+        """平仓只减掉该槽位的数量，同一腿上其他槽位保留"""
+        self.strategy.positions['Long_4H_T1'] = held(0.3)
+        self.strategy.positions['Long_1H_T1'] = held(0.5)
+        self.strategy.execute_trade('close', 'Long_4H_T1')
+
+        self.assertEqual(self.executor.calls, [('reduce_position', 'LONG', 0.3)])
+        self.assertIsNone(self.strategy.positions['Long_4H_T1'])
+        self.assertEqual(self.strategy.positions['Long_1H_T1']['filled'], 0.5)
+        # 同一K线同一槽位的平仓使用确定性的客户端订单ID，重试与重启重放不会重复减仓
+        self.assertEqual(self.executor.reduce_ids, [self.strategy._client_order_kwargs('Long_4H_T1', 'close')
+                                                    ['client_order_id']])
+
+    def test_close_unfilled_pending_slot_only_cancels(self):
+        """挂单未成交的槽位平仓时只撤单，订单结束后释放槽位"""
+        self.executor.order_lifecycle = FakeLifecycle()
+        self.strategy.positions['Short_1H_R1'] = {'status': 'pending', 'order': {'id': 'S9'}, 'filled': 0.0,
+                                                  'price': None}
+        self.strategy.execute_trade('close', 'Short_1H_R1')
+        self.assertEqual(self.executor.order_lifecycle.canceled, ['S9'])
+        self.assertIsNotNone(self.strategy.positions['Short_1H_R1'])
+
+        self.strategy._on_slot_done('Short_1H_R1')
+        self.assertEqual(self.executor.calls, [])
+        self.assertIsNone(self.strategy.positions['Short_1H_R1'])
+
+    def test_close_waits_for_fills_before_cancel_ack(self):
+        """撤单回报前到达的成交也计入平仓数量"""
+        self.executor.order_lifecycle = FakeLifecycle()
+        self.strategy.positions['Long_1H_T1'] = {'status': 'partial', 'order': {'id': 'L9'}, 'filled': 0.1,
+                                                 'price': 100.0}
+        self.strategy.execute_trade('close', 'Long_1H_T1')
+        self.assertEqual(self.executor.calls, [])
+
+        # 撤单请求与回报之间又成交了 0.2
+        self.strategy.positions['Long_1H_T1']['filled'] = 0.30000000000000004
+        self.strategy._on_slot_done('Long_1H_T1')
+        self.assertEqual(self.executor.calls, [('reduce_position', 'LONG', 0.30000000000000004)])
+        self.assertEqual(self.strategy._deferred_closes, set())
+
+    def test_close_without_known_quantity_skips(self):
+        """槽位数量无法确认时跳过平仓并保留槽位，不平掉整条持仓腿"""
+        self.strategy.positions['Short_4H_T2'] = {'id': 'S1', 'filled': 0.0}
+        self.strategy.execute_trade('close', 'Short_4H_T2')
+
+        self.assertEqual(self.executor.calls, [])
+        self.assertEqual(self.strategy.positions['Short_4H_T2']['id'], 'S1')
+
+    def test_close_looks_up_quantity_from_order(self):
+        """槽位未记录成交数量时按开仓订单查询，挂单中的先撤单，只减掉已成交数量"""
+        self.executor.exchange = FakeExchange({'S1': {'status': 'open', 'filled': 0.2}})
+        self.strategy.positions['Short_4H_T2'] = {'id': 'S1', 'filled': 0.0}
+        self.strategy.execute_trade('close', 'Short_4H_T2')
+
+        self.assertEqual(self.executor.exchange.canceled, ['S1'])
+        self.assertEqual(self.executor.calls, [('reduce_position', 'SHORT', 0.2)])
+        self.assertIsNone(self.strategy.positions['Short_4H_T2'])
+
+    def test_close_unfilled_order_releases_slot(self):
+        """查询到开仓单没有成交时只释放槽位"""
+        self.executor.exchange = FakeExchange({'L1': {'status': 'canceled', 'filled': 0.0}})
+        self.strategy.positions['Long_4H_T1'] = {'id': 'L1', 'filled': 0.0}
+        self.strategy.execute_trade('close', 'Long_4H_T1')
+
+        self.assertEqual(self.executor.calls, [])
+        self.assertIsNone(self.strategy.positions['Long_4H_T1'])
+
+    def test_netted_order_registers_slot_allocations(self):
+        """轧差订单按各槽位分配登记盈亏归属，不把合并的槽位名当作槽位"""
+        self.executor.pnl_engine = FakePnLEngine()
+        order = {'leg': 'LONG', 'reduce': False, 'allocations': [['Long_4H_T1', 1.0], ['Long_1H_T1', 0.5]]}
+        opening = self.strategy._netted_order_kwargs(order)['client_order_id']
+        self.assertEqual(self.executor.pnl_engine.registered[opening],
+                         [('DMRQuadrant', 'Long_4H_T1', 1.0), ('DMRQuadrant', 'Long_1H_T1', 0.5)])
+
+        # 轧差减仓同样带确定性的客户端订单ID，平仓成交记入被平的槽位
+        self.strategy.positions['Long_1H_R2'] = held(0.2)
+        closing = {'leg': 'LONG', 'side': 'SELL', 'reduce': True, 'quantity': 0.2,
+                   'allocations': [['Long_1H_R2', 0.2]]}
+        self.strategy._submit_netted(closing, 101.0)
+        self.assertEqual(self.executor.calls, [('reduce_position', 'LONG', 0.2)])
+        client_order_id = self.executor.reduce_ids[0]
+        self.assertNotEqual(client_order_id, opening)
+        self.assertEqual(self.executor.pnl_engine.registered[client_order_id], [('DMRQuadrant', 'Long_1H_R2', 0.2)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,109 @@
+"""
+多交易对DMR面板测试
+"""
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strategy.DMRQuadrantStrategy import DMRQuadrantStrategy
+from strategy.dmr_panel import (DMRPanel, QUADRANT_R1, QUADRANT_T1, QUADRANT_UNKNOWN, quadrant_codes,
+                                quadrant_matrix)
+
+HOUR_MS = 3600 * 1000
+
+
+def make_frame(periods, seed, start='2026-01-01'):
+    """随机游走的 1h OHLCV，索引为 UTC 开盘时间（无时区）"""
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, periods))
+    spread = np.abs(rng.normal(0, 0.5, periods)) + 0.1
+    return pd.DataFrame({'open': close, 'high': close + spread, 'low': close - spread, 'close': close,
+                         'volume': np.ones(periods)},
+                        index=pd.date_range(start, periods=periods, freq='1h'))
+
+
+def strategy_dmr(df):
+    """单交易对策略计算的 DMR6/12/26"""
+    strategy = DMRQuadrantStrategy(df.copy(), None)
+    strategy.calculate_dmr()
+    return strategy.df
+
+
+class TestDMRPanel(unittest.TestCase):
+    """DMR面板测试类"""
+
+    def test_matches_strategy_calculation(self):
+        """面板DMR与策略 calculate_dmr 在预热期之后逐根一致"""
+        frames = {'BTC/USDT': make_frame(60, 1), 'ETH/USDT': make_frame(60, 2)}
+        panel = DMRPanel.from_frames(frames, '1h')
+        for row, symbol in enumerate(panel.symbols):
+            expected = strategy_dmr(frames[symbol])
+            for period in (6, 12, 26):
+                np.testing.assert_allclose(panel.dmr(period)[row, period - 1:],
+                                           expected[f'dmr_avg{period}'].to_numpy()[period - 1:])
+
+    def test_warmup_is_nan(self):
+        """数据不足一个窗口时DMR为 NaN，而不是策略里前向填充的 0"""
+        panel = DMRPanel.from_frames({'BTC/USDT': make_frame(30, 3)}, '1h')
+        self.assertTrue(np.isnan(panel.dmr(26)[0, :25]).all())
+        self.assertFalse(np.isnan(panel.dmr(26)[0, 25:]).any())
+        self.assertTrue(np.isnan(DMRPanel.from_frames({'BTC/USDT': make_frame(5, 3)}, '1h').dmr(6)).all())
+
+    def test_ragged_histories_and_gaps(self):
+        """晚上市与中间缺失的交易对：缺失处 mask 为 False，DMR不跨越缺口计算"""
+        btc = make_frame(40, 4)
+        eth = make_frame(30, 5, start='2026-01-01 10:00')
+        eth_before, eth_after = eth.iloc[:8], eth.iloc[10:]
+        panel = DMRPanel.from_frames({'BTC/USDT': btc, 'ETH/USDT': pd.concat([eth_before, eth_after])}, '1h')
+
+        self.assertEqual(panel.high.shape, (2, 40))
+        self.assertEqual(panel.mask[1].sum(), 28)
+        self.assertFalse(panel.mask[1, :10].any())
+        self.assertFalse(panel.mask[1, 18:20].any())
+        # 缺口后第一根比率为 1，与单独计算缺口后数据一致
+        self.assertEqual(panel.ratio[1, 20], 1.0)
+        dmr6 = panel.dmr(6)[1]
+        self.assertTrue(np.isnan(dmr6[:15]).all())
+        self.assertFalse(np.isnan(dmr6[15:18]).any())
+        self.assertTrue(np.isnan(dmr6[18:25]).all())
+        np.testing.assert_allclose(dmr6[25:], strategy_dmr(eth_after)['dmr_avg6'].to_numpy()[5:])
+        # 完整历史的交易对不受其他行缺失影响
+        np.testing.assert_allclose(panel.dmr(6)[0, 5:], strategy_dmr(btc)['dmr_avg6'].to_numpy()[5:])
+
+    def test_from_ohlcv_drops_unaligned_bars(self):
+        """不在周期时间轴上的K线被丢弃，没有数据的交易对整行为 NaN"""
+        bars = [[0, 1.0, 2.0, 1.0, 1.5, 1.0], [HOUR_MS + 1, 1.0, 3.0, 1.0, 2.0, 1.0],
+                [2 * HOUR_MS, 1.0, 4.0, 2.0, 3.0, 1.0]]
+        panel = DMRPanel.from_ohlcv({'BTC/USDT': bars, 'ETH/USDT': []}, '1h')
+        np.testing.assert_array_equal(panel.timestamps, [0, HOUR_MS, 2 * HOUR_MS])
+        np.testing.assert_array_equal(panel.mask, [[True, False, True], [False, False, False]])
+
+    def test_quadrant_codes_and_alignment(self):
+        """四象限编码：任一DMR缺失为 UNKNOWN；长短周期面板交易对顺序不一致时报错"""
+        codes = quadrant_codes(np.array([0.1, 0.1, np.nan]), np.array([0.2, -0.2, 0.2]))
+        np.testing.assert_array_equal(codes, [QUADRANT_T1, QUADRANT_R1, QUADRANT_UNKNOWN])
+
+        frames = {'BTC/USDT': make_frame(60, 6), 'ETH/USDT': make_frame(60, 7)}
+        short_panel = DMRPanel.from_frames(frames, '1h')
+        long_panel = DMRPanel.from_frames({symbol: df.resample('4h').agg(
+            {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+            for symbol, df in frames.items()}, '4h')
+        matrix = quadrant_matrix(long_panel, 6, short_panel, 6)
+        self.assertEqual(matrix.shape, (2, 60))
+        # 长周期第6根K线（20:00 开始）之前没有长周期DMR
+        self.assertTrue((matrix[:, :20] == QUADRANT_UNKNOWN).all())
+        self.assertTrue((matrix[:, 20:] != QUADRANT_UNKNOWN).all())
+
+        reversed_panel = DMRPanel.from_frames(dict(reversed(list(frames.items()))), '1h')
+        with self.assertRaises(ValueError):
+            quadrant_matrix(long_panel, 6, reversed_panel, 6)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
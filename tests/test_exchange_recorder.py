@@ -0,0 +1,125 @@
+"""
+交易所流量录制与回放测试
+"""
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+import ccxt
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.exchange_recorder import (FOOTER_MAGIC, ExchangeReplayer, attach_traffic_hooks, close_traffic_sessions,
+                                     configure_traffic, exhausted_requests, mark_tick, normalize_request,
+                                     recorded_ticks)
+
+TICKER_URL = 'https://fapi.binance.com/fapi/v1/ticker/price?symbol=BTCUSDT'
+ORDER_URL = 'https://fapi.binance.com/fapi/v1/order'
+
+
+class FakeExchange:
+    """按调用次数返回递增价格的传输层，下单请求返回保证金不足"""
+
+    def __init__(self):
+        self.enableRateLimit = True
+        self.calls = 0
+
+    def fetch(self, url, method='GET', headers=None, body=None):
+        self.calls += 1
+        if url == ORDER_URL:
+            raise ccxt.InsufficientFunds('binance {"code":-2019,"msg":"Margin is insufficient."}')
+        return {'symbol': 'BTCUSDT', 'price': str(100 + self.calls)}
+
+
+class OfflineExchange(FakeExchange):
+    """回放时不允许访问网络"""
+
+    def fetch(self, url, method='GET', headers=None, body=None):
+        raise AssertionError('回放时访问了网络')
+
+
+def signed_body(timestamp):
+    return f"symbol=BTCUSDT&side=BUY&quantity=0.001&timestamp={timestamp}&recvWindow=60000&signature=abc{timestamp}"
+
+
+class TestExchangeRecorder(unittest.TestCase):
+    """流量录制与回放测试类"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'session.dmrrec')
+
+    def tearDown(self):
+        close_traffic_sessions()
+        configure_traffic('live')
+        self.directory.cleanup()
+
+    def record_session(self):
+        configure_traffic('record', self.path)
+        exchange = attach_traffic_hooks(FakeExchange())
+        mark_tick('tick', closed_timeframes=['1h'])
+        exchange.fetch(TICKER_URL)
+        exchange.fetch(TICKER_URL)
+        with self.assertRaises(ccxt.InsufficientFunds):
+            exchange.fetch(ORDER_URL, 'POST', body=signed_body(1))
+        close_traffic_sessions()
+
+    def test_round_trip(self):
+        """录制 → 写入索引页脚 → 回放：按录制顺序返回响应，录制的异常按原类型抛出"""
+        self.record_session()
+        with open(self.path, 'rb') as f:
+            self.assertTrue(f.read().endswith(FOOTER_MAGIC))
+
+        configure_traffic('replay', self.path)
+        exchange = attach_traffic_hooks(OfflineExchange())
+        self.assertFalse(exchange.enableRateLimit)
+        self.assertEqual(recorded_ticks()[0]['closed_timeframes'], ['1h'])
+        self.assertEqual(exchange.fetch(TICKER_URL)['price'], '101')
+        self.assertEqual(exchange.fetch(TICKER_URL)['price'], '102')
+        # 签名参数不同的同一下单请求命中录制记录
+        with self.assertRaises(ccxt.InsufficientFunds):
+            exchange.fetch(ORDER_URL, 'POST', body=signed_body(2))
+        self.assertEqual(exhausted_requests(), {})
+
+    def test_missing_footer_rebuilds_index(self):
+        """录制进程异常退出未写入索引时，顺序扫描记录块重建"""
+        self.record_session()
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        # 去掉索引块与页脚，并留下半个索引块模拟写到一半的尾部
+        (index_offset, _) = struct.unpack('>QI', data[-len(FOOTER_MAGIC) - 12:-len(FOOTER_MAGIC)])
+        with open(self.path, 'wb') as f:
+            f.write(data[:index_offset + 6])
+        replayer = ExchangeReplayer(self.path)
+        key = normalize_request('GET', TICKER_URL)
+        self.assertEqual(len(replayer.index[key]), 2)
+        self.assertEqual(len(replayer.ticks), 1)
+
+    def test_request_key_ignores_volatile_params(self):
+        """请求键忽略 timestamp / signature / recvWindow 及参数顺序，其他参数不同则键不同"""
+        self.assertEqual(normalize_request('post', ORDER_URL, signed_body(1)),
+                         normalize_request('POST', ORDER_URL, signed_body(2)))
+        self.assertEqual(normalize_request('GET', TICKER_URL + '&timestamp=1&signature=x'),
+                         normalize_request('GET', TICKER_URL))
+        self.assertEqual(normalize_request('GET', f"{ORDER_URL}?b=2&a=1"),
+                         normalize_request('GET', f"{ORDER_URL}?a=1&b=2"))
+        self.assertNotEqual(normalize_request('POST', ORDER_URL, signed_body(1)),
+                            normalize_request('POST', ORDER_URL, signed_body(1).replace('BUY', 'SELL')))
+
+    def test_exhausted_key_is_counted(self):
+        """同一请求的录制记录用尽后重复返回最后一条，并按请求键计数"""
+        self.record_session()
+        configure_traffic('replay', self.path)
+        exchange = attach_traffic_hooks(OfflineExchange())
+        prices = [exchange.fetch(TICKER_URL)['price'] for _ in range(4)]
+        self.assertEqual(prices, ['101', '102', '102', '102'])
+        self.assertEqual(exhausted_requests(), {normalize_request('GET', TICKER_URL): 2})
+        with self.assertRaises(KeyError):
+            exchange.fetch(ORDER_URL + '?unknown=1', 'POST')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
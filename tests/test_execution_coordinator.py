@@ -0,0 +1,134 @@
+"""
+跨策略执行协调器测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.pnl_engine import PnLEngine
+from common.state_store import StateStore
+from execution.execution_coordinator import ExecutionCoordinator
+from strategy.long_term.order_executor import LongTermOrderExecutor
+
+
+class FakeExchange:
+    """记录净额下单的交易所，fail=True 时下单失败"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.orders = []
+
+    def amount_to_precision(self, symbol, amount):
+        return f"{amount:.3f}"
+
+    def create_order(self, symbol, order_type, side, amount, price=None, params=None):
+        if self.fail:
+            raise Exception('binance {"code":-2019,"msg":"Margin is insufficient."}')
+        self.orders.append((side, amount, params.get('positionSide')))
+        return {'id': f"x{len(self.orders)}", 'filled': amount, 'average': 101.0}
+
+    def load_markets(self):
+        return {}
+
+
+class FakeFetcher:
+    def sync_time(self, force=False):
+        pass
+
+
+class TestExecutionCoordinator(unittest.TestCase):
+    """执行协调器测试类"""
+
+    def setUp(self):
+        self.exchange = FakeExchange()
+        self.coordinator = ExecutionCoordinator(self.exchange)
+        self.results = {}
+
+    def collect(self, intent_id):
+        self.coordinator.add_done_callback(intent_id, lambda result: self.results.__setitem__(intent_id, result))
+
+    def test_cross_then_residual_order(self):
+        """同一持仓方向的买卖意图内部撮合，净差额下单，结算回调给出各自成交数量与均价"""
+        with self.coordinator.batch():
+            opening = self.coordinator.submit('short_term', 'BTC/USDT', 'buy', 1.0, 'LONG', reference_price=100.0)
+            closing = self.coordinator.submit('long_term', 'BTC/USDT', 'sell', 0.4, 'LONG', reference_price=100.0)
+            self.collect(opening)
+            self.collect(closing)
+            # 批处理结束前不结算
+            self.assertEqual(self.results, {})
+
+        self.assertEqual(self.exchange.orders, [('buy', 0.6, 'LONG')])
+        self.assertEqual(self.results[closing]['status'], 'filled')
+        self.assertAlmostEqual(self.results[closing]['average'], 100.0)
+        self.assertEqual(self.results[opening]['status'], 'filled')
+        self.assertAlmostEqual(self.results[opening]['filled'], 1.0)
+        self.assertAlmostEqual(self.results[opening]['average'], 100.6)
+        self.assertEqual([fill['source'] for fill in self.coordinator.get_fills('short_term')], ['internal', 'exchange'])
+
+    def test_fills_written_to_state_store(self):
+        """内部撮合与交易所成交按策略写入状态存储，净额订单写入订单表"""
+        store = StateStore(':memory:')
+        self.coordinator.attach_state_store(store)
+        with self.coordinator.batch():
+            self.coordinator.submit('short_term', 'BTC/USDT', 'buy', 1.0, 'LONG', reference_price=100.0)
+            self.coordinator.submit('long_term', 'BTC/USDT', 'sell', 0.4, 'LONG', reference_price=100.0)
+
+        self.assertEqual([(fill['source'], fill['quantity']) for fill in store.fills(strategy='short_term')],
+                         [('internal', 0.4), ('exchange', 0.6)])
+        self.assertEqual([fill['side'] for fill in store.fills(strategy='long_term')], ['sell'])
+        order = store.conn.execute('SELECT side, position_side, amount FROM orders').fetchone()
+        self.assertEqual(tuple(order), ('buy', 'LONG', 0.6))
+
+    def test_fills_attributed_in_pnl_engine(self):
+        """内部撮合直接按策略入账，净额订单的成交推送按分配拆分给各策略"""
+        pnl_engine = PnLEngine()
+        self.coordinator.attach_pnl_engine(pnl_engine)
+        with self.coordinator.batch():
+            self.coordinator.submit('short_term', 'BTC/USDT', 'buy', 1.0, 'LONG', reference_price=100.0)
+            self.coordinator.submit('long_term', 'BTC/USDT', 'sell', 0.4, 'LONG', reference_price=100.0)
+
+        self.assertEqual(pnl_engine.positions[('long_term', None, 'BTC/USDT')], [-0.4, 100.0])
+        self.assertEqual(pnl_engine.positions[('short_term', None, 'BTC/USDT')], [0.4, 100.0])
+        pnl_engine._on_order_update({'o': {'s': 'BTC/USDT', 'i': 'x1', 'c': 'c1', 'x': 'TRADE', 'S': 'BUY',
+                                           'l': '0.6', 'L': '101.0', 'n': '0.06', 'N': 'USDT'}})
+        self.assertAlmostEqual(pnl_engine.positions[('short_term', None, 'BTC/USDT')][0], 1.0)
+        self.assertAlmostEqual(pnl_engine.get_pnl(strategy='short_term')['fees'], 0.06)
+
+    def test_residual_failure_reports_partial_and_failed(self):
+        """净额下单失败：已内部撮合的部分成交，其余意图失败并带错误信息"""
+        self.exchange.fail = True
+        with self.coordinator.batch():
+            opening = self.coordinator.submit('short_term', 'BTC/USDT', 'buy', 1.0, 'LONG', reference_price=100.0)
+            closing = self.coordinator.submit('long_term', 'BTC/USDT', 'sell', 0.4, 'LONG', reference_price=100.0)
+            alone = self.coordinator.submit('long_term', 'BTC/USDT', 'sell', 0.2, 'SHORT', reference_price=100.0)
+
+        self.assertEqual(self.coordinator.result(closing)['status'], 'filled')
+        partial = self.coordinator.result(opening)
+        self.assertEqual(partial['status'], 'partial')
+        self.assertAlmostEqual(partial['filled'], 0.4)
+        failed = self.coordinator.result(alone)
+        self.assertEqual((failed['status'], failed['filled'], failed['average']), ('failed', 0.0, None))
+        self.assertIn('-2019', failed['error'])
+
+    def test_executor_updates_only_from_settled_fill(self):
+        """执行器经协调器下单时，成交回调在撮合结算后按实际成交触发，失败时不触发"""
+        executor = LongTermOrderExecutor(self.exchange, data_fetcher=FakeFetcher())
+        executor.attach_coordinator(self.coordinator)
+        fills = []
+        with self.coordinator.batch():
+            order = executor.open_long(100.0, 0.5, on_filled=lambda qty, price: fills.append((qty, price)))
+            self.assertEqual(order['status'], 'pending')
+            self.assertEqual(fills, [])
+        self.assertEqual(fills, [(0.5, 101.0)])
+
+        self.exchange.fail = True
+        with self.coordinator.batch():
+            executor.open_short(100.0, 0.5, on_filled=lambda qty, price: fills.append((qty, price)))
+        self.assertEqual(len(fills), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
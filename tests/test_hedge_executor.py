@@ -0,0 +1,168 @@
+"""
+对冲腿并发提交测试
+"""
+import json
+import time
+import unittest
+import sys
+import os
+
+import ccxt
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution.hedge_executor import HedgeExecutor
+from execution.order_executor import OrderExecutor
+
+
+class FakeDataFetcher:
+    def sync_time(self, force=False):
+        pass
+
+    def get_timestamp(self):
+        return 0
+
+
+class FakeExchange:
+    """按客户端订单ID保存已接受的订单，可模拟批量拒单、接受后超时和慢速确认"""
+
+    def __init__(self):
+        self.orders = {}
+        self.batch_calls = 0
+        self.created = []
+        self.canceled = []
+        # 被拒绝的 positionSide
+        self.reject_sides = set()
+        # 接受订单后抛出超时的次数
+        self.timeouts = 0
+        # 各交易对单笔下单的确认延迟(秒)
+        self.delays = {}
+
+    def amount_to_precision(self, symbol, amount):
+        return f"{amount:.3f}"
+
+    def price_to_precision(self, symbol, price):
+        return f"{price:.1f}"
+
+    def _accept(self, cid, position_side):
+        raw = {'orderId': len(self.orders) + 1, 'clientOrderId': cid, 'status': 'NEW',
+               'positionSide': position_side, 'executedQty': '0'}
+        self.orders[cid] = raw
+        return raw
+
+    def fapiPrivatePostBatchOrders(self, params):
+        self.batch_calls += 1
+        response = []
+        for order in json.loads(params['batchOrders']):
+            if order['positionSide'] in self.reject_sides:
+                response.append({'code': -2019, 'msg': 'Margin is insufficient.'})
+            else:
+                response.append(self._accept(order.get('newClientOrderId'), order['positionSide']))
+        if self.timeouts:
+            self.timeouts -= 1
+            raise ccxt.RequestTimeout('batchOrders timed out')
+        return response
+
+    def market(self, symbol):
+        return {'symbol': symbol}
+
+    def parse_order(self, raw, market=None):
+        return {'id': str(raw['orderId']), 'clientOrderId': raw['clientOrderId'], 'status': 'open',
+                'filled': float(raw['executedQty']), 'symbol': market['symbol'] if market else None, 'info': raw}
+
+    def create_order(self, symbol, order_type, side, amount, price=None, params=None):
+        time.sleep(self.delays.get(symbol, 0))
+        self.created.append((symbol, order_type, side, amount))
+        raw = self._accept(params.get('newClientOrderId'), params.get('positionSide'))
+        if self.timeouts:
+            self.timeouts -= 1
+            raise ccxt.RequestTimeout('order timed out')
+        return self.parse_order(raw, self.market(symbol))
+
+    def fetch_order(self, order_id, symbol, params=None):
+        raw = self.orders.get(params['origClientOrderId'])
+        if raw is None:
+            raise ccxt.OrderNotFound('not found')
+        return self.parse_order(raw, self.market(symbol))
+
+    def cancel_order(self, order_id, symbol, params=None):
+        self.canceled.append(order_id)
+        return {'id': order_id, 'filled': 0.0}
+
+
+def make_order_executor(exchange):
+    """不连接交易所的 OrderExecutor：只用到批量下单与私有参数"""
+    executor = OrderExecutor.__new__(OrderExecutor)
+    executor.exchange = exchange
+    executor.data_fetcher = FakeDataFetcher()
+    executor.position_cache = None
+    executor.order_lifecycle = None
+    return executor
+
+
+def make_leg(symbol, position_side, cid):
+    return {'symbol': symbol, 'side': 'BUY' if position_side == 'LONG' else 'SELL', 'positionSide': position_side,
+            'amount': 0.01, 'type': 'LIMIT', 'price': 100000.0, 'clientOrderId': cid, 'reduceOnly': False}
+
+
+class TestHedgeExecutor(unittest.TestCase):
+    """对冲腿执行器测试类"""
+
+    def setUp(self):
+        self.exchange = FakeExchange()
+        self.alerts = []
+        self.hedger = HedgeExecutor(make_order_executor(self.exchange),
+                                    alert_fn=lambda message, report: self.alerts.append(message))
+
+    def test_same_symbol_legs_use_one_batch(self):
+        """同一交易对的两条腿在一个批量请求内提交，结果转换为 ccxt 统一格式"""
+        report = self.hedger.submit([make_leg('BTC/USDT', 'LONG', 'h-long'), make_leg('BTC/USDT', 'SHORT', 'h-short')])
+        self.assertEqual(self.exchange.batch_calls, 1)
+        self.assertTrue(report['hedged'])
+        self.assertEqual(report['gap_ms'], 0.0)
+        self.assertEqual([result['order']['clientOrderId'] for result in report['results']], ['h-long', 'h-short'])
+        self.assertEqual(self.alerts, [])
+
+    def test_batch_timeout_resolves_legs_by_client_id(self):
+        """批量请求被接受后超时：按客户端订单ID确认各腿，不判为失败也不回滚"""
+        self.exchange.timeouts = 1
+        report = self.hedger.submit([make_leg('BTC/USDT', 'LONG', 'h-long'), make_leg('BTC/USDT', 'SHORT', 'h-short')])
+        self.assertTrue(report['hedged'])
+        self.assertFalse(report['rolled_back'])
+        self.assertEqual([result['order']['id'] for result in report['results']], ['1', '2'])
+        self.assertEqual(self.exchange.canceled, [])
+
+    def test_partial_failure_rolls_back(self):
+        """一条腿被拒绝时撤销已成功的腿并告警"""
+        self.exchange.reject_sides.add('SHORT')
+        report = self.hedger.submit([make_leg('BTC/USDT', 'LONG', 'h-long'), make_leg('BTC/USDT', 'SHORT', 'h-short')])
+        self.assertFalse(report['hedged'])
+        self.assertTrue(report['rolled_back'])
+        self.assertEqual(self.exchange.canceled, ['1'])
+        self.assertTrue(report['results'][0]['rolled_back'])
+        self.assertIn('-2019', self.alerts[-1])
+
+    def test_cross_symbol_gap_report(self):
+        """不同交易对并发提交，确认时间差超过阈值时告警"""
+        self.hedger.config['max_leg_gap_ms'] = 20
+        self.exchange.delays['ETH/USDT'] = 0.1
+        report = self.hedger.submit([make_leg('BTC/USDT', 'LONG', 'h-btc'), make_leg('ETH/USDT', 'SHORT', 'h-eth')])
+        self.assertEqual(self.exchange.batch_calls, 0)
+        self.assertTrue(report['hedged'])
+        self.assertGreater(report['gap_ms'], 20)
+        self.assertGreaterEqual(report['elapsed_ms'], report['gap_ms'])
+        self.assertEqual(len(self.alerts), 1)
+        self.assertIn('对冲腿间隔', self.alerts[0])
+
+    def test_single_leg_timeout_is_idempotent(self):
+        """单笔提交被接受后超时：按客户端订单ID找回订单，不重复下单"""
+        self.exchange.timeouts = 1
+        report = self.hedger.submit([make_leg('BTC/USDT', 'LONG', 'h-btc'), make_leg('ETH/USDT', 'SHORT', 'h-eth')])
+        self.assertTrue(report['hedged'])
+        self.assertEqual(len(self.exchange.created), 2)
+        self.assertEqual(len(self.exchange.orders), 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
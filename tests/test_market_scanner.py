@@ -0,0 +1,161 @@
+"""
+并发多交易对行情扫描测试
+"""
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_markets import write_summary
+from data.market_scanner import MarketScanner, WeightBudget, kline_weight
+from strategy.dmr_panel import QUADRANT_R1, QUADRANT_T1, QUADRANT_UNKNOWN
+
+HOUR_MS = 3600 * 1000
+
+# 旧版 analyze_markets 由 DMRMarketAnalyzer 结果 DataFrame.to_csv 写出的列
+LEGACY_COLUMNS = ['symbol', 'market_state', 'market_description', 'position_advice', 'dmr_4h_value',
+                  'dmr_1h_value', 'dmr_4h_transition', 'dmr_1h_transition', 'enet_value']
+
+
+def trending_bars(timeframe_ms, count, step):
+    """中间价每根按 step 比例变化的K线"""
+    bars = []
+    price = 100.0
+    for index in range(count):
+        bars.append([index * timeframe_ms, price, price * 1.01, price * 0.99, price, 1.0])
+        price *= 1 + step
+    return bars
+
+
+class FakeAsyncExchange:
+    """按 (交易对, 周期) 返回固定K线的异步交易所"""
+
+    def __init__(self, klines, used_weight=None):
+        self.klines = klines
+        self.requests = []
+        self.last_response_headers = {'x-mbx-used-weight-1m': used_weight} if used_weight else {}
+
+    async def fetch_ohlcv(self, symbol, timeframe, limit=None):
+        self.requests.append((symbol, timeframe, limit))
+        if (symbol, timeframe) not in self.klines:
+            raise Exception(f"{symbol} 无数据")
+        return self.klines[(symbol, timeframe)]
+
+
+class TestWeightBudget(unittest.TestCase):
+    """请求权重预算测试类"""
+
+    def test_kline_weight_tiers(self):
+        """K线接口权重按 limit 分档"""
+        self.assertEqual([kline_weight(limit) for limit in (99, 100, 499, 500, 1000, 1500)], [1, 2, 2, 5, 5, 10])
+
+    def test_throttles_at_configured_weight(self):
+        """突发额度用完后按每分钟预算匀速放行"""
+        budget = WeightBudget(600)  # 每秒10，突发额度300
+
+        async def run():
+            await budget.acquire(300)
+            started = time.monotonic()
+            await budget.acquire(2)
+            return time.monotonic() - started
+
+        waited = asyncio.run(run())
+        self.assertGreaterEqual(waited, 0.15)
+        self.assertAlmostEqual(budget.waited_seconds, 0.2, delta=0.05)
+
+    def test_scanner_budget_follows_config(self):
+        """扫描器按 weight_per_minute × weight_budget_ratio 限速，超出突发额度的请求被延后"""
+        scanner = MarketScanner({'weight_per_minute': 1200, 'weight_budget_ratio': 0.5})
+        self.assertEqual(scanner.budget.capacity, 300)
+        symbols = [f"S{index}/USDT:USDT" for index in range(61)]
+        scanner.exchange = FakeAsyncExchange({(symbol, '1h'): [[0, 1.0, 1.0, 1.0, 1.0, 1.0]] for symbol in symbols})
+
+        started = time.monotonic()
+        klines = asyncio.run(scanner.fetch_klines(symbols, ['1h'], limit=500))
+        elapsed = time.monotonic() - started
+        # 61 × 5 = 305，超出额度的 5 个权重按每秒 10 补充
+        self.assertEqual(len(klines['1h']), 61)
+        self.assertGreaterEqual(elapsed, 0.4)
+        self.assertGreater(scanner.budget.waited_seconds, 0.4)
+
+    def test_pauses_when_exchange_weight_near_limit(self):
+        """交易所返回的已用权重接近上限时暂停到下一分钟"""
+        scanner = MarketScanner()
+        scanner.exchange = FakeAsyncExchange({}, used_weight=str(int(scanner.weight_limit * 0.95)))
+        scanner._observe_used_weight()
+        self.assertGreater(scanner.budget.paused_until, time.monotonic())
+
+
+class TestMarketScanner(unittest.TestCase):
+    """行情扫描测试类"""
+
+    def setUp(self):
+        self.scanner = MarketScanner()
+        self.scanner.markets = {
+            'BTC/USDT:USDT': {'swap': True, 'linear': True, 'quote': 'USDT', 'active': True,
+                              'info': {'contractType': 'PERPETUAL'}},
+            'ETH/USDT:USDT': {'swap': True, 'linear': True, 'quote': 'USDT', 'active': True,
+                              'info': {'contractType': 'PERPETUAL'}},
+            'BTC/USDT': {'spot': True, 'quote': 'USDT', 'active': True, 'info': {}},
+        }
+        self.scanner.exchange = FakeAsyncExchange({
+            ('BTC/USDT:USDT', '4h'): trending_bars(4 * HOUR_MS, 30, 0.01),
+            ('BTC/USDT:USDT', '1h'): trending_bars(HOUR_MS, 60, 0.01),
+            ('ETH/USDT:USDT', '4h'): trending_bars(4 * HOUR_MS, 30, 0.01),
+            ('ETH/USDT:USDT', '1h'): trending_bars(HOUR_MS, 60, -0.01),
+        })
+
+    def test_universe_and_symbol_resolution(self):
+        """默认扫描全部U本位永续合约；BTC/USDT 写法映射为合约交易对"""
+        self.assertEqual(self.scanner.usdt_perpetuals(), ['BTC/USDT:USDT', 'ETH/USDT:USDT'])
+        self.assertEqual(self.scanner.resolve_symbol('ETH/USDT'), 'ETH/USDT:USDT')
+        self.assertIsNone(self.scanner.resolve_symbol('DOGE/USDT'))
+
+    def test_scan_computes_quadrants(self):
+        """扫描结果按交易对给出最新DMR与四象限状态，无法解析或无数据的交易对记为错误"""
+        result = asyncio.run(self.scanner.scan(['BTC/USDT', 'ETH/USDT', 'DOGE/USDT']))
+        self.assertEqual(list(result['symbols']), ['BTC/USDT:USDT', 'ETH/USDT:USDT'])
+        np.testing.assert_array_equal(result['quadrant'], [QUADRANT_T1, QUADRANT_R1])
+        self.assertAlmostEqual(result['dmr_long'][0], 0.01)
+        self.assertIn('DOGE/USDT', self.scanner.errors)
+        self.assertEqual({request[2] for request in self.scanner.exchange.requests},
+                         {self.scanner.config['kline_limit']})
+
+
+class TestWriteSummary(unittest.TestCase):
+    """汇总CSV测试类"""
+
+    def test_columns_match_legacy_csv(self):
+        """汇总CSV列与旧版一致，DMR数据不足的交易对不写出"""
+        result = {
+            'symbols': np.array(['BTC/USDT:USDT', 'ETH/USDT:USDT', 'NEW/USDT:USDT'], dtype=object),
+            'quadrant': np.array([QUADRANT_T1, QUADRANT_R1, QUADRANT_UNKNOWN], dtype=np.int8),
+            'dmr_long': np.array([0.02, 0.01, np.nan]),
+            'dmr_long_prev': np.array([-0.01, 0.01, np.nan]),
+            'dmr_short': np.array([0.03, -0.02, np.nan]),
+            'dmr_short_prev': np.array([0.01, 0.01, np.nan]),
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'summary.csv')
+            counts = write_summary(path, result)
+            with open(path, newline='', encoding='utf-8') as f:
+                rows = list(csv.reader(f))
+
+        self.assertEqual(rows[0], LEGACY_COLUMNS)
+        self.assertEqual(rows[1:], [
+            ['BTC/USDT:USDT', 'T1', '多头趋势行情', '浮盈加仓 双多', '0.02', '0.03', '负转正', '持续为正', '200'],
+            ['ETH/USDT:USDT', 'R1', '高位震荡行情', '对冲行情 锁空', '0.01', '-0.02', '持续为正', '正转负', '50'],
+        ])
+        self.assertEqual(counts, {'T1': 1, 'R1': 1, 'UNKNOWN': 1})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,70 @@
+"""
+批量平仓订单腿测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution.order_executor import OrderExecutor
+
+
+class FakeExchange:
+    def amount_to_precision(self, symbol, amount):
+        return f"{amount:.3f}"
+
+    def price_to_precision(self, symbol, price):
+        return f"{price:.1f}"
+
+
+def make_order_executor():
+    """不连接交易所的 OrderExecutor：只用到平仓腿构造与批量参数转换"""
+    executor = OrderExecutor.__new__(OrderExecutor)
+    executor.exchange = FakeExchange()
+    return executor
+
+
+class TestBuildCloseLegs(unittest.TestCase):
+    """批量平仓订单腿测试类"""
+
+    def setUp(self):
+        self.executor = make_order_executor()
+
+    def test_hedge_mode_side_read_from_info(self):
+        """ccxt 统一格式不带 positionSide 时从 info 读取，双向持仓的平仓腿带 positionSide 且不传 reduceOnly"""
+        positions = [
+            {'symbol': 'BTC/USDT:USDT', 'contracts': 0.02, 'side': 'long', 'info': {'positionSide': 'LONG'}},
+            {'symbol': 'BTC/USDT:USDT', 'contracts': 0.01, 'side': 'short', 'info': {'positionSide': 'SHORT'}},
+            {'symbol': 'ETH/USDT:USDT', 'contracts': 0, 'side': 'long', 'info': {'positionSide': 'LONG'}},
+        ]
+        legs = self.executor.build_close_legs(positions)
+        self.assertEqual([(leg['symbol'], leg['side'], leg['positionSide'], leg['amount']) for leg in legs],
+                         [('BTC/USDT', 'SELL', 'LONG', 0.02), ('BTC/USDT', 'BUY', 'SHORT', 0.01)])
+        payload = self.executor._batch_order_payload(legs[0])
+        self.assertEqual(payload, {'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'MARKET', 'quantity': '0.020',
+                                   'positionSide': 'LONG'})
+
+    def test_filters_requested_sides(self):
+        """只生成指定方向的平仓腿"""
+        positions = [
+            {'symbol': 'BTC/USDT:USDT', 'contracts': 0.02, 'side': 'long', 'info': {'positionSide': 'LONG'}},
+            {'symbol': 'BTC/USDT:USDT', 'contracts': 0.01, 'side': 'short', 'info': {'positionSide': 'SHORT'}},
+        ]
+        legs = self.executor.build_close_legs(positions, position_sides=('SHORT',))
+        self.assertEqual([leg['positionSide'] for leg in legs], ['SHORT'])
+
+    def test_one_way_mode_uses_reduce_only(self):
+        """单向持仓（positionSide 为 BOTH）按 side 判断方向，批量参数用 reduceOnly"""
+        positions = [{'symbol': 'BTC/USDT:USDT', 'contracts': 0.03, 'side': 'short', 'info': {'positionSide': 'BOTH'}}]
+        legs = self.executor.build_close_legs(positions)
+        self.assertEqual(len(legs), 1)
+        self.assertEqual((legs[0]['side'], legs[0]['positionSide']), ('BUY', None))
+        payload = self.executor._batch_order_payload(legs[0])
+        self.assertEqual(payload['reduceOnly'], 'true')
+        self.assertNotIn('positionSide', payload)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,198 @@
+"""
+订单生命周期管理测试
+"""
+import unittest
+import sys
+import os
+
+import ccxt
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.pnl_engine import PnLEngine
+from common.state_store import StateStore
+from data.price_cache import price_cache
+from execution.order_lifecycle import OrderLifecycleManager, FILLED, CANCELED
+
+
+class FakeExchange:
+    """记录撤单与下单请求的交易所"""
+
+    def __init__(self):
+        self.open_ids = set()
+        self.canceled = []
+        self.created = []
+        # 客户端订单ID -> 已接受的订单；timeouts > 0 时订单已被接受但下单请求超时
+        self.by_client_id = {}
+        self.timeouts = 0
+
+    def fetch_open_orders(self, symbol, params=None):
+        return [{'id': order_id, 'status': 'open', 'filled': 0.0} for order_id in self.open_ids]
+
+    def fetch_order(self, order_id, symbol, params=None):
+        if params and 'origClientOrderId' in params:
+            order = self.by_client_id.get(params['origClientOrderId'])
+            if order is None:
+                raise ccxt.OrderNotFound('Order does not exist.')
+            return order
+        return {'id': order_id, 'status': 'closed', 'filled': 1.0, 'average': 99.5}
+
+    def cancel_order(self, order_id, symbol, params=None):
+        self.open_ids.discard(order_id)
+        self.canceled.append(order_id)
+        return {'id': order_id, 'status': 'canceled', 'filled': 0.4 if order_id == '1' else 0.0}
+
+    def create_order(self, symbol, order_type, side, amount, price=None, params=None):
+        order = {'id': f"r{len(self.created) + 1}", 'status': 'open', 'filled': 0.0,
+                 'clientOrderId': params.get('newClientOrderId')}
+        self.open_ids.add(order['id'])
+        self.created.append((order_type, side, amount, price, params.get('positionSide')))
+        self.by_client_id[order['clientOrderId']] = order
+        if self.timeouts:
+            self.timeouts -= 1
+            raise ccxt.RequestTimeout('binance POST https://fapi.binance.com/fapi/v1/order timed out')
+        return order
+
+
+def trade_update(order_id, status, filled, price):
+    return {'e': 'ORDER_TRADE_UPDATE', 'o': {'i': order_id, 'X': status, 'z': str(filled), 'ap': str(price)}}
+
+
+class TestOrderLifecycle(unittest.TestCase):
+    """订单生命周期管理测试类"""
+
+    def setUp(self):
+        self.exchange = FakeExchange()
+        self.fills = []
+        self.done = []
+        self.manager = OrderLifecycleManager(self.exchange, config={'order_timeout': 1000, 'max_reprices': 1})
+
+    def track(self, order_id='1'):
+        self.exchange.open_ids.add(order_id)
+        return self.manager.track(
+            {'id': order_id, 'status': 'open', 'filled': 0.0}, 'BTC/USDT', 'BUY', 1.0, price=100.0,
+            position_side='LONG', on_fill=lambda o, qty, px: self.fills.append((qty, px)),
+            on_done=lambda o: self.done.append(o.order_id)
+        )
+
+    def test_stream_fills_before_and_after_tracking(self):
+        """成交推送按累计数量拆分为增量，早于下单返回的推送也不会丢失"""
+        self.manager.on_stream_event(trade_update(7, 'PARTIALLY_FILLED', 0.25, 100.0))
+        order = self.track('7')
+        self.manager.on_stream_event(trade_update(7, 'FILLED', 1.0, 100.5))
+
+        self.assertEqual(order.state, FILLED)
+        self.assertEqual(self.fills, [(0.25, 100.0), (0.75, 100.5)])
+        self.assertEqual(self.done, ['7'])
+
+    def test_timeout_reprices_remaining_then_falls_back_to_market(self):
+        """超时撤单后按最新价重挂剩余数量，超过重挂次数后转市价"""
+        price_cache.update('BTC/USDT', 101.0)
+        order = self.track()
+        order.deadline = 0
+        self.manager.check()
+
+        self.assertEqual(order.state, CANCELED)
+        self.assertEqual(self.fills, [(0.4, 100.0)])
+        self.assertEqual(self.exchange.created[0], ('limit', 'buy', 0.6, 101.0, 'LONG'))
+        # 原订单被重挂，不触发终态回调
+        self.assertEqual(self.done, [])
+
+        replacement = self.manager.orders[order.replaced_by]
+        replacement.deadline = 0
+        self.manager.check()
+        self.assertEqual(self.exchange.created[1][0], 'market')
+
+    def test_early_terminal_update_settles_on_track(self):
+        """全部成交推送早于下单返回：登记时直接进入终态，回调各触发一次"""
+        self.manager.on_stream_event(trade_update(9, 'FILLED', 1.0, 100.2))
+        order = self.track('9')
+
+        self.assertEqual(order.state, FILLED)
+        self.assertEqual(self.fills, [(1.0, 100.2)])
+        self.assertEqual(self.done, ['9'])
+        self.manager.on_stream_event(trade_update(9, 'FILLED', 1.0, 100.2))
+        self.assertEqual((len(self.fills), len(self.done)), (1, 1))
+
+    def test_repriced_chain_reports_done_once(self):
+        """重挂后的订单继承回调：成交累计到原订单之后，只有最终订单触发终态回调"""
+        price_cache.update('BTC/USDT', 101.0)
+        order = self.track()
+        order.deadline = 0
+        self.manager.check()
+        replacement = self.manager.orders[order.replaced_by]
+        self.assertEqual((replacement.amount, replacement.price, replacement.reprice_count), (0.6, 101.0, 1))
+
+        self.manager.on_stream_event(trade_update(replacement.order_id, 'FILLED', 0.6, 101.0))
+        self.assertEqual(self.fills, [(0.4, 100.0), (0.6, 101.0)])
+        self.assertEqual(self.done, [replacement.order_id])
+
+    def test_replacement_is_idempotent_and_keeps_attribution(self):
+        """重挂订单按原客户端订单ID派生的ID提交：超时后按ID查到已接受的订单，不重复下单；盈亏归属随之登记"""
+        price_cache.update('BTC/USDT', 101.0)
+        pnl_engine = PnLEngine()
+        pnl_engine.register_order('c1', 'DMRQuadrant', 'Long_4H_T1')
+        self.manager.attach_pnl_engine(pnl_engine)
+        self.exchange.open_ids.add('1')
+        order = self.manager.track({'id': '1', 'clientOrderId': 'c1', 'status': 'open', 'filled': 0.0},
+                                   'BTC/USDT', 'BUY', 1.0, price=100.0, position_side='LONG')
+        self.exchange.timeouts = 1
+        order.deadline = 0
+        self.manager.check()
+
+        self.assertEqual(len(self.exchange.created), 1)
+        replacement = self.manager.orders[order.replaced_by]
+        self.assertEqual(replacement.order_id, 'r1')
+        self.assertNotEqual(replacement.client_order_id, 'c1')
+        self.assertEqual(pnl_engine.registered[replacement.client_order_id], ('DMRQuadrant', 'Long_4H_T1'))
+
+    def test_cancel_action_does_not_replace(self):
+        """超时处理为仅撤单时不重挂，原订单触发终态回调"""
+        self.manager.config['timeout_action'] = 'cancel'
+        order = self.track()
+        order.deadline = 0
+        self.manager.check()
+
+        self.assertEqual(order.state, CANCELED)
+        self.assertEqual(self.exchange.created, [])
+        self.assertEqual(self.done, ['1'])
+
+    def test_cancel_follows_replacement(self):
+        """撤销已被重挂的订单时撤销当前生效的替换订单"""
+        price_cache.update('BTC/USDT', 101.0)
+        order = self.track()
+        order.deadline = 0
+        self.manager.check()
+
+        self.assertTrue(self.manager.cancel('1'))
+        self.assertEqual(self.exchange.canceled, ['1', order.replaced_by])
+        self.assertFalse(self.manager.cancel('1'))
+
+    def test_poll_without_stream_fetches_final_state(self):
+        """没有数据流时轮询补齐已不在挂单列表中的订单状态"""
+        order = self.track()
+        self.exchange.open_ids.clear()
+        self.manager.check()
+
+        self.assertEqual(order.state, FILLED)
+        self.assertEqual(self.fills, [(1.0, 99.5)])
+        self.assertEqual(self.done, ['1'])
+
+    def test_orders_and_fills_written_to_state_store(self):
+        """跟踪的订单与每次新增成交写入状态存储，终态后不再是未结束订单"""
+        store = StateStore(':memory:')
+        self.manager.attach_state_store(store, default_strategy='DMRQuadrant')
+        self.track('5')
+        self.assertEqual([order['order_id'] for order in store.open_orders('DMRQuadrant')], ['5'])
+
+        self.manager.on_stream_event(trade_update(5, 'PARTIALLY_FILLED', 0.25, 100.0))
+        self.manager.on_stream_event(trade_update(5, 'FILLED', 1.0, 100.5))
+        fills = store.fills(strategy='DMRQuadrant')
+        self.assertEqual([(fill['order_id'], fill['side'], fill['quantity']) for fill in fills],
+                         [('5', 'buy', 0.25), ('5', 'buy', 0.75)])
+        self.assertEqual(store.open_orders(), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+"""
+增量绩效累加器测试
+"""
+import unittest
+import statistics
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.performance_accumulator import PerformanceAccumulator
+
+
+RETURNS = [0.05, -0.02, 0.03, -0.08, 0.01, 0.04, -0.01]
+
+
+def full_max_drawdown(returns):
+    """按全部收益率重算的最大回撤（PerformanceMonitor 原口径）"""
+    equity, peak, worst = 1.0, None, 0.0
+    for value in returns:
+        equity *= 1 + value
+        peak = equity if peak is None else max(peak, equity)
+        worst = min(worst, equity / peak - 1)
+    return worst
+
+
+class TestPerformanceAccumulator(unittest.TestCase):
+    """绩效累加器测试类"""
+
+    def setUp(self):
+        self.accumulator = PerformanceAccumulator()
+        for value in RETURNS:
+            self.accumulator.add(value)
+
+    def test_matches_full_recalculation(self):
+        """均值、样本标准差、夏普比率与最大回撤与全量重算一致"""
+        self.assertAlmostEqual(self.accumulator.mean, statistics.mean(RETURNS))
+        self.assertAlmostEqual(self.accumulator.std, statistics.stdev(RETURNS))
+        expected_sharpe = (statistics.mean(RETURNS) - 0.02) / statistics.stdev(RETURNS)
+        self.assertAlmostEqual(self.accumulator.sharpe_ratio(0.02), expected_sharpe)
+        self.assertAlmostEqual(self.accumulator.max_drawdown, full_max_drawdown(RETURNS))
+
+    def test_win_loss_and_profit_factor(self):
+        """盈亏笔数与盈亏因子"""
+        metrics = self.accumulator.metrics()
+        self.assertEqual((metrics['wins'], metrics['losses']), (4, 3))
+        self.assertAlmostEqual(metrics['profit_factor'], 0.13 / 0.11)
+        self.assertIsNone(PerformanceAccumulator().profit_factor)
+
+    def test_snapshot_restore_continues(self):
+        """从快照恢复后继续累计，结果与不中断时一致"""
+        restored = PerformanceAccumulator.restore(self.accumulator.snapshot())
+        for accumulator in (self.accumulator, restored):
+            accumulator.add(-0.03, pnl=-3.0)
+        self.assertEqual(restored.snapshot(), self.accumulator.snapshot())
+        self.assertAlmostEqual(restored.max_drawdown, full_max_drawdown(RETURNS + [-0.03]))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
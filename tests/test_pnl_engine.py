@@ -0,0 +1,109 @@
+"""
+实时盈亏引擎测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.pnl_engine import PnLEngine, DAY_MS
+
+
+class FakeStream:
+    def __init__(self):
+        self.subscribers = {}
+
+    def subscribe(self, event_type, callback):
+        self.subscribers.setdefault(event_type, []).append(callback)
+
+    def trade(self, order_id, side, quantity, price, fee=0.0):
+        event = {'e': 'ORDER_TRADE_UPDATE', 'o': {'s': 'BTC/USDT', 'i': order_id, 'c': f'c{order_id}', 'x': 'TRADE',
+                                                  'S': side, 'l': str(quantity), 'L': str(price), 'n': str(fee),
+                                                  'N': 'USDT'}}
+        for callback in self.subscribers['ORDER_TRADE_UPDATE']:
+            callback(event)
+
+
+class TestPnLEngine(unittest.TestCase):
+    """盈亏引擎测试类"""
+
+    def setUp(self):
+        self.now = 10 * DAY_MS + 1000
+        self.engine = PnLEngine(clock=lambda: self.now)
+
+    def test_realized_unrealized_and_fees(self):
+        """开仓、部分平仓后已实现/未实现盈亏与手续费"""
+        self.engine.on_fill('LongTerm', 'BTC/USDT', 'buy', 2, 100.0, fee=0.2)
+        self.engine.on_mark('BTC/USDT', 110.0)
+        self.assertAlmostEqual(self.engine.get_pnl(strategy='LongTerm')['unrealized'], 20.0)
+
+        self.engine.on_fill('LongTerm', 'BTC/USDT', 'sell', 1, 120.0, fee=0.1)
+        pnl = self.engine.get_pnl(strategy='LongTerm')
+        self.assertAlmostEqual(pnl['realized'], 20.0)
+        self.assertAlmostEqual(pnl['fees'], 0.3)
+        self.assertAlmostEqual(pnl['unrealized'], 10.0)
+        self.assertAlmostEqual(pnl['total'], 29.7)
+        self.assertAlmostEqual(self.engine.get_pnl(symbol='BTC/USDT')['total'], 29.7)
+
+    def test_daily_reset_on_utc_boundary(self):
+        """跨 UTC 日界后当日盈亏从零开始，累计盈亏不变"""
+        self.engine.on_fill('ShortTerm', 'BTC/USDT', 'sell', 1, 100.0)
+        self.engine.on_mark('BTC/USDT', 90.0)
+        self.assertAlmostEqual(self.engine.get_pnl(strategy='ShortTerm')['daily'], 10.0)
+
+        self.now += DAY_MS
+        self.engine.on_mark('BTC/USDT', 95.0)
+        pnl = self.engine.get_pnl(strategy='ShortTerm')
+        self.assertAlmostEqual(pnl['daily'], -5.0)
+        self.assertAlmostEqual(pnl['total'], 5.0)
+
+    def test_stream_fills_attributed_to_slots(self):
+        """推送的成交按登记归属槽位，先到的成交等待登记；未指定槽位的平仓按开仓先后扣减槽位"""
+        stream = FakeStream()
+        self.engine.attach_stream(stream)
+        stream.trade(1, 'BUY', 1, 100.0)
+        self.assertEqual(self.engine.fill_count, 0)
+        self.engine.register_order('c1', 'DMRQuadrant', 'Long_4H_T1')
+        self.assertEqual(self.engine.fill_count, 1)
+        self.engine.register_order('c2', 'DMRQuadrant', 'Long_1H_T1')
+        stream.trade(2, 'BUY', 1, 110.0)
+
+        self.engine.on_fill('DMRQuadrant', 'BTC/USDT', 'sell', 1.5, 120.0)
+        self.assertAlmostEqual(self.engine.get_pnl('DMRQuadrant', 'Long_4H_T1')['realized'], 20.0)
+        self.assertAlmostEqual(self.engine.get_pnl('DMRQuadrant', 'Long_1H_T1')['realized'], 5.0)
+        self.assertAlmostEqual(self.engine.get_pnl(strategy='DMRQuadrant')['realized'], 25.0)
+
+    def test_shared_order_split_by_allocations(self):
+        """多个槽位共用的订单按分配顺序拆分成交与手续费，先到的成交等待登记"""
+        stream = FakeStream()
+        self.engine.attach_stream(stream)
+        stream.trade(3, 'BUY', 1.5, 100.0, fee=0.3)
+        self.engine.register_allocations('c3', [('DMRQuadrant', 'Long_4H_T1', 1.0),
+                                                ('DMRQuadrant', 'Long_1H_T1', 1.0)])
+        stream.trade(3, 'BUY', 0.5, 110.0, fee=0.1)
+
+        self.assertEqual(self.engine.positions[('DMRQuadrant', 'Long_4H_T1', 'BTC/USDT')], [1.0, 100.0])
+        self.assertEqual(self.engine.positions[('DMRQuadrant', 'Long_1H_T1', 'BTC/USDT')], [1.0, 105.0])
+        self.assertAlmostEqual(self.engine.get_pnl('DMRQuadrant', 'Long_4H_T1')['fees'], 0.2)
+        self.assertAlmostEqual(self.engine.get_pnl('DMRQuadrant', 'Long_1H_T1')['fees'], 0.2)
+        self.assertNotIn(('DMRQuadrant', 'Long_4H_T1+Long_1H_T1', 'BTC/USDT'), self.engine.positions)
+
+    def test_registered_close_realizes_on_its_slot(self):
+        """按分配登记的减仓只平被平的槽位，不按开仓先后扣减更早的槽位"""
+        engine = PnLEngine(clock=lambda: self.now, default_strategy='DMRQuadrant')
+        stream = FakeStream()
+        engine.attach_stream(stream)
+        engine.on_fill('DMRQuadrant', 'BTC/USDT', 'buy', 1.0, 100.0, slot='Long_4H_T1')
+        engine.on_fill('DMRQuadrant', 'BTC/USDT', 'buy', 1.0, 110.0, slot='Long_1H_R2')
+        engine.register_allocations('c4', [('DMRQuadrant', 'Long_1H_R2', 1.0)])
+        stream.trade(4, 'SELL', 1.0, 120.0)
+
+        self.assertAlmostEqual(engine.get_pnl('DMRQuadrant', 'Long_1H_R2')['realized'], 10.0)
+        self.assertAlmostEqual(engine.get_pnl('DMRQuadrant', 'Long_4H_T1')['realized'], 0.0)
+        self.assertEqual(engine.positions[('DMRQuadrant', 'Long_4H_T1', 'BTC/USDT')], [1.0, 100.0])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
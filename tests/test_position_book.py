@@ -0,0 +1,84 @@
+"""
+紧凑持仓簿测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.position_book import PositionBook
+from common.position_manager import UnifiedPositionManager
+from common.risk_controller import RiskController
+
+
+class TestPositionBook(unittest.TestCase):
+    """持仓簿测试类"""
+
+    def setUp(self):
+        self.book = PositionBook(capacity=2)
+
+    def test_apply_open_add_reduce_close(self):
+        """加仓按加权均价并计次，减仓不低于0，平仓清空"""
+        self.book.apply('long_term', 'BTC/USDT', 'LONG', 20.0, 100.0, 'open')
+        self.book.apply('long_term', 'BTC/USDT', 'LONG', 20.0, 110.0, 'add')
+        self.assertEqual(self.book.get('long_term', 'BTC/USDT', 'LONG'),
+                         {'amount': 40.0, 'entry_price': 105.0, 'add_times': 1})
+        self.book.apply('long_term', 'BTC/USDT', 'LONG', 50.0, 120.0, 'reduce')
+        self.assertEqual(self.book.get('long_term', 'BTC/USDT', 'LONG')['amount'], 0.0)
+        self.book.apply('long_term', 'BTC/USDT', 'LONG', 0.0, 0.0, 'close')
+        self.assertEqual(self.book.get('long_term', 'BTC/USDT', 'LONG'),
+                         {'amount': 0.0, 'entry_price': 0.0, 'add_times': 0})
+        with self.assertRaises(ValueError):
+            self.book.apply('long_term', 'BTC/USDT', 'LONG', 1.0, 100.0, 'flip')
+
+    def test_exposure_across_symbols(self):
+        """总/净敞口及按交易对、按策略的金额；超过初始容量时自动扩容"""
+        self.book.set_position('long_term', 'BTC/USDT', 'LONG', 30.0, 100.0)
+        self.book.set_position('short_term', 'BTC/USDT', 'SHORT', 20.0, 100.0)
+        self.book.set_position('short_term', 'ETH/USDT', 'SHORT', 10.0, 10.0)
+        self.assertEqual(self.book.gross_exposure(), 60.0)
+        self.assertEqual(self.book.net_exposure(), 0.0)
+        self.assertEqual(self.book.net_exposure('BTC/USDT'), 10.0)
+        self.assertEqual(self.book.exposure_by_symbol(), {'BTC/USDT': (30.0, 20.0), 'ETH/USDT': (0.0, 10.0)})
+        self.assertEqual(self.book.exposure_by_strategy(), {'long_term': 30.0, 'short_term': 30.0})
+        self.assertEqual(len(self.book), 3)
+
+    def test_hedge_imbalance_sorted_by_ratio(self):
+        """只有多空两侧都有持仓的交易对参与，超过阈值的按不平衡率从高到低"""
+        self.book.set_position('a', 'BTC/USDT', 'LONG', 30.0, 100.0)
+        self.book.set_position('b', 'BTC/USDT', 'SHORT', 20.0, 100.0)
+        self.book.set_position('a', 'ETH/USDT', 'LONG', 40.0, 10.0)
+        self.book.set_position('b', 'ETH/USDT', 'SHORT', 10.0, 10.0)
+        self.book.set_position('a', 'SOL/USDT', 'LONG', 40.0, 1.0)
+        violations = self.book.hedge_imbalances(0.1)
+        self.assertEqual([violation['symbol'] for violation in violations], ['ETH/USDT', 'BTC/USDT'])
+        self.assertAlmostEqual(violations[0]['imbalance_ratio'], 0.75)
+
+    def test_add_overflows_rows(self):
+        """加仓溢出以数组返回，describe 解码名称；平仓的行不计入"""
+        self.book.set_position('a', 'BTC/USDT', 'LONG', 30.0, 100.0, add_times=2, max_add_times=1)
+        self.book.set_position('b', 'BTC/USDT', 'SHORT', 0.0, 0.0, add_times=3, max_add_times=1)
+        self.book.set_position('b', 'ETH/USDT', 'SHORT', 10.0, 10.0, add_times=1, max_add_times=1)
+        overflows = self.book.add_overflows()
+        self.assertEqual(len(overflows), 1)
+        self.assertEqual(self.book.describe(overflows[0]),
+                         {'strategy': 'a', 'symbol': 'BTC/USDT', 'side': 'LONG', 'amount': 30.0,
+                          'current_times': 2, 'max_add_times': 1})
+
+    def test_mirrors_position_manager_for_risk_controller(self):
+        """镜像统一持仓管理器的持仓，风控控制器经持仓簿检测对冲不平衡"""
+        manager = UnifiedPositionManager()
+        self.book.attach_position_manager(manager, 'BTC/USDT')
+        controller = RiskController(manager, None)
+        controller.attach_position_book(self.book)
+        manager.update_position('long_term', 'LONG', 40.0, 100.0, 'open')
+        manager.update_position('short_term', 'SHORT', 10.0, 100.0, 'open')
+        self.assertEqual(self.book.exposure_by_symbol(), {'BTC/USDT': (40.0, 10.0)})
+        self.assertEqual(controller.detect_hedge_imbalance()['data']['symbol'], 'BTC/USDT')
+        self.assertIsNone(controller.detect_add_overflow())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,90 @@
+"""
+持仓缓存测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.position_cache import PositionCache
+
+
+class FakeExchange:
+    def __init__(self):
+        self.fetch_count = 0
+        self.contracts = 0.0
+
+    def fetch_positions(self, symbols=None, params=None):
+        self.fetch_count += 1
+        return [{'symbol': 'BTC/USDT:USDT', 'contracts': self.contracts, 'side': 'long',
+                 'info': {'positionSide': 'LONG'}}]
+
+    def safe_symbol(self, market_id, market=None, delimiter=None, market_type=None):
+        return {'BTCUSDT': 'BTC/USDT:USDT'}.get(market_id, market_id)
+
+
+class FakeStream:
+    def __init__(self):
+        self.reconnect_count = 0
+        self.subscribers = {}
+
+    def subscribe(self, event_type, callback):
+        self.subscribers.setdefault(event_type, []).append(callback)
+
+    def is_healthy(self):
+        return True
+
+    def push(self, amount):
+        event = {'e': 'ACCOUNT_UPDATE', 'a': {
+            'B': [{'a': 'USDT', 'wb': '1000', 'cw': '900'}],
+            'P': [{'s': 'BTCUSDT', 'pa': str(amount), 'ep': '100', 'up': '0', 'ps': 'LONG'}],
+        }}
+        for callback in self.subscribers['ACCOUNT_UPDATE']:
+            callback(event)
+
+
+class TestPositionCache(unittest.TestCase):
+    """持仓缓存测试类"""
+
+    def setUp(self):
+        self.exchange = FakeExchange()
+        self.stream = FakeStream()
+        self.cache = PositionCache(self.exchange, config={'stream_wait_seconds': 0.01})
+        self.cache.attach_stream(self.stream)
+
+    def test_stream_updates_served_from_memory(self):
+        """首次读取后，账户推送直接更新持仓，读取不再请求交易所"""
+        self.assertEqual(self.cache.get_positions('BTC/USDT')[0]['contracts'], 0.0)
+        self.stream.push(0.5)
+        position = self.cache.get_positions('BTC/USDT')[0]
+        self.assertEqual((position['contracts'], position['positionSide']), (0.5, 'LONG'))
+        self.assertEqual(self.cache.get_positions('BTC/USDT:USDT')[0]['contracts'], 0.5)
+        self.assertEqual(self.exchange.fetch_count, 1)
+        self.assertEqual(self.cache.balances['USDT']['total'], 1000.0)
+
+    def test_invalidate_waits_for_push_then_falls_back_to_rest(self):
+        """下单后读取等待推送；推送已到则不请求交易所，超时则回退到 REST"""
+        self.cache.get_positions('BTC/USDT')
+        self.cache.invalidate('BTC/USDT')
+        self.stream.push(0.2)
+        self.assertEqual(self.cache.get_positions('BTC/USDT')[0]['contracts'], 0.2)
+        self.assertEqual(self.exchange.fetch_count, 1)
+
+        self.cache.invalidate('BTC/USDT')
+        self.exchange.contracts = 0.3
+        self.assertEqual(self.cache.get_positions('BTC/USDT')[0]['contracts'], 0.3)
+        self.assertEqual(self.exchange.fetch_count, 2)
+
+    def test_reconnect_triggers_resync(self):
+        """数据流重连后重新拉取一次持仓"""
+        self.cache.get_positions('BTC/USDT')
+        self.stream.reconnect_count += 1
+        self.cache.get_positions('BTC/USDT')
+        self.cache.get_positions('BTC/USDT')
+        self.assertEqual(self.exchange.fetch_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+"""
+下单前快速检查测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.pnl_engine import DAY_MS
+from common.position_manager import UnifiedPositionManager
+from common.pre_trade_gate import PreTradeGate
+from common.trading_validator import TradingValidator
+
+
+class TestPreTradeGate(unittest.TestCase):
+    """下单前检查测试类"""
+
+    def setUp(self):
+        self.manager = UnifiedPositionManager()
+        self.gate = PreTradeGate(self.manager)
+
+    def test_add_requires_profit_and_count(self):
+        """加仓需浮盈达到阈值且未超过次数"""
+        self.manager.update_position('long_term', 'LONG', 20.0, 100.0, 'open')
+        self.assertEqual(self.gate.check('long_term', 'add_position', 20.0, 100.5, now=0).check, 'add_profit')
+        self.assertTrue(self.gate.check('long_term', 'add_position', 20.0, 101.0, now=0))
+        self.manager.update_position('long_term', 'LONG', 20.0, 101.0, 'add')
+        self.assertEqual(self.gate.check('long_term', 'add_position', 20.0, 110.0, now=0).check, 'max_add_times')
+
+    def test_interval_daily_trades_and_close(self):
+        """最小下单间隔与当日成交次数限制开仓，平仓不受限制"""
+        self.gate.record_order('short_term', now=100.0)
+        self.assertEqual(self.gate.check('short_term', 'open_short', 20.0, 100.0, now=110.0).check,
+                         'min_order_interval')
+        self.assertTrue(self.gate.check('short_term', 'open_short', 20.0, 100.0, now=131.0))
+        self.gate.daily_trades = self.gate.max_daily_trades
+        self.assertEqual(self.gate.check('long_term', 'open_long', 20.0, 100.0, now=0).check, 'max_daily_trades')
+        self.assertTrue(self.gate.check('long_term', 'close', 20.0, 100.0, now=0))
+
+    def test_hedge_tolerance(self):
+        """对冲状态下加仓后多空不等额被拒绝"""
+        self.manager.update_position('long_term', 'LONG', 20.0, 100.0, 'open')
+        self.manager.update_position('short_term', 'SHORT', 20.0, 100.0, 'open')
+        verdict = self.gate.check('long_term', 'add_position', 20.0, 102.0, now=0)
+        self.assertFalse(verdict.allowed)
+        self.assertEqual(verdict.check, 'hedge_tolerance')
+
+    def test_daily_trades_reset_on_utc_boundary(self):
+        """当日成交次数在服务器时间跨过 UTC 日界时重置"""
+        server_time = [DAY_MS * 10 + 1000]
+        gate = PreTradeGate(self.manager, day_clock=lambda: server_time[0])
+        for _ in range(gate.max_daily_trades):
+            gate.record_order('long_term', now=0)
+        self.assertEqual(gate.check('long_term', 'open_long', 20.0, 100.0, now=1000).check, 'max_daily_trades')
+        server_time[0] = DAY_MS * 11
+        self.assertTrue(gate.check('long_term', 'open_long', 20.0, 100.0, now=1000))
+        self.assertEqual(gate.daily_trades, 0)
+
+    def test_reversing_open_ignores_previous_side(self):
+        """反手开仓时原方向持仓不计入持仓上限"""
+        self.manager.update_position('long_term', 'LONG', self.gate.max_position, 100.0, 'open')
+        self.assertEqual(self.gate.check('long_term', 'open_long', 20.0, 100.0, now=0).check, 'max_position')
+        self.assertTrue(self.gate.check('long_term', 'open_short', 20.0, 100.0, now=0))
+
+    def test_validator_records_orders_to_gate(self):
+        """交易验证器经挂载的下单前检查拒绝信号，并把成功的下单登记到检查中"""
+        validator = TradingValidator(None, self.manager, pre_trade_gate=self.gate)
+        signal = {'action': 'open_long', 'side': 'long', 'amount': 20.0}
+        self.assertTrue(validator.pre_trade_validation('long_term', signal, 100.0))
+        validator.record_order('long_term')
+        self.assertEqual(self.gate.daily_trades, 1)
+        verdict = validator.pre_trade_validation('long_term', signal, 100.0)
+        self.assertFalse(verdict)
+        self.assertEqual(verdict.check, 'min_order_interval')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
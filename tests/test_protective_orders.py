@@ -0,0 +1,108 @@
+"""
+交易所端保护单测试
+"""
+import unittest
+import sys
+import os
+
+import ccxt
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.pnl_engine import PnLEngine
+from execution.protective_orders import ProtectiveOrderManager
+
+
+class FakeExchange:
+    """按客户端订单ID保存挂单，同ID订单仍在挂单中时返回 -4116"""
+
+    def __init__(self):
+        self.open_orders = {}
+        self.created = 0
+        # 下一次挂单失败的订单类型
+        self.fail_types = set()
+
+    def amount_to_precision(self, symbol, amount):
+        return f"{amount:.3f}"
+
+    def price_to_precision(self, symbol, price):
+        return f"{price:.1f}"
+
+    def create_order(self, symbol, order_type, side, amount, price=None, params=None):
+        cid = params['newClientOrderId']
+        if order_type in self.fail_types:
+            self.fail_types.discard(order_type)
+            raise Exception('binance {"code":-2021,"msg":"Order would immediately trigger."}')
+        if cid in self.open_orders:
+            raise Exception('binance {"code":-4116,"msg":"ClientOrderId is duplicated."}')
+        self.created += 1
+        order = {'id': f"p{self.created}", 'clientOrderId': cid, 'status': 'open', 'type': order_type}
+        self.open_orders[cid] = order
+        return order
+
+    def fetch_order(self, order_id, symbol, params=None):
+        order = self.open_orders.get(params['origClientOrderId'])
+        if order is None:
+            raise ccxt.OrderNotFound('not found')
+        return order
+
+    def cancel_order(self, order_id, symbol, params=None):
+        for cid, order in list(self.open_orders.items()):
+            if order['id'] == order_id:
+                del self.open_orders[cid]
+
+
+class TestProtectiveOrders(unittest.TestCase):
+    """保护单测试类"""
+
+    def setUp(self):
+        self.exchange = FakeExchange()
+        self.positions = {'Long_4H_T1': {'status': 'filled', 'filled': 0.01, 'price': 100000.0}}
+
+    def test_restart_adopts_existing_orders(self):
+        """重启后同步同一槽位时认领交易所仍挂着的保护单，不重复挂单"""
+        ProtectiveOrderManager(self.exchange).sync_slots('DMRQuadrant', 'BTC/USDT', self.positions)
+        self.assertEqual(self.exchange.created, 2)
+        before = {order['id'] for order in self.exchange.open_orders.values()}
+
+        restarted = ProtectiveOrderManager(self.exchange)
+        restarted.sync_slots('DMRQuadrant', 'BTC/USDT', self.positions)
+        self.assertEqual(self.exchange.created, 2)
+        self.assertEqual(set(restarted.slots[('DMRQuadrant', 'Long_4H_T1')].order_ids.values()), before)
+
+    def test_changed_quantity_replaces_orders(self):
+        """槽位数量变化时挂新单并撤销旧单"""
+        manager = ProtectiveOrderManager(self.exchange)
+        manager.sync_slots('DMRQuadrant', 'BTC/USDT', self.positions)
+        self.positions['Long_4H_T1']['filled'] = 0.02
+        manager.sync_slots('DMRQuadrant', 'BTC/USDT', self.positions)
+        self.assertEqual(self.exchange.created, 4)
+        self.assertEqual(len(self.exchange.open_orders), 2)
+
+    def test_retry_after_failed_side_keeps_adopted_order(self):
+        """一侧挂单失败后重试：另一侧按同一ID认领回的现有保护单不被撤销"""
+        manager = ProtectiveOrderManager(self.exchange)
+        self.exchange.fail_types.add('TAKE_PROFIT_MARKET')
+        manager.sync_slots('DMRQuadrant', 'BTC/USDT', self.positions)
+        slot = manager.slots[('DMRQuadrant', 'Long_4H_T1')]
+        self.assertEqual(list(slot.order_ids), ['sl'])
+
+        manager.sync_slots('DMRQuadrant', 'BTC/USDT', self.positions)
+        open_ids = {order['id'] for order in self.exchange.open_orders.values()}
+        self.assertEqual(set(slot.order_ids.values()), open_ids)
+        self.assertEqual(len(open_ids), 2)
+        self.assertEqual(set(manager._orders), open_ids)
+
+    def test_client_ids_registered_to_slot(self):
+        """保护单的客户端订单ID登记到所属槽位，触发成交的盈亏记入该槽位"""
+        pnl_engine = PnLEngine()
+        manager = ProtectiveOrderManager(self.exchange)
+        manager.attach_pnl_engine(pnl_engine)
+        manager.sync_slots('DMRQuadrant', 'BTC/USDT', self.positions)
+        self.assertEqual(sorted(pnl_engine.registered), sorted(self.exchange.open_orders))
+        self.assertEqual(set(pnl_engine.registered.values()), {('DMRQuadrant', 'Long_4H_T1')})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
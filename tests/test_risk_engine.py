@@ -0,0 +1,75 @@
+"""
+事件驱动风控引擎测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.position_manager import UnifiedPositionManager
+from common.risk_controller import RiskController
+from common.pnl_engine import DAY_MS
+from common.risk_engine import RiskEngine
+from monitoring.metrics_registry import MetricsRegistry
+
+
+class TestRiskEngine(unittest.TestCase):
+    """风控引擎测试类"""
+
+    def setUp(self):
+        self.manager = UnifiedPositionManager()
+        self.controller = RiskController(self.manager, exchange=None)
+        self.registry = MetricsRegistry()
+        self.engine = RiskEngine(self.manager, controller=self.controller, registry=self.registry)
+
+    def test_hedge_imbalance_raised_on_position_event(self):
+        """持仓事件立即触发对冲不平衡检查，严重违规交给风控控制器"""
+        handled = []
+        self.controller.handle_anomalies = handled.extend
+        self.manager.update_position('long_term', 'LONG', 20.0, 100.0, 'open')
+        self.manager.update_position('short_term', 'SHORT', 10.0, 100.0, 'open')
+
+        self.assertEqual([a['type'] for a in handled], ['hedge_imbalance'])
+        self.assertAlmostEqual(self.engine.gross_exposure, 30.0)
+        # 持续违规不重复上报，恢复后清除
+        self.manager.update_position('short_term', 'SHORT', 10.0, 100.0, 'add')
+        self.assertEqual(len(handled), 1)
+        self.assertNotIn('hedge_imbalance', self.engine.active)
+
+    def test_price_event_updates_drawdown(self):
+        """价格事件增量更新未实现盈亏，超过最大回撤时紧急停止"""
+        self.manager.update_position('long_term', 'LONG', 20.0, 100.0, 'open')
+        self.engine.on_price(110.0)
+        self.assertAlmostEqual(self.engine.unrealized_pnl(), 2.0)
+        self.engine.on_price(70.0)
+        self.assertIn('drawdown', self.engine.active)
+        self.assertTrue(self.controller.emergency_stop_triggered)
+        self.assertGreater(self.registry.histogram('risk_check_seconds.drawdown').count, 0)
+
+    def test_add_overflow_repaired_and_cleared(self):
+        """加仓溢出由控制器自动修复后，引擎重新读取状态并清除违规"""
+        self.manager.update_position('long_term', 'LONG', 20.0, 100.0, 'open')
+        self.manager.update_position('long_term', 'LONG', 20.0, 101.0, 'add')
+        self.manager.update_position('long_term', 'LONG', 20.0, 102.0, 'add')
+        self.assertEqual(self.manager.strategies['long_term']['current_add_times'], 1)
+        self.assertEqual(self.engine.add_overflows, 0)
+        self.assertFalse(self.controller.emergency_stop_triggered)
+
+    def test_daily_reset_on_utc_boundary(self):
+        """跨过服务器时间的 UTC 日界后，日初权益取当前权益、当日成交次数清零"""
+        now = [3 * DAY_MS + 1000]
+        engine = RiskEngine(UnifiedPositionManager(), registry=self.registry, clock=lambda: now[0])
+        engine.on_fill(realized_pnl=-2.0)
+        self.assertEqual(engine.daily_trades, 1)
+        self.assertEqual(engine.daily_start_equity, engine.capital)
+
+        now[0] = 4 * DAY_MS + 5
+        engine.on_price(100.0)
+        self.assertEqual(engine.daily_trades, 0)
+        self.assertAlmostEqual(engine.daily_start_equity, engine.capital - 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
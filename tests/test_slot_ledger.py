@@ -0,0 +1,62 @@
+"""
+仓位槽账本测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strategy.slot_ledger import SlotLedger
+
+
+def held(quantity, price=100.0):
+    return {'status': 'filled', 'order': None, 'filled': quantity, 'price': price}
+
+
+class TestSlotLedger(unittest.TestCase):
+    """仓位槽账本测试类"""
+
+    def setUp(self):
+        self.positions = {'Long_4H_T1': None, 'Long_1H_T1': None, 'Short_1H_R1': None, 'Long_4H_R1': None}
+        self.ledger = SlotLedger(self.positions)
+
+    def test_same_leg_close_and_open_net_to_one_order(self):
+        """同一腿上平仓与开仓内部转移，只下净差额"""
+        self.positions['Long_4H_T1'] = held(0.3)
+        orders = self.ledger.net([('Long_4H_T1', 'close', None), ('Long_1H_T1', 'open', 0.5)], price=110.0)
+
+        self.assertEqual(len(orders), 1)
+        self.assertEqual((orders[0]['leg'], orders[0]['reduce']), ('LONG', False))
+        self.assertAlmostEqual(orders[0]['quantity'], 0.2)
+        self.assertIsNone(self.positions['Long_4H_T1'])
+        self.assertAlmostEqual(self.positions['Long_1H_T1']['filled'], 0.3)
+
+        self.ledger.allocate(orders[0], 0.2, 120.0)
+        self.assertAlmostEqual(self.positions['Long_1H_T1']['filled'], 0.5)
+        self.assertAlmostEqual(self.positions['Long_1H_T1']['price'], (0.3 * 110.0 + 0.2 * 120.0) / 0.5)
+
+    def test_partial_close_leaves_other_slots_on_the_leg(self):
+        """平仓只减掉所属槽位的数量"""
+        self.positions['Long_4H_T1'] = held(0.3)
+        self.positions['Long_4H_R1'] = held(0.4)
+        orders = self.ledger.net([('Long_4H_T1', 'close', None)], price=100.0)
+
+        self.assertEqual((orders[0]['side'], orders[0]['reduce'], orders[0]['quantity']), ('SELL', True, 0.3))
+        self.ledger.allocate(orders[0], 0.1, 100.0)
+        self.assertAlmostEqual(self.positions['Long_4H_T1']['filled'], 0.2)
+        self.ledger.allocate(orders[0], 0.2, 100.0)
+        self.assertIsNone(self.positions['Long_4H_T1'])
+        self.assertAlmostEqual(self.ledger.leg_quantity('LONG'), 0.4)
+
+    def test_unfilled_open_releases_slot(self):
+        """开仓订单未成交结束时释放槽位"""
+        orders = self.ledger.net([('Short_1H_R1', 'open', 0.2)], price=100.0)
+        self.assertEqual(self.positions['Short_1H_R1']['status'], 'pending')
+        self.ledger.release(orders[0])
+        self.assertIsNone(self.positions['Short_1H_R1'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,67 @@
+"""
+状态存储测试
+"""
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.state_store import StateStore
+
+
+class TestStateStore(unittest.TestCase):
+    """状态存储测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'state.db')
+        self.store = StateStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_position_survives_reopen(self):
+        """持仓写入后重新打开数据库仍可读取，空仓删除记录"""
+        self.store.save_position('LongTerm', 'BTC/USDT', {'side': 'long', 'amount': 0.5, 'entry_price': 100.0})
+        self.store.close()
+        self.store = StateStore(self.path)
+        self.assertEqual(self.store.load_position('LongTerm', 'BTC/USDT')['amount'], 0.5)
+
+        self.store.save_position('LongTerm', 'BTC/USDT', None)
+        self.assertIsNone(self.store.load_position('LongTerm', 'BTC/USDT'))
+
+    def test_transaction_rolls_back_all_writes(self):
+        """事务中出现异常时，持仓与成交都不写入"""
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.save_position('ShortTerm', 'BTC/USDT', {'side': 'short', 'amount': 1, 'entry_price': 1})
+                self.store.record_fill('BTC/USDT', 'sell', 1, 1, strategy='ShortTerm')
+                raise RuntimeError('crash')
+        self.assertIsNone(self.store.load_position('ShortTerm', 'BTC/USDT'))
+        self.assertEqual(self.store.fills(strategy='ShortTerm'), [])
+
+    def test_signal_recorded_once_per_bar(self):
+        """同一根K线的同一信号只能记录一次"""
+        self.assertTrue(self.store.record_signal('LongTerm', 'BTC/USDT', 1700000000000, 'LONG'))
+        self.assertFalse(self.store.record_signal('LongTerm', 'BTC/USDT', 1700000000000, 'LONG'))
+        self.assertTrue(self.store.record_signal('LongTerm', 'BTC/USDT', 1700003600000, 'SHORT'))
+        self.assertTrue(self.store.has_signal('LongTerm', 'BTC/USDT', 1700003600000, 'SHORT'))
+        self.assertFalse(self.store.has_signal('ShortTerm', 'BTC/USDT', 1700003600000, 'SHORT'))
+
+    def test_json_position_file_is_migrated(self):
+        """旧的 JSON 持仓文件导入后重命名"""
+        json_path = os.path.join(self.tmpdir.name, 'long_term_position_BTC_USDT.json')
+        with open(json_path, 'w') as f:
+            json.dump({'side': 'long', 'amount': 2, 'entry_price': 50}, f)
+        self.assertTrue(self.store.import_json_position('LongTerm', 'BTC/USDT', json_path))
+        self.assertFalse(os.path.exists(json_path))
+        self.assertEqual(self.store.load_position('LongTerm', 'BTC/USDT')['side'], 'long')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,73 @@
+"""
+交易配置缓存测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution.trading_context import TradingContext, TradingContextCache, TICK_SIZE
+
+MARKET = {
+    'precision': {'amount': 0.001, 'price': 0.1},
+    'limits': {'amount': {'min': 0.001}, 'cost': {'min': 100}},
+}
+
+
+class FakeExchange:
+    """返回固定杠杆响应、记录市场信息加载次数的交易所"""
+
+    precisionMode = TICK_SIZE
+
+    def __init__(self):
+        self.markets = {'BTC/USDT': MARKET}
+        self.reloads = 0
+
+    def fapiPrivateGetPositionSideDual(self, params):
+        return {'dualSidePosition': True}
+
+    def fapiPrivatePostLeverage(self, params):
+        return {'maxNotionalValue': '1000000'}
+
+    def fapiPrivatePostMarginType(self, params):
+        return {}
+
+    def load_markets(self, reload=False):
+        self.reloads += 1
+        self.markets = {'BTC/USDT': {**MARKET, 'limits': {'amount': {'min': 0.001}, 'cost': {'min': 5}}}}
+        return self.markets
+
+
+class TestTradingContext(unittest.TestCase):
+    """交易配置缓存测试类"""
+
+    def test_order_rules_from_market(self):
+        """数量向下取整到步长、价格取整到最小变动价位，不足最小名义价值时补足数量"""
+        context = TradingContext('BTC/USDT', 5, 'CROSSED', True, market=MARKET, precision_mode=TICK_SIZE)
+        self.assertEqual(context.round_amount(0.0019), 0.001)
+        self.assertEqual(context.round_price(65432.17), 65432.2)
+        self.assertEqual(context.order_quantity(100, 65000), 0.002)
+        self.assertEqual(context.order_quantity(1000, 65000), 0.015)
+
+        # 小数位数精度模式
+        decimals = TradingContext('ETH/USDT', 5, 'CROSSED', True,
+                                  market={'precision': {'amount': 3, 'price': 2}}, precision_mode=2)
+        self.assertEqual(decimals.round_amount(0.3), 0.3)
+        self.assertEqual(decimals.round_price(3000.128), 3000.13)
+
+    def test_rule_error_reloads_markets(self):
+        """精度/名义价值错误使缓存失效，下次设置前重新加载市场信息"""
+        exchange = FakeExchange()
+        cache = TradingContextCache(exchange)
+        self.assertEqual(cache.ensure('BTC/USDT').min_order_notional, 100)
+
+        self.assertTrue(cache.handle_error('BTC/USDT', Exception('binance {"code":-4164,"msg":"notional"}')))
+        self.assertEqual(cache.rules('BTC/USDT').min_order_notional, 100)
+        self.assertEqual(cache.ensure('BTC/USDT').min_order_notional, 5)
+        self.assertEqual(exchange.reloads, 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
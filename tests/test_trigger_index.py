@@ -0,0 +1,98 @@
+"""
+价格触发索引测试
+"""
+import unittest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.position_manager import UnifiedPositionManager
+from common.risk_controller import RiskController
+from common.risk_engine import RiskEngine
+from common.trigger_index import ABOVE, BELOW, TriggerIndex
+from monitoring.metrics_registry import MetricsRegistry
+
+
+class TestTriggerIndex(unittest.TestCase):
+    """触发索引测试类"""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.index = TriggerIndex(registry=self.registry)
+        self.fired = []
+
+    def record(self, trigger, price):
+        self.fired.append((trigger.tag, price))
+
+    def test_fixed_levels_fire_once_when_crossed(self):
+        """只弹出已穿越的触发价，其余保留；触发后不再重复触发"""
+        for level in (90.0, 95.0, 98.0):
+            self.index.add('BTC/USDT', BELOW, self.record, price=level, tag=f'stop{level:.0f}')
+        self.index.add('BTC/USDT', ABOVE, self.record, price=105.0, tag='tp105')
+        self.index.add('ETH/USDT', BELOW, self.record, price=1000.0, tag='eth')
+
+        self.index.on_price('BTC/USDT', 96.0)
+        self.assertEqual(self.fired, [('stop98', 96.0)])
+        self.assertEqual(self.index.nearest('BTC/USDT'), (95.0, 105.0))
+
+        self.index.on_price('BTC/USDT', 106.0)
+        self.index.on_price('BTC/USDT', 96.0)
+        self.assertEqual([tag for tag, _ in self.fired], ['stop98', 'tp105'])
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.registry.histogram('trigger_eval_seconds').count, 3)
+
+    def test_trailing_stop_moves_with_new_extremes(self):
+        """移动止损随新高上移、随新低下移，回撤达到比例时触发；撤销后不再触发"""
+        long_id = self.index.add('BTC/USDT', BELOW, self.record, trail_pct=0.05, anchor=100.0, tag='long')
+        self.index.add('BTC/USDT', ABOVE, self.record, trail_pct=0.05, anchor=100.0, tag='short')
+
+        self.index.on_price('BTC/USDT', 120.0)
+        self.assertAlmostEqual(self.index.triggers[long_id].price, 114.0)
+        self.assertEqual(self.fired, [('short', 120.0)])
+
+        self.index.on_price('BTC/USDT', 116.0)
+        self.assertEqual(len(self.fired), 1)
+        self.index.on_price('BTC/USDT', 113.0)
+        self.assertEqual(self.fired[-1], ('long', 113.0))
+
+        trailing_id = self.index.add('BTC/USDT', BELOW, self.record, trail_pct=0.05, anchor=100.0, tag='removed')
+        self.assertTrue(self.index.remove(trailing_id))
+        self.index.on_price('BTC/USDT', 50.0)
+        self.assertEqual(len(self.fired), 2)
+        self.assertEqual(len(self.index.books['BTC/USDT'].trail_below), 0)
+
+    def test_trailing_anchor_ties_keep_order(self):
+        """锚点移到与未移动的锚点相同的价格后仍保持有序，撤销的移动止损不会再触发"""
+        first = self.index.add('BTC/USDT', BELOW, self.record, trail_pct=0.05, anchor=100.0, tag='first')
+        self.index.add('BTC/USDT', BELOW, self.record, trail_pct=0.05, anchor=99.0, tag='second')
+
+        self.index.on_price('BTC/USDT', 100.0)
+        anchors = self.index.books['BTC/USDT'].trail_below
+        self.assertEqual([entry[:2] for entry in anchors], sorted(entry[:2] for entry in anchors))
+        self.assertTrue(self.index.remove(first))
+        self.assertEqual([entry[2].tag for entry in anchors], ['second'])
+
+        self.index.on_price('BTC/USDT', 120.0)
+        self.index.on_price('BTC/USDT', 50.0)
+        self.assertEqual(self.fired, [('second', 50.0)])
+
+    def test_risk_engine_emergency_stop(self):
+        """风控引擎按持仓登记紧急止损，价格穿越时交给风控控制器"""
+        manager = UnifiedPositionManager()
+        controller = RiskController(manager, exchange=None)
+        handled = []
+        controller.handle_anomalies = handled.extend
+        engine = RiskEngine(manager, controller=controller, registry=self.registry)
+        engine.attach_trigger_index(self.index, 'BTC/USDT')
+
+        manager.update_position('long_term', 'LONG', 20.0, 100.0, 'open')
+        self.assertEqual(self.index.nearest('BTC/USDT'), (95.0, None))
+        self.index.on_price('BTC/USDT', 94.0)
+        self.assertEqual([a['type'] for a in handled], ['emergency_stop_loss'])
+        self.assertEqual(handled[0]['data']['strategy'], 'long_term')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,207 @@
+"""
+K线收盘事件调度器 - 以交易所服务器时间驱动
+
+- 每个时间周期的每根已收盘K线只触发一次，不依赖本地 datetime.now()
+- 多个周期在同一时刻收盘（如 5m 与 15m 的整刻）时合并为一次触发
+- 到点后以自适应退避探测交易所，确认K线确实已收盘后再触发
+- 记录每次触发相对收盘时刻的延迟；任务启动晚了也会补触发，不会静默错过
+"""
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from config.config import BAR_SCHEDULER_CONFIG
+
+# 时间周期对应的毫秒数
+TIMEFRAME_MS = {
+    '1m': 60000, '3m': 180000, '5m': 300000, '15m': 900000, '30m': 1800000,
+    '1h': 3600000, '2h': 7200000, '4h': 14400000, '6h': 21600000,
+    '8h': 28800000, '12h': 43200000, '1d': 86400000,
+}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """将币安时间周期转换为毫秒"""
+    if timeframe not in TIMEFRAME_MS:
+        raise ValueError(f"不支持的调度时间周期: {timeframe}")
+    return TIMEFRAME_MS[timeframe]
+
+
+class BarCloseEvent:
+    """一次K线收盘触发"""
+
+    __slots__ = ('close_time_ms', 'timeframes', 'fired_at_ms', 'lateness_ms', 'probe_attempts',
+                 'confirmed', 'missed_bars')
+
+    def __init__(self, close_time_ms: int, timeframes: List[str], fired_at_ms: int, probe_attempts: int,
+                 confirmed: bool, missed_bars: Dict[str, int]):
+        self.close_time_ms = close_time_ms
+        self.timeframes = timeframes
+        self.fired_at_ms = fired_at_ms
+        self.lateness_ms = fired_at_ms - close_time_ms
+        self.probe_attempts = probe_attempts
+        self.confirmed = confirmed
+        self.missed_bars = missed_bars
+
+    def __repr__(self):
+        return (f"BarCloseEvent(close={self.close_time_ms}, timeframes={self.timeframes}, "
+                f"lateness={self.lateness_ms}ms, probes={self.probe_attempts}, confirmed={self.confirmed})")
+
+
+class BarCloseScheduler:
+    """基于服务器时间的K线收盘调度器"""
+
+    def __init__(self, clock: Callable[[], int], timeframes: List[str], callback: Callable[[BarCloseEvent], None],
+                 probe: Optional[Callable[[str, int], bool]] = None, config: Optional[Dict] = None,
+                 wait: Optional[Callable[[float], bool]] = None):
+        """
+        Args:
+            clock: 返回交易所服务器时间(毫秒)的函数，如 DataFetcher.get_timestamp
+            timeframes: 需要调度的时间周期列表，重复项会被合并
+            callback: 收盘触发回调，参数为 BarCloseEvent
+            probe: 收盘确认函数 probe(timeframe, close_time_ms) -> bool，None 表示不探测
+            config: 调度参数，默认使用 BAR_SCHEDULER_CONFIG
+            wait: 休眠函数 wait(seconds) -> 是否收到停止信号，默认基于内部 Event
+        """
+        self.clock = clock
+        self.timeframes = sorted(set(timeframes), key=timeframe_to_ms)
+        self.callback = callback
+        self.probe = probe
+        self.config = dict(BAR_SCHEDULER_CONFIG)
+        if config:
+            self.config.update(config)
+        self._stop_event = threading.Event()
+        self._wait = wait or self._stop_event.wait
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        # 每个周期最近一次已触发的收盘时刻，启动时以当前时间为基准，不补触发启动前的K线
+        now = self.clock()
+        self.last_fired = {tf: (now // timeframe_to_ms(tf)) * timeframe_to_ms(tf) for tf in self.timeframes}
+        self.stats = {tf: {'fired': 0, 'missed': 0, 'total_lateness_ms': 0, 'max_lateness_ms': 0}
+                      for tf in self.timeframes}
+
+    def pending_close(self, now: int):
+        """
+        计算下一次应触发的收盘时刻及在该时刻收盘的周期
+
+        Returns:
+            tuple: (收盘时刻毫秒, 周期列表)
+        """
+        due = {}
+        for tf in self.timeframes:
+            tf_ms = timeframe_to_ms(tf)
+            latest_close = (now // tf_ms) * tf_ms
+            # 已过收盘时刻但尚未触发的，立即补触发最近一根；否则等待下一根
+            due[tf] = latest_close if latest_close > self.last_fired[tf] else latest_close + tf_ms
+        close_time = min(due.values())
+        return close_time, [tf for tf in self.timeframes if due[tf] == close_time]
+
+    def _sleep_until(self, target_ms: int) -> bool:
+        """按服务器时间等待到目标时刻，返回 False 表示收到停止信号"""
+        max_slice = self.config['max_wait_slice_ms']
+        while True:
+            remaining = target_ms - self.clock()
+            if remaining <= 0:
+                return True
+            if self._wait(min(remaining, max_slice) / 1000.0):
+                return False
+
+    def _confirm_close(self, timeframes: List[str], close_time_ms: int):
+        """自适应探测交易所，直到所有周期的K线都确认收盘或超时"""
+        if self.probe is None:
+            return 0, True
+
+        delay = self.config['probe_initial_delay_ms']
+        deadline = self.clock() + self.config['probe_timeout_ms']
+        pending = list(timeframes)
+        attempts = 0
+        while pending:
+            attempts += 1
+            try:
+                pending = [tf for tf in pending if not self.probe(tf, close_time_ms)]
+            except Exception as e:
+                self.logger.warning(f"收盘确认探测失败: {e}")
+            if not pending:
+                return attempts, True
+            if self.clock() + delay > deadline:
+                self.logger.warning(f"K线收盘确认超时: {pending} @ {close_time_ms}，仍然触发")
+                return attempts, False
+            if self._wait(delay / 1000.0):
+                return attempts, False
+            delay = min(delay * 2, self.config['probe_max_delay_ms'])
+        return attempts, True
+
+    def run_once(self) -> Optional[BarCloseEvent]:
+        """等待并触发下一次收盘事件，收到停止信号时返回 None"""
+        close_time, timeframes = self.pending_close(self.clock())
+        if not self._sleep_until(close_time):
+            return None
+
+        attempts, confirmed = self._confirm_close(timeframes, close_time)
+        if self._stop_event.is_set():
+            return None
+
+        missed = {}
+        for tf in timeframes:
+            tf_ms = timeframe_to_ms(tf)
+            skipped = max(0, (close_time - self.last_fired[tf]) // tf_ms - 1)
+            if skipped:
+                missed[tf] = skipped
+            self.last_fired[tf] = close_time
+
+        event = BarCloseEvent(close_time, timeframes, self.clock(), attempts, confirmed, missed)
+        for tf in timeframes:
+            stats = self.stats[tf]
+            stats['fired'] += 1
+            stats['missed'] += missed.get(tf, 0)
+            stats['total_lateness_ms'] += event.lateness_ms
+            stats['max_lateness_ms'] = max(stats['max_lateness_ms'], event.lateness_ms)
+
+        if missed:
+            self.logger.warning(f"调度滞后，已跳过的K线数: {missed}，仅对最近收盘K线触发一次")
+        if event.lateness_ms > self.config['late_warning_ms']:
+            self.logger.warning(f"K线收盘触发延迟过大: {event}")
+        else:
+            self.logger.info(f"K线收盘触发: {event}")
+
+        try:
+            self.callback(event)
+        except Exception as e:
+            self.logger.error(f"K线收盘回调执行失败: {e}")
+        return event
+
+    def run_forever(self):
+        """循环调度直到 stop() 被调用"""
+        while not self._stop_event.is_set():
+            self.run_once()
+
+    def stop(self):
+        """停止调度"""
+        self._stop_event.set()
+
+    def get_lateness_report(self) -> Dict[str, Dict[str, float]]:
+        """各周期的触发次数、跳过次数与平均/最大延迟(毫秒)"""
+        report = {}
+        for tf, stats in self.stats.items():
+            fired = stats['fired']
+            report[tf] = {
+                'fired': fired,
+                'missed': stats['missed'],
+                'avg_lateness_ms': stats['total_lateness_ms'] / fired if fired else 0.0,
+                'max_lateness_ms': stats['max_lateness_ms'],
+            }
+        return report
+
+
+def make_kline_probe(exchange, symbol: str):
+    """
+    构造K线收盘确认探测函数
+
+    交易所返回的最新K线开盘时间不早于收盘时刻，说明上一根K线已经收盘定型。
+    每次探测只请求最近2根K线，权重最低。
+    """
+    def probe(timeframe: str, close_time_ms: int) -> bool:
+        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=2)
+        return bool(ohlcv) and ohlcv[-1][0] >= close_time_ms
+
+    return probe
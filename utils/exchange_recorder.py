@@ -0,0 +1,317 @@
+"""
+交易所流量录制与回放工具
+
+在 ccxt 的传输层（exchange.fetch）上挂钩：
+- record 模式：透传请求到交易所，并把每一次请求/响应追加写入紧凑的索引文件
+- replay 模式：不访问网络，按录制顺序确定性地返回响应，且关闭限速等待
+
+录制文件格式（.dmrrec）：
+    MAGIC | 记录块... | 索引块 | 页脚(索引偏移 + 记录数 + FOOTER_MAGIC)
+每个记录块为 4 字节长度前缀 + zlib 压缩的 JSON。
+索引把归一化后的请求键映射到记录偏移列表，回放时按键顺序取用。
+若录制进程异常退出未写入索引，读取时会顺序扫描记录块重建索引。
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from config.config import EXCHANGE_TRAFFIC_CONFIG
+
+MAGIC = b'DMRREC1\n'
+FOOTER_MAGIC = b'DMRIDX1\n'
+_LENGTH = struct.Struct('>I')
+_FOOTER = struct.Struct('>QI')
+
+# 每次请求都会变化的签名类参数，不参与请求键计算
+VOLATILE_PARAMS = {'timestamp', 'signature', 'recvWindow'}
+
+# 当前进程的流量模式，可由 configure_traffic 覆盖配置文件
+_traffic_settings = {
+    'mode': EXCHANGE_TRAFFIC_CONFIG['mode'],
+    'path': EXCHANGE_TRAFFIC_CONFIG['path'],
+}
+_sessions: Dict[str, Any] = {}
+_sessions_lock = threading.Lock()
+
+
+def _normalize_params(raw: Optional[str]) -> str:
+    """去掉易变参数并排序，得到稳定的参数串"""
+    if not raw:
+        return ''
+    pairs = [(k, v) for k, v in parse_qsl(raw, keep_blank_values=True) if k not in VOLATILE_PARAMS]
+    return urlencode(sorted(pairs))
+
+
+def normalize_request(method: str, url: str, body: Any = None) -> str:
+    """
+    生成请求键
+
+    Args:
+        method: HTTP方法
+        url: 完整请求URL（含查询参数）
+        body: 请求体（币安签名接口为表单编码字符串）
+
+    Returns:
+        str: 与时间戳、签名无关的请求键
+    """
+    parts = urlsplit(url)
+    body_key = _normalize_params(body) if isinstance(body, str) else ''
+    return f"{method.upper()} {parts.netloc}{parts.path}?{_normalize_params(parts.query)}|{body_key}"
+
+
+class ExchangeRecorder:
+    """把交易所请求/响应写入录制文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index: Dict[str, List[int]] = {}
+        self.ticks: List[Dict[str, Any]] = []
+        self.record_count = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+
+    def _append(self, record: Dict[str, Any]) -> int:
+        payload = zlib.compress(json.dumps(record, separators=(',', ':'), default=str).encode('utf-8'))
+        offset = self._file.tell()
+        self._file.write(_LENGTH.pack(len(payload)))
+        self._file.write(payload)
+        self.record_count += 1
+        return offset
+
+    def record(self, key: str, method: str, url: str, response: Any = None, error: Optional[BaseException] = None,
+               elapsed_ms: float = 0.0):
+        """追加一条请求/响应记录"""
+        record = {
+            'k': key,
+            'm': method,
+            'u': url.split('?')[0],
+            'r': response,
+            'e': None if error is None else [error.__class__.__name__, str(error)],
+            't': int(time.time() * 1000),
+            'ms': round(elapsed_ms, 3),
+            'tick': len(self.ticks),
+        }
+        with self._lock:
+            offset = self._append(record)
+            self.index.setdefault(key, []).append(offset)
+
+    def mark_tick(self, label: str, **fields):
+        """记录一次策略调度边界，回放时据此还原调度次数；fields 为调度参数（如收盘周期）"""
+        with self._lock:
+            tick = {'label': label, 't': int(time.time() * 1000), 'seq': self.record_count, **fields}
+            self.ticks.append(tick)
+            self._append({'tick_marker': tick})
+            self._file.flush()
+
+    def close(self):
+        """写入索引与页脚"""
+        with self._lock:
+            if self._file.closed:
+                return
+            index_payload = zlib.compress(json.dumps(
+                {'index': self.index, 'ticks': self.ticks}, separators=(',', ':')
+            ).encode('utf-8'))
+            index_offset = self._file.tell()
+            self._file.write(_LENGTH.pack(len(index_payload)))
+            self._file.write(index_payload)
+            self._file.write(_FOOTER.pack(index_offset, self.record_count))
+            self._file.write(FOOTER_MAGIC)
+            self._file.close()
+            print(f"流量录制已保存: {self.path}, 共 {self.record_count} 条记录, {len(self.ticks)} 次调度")
+
+
+class ExchangeReplayer:
+    """从录制文件确定性地回放交易所响应"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._data = f.read()
+        if not self._data.startswith(MAGIC):
+            raise ValueError(f"不是有效的流量录制文件: {path}")
+        self.index, self.ticks = self._load_index()
+        self._cursors: Dict[str, int] = {}
+        # 录制记录已用尽后仍被请求的次数（按请求键），说明回放偏离了录制时的调用序列
+        self.exhausted: Dict[str, int] = {}
+        self._cache: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _read_block(self, offset: int) -> Dict[str, Any]:
+        (length,) = _LENGTH.unpack_from(self._data, offset)
+        start = offset + _LENGTH.size
+        return json.loads(zlib.decompress(self._data[start:start + length]))
+
+    def _load_index(self):
+        footer_size = _FOOTER.size + len(FOOTER_MAGIC)
+        if len(self._data) >= len(MAGIC) + footer_size and self._data.endswith(FOOTER_MAGIC):
+            index_offset, _ = _FOOTER.unpack_from(self._data, len(self._data) - footer_size)
+            meta = self._read_block(index_offset)
+            return meta['index'], meta['ticks']
+
+        # 录制未正常结束，顺序扫描重建索引
+        print(f"录制文件缺少索引，正在扫描重建: {self.path}")
+        index, ticks = {}, []
+        offset = len(MAGIC)
+        while offset + _LENGTH.size <= len(self._data):
+            (length,) = _LENGTH.unpack_from(self._data, offset)
+            if offset + _LENGTH.size + length > len(self._data):
+                break  # 尾部残缺的记录块
+            block = self._read_block(offset)
+            if 'tick_marker' in block:
+                ticks.append(block['tick_marker'])
+            else:
+                index.setdefault(block['k'], []).append(offset)
+            offset += _LENGTH.size + length
+        return index, ticks
+
+    def next_response(self, key: str) -> Dict[str, Any]:
+        """
+        取出该请求键的下一条录制记录
+
+        同一请求键按录制顺序依次返回；用尽后重复返回最后一条，
+        保证回放期间额外的重复查询（如重试）也能得到确定结果，
+        同时按键计入 exhausted 并在首次用尽时告警。
+        """
+        offsets = self.index.get(key)
+        if not offsets:
+            raise KeyError(f"录制文件中没有该请求: {key}")
+        with self._lock:
+            position = self._cursors.get(key, 0)
+            self._cursors[key] = position + 1
+            if position >= len(offsets):
+                self.exhausted[key] = self.exhausted.get(key, 0) + 1
+                if self.exhausted[key] == 1:
+                    print(f"警告: 录制记录已用尽，重复返回最后一条响应: {key}")
+        offset = offsets[min(position, len(offsets) - 1)]
+        record = self._cache.get(offset)
+        if record is None:
+            record = self._read_block(offset)
+            self._cache[offset] = record
+        return record
+
+    def close(self):
+        """回放无需落盘，保留接口与录制器一致"""
+        pass
+
+
+def configure_traffic(mode: str, path: Optional[str] = None):
+    """
+    覆盖当前进程的流量模式
+
+    Args:
+        mode: 'live'、'record' 或 'replay'
+        path: 录制文件路径，默认使用配置文件中的路径
+    """
+    if mode not in ('live', 'record', 'replay'):
+        raise ValueError(f"未知的流量模式: {mode}")
+    _traffic_settings['mode'] = mode
+    if path:
+        _traffic_settings['path'] = path
+
+
+def traffic_mode() -> str:
+    """当前进程的流量模式：'live'、'record' 或 'replay'"""
+    return _traffic_settings['mode']
+
+
+def get_traffic_session():
+    """获取当前进程共享的录制器/回放器，live 模式返回 None"""
+    mode = _traffic_settings['mode']
+    if mode == 'live':
+        return None
+    path = _traffic_settings['path']
+    with _sessions_lock:
+        session = _sessions.get(path)
+        if session is None:
+            session = ExchangeRecorder(path) if mode == 'record' else ExchangeReplayer(path)
+            _sessions[path] = session
+        return session
+
+
+def _raise_recorded_error(error: List[str]):
+    """按录制的异常类型重新抛出，保持上层错误处理路径一致"""
+    import ccxt
+    name, message = error
+    error_class = getattr(ccxt, name, None)
+    if not (isinstance(error_class, type) and issubclass(error_class, Exception)):
+        error_class = ccxt.ExchangeError
+    raise error_class(message)
+
+
+def attach_traffic_hooks(exchange):
+    """
+    按当前流量模式为 ccxt 交易所实例挂钩传输层
+
+    同一进程内的所有实例（DataFetcher、各执行器内部的数据获取器）共享同一个录制文件。
+    """
+    session = get_traffic_session()
+    if session is None:
+        return exchange
+
+    original_fetch = exchange.fetch
+
+    if isinstance(session, ExchangeRecorder):
+        def recording_fetch(url, method='GET', headers=None, body=None):
+            key = normalize_request(method, url, body)
+            started = time.perf_counter()
+            try:
+                response = original_fetch(url, method, headers, body)
+            except Exception as e:
+                session.record(key, method, url, error=e, elapsed_ms=(time.perf_counter() - started) * 1000)
+                raise
+            session.record(key, method, url, response=response, elapsed_ms=(time.perf_counter() - started) * 1000)
+            return response
+
+        exchange.fetch = recording_fetch
+    else:
+        def replay_fetch(url, method='GET', headers=None, body=None):
+            record = session.next_response(normalize_request(method, url, body))
+            if record['e']:
+                _raise_recorded_error(record['e'])
+            return record['r']
+
+        exchange.fetch = replay_fetch
+        # 回放时不需要限速等待
+        exchange.enableRateLimit = False
+
+    return exchange
+
+
+def mark_tick(label: str, **fields):
+    """在录制模式下标记一次策略调度"""
+    session = get_traffic_session()
+    if isinstance(session, ExchangeRecorder):
+        session.mark_tick(label, **fields)
+
+
+def recorded_ticks() -> List[Dict[str, Any]]:
+    """回放模式下返回录制时的调度列表"""
+    session = get_traffic_session()
+    if isinstance(session, ExchangeReplayer):
+        return session.ticks
+    return []
+
+
+def exhausted_requests() -> Dict[str, int]:
+    """回放模式下录制记录用尽后仍被请求的请求键及次数"""
+    session = get_traffic_session()
+    if isinstance(session, ExchangeReplayer):
+        return dict(session.exhausted)
+    return {}
+
+
+def close_traffic_sessions():
+    """关闭所有录制/回放会话（录制模式会写入索引）"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -1,6 +1,9 @@
 import logging
 from config.config import LOG_LEVEL, LOG_FILE
 
+# 已配置的日志记录器及其日志文件，重复调用时直接复用
+_configured_loggers = {}
+
 def setup_logger(name=None, log_file=None):
     """设置日志记录器
     
@@ -12,9 +15,16 @@ def setup_logger(name=None, log_file=None):
     log_file_path = log_file if log_file else LOG_FILE
     
     logger = logging.getLogger(logger_name)
+    
+    # 同名、同文件的记录器已配置过，直接复用，避免每次调度重建文件处理器
+    if _configured_loggers.get(logger_name) == log_file_path and logger.handlers:
+        return logger
+    
     logger.setLevel(LOG_LEVEL)
     
-    # 清除现有的处理器，避免重复添加
+    # 关闭并清除现有的处理器，避免重复添加和文件句柄泄漏
+    for handler in list(logger.handlers):
+        handler.close()
     logger.handlers.clear()
 
     file_handler = logging.FileHandler(log_file_path)
@@ -29,5 +39,6 @@ def setup_logger(name=None, log_file=None):
 
     logger.addHandler(file_handler)
     logger.addHandler(console_handler)
+    _configured_loggers[logger_name] = log_file_path
 
     return logger
\ No newline at end of file